@@ -1,6 +1,7 @@
 import os
 import numpy as np
 import json
+import ragged_store
 
 #@todo, get rid of json and pass all variable here
 # the idea here is to use the same code with abritrary sets of data
@@ -8,22 +9,38 @@ with open(os.environ['DATA_CONFIG'], 'rb') as handle:
     config = json.load(handle)
 
 pad_index = config['pad_index']
-max_seq_len = int(os.environ['MAX_SEQ_LEN']) 
-samples = np.load(os.environ['DATA_PATH'], allow_pickle=True)
+max_seq_len = int(os.environ['MAX_SEQ_LEN'])
+
+# Memory-map the ragged store if the data has been converted (see
+# ragged_store.py), otherwise load the pickled sequences
+data_path = os.environ['DATA_PATH']
+if ragged_store.exists(ragged_store.store_prefix(data_path)):
+    tokens, offsets = ragged_store.load(ragged_store.store_prefix(data_path))
+    samples = None
+else:
+    samples = np.load(data_path, allow_pickle=True)
+
+# Reusable sample buffer
+# Note: The data reader copies each sample before requesting the next
+# one, and float32 samples are copied without a Python loop.
+buffer = np.empty(max_seq_len, dtype=np.float32)
 
 
 # Sample access functions
 def get_sample(index):
-    sample = samples[index]
-    if len(sample) < max_seq_len:
-        sample = np.concatenate((sample, np.full(max_seq_len-len(sample), pad_index)))
+    if samples is None:
+        sample = tokens[offsets[index]:offsets[index+1]]
     else:
-        sample = np.resize(sample, max_seq_len)
-    return sample
+        sample = samples[index]
+
+    # Pad or truncate to max_seq_len
+    length = min(len(sample), max_seq_len)
+    buffer[:length] = sample[:length]
+    buffer[length:] = pad_index
+    return buffer
 
 def num_samples():
-    return samples.shape[0]
+    return len(offsets) - 1 if samples is None else samples.shape[0]
 
 def sample_dims():
     return [max_seq_len]
-
@@ -0,0 +1,97 @@
+"""Ragged storage for tokenized SMILES sequences.
+
+A dataset of variable-length token sequences is stored as two NumPy
+files that can be memory-mapped:
+
+    PREFIX.tokens.npy   tokens of all sequences, concatenated
+    PREFIX.offsets.npy  int64 start of each sequence in the tokens,
+                        followed by the total number of tokens
+
+so sequence i is tokens[offsets[i]:offsets[i+1]]. Unlike a pickled
+object array, the store is not loaded into every data reader process
+and its pages are shared between processes on a node.
+
+Convert an existing dataset with
+
+    python3 ragged_store.py DATA.npy [PREFIX]
+
+PREFIX defaults to DATA, so dataset.py finds the store next to the
+original file.
+
+"""
+import argparse
+import os.path
+import numpy as np
+
+def store_prefix(data_path):
+    """Default prefix of the ragged store for a .npy dataset."""
+    return os.path.splitext(data_path)[0]
+
+def exists(prefix):
+    return os.path.isfile(prefix + '.offsets.npy')
+
+def token_dtype(max_token):
+    """Narrowest integer type that holds every token."""
+    for dtype in (np.uint8, np.uint16, np.int32):
+        if max_token <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def write(sequences, prefix, chunk_size=1<<16):
+    """Write sequences as a ragged store.
+
+    Args:
+        sequences (sequence of array): Token sequences.
+        prefix (str): Path prefix of the store files.
+        chunk_size (int): Number of sequences concatenated at a time.
+
+    """
+    lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64,
+                          count=len(sequences))
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    max_token = max((int(np.max(s)) for s in sequences if len(s)),
+                    default=0)
+    tokens = np.lib.format.open_memmap(prefix + '.tokens.npy', mode='w+',
+                                       dtype=token_dtype(max_token),
+                                       shape=(int(offsets[-1]),))
+    for first in range(0, len(sequences), chunk_size):
+        last = min(first + chunk_size, len(sequences))
+        if offsets[last] > offsets[first]:
+            tokens[offsets[first]:offsets[last]] = np.concatenate(
+                [np.asarray(s) for s in sequences[first:last]])
+    tokens.flush()
+    del tokens
+
+    # Offsets are written last, since the store is detected by their presence
+    np.save(prefix + '.offsets.npy', offsets)
+
+def load(prefix):
+    """Memory-map a ragged store.
+
+    Returns:
+        (ndarray, ndarray): Tokens and offsets. The arrays are plain
+            ndarray views of the memory maps, which are cheaper to slice
+            than np.memmap objects.
+
+    """
+    return (np.asarray(np.load(prefix + '.tokens.npy', mmap_mode='r')),
+            np.asarray(np.load(prefix + '.offsets.npy', mmap_mode='r')))
+
+def convert(data_path, prefix=None):
+    """Convert a pickled object array of sequences to a ragged store."""
+    prefix = prefix or store_prefix(data_path)
+    write(np.load(data_path, allow_pickle=True), prefix)
+    return prefix
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Convert ATOM sequence data to a ragged store')
+    parser.add_argument('data_path', type=str,
+                        help='NumPy object array of token sequences')
+    parser.add_argument('prefix', type=str, nargs='?', default=None,
+                        help='path prefix of the store files '
+                        '(default: data_path without extension)')
+    args = parser.parse_args()
+    prefix = convert(args.data_path, args.prefix)
+    print('Wrote', prefix + '.tokens.npy', 'and', prefix + '.offsets.npy')
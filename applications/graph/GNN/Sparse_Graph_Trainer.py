@@ -1,5 +1,6 @@
 import lbann
 from lbann.modules.graph import GINConv, GCNConv, GraphConv, GatedGraphConv
+from lbann.modules.graph import PackedGraphParser, GraphPool
 from itertools import accumulate
 
 
@@ -182,12 +183,42 @@ def GATConvLayer(node_features,
                                   name = name)
     return graph_kernel(node_features,source_indices, target_indices)
 
+def Packed_Accuracy(probs, targets, max_graphs, num_classes):
+    """ Percentage of graphs in a pack whose target class has the highest
+        probability
+
+    Args:
+        probs (Layer): Class probabilities with shape (max_graphs, num_classes)
+        targets (Layer): One-hot targets with shape (max_graphs, num_classes),
+                         zero for padded graphs
+        max_graphs (int): Maximum number of graphs in a pack
+        num_classes (int): The number of classes in the target
+    Returns:
+        (Layer) : Accuracy in percent
+    """
+    ones = lbann.Constant(value = 1, num_neurons = [num_classes, 1],
+                          name = "Accuracy_Ones")
+    target_probs = lbann.MatMul(lbann.Multiply(probs, targets), ones,
+                                name = "Target_Probabilities")
+    target_probs = lbann.Tessellate(target_probs, dims = [max_graphs, num_classes])
+    is_max = lbann.GreaterEqualConstant(lbann.Subtract(target_probs, probs),
+                                        constant = 0)
+    correct = lbann.EqualConstant(lbann.MatMul(is_max, ones),
+                                  constant = num_classes)
+    num_graphs = lbann.Reduction(targets, mode = 'sum')
+    return lbann.Scale(lbann.SafeDivide(lbann.Reduction(correct, mode = 'sum'),
+                                        num_graphs),
+                       constant = 100,
+                       name = "Accuracy")
+
+
 def make_model(num_vertices = None,
                node_features = None,
                num_classes = None,
                kernel_type = 'GCN',
                callbacks = None,
-               num_epochs = 1):
+               num_epochs = 1,
+               packed = False):
     '''Construct a model DAG using one of the Graph Kernels
 
     Args:
@@ -201,6 +232,9 @@ def make_model(num_vertices = None,
                           GPU usage, training_output, and timer is reported.
                           (default: None)
         num_epochs (int): Number of epochs to run (default: 1)
+        packed (bool): Read several graphs per sample without per-graph padding
+                       (see lbann.modules.graph.packed). Requires the "Packed"
+                       data reader (default: False)
     Returns:
         (lbann.Model) : A model object with the supplied callbacks, dataset
                                presets, and graph kernels.
@@ -211,6 +245,12 @@ def make_model(num_vertices = None,
     node_feature_size = 3
     max_edges = 415
 
+    # Pack capacities, which must match data/PROTEINS/PROTEINS_Packed_Dataloader.py
+    max_graphs = 8
+    if packed:
+        num_vertices = 400
+        max_edges = 1600
+
     #----------------------------------
     # Reshape and Slice Input Tensor
     #----------------------------------
@@ -219,11 +259,19 @@ def make_model(num_vertices = None,
 
     # Input dimensions should be (num_vertices * node_features + num_vertices^2 + num_classes )
 
-    data = Graph_Data_Parser(input_,
-                             num_vertices,
-                             node_feature_size,
-                             max_edges,
-                             num_classes)
+    if packed:
+        data = PackedGraphParser(input_,
+                                 num_vertices,
+                                 node_feature_size,
+                                 max_edges,
+                                 max_graphs,
+                                 num_classes)
+    else:
+        data = Graph_Data_Parser(input_,
+                                 num_vertices,
+                                 node_feature_size,
+                                 max_edges,
+                                 num_classes)
 
     feature_matrix = data['node_features']
     source_indices = data['source_indices']
@@ -264,28 +312,43 @@ def make_model(num_vertices = None,
     # Apply Reduction on Node Features
     #----------------------------------
 
-    average_vector = lbann.Constant(value = 1/num_vertices,
-                                    num_neurons = [1,num_vertices],
-                                    name="Average_Vector")
+    if packed:
+        # Average the real nodes of each graph, then classify each graph
+        x = GraphPool(x, data['graph_indices'], [max_graphs, output_channels],
+                      name="Node_Feature_Reduction")
+        x = lbann.ChannelwiseFullyConnected(x, output_channel_dims = [64],
+                                            name = "hidden_layer_1")
+        x = lbann.Relu(x, name = "hidden_layer_1_activation")
+        x = lbann.ChannelwiseFullyConnected(x, output_channel_dims = [num_classes],
+                                            name="Output_Fully_Connected")
+
+        # Padded graphs have zero targets and do not contribute
+        probs = lbann.ChannelwiseSoftmax(x, name="Softmax")
+        loss = lbann.CrossEntropy(probs, target, name="Cross_Entropy_Loss")
+        accuracy = Packed_Accuracy(probs, target, max_graphs, num_classes)
+    else:
+        average_vector = lbann.Constant(value = 1/num_vertices,
+                                        num_neurons = [1,num_vertices],
+                                        name="Average_Vector")
 
-    x = lbann.MatMul(average_vector,x, name="Node_Feature_Reduction")
+        x = lbann.MatMul(average_vector,x, name="Node_Feature_Reduction")
 
-    # X is now a vector with output_channel dimensions
+        # X is now a vector with output_channel dimensions
 
-    x = lbann.Reshape(x, dims = [output_channels], name = "Squeeze")
-    x = lbann.FullyConnected(x, num_neurons = 64, name = "hidden_layer_1")
-    x = lbann.Relu(x, name = "hidden_layer_1_activation")
-    x = lbann.FullyConnected(x, num_neurons = num_classes,
-                                name="Output_Fully_Connected")
+        x = lbann.Reshape(x, dims = [output_channels], name = "Squeeze")
+        x = lbann.FullyConnected(x, num_neurons = 64, name = "hidden_layer_1")
+        x = lbann.Relu(x, name = "hidden_layer_1_activation")
+        x = lbann.FullyConnected(x, num_neurons = num_classes,
+                                    name="Output_Fully_Connected")
 
-    #----------------------------------
-    # Loss Function and Accuracy s
-    #----------------------------------
+        #----------------------------------
+        # Loss Function and Accuracy s
+        #----------------------------------
 
 
-    probs = lbann.Softmax(x, name="Softmax")
-    loss = lbann.CrossEntropy(probs, target, name="Cross_Entropy_Loss")
-    accuracy = lbann.CategoricalAccuracy(probs, target, name="Accuracy")
+        probs = lbann.Softmax(x, name="Softmax")
+        loss = lbann.CrossEntropy(probs, target, name="Cross_Entropy_Loss")
+        accuracy = lbann.CategoricalAccuracy(probs, target, name="Accuracy")
 
     layers = lbann.traverse_layer_graph(input_)
 
@@ -1,40 +1,35 @@
-import numpy as np 
-
-dataset = np.array(np.memmap("/p/vast1/zaman2/LBANN_Data.bin",
-            dtype='float32',
-            mode='r',
-            shape=(3045360,1101)))
+import os
+import numpy as np
+
+from lsc_memmap import compute_split_indices, load_memmap_dataset
+
+# The dataset is memory-mapped and samples are returned as views, so
+# reader processes share the page cache instead of each loading the
+# full dataset. Preprocess the raw sample matrix with lsc_memmap.py and
+# point LBANN_LSC_DATA_HEADER to the resulting JSON header.
+header_file = os.getenv('LBANN_LSC_DATA_HEADER',
+                        '/p/vast1/zaman2/LBANN_Data.json')
+if os.path.exists(header_file):
+  dataset, header = load_memmap_dataset(header_file)
+  split_indices = header['split_indices']
+else:
+  dataset = np.memmap("/p/vast1/zaman2/LBANN_Data.bin",
+                      dtype='float32',
+                      mode='r',
+                      shape=(3045360, 1101))
+  split_indices = compute_split_indices()
 
 def get_sample_func(index):
   return dataset[index]
 
 
 def num_samples_func():
-  return 3045360
+  return dataset.shape[0]
 
 
 def sample_dims_func():
-  return (1101, )
+  return dataset.shape[1:]
 
 
 if __name__ == '__main__':
-  split_indices = []
-
-  start_index = 0
-
-  split_indices.append(start_index)
-
-  node_features = [51 for i in range(1, 10) ]
-
-  split_indices.extend(node_features)
-
-  edge_features = [118 for i in range(1,4)]
-
-  split_indices.extend(edge_features)
-  misc = [118, 118, 1]
-  split_indices.extend(misc)
-
-
-  for i in range(1, len(split_indices)):
-    split_indices[i] = split_indices[i] + split_indices[i-1]
   print(split_indices)
@@ -0,0 +1,133 @@
+"""Out-of-core storage for the preprocessed LSC-PCQM4M dataset.
+
+Each sample is a flat float32 vector holding the node features, edge
+features, edge indices and target of one molecule graph, padded to the
+largest graph. The dataset is stored as a raw binary file whose data
+starts at a page boundary, plus a small JSON header describing its
+shape, dtype and the offsets of the sample fields (as sliced by the
+model). Readers memory-map the binary file and return samples as
+views, so the page cache is shared by every reader process on a node
+instead of each process holding its own copy of the dataset.
+
+Usage: python3 lsc_memmap.py <raw file> <output prefix>
+
+"""
+import argparse
+import json
+import os
+import os.path as osp
+import numpy as np
+
+PAGE_SIZE = 4096
+
+
+def compute_split_indices(num_nodes=51,
+                          num_edges=118,
+                          num_node_features=9,
+                          num_edge_features=3):
+  """Offsets of the fields in a sample vector.
+
+  A sample holds `num_node_features` blocks of node features,
+  `num_edge_features` blocks of edge features, the source and target
+  node of each edge, and the target value.
+  """
+  sizes = ([num_nodes] * num_node_features
+           + [num_edges] * num_edge_features
+           + [num_edges, num_edges, 1])
+  return [0] + np.cumsum(sizes).tolist()
+
+
+def write_memmap_dataset(data,
+                         output_prefix,
+                         split_indices,
+                         chunk_size=65536):
+  """Write a dataset in the page-aligned binary layout.
+
+  Writes `<output_prefix>.bin` and the header `<output_prefix>.json`.
+  `data` may itself be memory-mapped; it is copied in chunks of
+  `chunk_size` samples.
+  """
+  num_samples, sample_size = data.shape
+  if split_indices[-1] > sample_size:
+    raise ValueError(f'Split indices cover {split_indices[-1]} values, '
+                     f'but samples only have {sample_size} values')
+
+  data_file = output_prefix + '.bin'
+  header = {
+      'data_file': osp.basename(data_file),
+      'offset': PAGE_SIZE,
+      'dtype': np.dtype(data.dtype).str,
+      'num_samples': int(num_samples),
+      'sample_dims': [int(sample_size)],
+      'split_indices': [int(i) for i in split_indices],
+  }
+
+  # Header page is left empty so that sample data is page-aligned
+  out = np.memmap(data_file,
+                  dtype=data.dtype,
+                  mode='w+',
+                  offset=header['offset'],
+                  shape=(num_samples, sample_size))
+  for start in range(0, num_samples, chunk_size):
+    out[start:start + chunk_size] = data[start:start + chunk_size]
+  out.flush()
+  del out
+
+  # Header is written last so that readers never see a partial dataset
+  with open(output_prefix + '.json', 'w') as f:
+    json.dump(header, f, indent=2)
+  return output_prefix + '.json'
+
+
+def load_memmap_dataset(header_file):
+  """Memory-map a dataset written by `write_memmap_dataset`.
+
+  Returns the (num_samples x sample_size) read-only memmap and the
+  header dictionary.
+  """
+  with open(header_file, 'r') as f:
+    header = json.load(f)
+  data_file = osp.join(osp.dirname(osp.realpath(header_file)),
+                       header['data_file'])
+  data = np.memmap(data_file,
+                   dtype=np.dtype(header['dtype']),
+                   mode='r',
+                   offset=header['offset'],
+                   shape=(header['num_samples'], *header['sample_dims']))
+  return data, header
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(
+      description='Convert the raw LSC-PCQM4M sample matrix to the '
+      'memory-mapped layout')
+  parser.add_argument('raw_file', type=str,
+                      help='raw float32 sample matrix', metavar='FILE')
+  parser.add_argument('output_prefix', type=str,
+                      help='output prefix (writes PREFIX.bin and PREFIX.json)',
+                      metavar='PREFIX')
+  parser.add_argument('--sample-size', action='store', default=1101,
+                      type=int, help='values per sample (default: 1101)',
+                      metavar='NUM')
+  parser.add_argument('--num-nodes', action='store', default=51, type=int,
+                      help='number of nodes (default: 51)', metavar='NUM')
+  parser.add_argument('--num-edges', action='store', default=118, type=int,
+                      help='number of edges (default: 118)', metavar='NUM')
+  parser.add_argument('--num-node-features', action='store', default=9,
+                      type=int, help='number of node features (default: 9)',
+                      metavar='NUM')
+  parser.add_argument('--num-edge-features', action='store', default=3,
+                      type=int, help='number of edge features (default: 3)',
+                      metavar='NUM')
+  args = parser.parse_args()
+
+  split_indices = compute_split_indices(args.num_nodes,
+                                        args.num_edges,
+                                        args.num_node_features,
+                                        args.num_edge_features)
+  num_samples = os.path.getsize(args.raw_file) // (4 * args.sample_size)
+  raw = np.memmap(args.raw_file,
+                  dtype=np.float32,
+                  mode='r',
+                  shape=(num_samples, args.sample_size))
+  print(write_memmap_dataset(raw, args.output_prefix, split_indices))
@@ -3,12 +3,15 @@ import os
 import os.path 
 import sys 
 import utils
-import numpy as np 
-import sys 
+from lbann.modules.graph.packed import make_packed_sample, pack_graphs
 
 
 data_dir = os.path.dirname(os.path.realpath(__file__))
 
+# Preprocessing in data/graph_memmap.py
+sys.path.append(os.path.dirname(data_dir))
+import graph_memmap
+
 def get_data():
     if not os.path.isfile(os.path.join(data_dir, "PROTEINS.zip")):
         #Needs Download
@@ -19,88 +22,150 @@ def get_data():
         
 
 
+def load_dataset():
+    """Memory-map PROTEINS in the layout of graph_memmap.py
+
+    The dataset is downloaded and converted on first use. Node features
+    are the one-hot node labels.
+    """
+    save_dir = os.path.join(data_dir, 'PROTEINS')
+    header_file = os.path.join(save_dir, 'PROTEINS.json')
+    if not os.path.isfile(header_file):
+        if not os.path.isfile(os.path.join(save_dir, 'PROTEINS_A.txt')):
+            get_data()
+        graphs = graph_memmap.read_tu_dataset(save_dir, 'PROTEINS',
+                                              node_attributes=False)
+        graph_memmap.write_graph_dataset(graphs,
+                                         os.path.join(save_dir, 'PROTEINS'))
+    arrays, _ = graph_memmap.load_graph_dataset(header_file)
+    return arrays
+
+
+def select_graphs(arrays, graphs):
+    """Node features, COO edges, targets and node and edge offsets of the
+       given graphs, with nodes numbered across the selected graphs
+    """
+    node_offsets = np.asarray(arrays['node_offsets'])
+    edge_offsets = np.asarray(arrays['edge_offsets'])
+    num_nodes = node_offsets[graphs + 1] - node_offsets[graphs]
+    num_edges = edge_offsets[graphs + 1] - edge_offsets[graphs]
+    new_node_offsets = np.concatenate(([0], np.cumsum(num_nodes)))
+    new_edge_offsets = np.concatenate(([0], np.cumsum(num_edges)))
+    node_ids = (np.repeat(node_offsets[graphs] - new_node_offsets[:-1], num_nodes)
+                + np.arange(new_node_offsets[-1]))
+    edge_ids = (np.repeat(edge_offsets[graphs] - new_edge_offsets[:-1], num_edges)
+                + np.arange(new_edge_offsets[-1]))
+    edges = (arrays['edge_index'][:, edge_ids]
+             + np.repeat(new_node_offsets[:-1], num_edges).astype(np.int32))
+    return (np.asarray(arrays['node_features'][node_ids]),
+            edges,
+            np.asarray(arrays['targets'][graphs]),
+            new_node_offsets,
+            new_edge_offsets)
+
+
+def small_graphs(arrays, max_nodes):
+    """Indices of the graphs with fewer than max_nodes nodes"""
+    num_nodes = np.diff(arrays['node_offsets'])
+    return np.flatnonzero(num_nodes < max_nodes)
+
+
 class PROTEINS_Sparse_Dataset():
-    files = ['node_features_sparse.npy', 
-             'source_indices_sparse.npy',
-             'target_indices_sparse.npy',
-             'targets_sparse.npy']
-    
-    def __init__(self):
-        # Check is data is downloaded and processed
-        # Load if data exists 
-        # Else Download and process data
-        files = PROTEINS_Sparse_Dataset.files  
-        for npy_file in files:
-            if not os.path.isfile(os.path.join(data_dir,"PROTEINS/"+npy_file)):
-                get_data()
-                self.generate_dataset()
-                break
-
-        self.node_features = np.load(os.path.join(data_dir, "PROTEINS/"+files[0]))
-        self.source_indices = np.load(os.path.join(data_dir,"PROTEINS/"+files[1]))
-        self.target_indices = np.load(os.path.join(data_dir,"PROTEINS/"+files[2]))
-        self.targets = np.load(os.path.join(data_dir, "PROTEINS/"+files[3]))
-        self.max_edges = max([x.shape[0] for x in self.source_indices])
-        self.pad_edge_lists()
-
-    def generate_dataset(self):
-        files = PROTEINS_Sparse_Dataset.files
-        save_dir = os.path.join(data_dir, 'PROTEINS')        
-        data = utils.TUDataset_Parser(save_dir, 'PROTEINS', 2, graph_format="sparse")
-        
-        for file_name, _graph_data_i in zip(files, data):
-            np.save(os.path.join(save_dir, file_name), _graph_data_i)
+    """PROTEINS graphs with fewer than max_nodes nodes, padded to max_nodes
+       nodes and to the largest number of edges
 
-    def pad_edge_lists(self):
-        for i, (sources, targets) in enumerate(zip(self.source_indices, self.target_indices)):
-            padding_size = self.max_edges - sources.shape[0]
-            padding = np.full((padding_size), -1)
-            self.source_indices[i] = np.concatenate((sources, padding), axis=0)
-            self.target_indices[i] = np.concatenate((targets, padding), axis=0)
+    Padding edges have index -1.
+    """
+
+    def __init__(self, max_nodes=100):
+        self.max_nodes = max_nodes
+        self.arrays = load_dataset()
+        self.graphs = small_graphs(self.arrays, max_nodes)
+        self.max_edges = int(np.diff(self.arrays['edge_offsets'])[self.graphs].max())
+        self.num_node_features = self.arrays['node_features'].shape[1]
 
     def __len__(self):
-        return len(self.node_features)
+        return len(self.graphs)
 
     def __getitem__(self, index):
-        x = np.float32(self.node_features[index].flatten())
-        s = np.float32(self.source_indices[index].flatten())
-        t = np.float32(self.target_indices[index].flatten())
-        y = np.float32(self.targets[index].flatten())
-        return np.concatenate((x,s,t,y), axis=0)             
+        x, edges, y = graph_memmap.get_graph(self.arrays, self.graphs[index])
+        num_x = self.max_nodes * self.num_node_features
+        sample = np.zeros(num_x + 2 * self.max_edges + len(y), dtype=np.float32)
+        sample[:x.size] = x.ravel()
+        s = sample[num_x:num_x + self.max_edges]
+        t = sample[num_x + self.max_edges:num_x + 2 * self.max_edges]
+        s[:] = -1
+        t[:] = -1
+        s[:edges.shape[1]] = edges[0]
+        t[:edges.shape[1]] = edges[1]
+        sample[num_x + 2 * self.max_edges:] = y
+        return sample
 
 
 
-class PROTEINS_Dense_Dataset():
-    files = ['node_features_dense.npy', 'adj_mats_dense.npy', 'targets_dense.npy']
-    
-    def __init__(self):
-        # Check is data is downloaded and processed
-        # Load if data exists 
-        # Else download and process data
-        files = PROTEINS_Dense_Dataset.files  
-        for npy_file in files:
-            if not os.path.isfile(os.path.join(data_dir,"PROTEINS/"+npy_file)):
-                get_data()
-                self.generate_dataset()
-                break
-        self.node_features = np.load(os.path.join(data_dir, "PROTEINS/"+files[0]))
-        self.adjs = np.load(os.path.join(data_dir,"PROTEINS/"+files[1]))
-        self.targets = np.load(os.path.join(data_dir, "PROTEINS/"+files[2]))
-
-    def generate_dataset(self):
-        files = PROTEINS_Dense_Dataset.files
-        save_dir = os.path.join(data_dir, 'PROTEINS')        
-        data = utils.TUDataset_Parser(save_dir, 'PROTEINS', 2, graph_format="dense")
-        
-        for file_name, _graph_data_i in zip(files, data):
-            np.save(os.path.join(save_dir, file_name), _graph_data_i)
-    
+class PROTEINS_Packed_Dataset():
+    """PROTEINS graphs packed several per sample without per-graph padding
+
+    See lbann.modules.graph.packed for the sample layout.
+    """
+
+    def __init__(self, max_nodes, max_edges, max_graphs):
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+        self.max_graphs = max_graphs
+
+        # Graphs of the sparse dataset, without padding
+        arrays = load_dataset()
+        (self.node_features,
+         edges,
+         self.targets,
+         self.node_offsets,
+         self.edge_offsets) = select_graphs(arrays, small_graphs(arrays, 100))
+        self.source_indices = edges[0]
+        self.target_indices = edges[1]
+
+        self.pack_offsets = pack_graphs(self.node_offsets,
+                                        self.edge_offsets,
+                                        max_nodes,
+                                        max_edges,
+                                        max_graphs)
+
     def __len__(self):
-        return len(self.node_features)
-    
+        return len(self.pack_offsets) - 1
+
     def __getitem__(self, index):
-        x = np.float32(self.node_features[index].flatten())
-        y = np.float32(self.targets[index].flatten())
-        adj = np.float32(self.adjs[index].flatten())
+        return make_packed_sample(self.node_features,
+                                  self.source_indices,
+                                  self.target_indices,
+                                  self.targets,
+                                  self.node_offsets,
+                                  self.edge_offsets,
+                                  self.pack_offsets[index],
+                                  self.pack_offsets[index + 1],
+                                  self.max_nodes,
+                                  self.max_edges,
+                                  self.max_graphs)
+
 
-        return np.concatenate((x,adj,y), axis=0)
+class PROTEINS_Dense_Dataset():
+    """PROTEINS graphs with fewer than max_nodes nodes, with node features
+       and symmetric adjacency matrices padded to max_nodes nodes
+    """
+
+    def __init__(self, max_nodes=100):
+        self.max_nodes = max_nodes
+        self.arrays = load_dataset()
+        self.graphs = small_graphs(self.arrays, max_nodes)
+
+    def __len__(self):
+        return len(self.graphs)
+
+    def adjacency(self, index):
+        return graph_memmap.dense_adjacency(self.arrays, self.graphs[index:index + 1],
+                                            self.max_nodes)[0]
+
+    def __getitem__(self, index):
+        x, _, y = graph_memmap.get_graph(self.arrays, self.graphs[index])
+        x = np.pad(np.float32(x), ((0, self.max_nodes - len(x)), (0, 0)))
+        adj = self.adjacency(index)
+        return np.concatenate((x.flatten(), adj.flatten(), np.float32(y)), axis=0)
@@ -17,7 +17,5 @@ def sample_data_dims():
 
 if __name__== '__main__':
     print(len(protein_data))
-    print(protein_data.node_features[0].shape)
-    print(protein_data.adjs[0].shape)
-    print(protein_data.targets[0].shape)
+    print(protein_data.adjacency(0).shape)
     print(type(protein_data[0][0]))
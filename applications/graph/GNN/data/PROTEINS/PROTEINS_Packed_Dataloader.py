@@ -0,0 +1,29 @@
+from PROTEINS_Dataset import PROTEINS_Packed_Dataset
+from lbann.modules.graph.packed import packed_sample_size
+
+# Pack capacities, which must match Sparse_Graph_Trainer.make_model
+max_graphs = 8
+max_nodes = 400
+max_edges = 1600
+node_feature_size = 3
+num_classes = 2
+
+protein_data = PROTEINS_Packed_Dataset(max_nodes, max_edges, max_graphs)
+
+def get_train(index):
+	return protein_data[index]
+
+def num_train_samples():
+	return len(protein_data)
+
+def sample_data_dims():
+  return (packed_sample_size(max_nodes, node_feature_size, max_edges,
+                             max_graphs, num_classes),)
+
+if __name__ == '__main__':
+	print("Dataset info: ")
+	print("Total Number of samples: ", num_train_samples())
+	print("Sample size: ", sample_data_dims())
+	print("Graphs per sample: ", (len(protein_data.node_offsets) - 1) / num_train_samples())
+
+	print(get_train(0).shape)
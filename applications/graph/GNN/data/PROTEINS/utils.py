@@ -33,7 +33,7 @@ def edge_list_to_dense(elist, num_vertices = 75):
         matrix given edge list, elist
     """
 
-    adj_mat = np.zeros((num_vertices,num_vertices), dtype=np.float)
+    adj_mat = np.zeros((num_vertices,num_vertices), dtype=np.float64)
     num_edges = elist.shape[0]
     for edge in range(num_edges):
         source, sink = elist[edge,:]
@@ -53,9 +53,9 @@ def extract_node_features(node_slices, node_labels, max_nodes, num_classes = Non
     node_label_list = [] 
     for i, ind in enumerate(node_slices[1:]):
         if num_classes:
-            graph_x = np.eye(num_classes)[np.asarray([int(x) for x in node_labels[node_slices[i]:ind]],dtype=np.int)]
+            graph_x = np.eye(num_classes)[np.asarray([int(x) for x in node_labels[node_slices[i]:ind]],dtype=int)]
         else:
-            graph_x = anp.asarray([int(x) for x in node_labels[node_slices[i]:ind]],dtype=np.int)
+            graph_x = np.asarray([int(x) for x in node_labels[node_slices[i]:ind]],dtype=int)
         if (len(graph_x) < max_nodes):
             pad = max_nodes - len(graph_x)
             graph_x = np.pad(graph_x, ((0,pad),(0,0)), 'constant')
@@ -0,0 +1,140 @@
+"""Benchmark graph dataset preprocessing.
+
+Compares the TU parser in PROTEINS/utils.py with the vectorized,
+process-parallel pipeline in graph_memmap.py, on PROTEINS (if it has
+been downloaded) and on a synthetic dataset in the TU text format.
+
+The legacy parser counts the nodes of each graph with a scan over all
+nodes, so it is quadratic in the number of graphs. On the synthetic
+dataset it only runs on a separate synthetic set of --legacy-graphs
+graphs, and the reported full-dataset time is a linear extrapolation,
+i.e. a lower bound. Dense adjacency matrices are likewise built for
+that many graphs.
+
+Usage: python3 benchmark_preprocessing.py [--num-graphs N] [--workers P]
+
+"""
+import argparse
+import os
+import os.path as osp
+import sys
+import tempfile
+import time
+import numpy as np
+
+current_dir = osp.dirname(osp.realpath(__file__))
+sys.path.append(current_dir)
+sys.path.append(osp.join(current_dir, 'PROTEINS'))
+import graph_memmap
+import utils as legacy
+
+
+def write_synthetic_tu(data_dir, name, num_graphs, seed=0,
+                       chunk_size=100000):
+  """Write random graphs with PROTEINS-like sizes in the TU text format."""
+  rng = np.random.default_rng(seed)
+  files = {desc: open(osp.join(data_dir, f'{name}_{desc}.txt'), 'w')
+           for desc in ('A', 'graph_indicator', 'graph_labels',
+                        'node_labels', 'node_attributes')}
+  node_offset = 0
+  for first in range(0, num_graphs, chunk_size):
+    count = min(chunk_size, num_graphs - first)
+    num_nodes = rng.integers(4, 100, size=count)
+    num_edges = 2 * num_nodes
+    node_offsets = node_offset + np.concatenate(([0], np.cumsum(num_nodes)))
+    edge_graphs = np.repeat(np.arange(count), num_edges)
+    sources = (rng.random(len(edge_graphs)) * num_nodes[edge_graphs]).astype(
+        np.int64) + node_offsets[edge_graphs]
+    targets = (rng.random(len(edge_graphs)) * num_nodes[edge_graphs]).astype(
+        np.int64) + node_offsets[edge_graphs]
+    total_nodes = int(num_nodes.sum())
+    np.savetxt(files['A'], np.stack((sources, targets), axis=1) + 1,
+               fmt='%d, %d')
+    np.savetxt(files['graph_indicator'],
+               np.repeat(np.arange(first, first + count), num_nodes) + 1,
+               fmt='%d')
+    np.savetxt(files['graph_labels'], rng.integers(1, 3, size=count),
+               fmt='%d')
+    np.savetxt(files['node_labels'], rng.integers(0, 3, size=total_nodes),
+               fmt='%d')
+    np.savetxt(files['node_attributes'], rng.random(total_nodes), fmt='%.4f')
+    node_offset = node_offsets[-1]
+  for f in files.values():
+    f.close()
+
+
+def time_call(function, *args, **kwargs):
+  start = time.perf_counter()
+  result = function(*args, **kwargs)
+  return time.perf_counter() - start, result
+
+
+def benchmark(data_dir, name, num_classes, workers, legacy_graphs=None,
+              max_nodes=100):
+  """Print preprocessing times of both parsers on a TU dataset."""
+  with open(osp.join(data_dir, f'{name}_graph_labels.txt')) as f:
+    num_graphs = sum(1 for _ in f)
+
+  # Legacy parser on all graphs, or the first legacy_graphs graphs
+  legacy_dir = data_dir
+  if legacy_graphs is not None and legacy_graphs < num_graphs:
+    legacy_dir = tempfile.mkdtemp(dir=data_dir)
+    write_synthetic_tu(legacy_dir, name, legacy_graphs)
+  else:
+    legacy_graphs = num_graphs
+  scale = num_graphs / legacy_graphs
+  for graph_format in ('sparse', 'dense'):
+    seconds, _ = time_call(legacy.TUDataset_Parser, legacy_dir, name,
+                           num_classes, max_nodes, graph_format)
+    estimate = ' (extrapolated)' if scale > 1 else ''
+    print(f'  legacy {graph_format}: {seconds * scale:.2f} s{estimate}')
+
+  # Vectorized pipeline
+  output_prefix = osp.join(data_dir, f'{name}_memmap')
+  read_seconds, graphs = time_call(graph_memmap.read_tu_dataset, data_dir,
+                                   name, workers)
+  write_seconds, header_file = time_call(graph_memmap.write_graph_dataset,
+                                         graphs, output_prefix)
+  print(f'  vectorized read: {read_seconds:.2f} s, '
+        f'write: {write_seconds:.2f} s')
+
+  # Dense adjacency of the graphs kept by the legacy parser
+  arrays, _ = graph_memmap.load_graph_dataset(header_file)
+  node_counts = np.diff(arrays['node_offsets'][:legacy_graphs + 1])
+  dense_seconds, _ = time_call(graph_memmap.dense_adjacency, arrays,
+                               np.flatnonzero(node_counts < max_nodes),
+                               max_nodes)
+  print(f'  vectorized dense: {dense_seconds * scale:.2f} s{estimate}')
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(
+      description='Benchmark graph dataset preprocessing')
+  parser.add_argument('--num-graphs', action='store', default=1000000,
+                      type=int, help='synthetic graphs (default: 1000000)',
+                      metavar='NUM')
+  parser.add_argument('--legacy-graphs', action='store', default=10000,
+                      type=int,
+                      help='synthetic graphs for the legacy parser '
+                      '(default: 10000)', metavar='NUM')
+  parser.add_argument('--workers', action='store', default=None, type=int,
+                      help='number of processes (default: number of CPUs)',
+                      metavar='NUM')
+  parser.add_argument('--work-dir', action='store', default=None, type=str,
+                      help='directory for the synthetic dataset '
+                      '(default: temporary directory)', metavar='DIR')
+  args = parser.parse_args()
+
+  proteins_dir = osp.join(current_dir, 'PROTEINS', 'PROTEINS')
+  if osp.isfile(osp.join(proteins_dir, 'PROTEINS_A.txt')):
+    print('PROTEINS')
+    benchmark(proteins_dir, 'PROTEINS', 2, args.workers)
+  else:
+    print('PROTEINS not downloaded, skipping')
+
+  work_dir = args.work_dir or tempfile.mkdtemp()
+  print(f'Synthetic ({args.num_graphs} graphs in {work_dir})')
+  seconds, _ = time_call(write_synthetic_tu, work_dir, 'SYNTHETIC',
+                         args.num_graphs)
+  print(f'  generated in {seconds:.2f} s')
+  benchmark(work_dir, 'SYNTHETIC', 2, args.workers, args.legacy_graphs)
@@ -0,0 +1,421 @@
+"""Vectorized preprocessing of TU and OGB graph datasets.
+
+Graph datasets are stored as a disjoint union of all graphs in one
+raw binary file plus a small JSON header, as in
+LSC_PPQM4M/lsc_memmap.py. Each array starts at a page boundary:
+
+  node_offsets   int64 (num_graphs + 1)  first node of each graph
+  edge_offsets   int64 (num_graphs + 1)  first edge of each graph
+  row_offsets    int64 (num_nodes + 1)   CSR row pointers into the edges
+  edge_index     int32 (2, num_edges)    COO source and target nodes,
+                                         relative to the graph's first node
+  node_features  float32 (num_nodes, F)
+  edge_features  float32 (num_edges, F)  (if the dataset has them)
+  targets        float32 (num_graphs, T)
+
+Edges are sorted by graph and then by source node, so the COO edges of
+a graph are also its CSR column indices, and graph i is made of the
+slices between its node and edge offsets.
+
+Text files are parsed by several processes over byte ranges of the
+file, and everything else is done with whole-array NumPy operations,
+instead of per-graph and per-edge Python loops.
+
+Usage:
+  python3 graph_memmap.py tu <data dir> <name> <output prefix>
+  python3 graph_memmap.py ogb <raw dir> <output prefix>
+  python3 graph_memmap.py dense <header> <output file> --max-nodes N
+
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import io
+import json
+import os
+import os.path as osp
+import numpy as np
+
+PAGE_SIZE = 4096
+
+# Text files smaller than this are parsed by a single process
+PARALLEL_READ_SIZE = 1 << 24
+
+
+def _parse_values(text, dtype):
+  """Numbers in comma- or whitespace-separated text, flattened."""
+  if not text.strip():
+    return np.empty(0, dtype=dtype)
+  return np.loadtxt(io.BytesIO(text.replace(b',', b' ')),
+                    dtype=dtype, ndmin=1).reshape(-1)
+
+
+def _read_range(path, begin, end, dtype):
+  """Parse the lines of a text file that start in [begin, end)."""
+  with open(path, 'rb') as f:
+    if begin > 0:
+      # Skip the line that started in the previous range
+      f.seek(begin - 1)
+      f.readline()
+    start = f.tell()
+    if start >= end:
+      return np.empty(0, dtype=dtype)
+    text = f.read(end - start)
+    if not text.endswith(b'\n'):
+      text += f.readline()
+  return _parse_values(text, dtype)
+
+
+def read_table(path, dtype=np.int64, workers=None):
+  """Read a numeric table from a text file, possibly gzipped.
+
+  Values may be separated by commas or whitespace, with one row per
+  line. Large uncompressed files are split into byte ranges parsed by
+  `workers` processes (default: number of CPUs).
+
+  Returns a (rows x columns) array.
+  """
+  opener = gzip.open if path.endswith('.gz') else open
+  with opener(path, 'rb') as f:
+    first_line = f.readline()
+  num_columns = max(len(_parse_values(first_line, np.float64)), 1)
+
+  size = osp.getsize(path)
+  workers = workers or os.cpu_count() or 1
+  if path.endswith('.gz') or workers == 1 or size < PARALLEL_READ_SIZE:
+    with opener(path, 'rb') as f:
+      values = _parse_values(f.read(), dtype)
+  else:
+    bounds = np.linspace(0, size, workers + 1).astype(np.int64).tolist()
+    with ProcessPoolExecutor(workers) as pool:
+      parts = pool.map(_read_range, [path] * workers, bounds[:-1],
+                       bounds[1:], [dtype] * workers)
+      values = np.concatenate(list(parts))
+  return values.reshape(-1, num_columns)
+
+
+def one_hot(labels, num_classes=None):
+  """One-hot float32 encoding of integer labels.
+
+  Labels are mapped to consecutive classes in sorted order, so that
+  e.g. TU labels starting at 0, 1 or -1 are handled alike.
+  """
+  classes, labels = np.unique(labels, return_inverse=True)
+  num_classes = num_classes or len(classes)
+  out = np.zeros((len(labels), num_classes), dtype=np.float32)
+  out[np.arange(len(labels)), labels] = 1
+  return out
+
+
+def read_tu_dataset(data_dir, dataset_name, workers=None,
+                    node_attributes=True):
+  """Read a dataset in the TU text format.
+
+  See https://chrsmrrs.github.io/datasets/docs/format/. Node labels are
+  one-hot encoded and followed by the node attributes, if present and
+  `node_attributes` is set, and graph labels are one-hot encoded.
+
+  Returns a dictionary with the arrays of `write_graph_dataset`.
+  """
+  def path(description):
+    return osp.join(data_dir, f'{dataset_name}_{description}.txt')
+
+  files = {'A': np.int64, 'graph_indicator': np.int64,
+           'graph_labels': np.int64}
+  optional = {'node_labels': np.int64, 'node_attributes': np.float32,
+              'edge_labels': np.int64, 'edge_attributes': np.float32}
+  if not node_attributes:
+    del optional['node_attributes']
+  files.update({k: v for k, v in optional.items() if osp.isfile(path(k))})
+
+  # Large files are split across processes; small files are read
+  # concurrently
+  large = {k for k in files if osp.getsize(path(k)) >= PARALLEL_READ_SIZE}
+  tables = {k: read_table(path(k), files[k], workers) for k in large}
+  with ProcessPoolExecutor(workers) as pool:
+    futures = {k: pool.submit(read_table, path(k), files[k], 1)
+               for k in files if k not in large}
+    tables.update({k: f.result() for k, f in futures.items()})
+
+  # Graph indicator is sorted and 1-based
+  graph_indicator = tables['graph_indicator'][:, 0] - 1
+  num_graphs = len(tables['graph_labels'])
+  node_counts = np.bincount(graph_indicator, minlength=num_graphs)
+  node_offsets = np.concatenate(([0], np.cumsum(node_counts)))
+
+  # Edges hold 1-based node indices across the dataset
+  edges = tables['A'] - 1
+  edge_graphs = graph_indicator[edges[:, 0]]
+  edge_counts = np.bincount(edge_graphs, minlength=num_graphs)
+  edges = edges - node_offsets[edge_graphs][:, None]
+
+  node_features = []
+  if 'node_labels' in tables:
+    node_features.append(one_hot(tables['node_labels'][:, 0]))
+  if 'node_attributes' in tables:
+    node_features.append(tables['node_attributes'])
+  if not node_features:
+    node_features.append(np.ones((len(graph_indicator), 1)))
+  edge_features = []
+  if 'edge_labels' in tables:
+    edge_features.append(one_hot(tables['edge_labels'][:, 0]))
+  if 'edge_attributes' in tables:
+    edge_features.append(tables['edge_attributes'])
+
+  return {
+      'node_counts': node_counts,
+      'edge_counts': edge_counts,
+      'edge_graphs': edge_graphs,
+      'edge_index': edges.T,
+      'node_features': np.concatenate(node_features, axis=1),
+      'edge_features': (np.concatenate(edge_features, axis=1)
+                        if edge_features else None),
+      'targets': one_hot(tables['graph_labels'][:, 0]),
+  }
+
+
+def read_ogb_dataset(raw_dir, workers=None):
+  """Read an OGB graph property prediction dataset in its raw format.
+
+  `raw_dir` holds the files edge.csv.gz, num-node-list.csv.gz,
+  num-edge-list.csv.gz, graph-label.csv.gz and, if present,
+  node-feat.csv.gz and edge-feat.csv.gz. Edge indices are relative to
+  each graph's first node. Targets are stored as given.
+
+  Returns a dictionary with the arrays of `write_graph_dataset`.
+  """
+  def path(name):
+    return osp.join(raw_dir, f'{name}.csv.gz')
+
+  files = {'edge': np.int64, 'num-node-list': np.int64,
+           'num-edge-list': np.int64, 'graph-label': np.float32,
+           'node-feat': np.float32, 'edge-feat': np.float32}
+  files = {k: v for k, v in files.items() if osp.isfile(path(k))}
+  with ProcessPoolExecutor(workers) as pool:
+    futures = {k: pool.submit(read_table, path(k), v, 1)
+               for k, v in files.items()}
+    tables = {k: f.result() for k, f in futures.items()}
+
+  node_counts = tables['num-node-list'][:, 0]
+  edge_counts = tables['num-edge-list'][:, 0]
+  num_nodes = int(node_counts.sum())
+  return {
+      'node_counts': node_counts,
+      'edge_counts': edge_counts,
+      'edge_graphs': np.repeat(np.arange(len(edge_counts)), edge_counts),
+      'edge_index': tables['edge'].T,
+      'node_features': tables.get('node-feat',
+                                  np.ones((num_nodes, 1), np.float32)),
+      'edge_features': tables.get('edge-feat'),
+      'targets': tables['graph-label'],
+  }
+
+
+def write_graph_dataset(graphs, output_prefix):
+  """Write a graph dataset in the memory-mapped layout.
+
+  `graphs` is a dictionary as returned by `read_tu_dataset`: the
+  number of nodes and edges of each graph, the graph of each edge, the
+  (2 x num_edges) edge index relative to each graph's first node, node
+  features, edge features (or None) and targets.
+
+  Writes `<output_prefix>.bin` and the header `<output_prefix>.json`.
+  """
+  node_counts = np.asarray(graphs['node_counts'], dtype=np.int64)
+  edge_counts = np.asarray(graphs['edge_counts'], dtype=np.int64)
+  node_offsets = np.concatenate(([0], np.cumsum(node_counts)))
+  edge_offsets = np.concatenate(([0], np.cumsum(edge_counts)))
+  num_graphs = len(node_counts)
+  num_nodes = int(node_offsets[-1])
+  num_edges = int(edge_offsets[-1])
+
+  # Sort edges by graph and source node to get CSR order
+  edge_graphs = np.asarray(graphs['edge_graphs'])
+  edge_index = np.asarray(graphs['edge_index'])
+  sources = node_offsets[edge_graphs] + edge_index[0]
+  order = np.argsort(sources, kind='stable')
+  row_offsets = np.concatenate(
+      ([0], np.cumsum(np.bincount(sources, minlength=num_nodes))))
+
+  arrays = {
+      'node_offsets': node_offsets,
+      'edge_offsets': edge_offsets,
+      'row_offsets': row_offsets,
+      'edge_index': edge_index[:, order].astype(np.int32),
+      'node_features': np.asarray(graphs['node_features'], dtype=np.float32),
+      'targets': np.asarray(graphs['targets'], dtype=np.float32).reshape(
+          num_graphs, -1),
+  }
+  if graphs.get('edge_features') is not None:
+    arrays['edge_features'] = np.asarray(
+        graphs['edge_features'], dtype=np.float32)[order]
+
+  data_file = output_prefix + '.bin'
+  header = {
+      'data_file': osp.basename(data_file),
+      'num_graphs': num_graphs,
+      'num_nodes': num_nodes,
+      'num_edges': num_edges,
+      'arrays': {},
+  }
+  offset = PAGE_SIZE  # Header page is left empty
+  for name, array in arrays.items():
+    header['arrays'][name] = {
+        'offset': offset,
+        'dtype': array.dtype.str,
+        'shape': [int(d) for d in array.shape],
+    }
+    offset += -(-array.nbytes // PAGE_SIZE) * PAGE_SIZE
+  # Files are written under temporary names and moved into place, and
+  # the header is written last, so that readers (e.g. other processes
+  # converting the same dataset) never see a partial dataset
+  tmp_suffix = f'.{os.getpid()}.tmp'
+  with open(data_file + tmp_suffix, 'wb') as f:
+    f.truncate(offset)
+    for name, array in arrays.items():
+      f.seek(header['arrays'][name]['offset'])
+      f.write(np.ascontiguousarray(array).tobytes())
+  os.replace(data_file + tmp_suffix, data_file)
+  header_file = output_prefix + '.json'
+  with open(header_file + tmp_suffix, 'w') as f:
+    json.dump(header, f, indent=2)
+  os.replace(header_file + tmp_suffix, header_file)
+  return header_file
+
+
+def load_graph_dataset(header_file):
+  """Memory-map a dataset written by `write_graph_dataset`.
+
+  Returns a dictionary of read-only memmaps and the header dictionary.
+  """
+  with open(header_file, 'r') as f:
+    header = json.load(f)
+  data_file = osp.join(osp.dirname(osp.realpath(header_file)),
+                       header['data_file'])
+  arrays = {
+      name: np.memmap(data_file,
+                      dtype=np.dtype(info['dtype']),
+                      mode='r',
+                      offset=info['offset'],
+                      shape=tuple(info['shape']))
+      for name, info in header['arrays'].items()
+  }
+  return arrays, header
+
+
+def get_graph(arrays, index):
+  """Views of the node features, COO edges and targets of one graph."""
+  node_begin, node_end = arrays['node_offsets'][index:index + 2]
+  edge_begin, edge_end = arrays['edge_offsets'][index:index + 2]
+  return (arrays['node_features'][node_begin:node_end],
+          arrays['edge_index'][:, edge_begin:edge_end],
+          arrays['targets'][index])
+
+
+def dense_adjacency(arrays, graphs, max_nodes, symmetric=True, out=None):
+  """Dense adjacency matrices of the given graphs.
+
+  `graphs` is a sequence of graph indices. Graphs with more than
+  `max_nodes` nodes are an error. Returns a
+  len(graphs) x max_nodes x max_nodes float32 array, written into `out`
+  if given.
+  """
+  graphs = np.asarray(graphs, dtype=np.int64)
+  node_offsets = np.asarray(arrays['node_offsets'])
+  edge_offsets = np.asarray(arrays['edge_offsets'])
+  if np.any(node_offsets[graphs + 1] - node_offsets[graphs] > max_nodes):
+    raise ValueError(f'graphs have more than {max_nodes} nodes')
+  if out is None:
+    out = np.zeros((len(graphs), max_nodes, max_nodes), dtype=np.float32)
+  else:
+    out[...] = 0
+
+  # Gather the edges of all graphs
+  edge_counts = edge_offsets[graphs + 1] - edge_offsets[graphs]
+  edge_starts = np.cumsum(edge_counts) - edge_counts
+  edge_ids = (np.repeat(edge_offsets[graphs] - edge_starts, edge_counts)
+              + np.arange(edge_counts.sum()))
+  edges = arrays['edge_index'][:, edge_ids]
+  edge_graphs = np.repeat(np.arange(len(graphs)), edge_counts)
+  out[edge_graphs, edges[0], edges[1]] = 1
+  if symmetric:
+    out[edge_graphs, edges[1], edges[0]] = 1
+  return out
+
+
+def _write_dense_range(header_file, output_file, first, last, max_nodes):
+  """Worker for `write_dense_adjacency`."""
+  arrays, header = load_graph_dataset(header_file)
+  out = np.memmap(output_file,
+                  dtype=np.float32,
+                  mode='r+',
+                  shape=(header['num_graphs'], max_nodes, max_nodes))
+  dense_adjacency(arrays, range(first, last), max_nodes, out=out[first:last])
+  out.flush()
+
+
+def write_dense_adjacency(header_file, output_file, max_nodes,
+                          workers=None, chunk_size=4096):
+  """Write dense adjacency matrices of all graphs to a raw binary file.
+
+  The (num_graphs x max_nodes x max_nodes) float32 matrix is written
+  by `workers` processes (default: number of CPUs), in chunks of
+  `chunk_size` graphs.
+  """
+  _, header = load_graph_dataset(header_file)
+  num_graphs = header['num_graphs']
+  with open(output_file, 'wb') as f:
+    f.truncate(num_graphs * max_nodes * max_nodes * 4)
+  firsts = list(range(0, num_graphs, chunk_size))
+  lasts = [min(first + chunk_size, num_graphs) for first in firsts]
+  with ProcessPoolExecutor(workers) as pool:
+    list(pool.map(_write_dense_range,
+                  [header_file] * len(firsts),
+                  [output_file] * len(firsts),
+                  firsts,
+                  lasts,
+                  [max_nodes] * len(firsts)))
+  return output_file
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(
+      description='Convert a TU or OGB graph dataset to the memory-mapped '
+      'layout, or write dense adjacency matrices of a converted dataset')
+  parser.add_argument('--workers', action='store', default=None, type=int,
+                      help='number of processes (default: number of CPUs)',
+                      metavar='NUM')
+  subparsers = parser.add_subparsers(dest='format', required=True)
+  tu_parser = subparsers.add_parser('tu', help='TU text format')
+  tu_parser.add_argument('data_dir', type=str, metavar='DIR',
+                         help='directory with the NAME_*.txt files')
+  tu_parser.add_argument('name', type=str, metavar='NAME',
+                         help='dataset name, e.g. PROTEINS')
+  tu_parser.add_argument('output_prefix', type=str, metavar='PREFIX',
+                         help='output prefix (writes PREFIX.bin and '
+                         'PREFIX.json)')
+  ogb_parser = subparsers.add_parser('ogb', help='OGB raw csv.gz format')
+  ogb_parser.add_argument('raw_dir', type=str, metavar='DIR',
+                          help='directory with edge.csv.gz etc.')
+  ogb_parser.add_argument('output_prefix', type=str, metavar='PREFIX',
+                          help='output prefix (writes PREFIX.bin and '
+                          'PREFIX.json)')
+  dense_parser = subparsers.add_parser(
+      'dense', help='dense adjacency matrices of a converted dataset')
+  dense_parser.add_argument('header', type=str, metavar='FILE',
+                            help='header of a converted dataset')
+  dense_parser.add_argument('output_file', type=str, metavar='FILE',
+                            help='raw float32 output file')
+  dense_parser.add_argument('--max-nodes', action='store', required=True,
+                            type=int, help='matrix size', metavar='NUM')
+  args = parser.parse_args()
+
+  if args.format == 'tu':
+    graphs = read_tu_dataset(args.data_dir, args.name, args.workers)
+    print(write_graph_dataset(graphs, args.output_prefix))
+  elif args.format == 'ogb':
+    graphs = read_ogb_dataset(args.raw_dir, args.workers)
+    print(write_graph_dataset(graphs, args.output_prefix))
+  else:
+    print(write_dense_adjacency(args.header, args.output_file,
+                                args.max_nodes, args.workers))
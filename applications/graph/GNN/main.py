@@ -28,6 +28,11 @@ parser.add_argument(
     '--model', action = 'store', default='GCN', type=str,
     help="The type of model to use", metavar='NAME')
 
+parser.add_argument(
+    '--packed', action='store_true', default=False,
+    help="pack several graphs per sample without per-graph padding "
+    "(sparse models only)")
+
 args = parser.parse_args()
 
 
@@ -37,6 +42,7 @@ num_epochs = args.num_epochs
 mini_batch_size = args.mini_batch_size 
 job_name = args.job_name
 model_arch = args.model
+packed = args.packed
 
 
 ## Get Model
@@ -44,14 +50,17 @@ model_arch = args.model
 data_reader = None
 if (model_arch == 'GRAPH'):
     model = Sparse_Graph_Trainer.make_model(kernel_type = 'Graph',
-                                            num_epochs = num_epochs)
+                                            num_epochs = num_epochs,
+                                            packed = packed)
 elif(model_arch=='GIN'):
     model = Sparse_Graph_Trainer.make_model(kernel_type = 'GIN',
-                                            num_epochs = num_epochs)
+                                            num_epochs = num_epochs,
+                                            packed = packed)
 elif(model_arch=='GATEDGRAPH'):
     model = Sparse_Graph_Trainer.make_model(dataset = 'PROTEINS',
                                             kernel_type = 'GatedGraph',
-                                            num_epochs = num_epochs)
+                                            num_epochs = num_epochs,
+                                            packed = packed)
 elif (model_arch =='DGCN'):
     model = Dense_Graph_Trainer.make_model(kernel_type = 'GCN',
                                            num_epochs = num_epochs)
@@ -63,10 +72,11 @@ elif (model_arch == 'DGRAPH'):
 
 else:   
     model = Sparse_Graph_Trainer.make_model(kernel_type = 'GCN',
-                                            num_epochs=num_epochs)
+                                            num_epochs=num_epochs,
+                                            packed = packed)
 
 if data_reader is None:
-    data_reader = data.PROTEINS.make_data_reader()
+    data_reader = data.PROTEINS.make_data_reader("Packed" if packed else "Sparse")
 
 optimizer = lbann.SGD(learn_rate = 1e-3)
 
@@ -19,6 +19,7 @@ current_file = os.path.realpath(__file__)
 app_dir = os.path.dirname(os.path.dirname(current_file))
 sys.path.append(os.path.join(app_dir))
 import utils
+import utils.walks
 
 # ----------------------------------------------
 # Configuration
@@ -43,6 +44,7 @@ walk_length = config.getint('Walks', 'walk_length', fallback=0)
 epoch_size = config.getint('Skip-gram', 'epoch_size')
 num_negative_samples = config.getint('Skip-gram', 'num_negative_samples')
 noise_distribution_exp = config.getfloat('Skip-gram', 'noise_distribution_exp')
+negative_sampler = config.get('Skip-gram', 'negative_sampler', fallback='alias')
 
 # Check options
 if not walk_files:
@@ -50,6 +52,8 @@ if not walk_files:
 assert num_negative_samples > 0, \
     f'Invalid number of negative samples ({num_negative_samples})'
 assert num_vertices > 0, f'Invalid number of vertices ({num_vertices})'
+assert negative_sampler in ('alias', 'cdf'), \
+    f'Invalid negative sampler ({negative_sampler})'
 
 # Configure RNG
 rng_pid = None
@@ -73,7 +77,7 @@ def mpi_rank():
             'Could not detect MPI environment variables. '
             'We expect that LBANN is run with '
             'Open MPI or one of its derivatives.',
-            warning.RuntimeWarning,
+            RuntimeWarning,
         )
     return int(os.getenv('OMPI_COMM_WORLD_RANK', default=0))
 def mpi_size():
@@ -83,10 +87,108 @@ def mpi_size():
             'Could not detect MPI environment variables. '
             'We expect that LBANN is run with '
             'Open MPI or one of its derivatives.',
-            warning.RuntimeWarning,
+            RuntimeWarning,
         )
     return int(os.getenv('OMPI_COMM_WORLD_SIZE', default=1))
 
+# ----------------------------------------------
+# Negative samplers
+# ----------------------------------------------
+
+class CDFSampler:
+    """Draw vertices from a discrete distribution by inverting its CDF.
+
+    Draws cost O(log V) each.
+
+    """
+
+    def __init__(self, num_vertices):
+        self.cdf = np.zeros(num_vertices, dtype=np.float64)
+
+    def update(self, weights):
+        """Reset distribution from unnormalized vertex weights.
+
+        `weights` is not modified.
+
+        """
+        np.cumsum(weights, out=self.cdf)
+        self.cdf *= np.float64(1 / self.cdf[-1])
+
+    def sample(self, size):
+        """Draw vertices from distribution."""
+        return np.searchsorted(self.cdf, np.random.uniform(size=size))
+
+class AliasSampler:
+    """Draw vertices from a discrete distribution with the alias method.
+
+    Draws cost O(1) each: pick a vertex uniformly, then either keep it
+    or replace it by its alias, depending on its acceptance
+    probability.
+
+    The alias table is built with a vectorized form of the sweeping
+    construction (Hübschle-Schneider and Sanders, "Parallel Weighted
+    Random Sampling", 2019). Vertices are scaled so the mean weight is
+    1 and split into light (weight < 1) and heavy vertices. Heavy
+    vertices are visited in order and donate their excess weight to
+    fill the deficits of light vertices, also in order. A light vertex
+    is aliased to the heavy vertex that fills its deficit. Once a heavy
+    vertex's remaining weight drops to at most 1, it becomes light and
+    is aliased to the next heavy vertex. Both assignments follow from
+    comparing the prefix sums of the deficits and excesses, so no
+    Python loop over vertices is needed.
+
+    """
+
+    def __init__(self, num_vertices):
+        self.num_vertices = num_vertices
+        index_dtype = np.int32 if num_vertices <= np.iinfo(np.int32).max else np.int64
+        self.prob = np.ones(num_vertices, dtype=np.float64)
+        self.alias = np.arange(num_vertices, dtype=index_dtype)
+
+    def update(self, weights):
+        """Reset distribution from unnormalized vertex weights.
+
+        `weights` is overwritten.
+
+        """
+        weights *= np.float64(self.num_vertices / weights.sum())
+        light = np.flatnonzero(weights < 1)
+        heavy = np.flatnonzero(weights >= 1)
+        prob = self.prob
+        alias = self.alias
+        prob[:] = weights
+        alias[:] = np.arange(self.num_vertices)
+        if heavy.size == 0 or light.size == 0:
+            prob[:] = 1
+            return
+
+        # Prefix sums of light deficits and heavy excesses
+        deficits = np.cumsum(1 - weights[light])
+        excesses = np.cumsum(weights[heavy] - 1)
+
+        # Each light vertex is filled by the first heavy vertex whose
+        # cumulative excess exceeds the deficit accumulated before it
+        deficits_before = deficits - (1 - weights[light])
+        donors = np.searchsorted(excesses, deficits_before, side='right')
+        np.minimum(donors, heavy.size - 1, out=donors)
+        alias[light] = heavy[donors]
+
+        # Once a heavy vertex has filled all light vertices assigned to
+        # it and to earlier heavy vertices, its remaining weight is
+        # topped up by the next heavy vertex
+        last_light = np.searchsorted(deficits_before, excesses, side='left') - 1
+        filled = np.where(last_light >= 0, deficits[last_light], 0)
+        overflow = np.maximum(filled - excesses, 0)
+        prob[heavy] = np.clip(1 - overflow, 0, 1)
+        alias[heavy[:-1]] = heavy[1:]
+        prob[heavy[-1]] = 1
+
+    def sample(self, size):
+        """Draw vertices from distribution."""
+        vertices = np.random.randint(self.num_vertices, size=size)
+        keep = np.random.uniform(size=size) < self.prob[vertices]
+        return np.where(keep, vertices, self.alias[vertices])
+
 # ----------------------------------------------
 # Sample generator
 # ----------------------------------------------
@@ -98,6 +200,11 @@ class SampleIterator:
     samples. Data samples are produced in batches to amortize Python
     and I/O overheads.
 
+    Walk files may be text files or binary walk files (see
+    `utils.walks`). Binary walk files are memory-mapped and each rank
+    reads a contiguous slab of walks, so a rank only touches its own
+    part of the file.
+
     """
 
     def __init__(
@@ -110,6 +217,7 @@ class SampleIterator:
             batch_size,
             ranks_per_file=1,
             rank_in_file=0,
+            negative_sampler='alias',
         ):
 
         # Options
@@ -124,6 +232,8 @@ class SampleIterator:
 
         # Cache for walk data
         self.walk_batches = iter(())
+        self.binary_walks = None
+        self.binary_walks_pos = 0
         self.next_walk_batch = None
         self.next_walk_batch_thread = None
 
@@ -132,7 +242,11 @@ class SampleIterator:
         self.batch_rows = []
 
         # Negative sampling distribution
-        self.noise_cdf = np.zeros(num_vertices, dtype=np.float64)
+        if negative_sampler == 'alias':
+            self.noise_sampler = AliasSampler(num_vertices)
+        else:
+            self.noise_sampler = CDFSampler(num_vertices)
+        self.noise_weights = np.zeros(num_vertices, dtype=np.float64)
         self.noise_visit_count = 0
         self.visit_counts = np.ones(self.num_vertices, dtype=np.int64)
         self.total_visit_count = self.num_vertices
@@ -158,6 +272,28 @@ class SampleIterator:
         """
 
         # Read walks from file
+        if utils.walks.is_binary_walk_file(self.walk_file):
+            walks = self._read_binary_walks()
+        else:
+            walks = self._read_text_walks()
+
+        # Check that walks are valid
+        assert walks.shape[0] > 0, \
+            f'Did not load any walks from {self.walk_file}'
+        assert walks.shape[1] == self.walk_length, \
+            f'Found walks of length {walks.shape[1]} in {self.walk_file}, ' \
+            f'but expected a walk length of {self.walk_length}'
+
+        # Store walks in member variable
+        self.next_walk_batch = walks
+
+    def _read_text_walks(self):
+        """Read next batch of walks from text walk file.
+
+        Each rank parses every line of the file and keeps every
+        `ranks_per_file`-th line.
+
+        """
         try:
             walks = next(self.walk_batches)
         except StopIteration:
@@ -177,17 +313,32 @@ class SampleIterator:
                 memory_map=True,
             )
             walks = next(self.walk_batches)
-        walks = walks.to_numpy(dtype=np.int64)
+        return walks.to_numpy(dtype=np.int64)
 
-        # Check that walks are valid
-        assert walks.shape[0] > 0, \
-            f'Did not load any walks from {walk_file}'
-        assert walks.shape[1] == self.walk_length, \
-            f'Found walks of length {walks.shape[1]} in {walk_file}, ' \
-            f'but expected a walk length of {self.walk_length}'
+    def _read_binary_walks(self):
+        """Read next batch of walks from binary walk file.
 
-        # Store walks in member variable
-        self.next_walk_batch = walks
+        Each rank reads batches from a contiguous slab of the file,
+        starting over at the beginning of the slab when it reaches
+        the end.
+
+        """
+
+        # Memory-map this rank's slab of the walk file
+        if self.binary_walks is None:
+            walks = utils.walks.load_binary_walks(self.walk_file)
+            num_walks = walks.shape[0]
+            start = (self.rank_in_file * num_walks) // self.ranks_per_file
+            end = ((self.rank_in_file + 1) * num_walks) // self.ranks_per_file
+            self.binary_walks = walks[start:end]
+
+        # Read batch from slab
+        if self.binary_walks_pos >= self.binary_walks.shape[0]:
+            self.binary_walks_pos = 0
+        pos = self.binary_walks_pos
+        self.binary_walks_pos += self.batch_size
+        return np.array(self.binary_walks[pos:pos+self.batch_size],
+                        dtype=np.int64)
 
     def _generate_batch(self, out, rows):
         """Produce a batch of data samples.
@@ -218,8 +369,8 @@ class SampleIterator:
             self._update_noise_distribution()
 
         # Generate negative samples
-        rands = np.random.uniform(size=(batch_size, self.num_negative_samples))
-        negative_samples = np.searchsorted(self.noise_cdf, rands)
+        negative_samples = self.noise_sampler.sample(
+            (batch_size, self.num_negative_samples))
 
         # Populate output matrix with data samples
         col0 = 0
@@ -235,9 +386,7 @@ class SampleIterator:
 
     def _record_walk_visits(self, walks):
         """Record visits to vertices in a graph walk."""
-        # Note: Doesn't correctly handle case where vertex is visited
-        # multiple times
-        self.visit_counts[walks] += np.int64(1)
+        np.add.at(self.visit_counts, walks.ravel(), np.int64(1))
         self.total_visit_count += walks.size
 
     def _update_noise_distribution(self):
@@ -245,11 +394,10 @@ class SampleIterator:
         np.float_power(
             self.visit_counts,
             self.noise_distribution_exp,
-            out=self.noise_cdf,
+            out=self.noise_weights,
             dtype=np.float64,
         )
-        np.cumsum(self.noise_cdf, out=self.noise_cdf)
-        self.noise_cdf *= np.float64(1 / self.noise_cdf[-1])
+        self.noise_sampler.update(self.noise_weights)
         self.noise_visit_count = self.total_visit_count
 
 # ----------------------------------------------
@@ -302,6 +450,7 @@ def get_sample(*args):
             batch_size=4096,
             ranks_per_file=ranks_per_file,
             rank_in_file=rank_in_file,
+            negative_sampler=negative_sampler,
         )
 
     # Get sample from iterator
@@ -15,6 +15,7 @@ import model.skip_gram
 import utils
 import utils.graph
 import utils.snap
+import utils.walks
 
 root_dir = os.path.dirname(os.path.realpath(__file__))
 
@@ -105,7 +106,11 @@ walk_file = config.get('Walks', 'file', fallback=None)
 if not num_vertices and graph_file:
     num_vertices = utils.graph.max_vertex_index(graph_file) + 1
 if not num_vertices and walk_file:
-    num_vertices = np.loadtxt(walk_file, dtype=np.int64).max() + 1
+    if utils.walks.is_binary_walk_file(walk_file):
+        walks = utils.walks.load_binary_walks(walk_file)
+    else:
+        walks = np.loadtxt(walk_file, dtype=np.int64)
+    num_vertices = walks.max() + 1
 if not num_vertices:
     raise RuntimeError('Number of graph vertices not provided in config file')
 config.set('Graph', 'num_vertices', str(num_vertices))
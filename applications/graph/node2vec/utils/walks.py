@@ -0,0 +1,130 @@
+"""Utilities for graph walk files.
+
+Offline walks are generated as text files, with one walk per line and
+vertex indices separated by spaces. Parsing text is slow and every
+reader must scan the file to find its lines, so walk files can be
+converted to a fixed-width binary format: a NumPy ``.npy`` file with a
+(num_walks x walk_length) matrix of int32 or int64 vertex indices.
+Binary walk files are memory-mapped, and any range of walks is found
+by offset arithmetic.
+
+"""
+import argparse
+import os.path
+import numpy as np
+import pandas as pd
+
+
+def is_binary_walk_file(walk_file):
+    """Whether a walk file is in the binary format."""
+    return walk_file.endswith('.npy')
+
+
+def walk_dtype(num_vertices):
+    """Narrowest integer type that can store vertex indices."""
+    if num_vertices is not None and num_vertices <= np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+def count_lines(text_file, chunk_size=1 << 26):
+    """Number of lines in a text file."""
+    count = 0
+    last = b'\n'
+    with open(text_file, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            count += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        count += 1
+    return count
+
+
+def convert_walks_to_binary(
+        walk_file,
+        binary_file=None,
+        num_vertices=None,
+        chunk_size=1 << 16,
+):
+    """Convert a text walk file to the binary format.
+
+    The text file is parsed in chunks, so it does not need to fit in
+    memory.
+
+    Args:
+        walk_file (str): Text walk file.
+        binary_file (str, optional): Output file (default: walk file
+            with '.npy' appended).
+        num_vertices (int, optional): Number of graph vertices. Walks
+            are stored as int32 if all vertex indices fit, and as
+            int64 otherwise (default: int64).
+        chunk_size (int): Number of walks parsed at a time.
+
+    Returns:
+        str: Binary walk file.
+
+    """
+    if not binary_file:
+        binary_file = walk_file + '.npy'
+
+    # Get walk file dimensions
+    num_walks = count_lines(walk_file)
+    with open(walk_file, 'r') as f:
+        walk_length = len(f.readline().split())
+
+    # Parse text file and write to memory-mapped binary file
+    walks = np.lib.format.open_memmap(
+        binary_file,
+        mode='w+',
+        dtype=walk_dtype(num_vertices),
+        shape=(num_walks, walk_length),
+    )
+    offset = 0
+    for chunk in pd.read_csv(
+            walk_file,
+            delimiter=' ',
+            header=None,
+            dtype=np.int64,
+            keep_default_na=False,
+            iterator=True,
+            chunksize=chunk_size,
+            compression=None,
+    ):
+        chunk = chunk.to_numpy(dtype=np.int64)
+        walks[offset:offset+chunk.shape[0]] = chunk
+        offset += chunk.shape[0]
+    assert offset == num_walks, \
+        f'Expected {num_walks} walks in {walk_file}, but read {offset}'
+    walks.flush()
+    return binary_file
+
+
+def load_binary_walks(walk_file):
+    """Memory-map a binary walk file.
+
+    Returns:
+        np.memmap: (num_walks x walk_length) matrix of vertex indices.
+
+    """
+    return np.load(walk_file, mmap_mode='r')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Convert text walk files to the binary format')
+    parser.add_argument(
+        'walk_files', nargs='+', type=str,
+        help='text walk files', metavar='FILE')
+    parser.add_argument(
+        '--num-vertices', action='store', default=None, type=int,
+        help='number of graph vertices (default: store as int64)',
+        metavar='NUM')
+    args = parser.parse_args()
+    for walk_file in args.walk_files:
+        print(convert_walks_to_binary(
+            walk_file,
+            num_vertices=args.num_vertices,
+        ))
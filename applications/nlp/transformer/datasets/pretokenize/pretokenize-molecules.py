@@ -0,0 +1,43 @@
+"""
+Pre-tokenizes molecular text datasets for ``ChemTextDataset``.
+
+For every input file ``f``, writes the token IDs of all lines to ``f.tokens``,
+the line offsets to ``f.tokens.offsets`` and a header with the vocabulary hash
+to ``f.tokens.json``. ``ChemTextDataset`` detects the pre-tokenized files and
+reads them instead of tokenizing during training.
+"""
+import argparse
+
+from lbann.contrib.data.chem_tokenizers import ChemTokenType
+from lbann.contrib.data.molecule_dataset import pretokenize_file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('vocab', help='Vocabulary file')
+    parser.add_argument('files', nargs='+', help='Dataset files')
+    parser.add_argument('--token-format',
+                        default='smiles',
+                        choices=[s.name.lower() for s in ChemTokenType],
+                        help='Tokenizer type (default: smiles)')
+    parser.add_argument('--data-format',
+                        default=None,
+                        choices=[s.name.lower() for s in ChemTokenType],
+                        help='Molecule format of the dataset files '
+                        '(default: same as --token-format)')
+    parser.add_argument('-j',
+                        action='store',
+                        default=0,
+                        type=int,
+                        help='Processes (default 0 = number of cores)')
+    args = parser.parse_args()
+
+    token_format = ChemTokenType[args.token_format.upper()]
+    data_format = (ChemTokenType[args.data_format.upper()]
+                   if args.data_format else None)
+    for f in args.files:
+        out = pretokenize_file(f,
+                               args.vocab,
+                               token_format,
+                               input_type=data_format,
+                               num_procs=args.j or None)
+        print('Wrote', out)
@@ -143,7 +143,9 @@ def main():
         num_epochs=args.num_epochs,
         args=args,
     )
-    lbann.util.amp.enable_amp(model, args)
+    amp_plan = lbann.util.amp.enable_amp(model, args)
+    if amp_plan is not None:
+        print(amp_plan.summary())
 
     # Construct trainer
 
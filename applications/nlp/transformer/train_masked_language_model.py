@@ -15,6 +15,7 @@ import lbann
 import lbann.contrib.args
 from lbann.launcher.batch_script import BatchScript
 import lbann.util.amp
+from lbann.util.data import DatasetFactory
 
 # Local imports
 current_dir = os.path.dirname(os.path.realpath(__file__))
@@ -188,21 +189,25 @@ def main():
         else:
             token_format = input_format
 
-        dataset = ChemTextDataset(args.train_set,
-                                  args.vocab_file,
-                                  args.sequence_length,
-                                  tokenizer_type=token_format,
-                                  input_type=input_format,
-                                  mlm_probability=args.mlm_fraction,
-                                  attn_mask=args.attn_mask)
+        # Ship datasets as constructor arguments so that each data reader
+        # worker opens the (memory-mapped) text files itself
+        dataset = DatasetFactory(ChemTextDataset,
+                                 args.train_set,
+                                 args.vocab_file,
+                                 args.sequence_length,
+                                 tokenizer_type=token_format,
+                                 input_type=input_format,
+                                 mlm_probability=args.mlm_fraction,
+                                 attn_mask=args.attn_mask)
         if args.val_set:
-            val_dataset = ChemTextDataset(args.val_set,
-                                          args.vocab_file,
-                                          args.sequence_length,
-                                          tokenizer_type=token_format,
-                                          input_type=input_format,
-                                          mlm_probability=args.mlm_fraction,
-                                          attn_mask=args.attn_mask)
+            val_dataset = DatasetFactory(ChemTextDataset,
+                                         args.val_set,
+                                         args.vocab_file,
+                                         args.sequence_length,
+                                         tokenizer_type=token_format,
+                                         input_type=input_format,
+                                         mlm_probability=args.mlm_fraction,
+                                         attn_mask=args.attn_mask)
 
     # Construct model
     chosen_config = SIZES[args.model_type]
@@ -218,7 +223,9 @@ def main():
         num_epochs=args.num_epochs,
         args=args,
     )
-    lbann.util.amp.enable_amp(model, args)
+    amp_plan = lbann.util.amp.enable_amp(model, args)
+    if amp_plan is not None:
+        print(amp_plan.summary())
 
     # Construct trainer
 
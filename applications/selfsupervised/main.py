@@ -35,6 +35,11 @@ parser.add_argument(
 parser.add_argument(
     '--checkpoint-interval', action='store', default=0, type=int,
     help='epoch frequency for checkpointing')
+parser.add_argument(
+    '--image-store', action='store', default=None, type=str,
+    help=('path prefix of decoded image store for siamese pretraining; '
+          'enables batched patch generation (default: None)'),
+    metavar='PREFIX')
 args = parser.parse_args()
 
 # ==============================================
@@ -49,6 +54,7 @@ if not args.pretrain or args.pretrain == 'siamese':
         num_epochs=args.pretrain_epochs,
         learning_rate=0.005,
         checkpoint_interval=args.checkpoint_interval,
+        image_store=args.image_store,
     )
 elif args.pretrain == 'supervised':
     data_reader_file = os.path.join(current_dir, 'data_reader_imagenet.prototext')
@@ -0,0 +1,65 @@
+"""Python dataset for batched patch generation.
+
+Unlike the per-sample functions in patch_generator, which LBANN calls
+once per sample, this dataset generates all samples of a data reader
+worker task at once (see patch_generator.batched). Images are read
+from a store of decoded, center-cropped images, built ahead of time
+with `python3 -m patch_generator.batched`.
+
+"""
+import numpy as np
+from lbann.contrib.data.image_store import ImageStore
+from lbann.util.data import Dataset, Sample, SampleDims, get_worker_index
+import patch_generator
+from patch_generator.batched import make_samples
+
+class PatchDataset(Dataset):
+    """Patches and pattern labels from stored ImageNet images."""
+
+    def __init__(self, num_patches, store_prefix, seed=None):
+        """Initialize dataset.
+
+        Args:
+            num_patches (int): Number of patches per sample (2-5).
+            store_prefix (str): Path prefix of the image store. Images
+                must be square and of equal size, as written by
+                `python3 -m patch_generator.batched`.
+            seed (int): Random seed, combined with the data reader worker
+                index.
+
+        """
+        self.num_patches = num_patches
+        self.patterns = {
+            2: patch_generator.patterns_2patch,
+            3: patch_generator.patterns_3patch,
+            4: patch_generator.patterns_4patch,
+            5: patch_generator.patterns_5patch,
+        }[num_patches]
+        self.store = ImageStore(store_prefix)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        return Sample(sample=self.__getitems__([index]).sample[0])
+
+    def __getitems__(self, indices):
+        images = np.stack([self.store[i] for i in indices])
+        if images.shape[1] != images.shape[2]:
+            raise ValueError(f'images in {self.store.prefix} are not square')
+        return Sample(sample=make_samples(images, self.patterns, self.rng))
+
+    def get_sample_dims(self):
+        return SampleDims(
+            sample=patch_generator.sample_dims(self.num_patches))
+
+    def worker_init(self):
+        # Workers need distinct random streams. Same as
+        # SeedSequence(seed).spawn(index + 1)[index].
+        seed = self.seed
+        if seed is not None:
+            seed = np.random.SeedSequence(seed,
+                                          spawn_key=(get_worker_index() or 0,))
+        self.rng = np.random.default_rng(seed)
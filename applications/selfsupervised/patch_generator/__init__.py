@@ -14,11 +14,14 @@ label_file = '/p/lscratchh/brainusr/ILSVRC2012/labels/train.txt'
 data_dir = '/p/lscratchh/brainusr/ILSVRC2012/original/train'
 
 # Read label files
+# Note: The label file is only available on LLNL systems. Other
+# modules of the package (e.g. batched) are usable without it.
 samples = []
-with open(label_file) as f:
-    for line in f:
-        line = line.split(' ')
-        samples.append((line[0], int(line[1])))
+if os.path.exists(label_file):
+    with open(label_file) as f:
+        for line in f:
+            line = line.split(' ')
+            samples.append((line[0], int(line[1])))
 
 # Get sample function
 def get_sample_2patch(index):
@@ -0,0 +1,360 @@
+"""Batched patch generation from a decoded image store.
+
+Processes many images per call instead of one patch at a time:
+patches are cropped, resized, flipped and rotated with one cv2.remap
+over the batch per interpolation method, and chroma blur is one Lab
+conversion and one box filter over all patches stacked together.
+Images are read from an lbann.contrib.data.image_store.ImageStore of
+decoded, center-cropped squares, so JPEGs are only decoded once, when
+the store is built:
+
+    python3 -m patch_generator.batched --store PREFIX [--workers N]
+
+The per-sample generator crops patches from the full-resolution
+image. Stored images are resized to image_size x image_size, so
+patches are cropped from a downsampled image. The largest patch
+crops cover 110/196 of the image and the smallest (3x3 patches
+zoomed in by 128/96) 82.5/384 of it, so 384 pixels (the default)
+keeps the crops at 82-215 pixels, comparable to typical ImageNet
+images with shorter sides of 333-500 pixels. Smaller stores are
+faster to read but blur the patches: at 256 pixels, 3x3 patches are
+upsampled from as few as 55 pixels, which changes the training data.
+At 384 pixels, the store takes 432 KiB per image (about 570 GB for
+the ImageNet-1k training set).
+
+"""
+import functools
+import os.path
+import cv2
+import numpy as np
+import scipy.ndimage
+from .extract_patches import (PatchType,
+                              _3x3_patch_pos, _3x3_patch_size,
+                              _2x2_patch_pos, _2x2_patch_size,
+                              overlap_patch_pos, overlap_patch_size)
+
+# Default height and width of stored images
+default_image_size = 384
+
+# Patch size in pixels
+patch_size = 96
+
+# Normalization of BGR channels
+means = np.array([0.406, 0.456, 0.485], dtype=np.float32)
+stdevs = np.array([0.225, 0.224, 0.229], dtype=np.float32)
+
+# Interpolation methods, as in extract_patches.extract_patch
+interp_methods = (cv2.INTER_LINEAR, cv2.INTER_AREA,
+                  cv2.INTER_CUBIC, cv2.INTER_LANCZOS4)
+
+# Replicated rows around each stacked image, enough for the widest
+# interpolation kernel (Lanczos, 8 taps)
+_border_rows = 4
+
+# Nearest-neighbor samples per output pixel and dimension that
+# approximate INTER_AREA, which cv2.remap does not implement
+_area_samples = 4
+
+# ----------------------------------------------
+# Batched patch extraction
+# ----------------------------------------------
+
+@functools.lru_cache(maxsize=None)
+def _patch_table(patterns):
+    """Normalized position and size of each patch in each pattern.
+
+    Returns:
+        ndarray: Array of shape (num_patterns, num_patches, 3) with
+            posy, posx and size.
+
+    """
+    table = []
+    for pattern in patterns:
+        row = []
+        for patch_type, index in pattern:
+            if patch_type == PatchType._3X3:
+                pos, size = _3x3_patch_pos[index], _3x3_patch_size
+            if patch_type == PatchType._2X2:
+                pos, size = _2x2_patch_pos[index], _2x2_patch_size
+            if patch_type == PatchType.OVERLAP:
+                pos, size = overlap_patch_pos[index], overlap_patch_size
+            row.append((pos[0], pos[1], size))
+        table.append(row)
+    return np.array(table, dtype=np.float64)
+
+def _sampling_grid(posy, posx, size, img_size, flip, rotate):
+    """Pixel coordinates of resized patches.
+
+    Follows the crop boxes of extract_patches.extract_patch and samples
+    patch_size x patch_size pixel centers in them. Coordinates are
+    clamped to the crop box, like the borders of cv2.resize.
+
+    Returns:
+        (ndarray, ndarray): float32 y and x coordinates, each of shape
+            (num_patches, patch_size, patch_size).
+
+    """
+    y0 = np.clip(np.floor(posy * img_size), 0, img_size-1)
+    y1 = np.clip(np.ceil((posy + size) * img_size), 1, img_size)
+    x0 = np.clip(np.floor(posx * img_size), 0, img_size-1)
+    x1 = np.clip(np.ceil((posx + size) * img_size), 1, img_size)
+    steps = (np.arange(patch_size) + 0.5) / patch_size
+    ys = y0[:, None] + steps * (y1 - y0)[:, None] - 0.5
+    xs = x0[:, None] + steps * (x1 - x0)[:, None] - 0.5
+    ys = np.clip(ys, y0[:, None], (y1 - 1)[:, None]).astype(np.float32)
+    xs = np.clip(xs, x0[:, None], (x1 - 1)[:, None]).astype(np.float32)
+    xs[flip] = xs[flip, ::-1]
+    num_patches = len(ys)
+    ys = np.broadcast_to(ys[:, :, None],
+                         (num_patches, patch_size, patch_size)).copy()
+    xs = np.broadcast_to(xs[:, None, :],
+                         (num_patches, patch_size, patch_size)).copy()
+
+    # Rotating the grid rotates the sampled patch
+    for k in range(1, 4):
+        mask = rotate == k
+        ys[mask] = np.rot90(ys[mask], k, axes=(1, 2))
+        xs[mask] = np.rot90(xs[mask], k, axes=(1, 2))
+    return ys, xs
+
+def _remap_area(image, map_x, map_y):
+    """Area-averaging version of cv2.remap.
+
+    Averages _area_samples x _area_samples nearest-neighbor samples
+    spread over the footprint of each output pixel, which approximates
+    how cv2.resize with INTER_AREA weights the source pixels by their
+    overlap with the footprint, both when shrinking and enlarging.
+
+    Args:
+        image (ndarray): uint8 image in HWC format.
+        map_x (ndarray): x coordinates of each patch, with shape
+            (num_patches, patch_size, patch_size).
+        map_y (ndarray): y coordinates of each patch, with shape
+            (num_patches, patch_size, patch_size).
+
+    Returns:
+        ndarray: uint8 patches, stacked vertically.
+
+    """
+    grads = [np.gradient(m, axis=axis) for m in (map_x, map_y)
+             for axis in (1, 2)]
+    steps = np.arange(_area_samples, dtype=np.float32)
+    steps = (steps + 0.5) / _area_samples - 0.5
+    total = np.zeros((map_x.size // patch_size, patch_size, image.shape[-1]),
+                     dtype=np.uint16)
+    for a in steps:
+        for b in steps:
+            x = map_x + a * grads[0] + b * grads[1]
+            y = map_y + a * grads[2] + b * grads[3]
+            total += cv2.remap(image,
+                               x.reshape(-1, patch_size),
+                               y.reshape(-1, patch_size),
+                               cv2.INTER_NEAREST,
+                               borderMode=cv2.BORDER_REPLICATE)
+    total += len(steps)**2 // 2
+    total //= len(steps)**2
+    return total.astype(np.uint8)
+
+def _resample(images, image_index, ys, xs, interpolation):
+    """Sample images at pixel coordinates.
+
+    All images are stacked into one tall image so that a single
+    cv2.remap call extracts all patches with the same interpolation
+    method. Image borders are replicated, so that interpolation near
+    the edge of an image does not read its neighbors. OpenCV limits
+    image dimensions to 32767 pixels, so large batches are split into
+    chunks.
+
+    Args:
+        images (ndarray): uint8 square images in NHWC format.
+        image_index (ndarray): Image of each patch.
+        ys (ndarray): y coordinates of each patch, from _sampling_grid.
+        xs (ndarray): x coordinates of each patch, from _sampling_grid.
+        interpolation (ndarray): OpenCV interpolation method of each
+            patch.
+
+    Returns:
+        ndarray: float32 patches in NHWC format, in [0,1].
+
+    """
+    num_images, img_size = images.shape[0], images.shape[1]
+    channels = images.shape[-1]
+    rows = img_size + 2 * _border_rows
+    max_rows = 32767
+    chunk = max(1, min(max_rows // rows,
+                       max_rows // (patch_size * max(1, len(image_index)
+                                                     // num_images))))
+    patches = np.empty(ys.shape + (channels,), dtype=np.uint8)
+    for first in range(0, num_images, chunk):
+        last = min(first + chunk, num_images)
+        tall = np.pad(images[first:last],
+                      ((0, 0), (_border_rows, _border_rows), (0, 0), (0, 0)),
+                      mode='edge')
+        tall = tall.reshape(-1, img_size, channels)
+        in_chunk = np.flatnonzero((image_index >= first)
+                                  & (image_index < last))
+        for method in np.unique(interpolation[in_chunk]):
+            group = in_chunk[interpolation[in_chunk] == method]
+            offset = ((image_index[group] - first) * rows
+                      + _border_rows).astype(np.float32)
+            map_y = ys[group] + offset[:, None, None]
+            map_x = xs[group]
+            if method == cv2.INTER_AREA:
+                out = _remap_area(tall, map_x, map_y)
+            else:
+                out = cv2.remap(tall,
+                                map_x.reshape(-1, patch_size),
+                                map_y.reshape(-1, patch_size),
+                                int(method),
+                                borderMode=cv2.BORDER_REPLICATE)
+            patches[group] = out.reshape(-1, patch_size, patch_size,
+                                         channels)
+    return patches.astype(np.float32) * (1/255)
+
+def chroma_blur_batch(patches):
+    """Blur chroma channels of a batch of patches.
+
+    Same as chroma_blur.chroma_blur, applied to all patches at once.
+
+    Args:
+        patches (ndarray): float32 patches in NHWC format.
+
+    """
+    n, h, w, c = patches.shape
+    lab = cv2.cvtColor(patches.reshape(n * h, w, c), cv2.COLOR_BGR2Lab)
+    lab = lab.reshape(n, h, w, c)
+    scipy.ndimage.uniform_filter(lab[..., 1:], size=(1, 13, 13, 1),
+                                 output=lab[..., 1:])
+    bgr = cv2.cvtColor(lab.reshape(n * h, w, c), cv2.COLOR_Lab2BGR)
+    return bgr.reshape(n, h, w, c)
+
+def random_transforms(num_images, num_patterns, num_patches, rng):
+    """Draw the random transforms of a batch of samples.
+
+    Args:
+        num_images (int): Number of samples.
+        num_patterns (int): Number of patch patterns.
+        num_patches (int): Number of patches per pattern.
+        rng (numpy.random.Generator): Random number generator.
+
+    Returns:
+        dict of ndarray: Pattern label, zoom, jitter, flips, patch order,
+            rotation, random aperture and interpolation method of each
+            sample. Entries are indexed by sample and, if per-patch, by
+            position of the patch in the sample.
+
+    """
+    transforms = dict(
+        label=rng.integers(0, num_patterns, size=num_images),
+        zoom=rng.uniform(1, 128/96, size=(num_images, 1)),
+        jitter=rng.random((num_images, 1, 2)),
+        flip=rng.random((num_images, num_patches)) < 0.5,
+        order=rng.permuted(np.tile(np.arange(num_patches), (num_images, 1)),
+                           axis=1),
+        rotate=rng.integers(0, 4, size=num_images),
+    )
+    ap_size = rng.integers(64, 97, size=(num_images, num_patches))
+    transforms['aperture_size'] = ap_size
+    transforms['aperture_y'] = rng.integers(0, 97 - ap_size)
+    transforms['aperture_x'] = rng.integers(0, 97 - ap_size)
+    transforms['interpolation'] = rng.choice(interp_methods,
+                                             size=(num_images, num_patches))
+    return transforms
+
+def make_samples(images, patterns, rng):
+    """Generate data samples from a batch of images.
+
+    Batched version of get_sample: extract patches with random zoom,
+    jitter, flips and order, rotate all patches of a sample, apply
+    chroma blur, normalize and apply random apertures. Each patch is
+    resized with a random choice of OpenCV interpolation methods.
+
+    Args:
+        images (ndarray): uint8 square images in NHWC format.
+        patterns (list of (list of (PatchType, int))): Patch patterns.
+            See patterns.py.
+        rng (numpy.random.Generator): Random number generator. The
+            transforms are drawn with random_transforms.
+
+    Returns:
+        ndarray: Flattened patches and one-hot labels, with shape
+            (num_images, sample_size).
+
+    """
+    num_images, img_size = images.shape[0], images.shape[1]
+    num_patterns = len(patterns)
+    num_patches = len(patterns[0])
+    table = _patch_table(patterns)
+    t = random_transforms(num_images, num_patterns, num_patches, rng)
+    rotate = t['rotate']
+    label = t['label'] + rotate * num_patterns
+
+    # Patch positions, in shuffled order
+    boxes = table[t['label']]
+    boxes = np.take_along_axis(boxes, t['order'][..., None], axis=1)
+    zoom, jitter = t['zoom'], t['jitter']
+    size = boxes[..., 2]
+    posy = boxes[..., 0] + (1 - 1/zoom) * size * jitter[..., 0]
+    posx = boxes[..., 1] + (1 - 1/zoom) * size * jitter[..., 1]
+    size = size / zoom
+
+    # Extract all patches at once
+    ys, xs = _sampling_grid(posy.ravel(), posx.ravel(), size.ravel(),
+                            img_size, t['flip'].ravel(),
+                            np.repeat(rotate, num_patches))
+    image_index = np.repeat(np.arange(num_images), num_patches)
+    patches = _resample(images, image_index, ys, xs,
+                        t['interpolation'].ravel())
+    patches = chroma_blur_batch(patches)
+
+    # Normalize in place
+    patches -= means
+    patches *= 1 / stdevs
+
+    # Random aperture on all but the first patch
+    ap_size = t['aperture_size'][..., None]
+    ap_y = t['aperture_y'][..., None]
+    ap_x = t['aperture_x'][..., None]
+    pixels = np.arange(patch_size)
+    in_y = (pixels >= ap_y) & (pixels < ap_y + ap_size)
+    in_x = (pixels >= ap_x) & (pixels < ap_x + ap_size)
+    aperture = in_y[..., :, None] & in_x[..., None, :]
+    aperture[:, 0] = True
+
+    # Write patches in CHW format and one-hot labels into the samples
+    patch_values = num_patches * 3 * patch_size * patch_size
+    samples = np.zeros((num_images, patch_values + 4 * num_patterns),
+                       dtype=np.float32)
+    np.multiply(
+        patches.reshape(num_images, num_patches,
+                        patch_size, patch_size, 3).transpose(0, 1, 4, 2, 3),
+        aperture[:, :, None],
+        out=samples[:, :patch_values].reshape(
+            num_images, num_patches, 3, patch_size, patch_size))
+    samples[np.arange(num_images), patch_values + label] = 1
+    return samples
+
+if __name__ == '__main__':
+    import argparse
+    from lbann.contrib.data.image_store import build_image_store
+    from . import samples, data_dir
+    parser = argparse.ArgumentParser(
+        description='Decode images into a store for batched patch generation')
+    parser.add_argument(
+        '--store', action='store', required=True, type=str,
+        help='path prefix of the image store files', metavar='PREFIX')
+    parser.add_argument(
+        '--image-size', action='store', default=default_image_size, type=int,
+        help=('height and width of stored images '
+              f'(default: {default_image_size})'),
+        metavar='NUM')
+    parser.add_argument(
+        '--workers', action='store', default=None, type=int,
+        help='number of processes (default: number of CPUs)', metavar='NUM')
+    args = parser.parse_args()
+    build_image_store([os.path.join(data_dir, f) for f, _ in samples],
+                      [label for _, label in samples],
+                      args.store,
+                      image_size=args.image_size,
+                      center_crop=True,
+                      num_procs=args.workers)
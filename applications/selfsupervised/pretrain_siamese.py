@@ -14,7 +14,9 @@ def setup(num_patches=3,
           bn_statistics_group_size=2,
           fc_data_layout='model_parallel',
           warmup=True,
-          checkpoint_interval=None):
+          checkpoint_interval=None,
+          image_store=None,
+          samples_per_task=32):
 
     # Data dimensions
     patch_dims = patch_generator.patch_dims
@@ -100,12 +102,22 @@ def setup(num_patches=3,
     # opt = lbann.Adam(learn_rate=learning_rate, beta1=0.9, beta2=0.999, eps=1e-8)
 
     # Setup data reader
-    data_reader = make_data_reader(num_patches)
+    data_reader = make_data_reader(num_patches, image_store, samples_per_task)
 
     # Return experiment objects
     return model, data_reader, opt
 
-def make_data_reader(num_patches):
+def make_data_reader(num_patches, image_store=None, samples_per_task=32):
+    if image_store:
+        # Batched patch generation from decoded image store
+        import lbann.util.data
+        import patch_dataset
+        dataset = lbann.util.data.DatasetFactory(
+            patch_dataset.PatchDataset, num_patches, image_store)
+        reader = lbann.util.data.construct_python_dataset_reader(
+            dataset, role='train', samples_per_task=samples_per_task)
+        return lbann.reader_pb2.DataReader(reader=[reader])
+
     message = lbann.reader_pb2.DataReader()
     data_reader = message.reader.add()
     data_reader.name = 'python'
@@ -159,6 +171,10 @@ if __name__ == "__main__":
     parser.add_argument(
         '--warmup', action='store', default=True, type=bool,
         help='use learning rate warmup (default: True)')
+    parser.add_argument(
+        '--image-store', action='store', default=None, type=str,
+        help=('path prefix of decoded image store; enables batched patch '
+              'generation (default: None)'), metavar='PREFIX')
     args = parser.parse_args()
 
     # Setup experiment
@@ -171,6 +187,7 @@ if __name__ == "__main__":
         bn_statistics_group_size=args.bn_statistics_group_size,
         fc_data_layout=args.fc_data_layout,
         warmup=args.warmup,
+        image_store=args.image_store,
     )
 
     # Run experiment
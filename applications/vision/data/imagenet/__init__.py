@@ -69,10 +69,41 @@ def make_data_reader_synthetic(num_classes: int = 1000) -> Any:
 
     return message
 
+def make_data_reader_image_store(
+        image_store: str,
+        num_classes: int = 1000,
+        samples_per_task: int = 32) -> Any:
+    """Set up Python dataset readers for pre-decoded ImageNet images.
+
+    The training and validation stores are expected at
+    ``image_store/train`` and ``image_store/val`` (see
+    build_image_store.py). Samples are augmented like in the ImageNet
+    data reader, but no JPEGs are decoded during training.
+
+    """
+    from lbann.contrib.data.image_store import ImageStoreDataset
+    from lbann.util.data import DatasetFactory, construct_python_dataset_reader
+    message = lbann.reader_pb2.DataReader()
+    for role, store, train in (('train', 'train', True),
+                               ('validate', 'val', False)):
+        dataset = DatasetFactory(ImageStoreDataset,
+                                 os.path.join(image_store, store),
+                                 num_classes=num_classes,
+                                 train=train)
+        message.reader.extend([construct_python_dataset_reader(
+            dataset,
+            role=role,
+            samples_per_task=samples_per_task)])
+    return message
+
 def make_data_reader(
         num_classes: int = 1000,
-        synthetic: bool = False) -> Any:
+        synthetic: bool = False,
+        image_store: str = None) -> Any:
     if synthetic:
         return make_data_reader_synthetic(num_classes=num_classes)
+    elif image_store:
+        return make_data_reader_image_store(image_store,
+                                            num_classes=num_classes)
     else:
         return make_data_reader_imagenet(num_classes=num_classes)
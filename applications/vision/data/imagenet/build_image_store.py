@@ -0,0 +1,53 @@
+"""
+Decodes ImageNet images into an ``ImageStore`` for ``ImageStoreDataset``.
+
+Every image in the label file is decoded once with OpenCV, resized so its
+shorter side has --image-size pixels and written as raw uint8 pixels to
+sharded files ``PREFIX.<n>.images`` with an index ``PREFIX.index.npy``.
+``make_data_reader(image_store=DIR)`` expects the training and validation
+stores at ``DIR/train`` and ``DIR/val``.
+"""
+import argparse
+import os
+
+from lbann.contrib.data.image_store import build_image_store, read_label_file
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('label_file',
+                        help='Image list with a file path and label per line')
+    parser.add_argument('data_dir',
+                        help='Directory the image paths are relative to')
+    parser.add_argument('prefix', help='Path prefix of the store files')
+    parser.add_argument('--image-size',
+                        action='store',
+                        default=256,
+                        type=int,
+                        help='Shorter image side in the store (default: 256)')
+    parser.add_argument('--center-crop',
+                        action='store_true',
+                        help='Crop images to centered squares')
+    parser.add_argument('--shard-size',
+                        action='store',
+                        default=4,
+                        type=float,
+                        help='Maximum shard size in GiB (default: 4)')
+    parser.add_argument('-j',
+                        action='store',
+                        default=0,
+                        type=int,
+                        help='Processes (default 0 = number of cores)')
+    args = parser.parse_args()
+
+    prefix_dir = os.path.dirname(args.prefix)
+    if prefix_dir:
+        os.makedirs(prefix_dir, exist_ok=True)
+    files, labels = read_label_file(args.label_file, args.data_dir)
+    out = build_image_store(files,
+                            labels,
+                            args.prefix,
+                            image_size=args.image_size,
+                            center_crop=args.center_crop,
+                            shard_size=int(args.shard_size * (1 << 30)),
+                            num_procs=args.j or None)
+    print('Wrote', out)
@@ -78,7 +78,9 @@ model = lbann.Model(num_epochs,
                                lbann.CallbackPrint(),
                                lbann.CallbackTimer()])
 
-lbann.util.amp.enable_amp(model, args)
+amp_plan = lbann.util.amp.enable_amp(model, args)
+if amp_plan is not None:
+    print(amp_plan.summary())
 
 # Setup optimizer
 opt = lbann.SGD(learn_rate=0.01, momentum=0.9)
@@ -48,6 +48,10 @@ parser.add_argument(
 parser.add_argument(
     '--synthetic', action='store_true', default=False,
     help='Use synthetic data')
+parser.add_argument(
+    '--image-store', action='store', default=None, type=str,
+    help=('directory with pre-decoded training and validation images '
+          '(see data/imagenet/build_image_store.py)'), metavar='DIR')
 lbann.contrib.args.add_optimizer_arguments(parser, default_learning_rate=0.1)
 args = parser.parse_args()
 
@@ -139,7 +143,9 @@ model = lbann.Model(args.num_epochs,
                     callbacks=callbacks)
 
 # Enable AMP if requested.
-lbann.util.amp.enable_amp(model, args)
+amp_plan = lbann.util.amp.enable_amp(model, args)
+if amp_plan is not None:
+    print(amp_plan.summary())
 
 # Setup optimizer
 opt = lbann.contrib.args.create_optimizer(args)
@@ -147,14 +153,15 @@ opt = lbann.contrib.args.create_optimizer(args)
 # Setup data reader
 data_reader = data.imagenet.make_data_reader(
     num_classes=args.num_classes,
-    synthetic=args.synthetic)
+    synthetic=args.synthetic,
+    image_store=args.image_store)
 
 # Setup trainer
 trainer = lbann.Trainer(mini_batch_size=args.mini_batch_size, random_seed=args.random_seed)
 
 # Run experiment
 kwargs = lbann.contrib.args.get_scheduler_kwargs(args)
-if args.synthetic:
+if args.synthetic or args.image_store:
     lbann_args = []
 else:
     lbann_args = ['--use_data_store', '--preload_data_store', '--node_sizes_vary']
@@ -14,6 +14,8 @@ except (ModuleNotFoundError, ImportError):
 
 from torch import nn
 import lbann.torch
+import lbann.torch.cache
+import lbann.torch.lowering
 import numpy as np
 
 
@@ -121,6 +123,123 @@ def test_module_with_parameters_custom():
     assert np.allclose(out, ref)
 
 
+def test_compile_cache(tmp_path, monkeypatch):
+    torch.manual_seed(20230620)
+
+    # Count lowerings, which only run if the graph is not cached
+    lowerings = []
+    dynamo_callback = lbann.torch.lowering.dynamo_callback
+
+    def counting_callback(*args, **kwargs):
+        lowerings.append(args)
+        return dynamo_callback(*args, **kwargs)
+
+    monkeypatch.setattr(lbann.torch.lowering, 'dynamo_callback',
+                        counting_callback)
+
+    class parameterized(nn.Module):
+
+        def __init__(self):
+            super().__init__()
+            self.p = nn.Parameter(torch.randn(1, 20))
+
+        def forward(self, x):
+            return x * self.p
+
+    mod = parameterized()
+    np.random.seed(20230620)
+    inp = np.random.rand(1, 20).astype(np.float32)
+
+    # First compilation populates the cache, second one loads from it
+    g1 = lbann.torch.compile(mod, x=torch.randn(20), cache_dir=tmp_path)
+    assert len(lowerings) == 1
+    g2 = lbann.torch.compile(mod, x=torch.randn(20), cache_dir=tmp_path)
+    assert len(lowerings) == 1
+    assert len(list(tmp_path.glob('*/*/graph.pkl'))) == 1
+    assert len(g1) == len(g2)
+    assert np.allclose(lbann.evaluate(g2, inp), inp * mod.p.detach().numpy())
+
+    # Changing parameter values creates a new entry
+    with torch.no_grad():
+        mod.p.mul_(2)
+    g3 = lbann.torch.compile(mod, x=torch.randn(20), cache_dir=tmp_path)
+    assert len(lowerings) == 2
+    assert len(list(tmp_path.glob('*/*/graph.pkl'))) == 2
+    assert np.allclose(lbann.evaluate(g3, inp), inp * mod.p.detach().numpy())
+
+
+class _Config:
+    """Configuration object, like those of Huggingface Transformers"""
+
+    def __init__(self, activation):
+        self.activation = activation
+
+    def to_dict(self):
+        return {'activation': self.activation}
+
+
+class _Configured(nn.Module):
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.linear = nn.Linear(20, 20)
+
+    def forward(self, x):
+        return self.activate(self.linear(x))
+
+    def activate(self, x):
+        if self.config.activation == 'relu':
+            return torch.relu(x)
+        return torch.tanh(x)
+
+
+def test_compile_key(monkeypatch):
+    x = torch.randn(1, 20)
+
+    def key(mod):
+        return lbann.torch.cache.compile_key(mod, (x, ), {}, True)
+
+    torch.manual_seed(20230620)
+    reference = key(_Configured(_Config('relu')))
+    torch.manual_seed(20230620)
+    assert key(_Configured(_Config('relu'))) == reference
+
+    # Configuration objects are part of the key
+    torch.manual_seed(20230620)
+    assert key(_Configured(_Config('tanh'))) != reference
+
+    # So are methods other than forward
+    torch.manual_seed(20230620)
+    mod = _Configured(_Config('relu'))
+    monkeypatch.setattr(_Configured, 'activate',
+                        lambda self, x: torch.sigmoid(x))
+    assert key(mod) != reference
+
+
+def test_compile_report(tmp_path):
+
+    def fn(x):
+        return torch.cos(x) + torch.sin(x)
+
+    # Compile with profiling enabled
+    report = lbann.torch.CompilationReport()
+    graph = lbann.torch.compile(fn, x=torch.randn(1, 20), report=report)
+
+    # Test report contents
+    assert report.compilations == 1
+    assert report.layers == len(graph)
+    assert report.nodes_before_lowering > 0
+    for name in ('total', 'fake_tensor_prop', 'partial_lowering',
+                 'conversion'):
+        assert name in report.pass_times
+    assert sum(report.converter_calls.values()) >= 3
+
+    # Test JSON output
+    report.save_json(tmp_path / 'report.json')
+    assert (tmp_path / 'report.json').stat().st_size > 0
+
+
 if __name__ == '__main__':
     test_simple_function()
     test_simple_module()
@@ -0,0 +1,68 @@
+""" Tests the cost-aware automatic mixed-precision planner. """
+import argparse
+
+import lbann
+import lbann.contrib.args
+from lbann.util.amp import enable_amp, plan_layer_datatypes
+
+
+def _build_model():
+    x = lbann.Input(data_field='samples', name='x')
+    y = lbann.FullyConnected(x, num_neurons=8, name='fc1')
+    y = lbann.Add(lbann.Relu(y, name='relu'), x, name='residual')
+    y = lbann.FullyConnected(y, num_neurons=8, name='fc2')
+    y = lbann.Softmax(lbann.Tanh(y, name='tanh'), name='softmax')
+    loss = lbann.CrossEntropy(y, lbann.Identity(x, name='label'))
+    return lbann.Model(0,
+                       layers=lbann.traverse_layer_graph(x),
+                       objective_function=loss)
+
+
+def test_plan_fewer_casts():
+    model = _build_model()
+    plan = plan_layer_datatypes(model, input_dims=[8])
+    layers = {l.name: l for l in model.layers}
+
+    # Numerically sensitive layers stay in FP32
+    for name in ('x', 'softmax', 'label'):
+        assert layers[name].datatype == lbann.DataType.FLOAT
+    for name in ('fc1', 'relu', 'residual', 'fc2'):
+        assert layers[name].datatype == lbann.DataType.FP16
+
+    # Input is converted once for both of its FP16 children
+    assert plan.num_casts == 2 < plan.baseline_num_casts
+    assert plan.casts_saved > 0 and plan.bytes_saved > 0
+    cast = layers['x_fp16']
+    assert isinstance(cast, lbann.Identity)
+    assert sorted(c.name for c in cast.children) == ['fc1', 'residual']
+    assert ('x', 'x_fp16', ['fc1', 'residual']) in plan.conversions
+
+    # Graph connections are consistent
+    for l in model.layers:
+        assert all(l in p.children for p in l.parents)
+        assert all(l in c.parents for c in l.children)
+
+
+def test_plan_respects_explicit_datatypes():
+    model = _build_model()
+    layers = {l.name: l for l in model.layers}
+    layers['fc2'].datatype = lbann.DataType.FLOAT
+    plan = plan_layer_datatypes(model, insert_casts=False)
+    assert plan.datatypes['fc2'] == lbann.DataType.FLOAT
+    assert plan.datatypes['fc1'] == lbann.DataType.FP16
+    assert all(cast is None for _, cast, _ in plan.conversions)
+
+
+def test_enable_amp_returns_plan(capsys):
+    parser = argparse.ArgumentParser()
+    lbann.contrib.args.add_amp_arguments(parser)
+    model = _build_model()
+    plan = enable_amp(model, parser.parse_args(['--amp', '--amp-planner']),
+                      input_dims=[8])
+    assert plan.num_casts == 2
+    assert model.amp is not None
+    assert not capsys.readouterr().out
+
+    model = _build_model()
+    assert enable_amp(model, parser.parse_args(['--amp'])) is None
+    assert model.amp is not None
@@ -0,0 +1,106 @@
+""" Tests the ragged token store and dataset of the ATOM application. """
+import importlib.util
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+atom_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)),
+                        'applications', 'ATOM')
+sys.path.insert(0, atom_dir)
+import ragged_store
+
+pad_index = 2
+max_seq_len = 8
+
+
+def make_sequences(max_token, seed=0):
+    """Random sequences, including empty, short and long ones"""
+    rng = np.random.default_rng(seed)
+    lengths = [0, 1, max_seq_len - 1, max_seq_len, max_seq_len + 5, 0, 3]
+    sequences = [rng.integers(0, max_token + 1, size=n) for n in lengths]
+    sequences[-1][0] = max_token
+    return sequences
+
+
+def legacy_sample(sample):
+    """Padding and truncation of the original ATOM dataset"""
+    if len(sample) < max_seq_len:
+        sample = np.concatenate(
+            (sample, np.full(max_seq_len - len(sample), pad_index)))
+    else:
+        sample = np.resize(sample, max_seq_len)
+    return sample
+
+
+def load_dataset(tmp_path, monkeypatch, data_path):
+    """Import a fresh copy of the ATOM dataset module"""
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({'pad_index': pad_index}))
+    monkeypatch.setenv('DATA_CONFIG', str(config))
+    monkeypatch.setenv('MAX_SEQ_LEN', str(max_seq_len))
+    monkeypatch.setenv('DATA_PATH', str(data_path))
+    spec = importlib.util.spec_from_file_location(
+        'atom_dataset', os.path.join(atom_dir, 'dataset.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('max_token,dtype',
+                         [(0, np.uint8), (255, np.uint8), (256, np.uint16),
+                          (65535, np.uint16), (65536, np.int32),
+                          (2**31 - 1, np.int32), (2**31, np.int64)])
+def test_round_trip(tmp_path, max_token, dtype):
+    assert ragged_store.token_dtype(max_token) == dtype
+    sequences = make_sequences(max_token)
+    prefix = str(tmp_path / 'data')
+    assert not ragged_store.exists(prefix)
+    ragged_store.write(sequences, prefix, chunk_size=2)
+    assert ragged_store.exists(prefix)
+
+    tokens, offsets = ragged_store.load(prefix)
+    assert tokens.dtype == dtype
+    assert type(tokens) is np.ndarray and type(offsets) is np.ndarray
+    assert len(offsets) == len(sequences) + 1
+    assert offsets[-1] == len(tokens)
+    for i, sequence in enumerate(sequences):
+        np.testing.assert_array_equal(tokens[offsets[i]:offsets[i + 1]],
+                                      sequence)
+
+
+def test_empty_store(tmp_path):
+    prefix = str(tmp_path / 'data')
+    ragged_store.write([np.zeros(0, dtype=np.int64)] * 3, prefix)
+    tokens, offsets = ragged_store.load(prefix)
+    assert tokens.dtype == np.uint8 and len(tokens) == 0
+    np.testing.assert_array_equal(offsets, [0, 0, 0, 0])
+
+
+@pytest.mark.parametrize('use_store', [False, True])
+def test_dataset(tmp_path, monkeypatch, use_store):
+    sequences = make_sequences(40)
+    data_path = tmp_path / 'data.npy'
+    array = np.empty(len(sequences), dtype=object)
+    array[:] = sequences
+    np.save(data_path, array, allow_pickle=True)
+    if use_store:
+        assert ragged_store.convert(str(data_path)) == str(tmp_path / 'data')
+    dataset = load_dataset(tmp_path, monkeypatch, data_path)
+    assert (dataset.samples is None) == use_store
+
+    assert dataset.num_samples() == len(sequences)
+    assert dataset.sample_dims() == [max_seq_len]
+
+    # Samples are padded and truncated as before, also when a short
+    # sample follows a long one in the reused buffer
+    for order in [range(len(sequences)), reversed(range(len(sequences)))]:
+        for i in order:
+            sample = dataset.get_sample(i)
+            assert sample.dtype == np.float32
+            assert sample is dataset.buffer
+            np.testing.assert_array_equal(sample,
+                                          legacy_sample(sequences[i]))
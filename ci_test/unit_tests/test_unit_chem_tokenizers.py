@@ -0,0 +1,116 @@
+""" Tests the batch interface of the molecular tokenizers. """
+import numpy as np
+import pytest
+
+pytest.importorskip('transformers')
+
+from lbann.contrib.data.chem_tokenizers import (AISTokenizer,
+                                                SELFIESTokenizer,
+                                                SMILESTokenizer)
+
+_special_tokens = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+
+_smiles = [
+    'CCO',
+    '',
+    'c1ccccc1C(=O)O',
+    'CC(C)Cc1ccc(cc1)[C@@H](C)C(=O)O',
+    'id|CN1C=NC2=C1C(=O)N(C(=O)N2C)C',
+    '|',
+    'CC[MASK]O',
+    '[MASK]',
+    'Xx?C',
+    'C' * 700 + 'N' * 300 + 'Br' * 100,
+]
+
+_ais = [
+    '[CH3;!R;C] [CH2;!R;CO] [OH;!R;C]',
+    '',
+    ' ',
+    '[CH3;!R;C]  [OH;!R;C]',
+    'id|[CH3;!R;C] [CH2;!R;CO]',
+    '[CH3;!R;C] [MASK] [OH;!R;C]',
+    '[MASK]',
+    ' '.join(['[CH2;!R;CC]'] * 1500),
+]
+
+_selfies = [
+    '[C][C][O]',
+    '',
+    '[C][=C][C][=C][C][=C][Ring1][=Branch1]',
+    '[C][MASK][O]',
+    '[Xe][C]',
+    '[C]' * 1000,
+]
+
+
+def _vocab_file(tmp_path, tokens):
+    vocab = tmp_path / 'vocab.txt'
+    vocab.write_text('\n'.join(_special_tokens + tokens) + '\n')
+    return str(vocab)
+
+
+def _make_tokenizer(tmp_path, kind):
+    if kind == 'smiles':
+        tokens = ['C', 'N', 'O', 'Br', 'c', '1', '(', ')', '=', '[C@@H]']
+        return SMILESTokenizer(_vocab_file(tmp_path, tokens)), _smiles
+    if kind == 'ais':
+        pytest.importorskip('atomInSmiles')
+        tokens = ['[CH3;!R;C]', '[CH2;!R;CO]', '[OH;!R;C]', '[CH2;!R;CC]']
+        return AISTokenizer(_vocab_file(tmp_path, tokens)), _ais
+    pytest.importorskip('selfies')
+    tokens = ['[C]', '[O]', '[=C]', '[Ring1]', '[=Branch1]']
+    return SELFIESTokenizer(_vocab_file(tmp_path, tokens)), _selfies
+
+
+@pytest.fixture(params=['smiles', 'ais', 'selfies'])
+def tokenizer(request, tmp_path):
+    return _make_tokenizer(tmp_path, request.param)
+
+
+def test_encode_ragged(tokenizer):
+    tokenizer, texts = tokenizer
+    expected = [tokenizer(text)['input_ids'] for text in texts]
+    for num_procs, chunk_size in [(None, 4096), (2, 3)]:
+        ids, lengths = tokenizer.encode_ragged(texts,
+                                               num_procs=num_procs,
+                                               chunk_size=chunk_size)
+        assert ids.dtype == np.int32
+        assert lengths.tolist() == [len(e) for e in expected]
+        assert [s.tolist()
+                for s in np.split(ids, np.cumsum(lengths)[:-1])] == expected
+
+    # Empty strings only hold [CLS] and [SEP]
+    ids, lengths = tokenizer.encode_ragged([''])
+    assert ids.tolist() == [tokenizer.cls_token_id, tokenizer.sep_token_id]
+
+
+@pytest.mark.parametrize('pad_left', [False, True])
+@pytest.mark.parametrize('max_length', [None, 4])
+def test_encode_batch(tokenizer, pad_left, max_length):
+    tokenizer, texts = tokenizer
+    expected = [tokenizer(text)['input_ids'] for text in texts]
+    width = max_length or max(len(e) for e in expected)
+    out = tokenizer.encode_batch(texts, max_length=max_length,
+                                 pad_left=pad_left)
+    assert out.shape == (len(texts), width)
+    for row, e in zip(out, expected):
+        e = e[:width]
+        padding = [tokenizer.pad_token_id] * (width - len(e))
+        assert row.tolist() == (padding + e if pad_left else e + padding)
+
+
+def test_added_tokens(tokenizer):
+    tokenizer, texts = tokenizer
+    texts = texts + ['[Xe]']
+    tokenizer.encode_ragged(texts)
+
+    # Tokens added after the lookup table is built are not unknown
+    assert '[Xe]' not in tokenizer.get_vocab()
+    tokenizer.add_tokens(['[Xe]'])
+    expected = [tokenizer(text)['input_ids'] for text in texts]
+    ids, lengths = tokenizer.encode_ragged(texts)
+    assert [s.tolist()
+            for s in np.split(ids, np.cumsum(lengths)[:-1])] == expected
+    assert ids[-2] == tokenizer.convert_tokens_to_ids('[Xe]')
+    assert ids[-2] != tokenizer.unk_token_id
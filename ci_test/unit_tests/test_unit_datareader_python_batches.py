@@ -0,0 +1,155 @@
+""" Tests the copy and in-place batch paths of the Python data reader. """
+import numpy as np
+import pytest
+
+from lbann.util.data import (DataReader, Dataset, DistConvDataset, Sample,
+                             SampleDims)
+
+num_samples = 13
+sample_size = 8
+num_labels = 3
+
+
+class _Data:
+
+    def __init__(self):
+        rng = np.random.default_rng(20240109)
+        self.samples = rng.normal(size=(num_samples, sample_size))
+        self.labels = rng.normal(size=(num_samples, num_labels))
+        self.responses = rng.normal(size=(num_samples, 1))
+
+    def __len__(self):
+        return num_samples
+
+    def get_sample_dims(self):
+        return SampleDims(sample=[sample_size],
+                          label=[num_labels],
+                          response=[1])
+
+
+class PlainDataset(_Data, Dataset):
+
+    def __getitem__(self, index):
+        return Sample(sample=self.samples[index],
+                      label=self.labels[index],
+                      response=self.responses[index])
+
+    def expected_samples(self):
+        return self.samples
+
+
+class PartitionedDataset(_Data, DistConvDataset):
+    """DistConv dataset whose samples are split over two IO partitions."""
+
+    def __getitem__(self, index):
+        width = sample_size // self.num_io_partitions
+        part = self.rank % self.num_io_partitions
+        return Sample(sample=self.samples[index, part * width:(part + 1) *
+                                          width],
+                      label=self.labels[index],
+                      response=self.responses[index])
+
+    def expected_samples(self):
+        width = sample_size // self.num_io_partitions
+        part = self.rank % self.num_io_partitions
+        return self.samples[:, part * width:(part + 1) * width]
+
+
+def _make_dataset(kind):
+    if kind == 'plain':
+        return PlainDataset()
+    dataset = PartitionedDataset()
+    dataset.num_io_partitions = 2
+    dataset.rank = 1
+    return dataset
+
+
+@pytest.fixture(params=['plain', 'distconv'])
+def dataset(request):
+    return _make_dataset(request.param)
+
+
+def _reader(dataset):
+    return DataReader(dataset,
+                      num_procs=2,
+                      prefetch_factor=2,
+                      dtype='float32',
+                      samples_per_task=2)
+
+
+def test_copy_path(dataset):
+    """``get_batch``, used when DistConv responses must be redistributed"""
+    reader = _reader(dataset)
+    try:
+        reader.queue_samples(list(range(num_samples)))
+        batch = reader.get_batch(num_samples)
+    finally:
+        reader.terminate()
+    np.testing.assert_allclose(batch['sample'], dataset.expected_samples(),
+                               rtol=1e-6)
+    np.testing.assert_allclose(batch['label'], dataset.labels, rtol=1e-6)
+    np.testing.assert_allclose(batch['response'], dataset.responses,
+                               rtol=1e-6)
+    assert batch['sample_ptr'] == batch['sample'].ctypes.data
+
+
+def test_in_place_path(dataset):
+    """``get_batch_into`` fills padded column-major buffers in place"""
+    expected = dataset.expected_samples()
+    ldim = expected.shape[1] + 3
+    capacity = num_samples + 2
+
+    # Column-major matrices, stored as (columns, leading dimension)
+    buffers = {
+        'sample': np.full((capacity, ldim), -1, dtype=np.float32),
+        'label': np.full((capacity, num_labels), -1, dtype=np.float32),
+        'response': np.full((capacity, 1), -1, dtype=np.float32),
+    }
+    reader = _reader(dataset)
+    try:
+        buffers_id = reader.register_batch_buffers({
+            field: (buf.ctypes.data, buf.shape[1], capacity)
+            for field, buf in buffers.items()
+        })
+        reader.queue_samples(list(range(num_samples)))
+        first = 5
+        reader.get_batch_into(first, buffers_id)
+        np.testing.assert_allclose(buffers['sample'][:first, :expected.shape[1]],
+                                   expected[:first],
+                                   rtol=1e-6)
+        reader.get_batch_into(num_samples - first, buffers_id)
+    finally:
+        reader.terminate()
+
+    # Later batches overwrite the start of the buffers
+    np.testing.assert_allclose(
+        buffers['sample'][:num_samples - first, :expected.shape[1]],
+        expected[first:],
+        rtol=1e-6)
+    np.testing.assert_allclose(buffers['label'][:num_samples - first],
+                               dataset.labels[first:],
+                               rtol=1e-6)
+    np.testing.assert_allclose(buffers['response'][:num_samples - first],
+                               dataset.responses[first:],
+                               rtol=1e-6)
+
+    # Padding rows and unused columns are left untouched
+    assert (buffers['sample'][:, expected.shape[1]:] == -1).all()
+    assert (buffers['sample'][num_samples:] == -1).all()
+
+
+def test_in_place_rejects_small_buffers():
+    dataset = _make_dataset('plain')
+    reader = _reader(dataset)
+    try:
+        buf = np.empty((4, sample_size - 1), dtype=np.float32)
+        with pytest.raises(ValueError):
+            reader.register_batch_buffers(
+                {'sample': (buf.ctypes.data, sample_size - 1, 4)})
+        buf = np.empty((4, sample_size), dtype=np.float32)
+        buffers_id = reader.register_batch_buffers(
+            {'sample': (buf.ctypes.data, sample_size, 4)})
+        with pytest.raises(ValueError):
+            reader.get_batch_into(5, buffers_id)
+    finally:
+        reader.terminate()
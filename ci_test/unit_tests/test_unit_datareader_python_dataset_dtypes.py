@@ -0,0 +1,162 @@
+import os
+import os.path
+import sys
+import numpy as np
+from lbann.util.data import DataReader, Dataset, Sample, SampleDims, construct_python_dataset_reader
+
+# Bamboo utilities
+current_file = os.path.realpath(__file__)
+current_dir = os.path.dirname(current_file)
+sys.path.insert(0, os.path.join(os.path.dirname(current_dir), 'common_python'))
+import tools
+
+# ==============================================
+# Objects for Python dataset data reader
+# ==============================================
+# Note: The Python dataset data reader loads the dataset constructed below.
+
+# Data
+class TestDataset(Dataset):
+    def __init__(self):
+        np.random.seed(20240109)
+        self.num_samples = 29
+        self.sample_size = 7
+        self.samples = np.random.randint(256, size=(self.num_samples,self.sample_size)).astype(np.uint8)
+    
+    def __len__(self):
+        return self.num_samples
+    
+    def __getitem__(self, index):
+        return Sample(sample=self.samples[index,:])
+    
+    def get_sample_dims(self):
+        return SampleDims(sample=[self.sample_size], dtypes={'sample': 'uint8'})
+
+test_dataset = TestDataset()
+
+# ==============================================
+# Setup LBANN experiment
+# ==============================================
+
+def setup_experiment(lbann, weekly):
+    """Construct LBANN experiment.
+
+    Args:
+        lbann (module): Module for LBANN Python frontend
+
+    """
+    mini_batch_size = len(test_dataset) // 4
+    trainer = lbann.Trainer(mini_batch_size)
+    model = construct_model(lbann)
+    data_reader = construct_data_reader(lbann)
+    optimizer = lbann.NoOptimizer()
+    return trainer, model, data_reader, optimizer, None # Don't request any specific number of nodes
+
+def construct_model(lbann):
+    """Construct LBANN model.
+
+    Args:
+        lbann (module): Module for LBANN Python frontend
+
+    """
+
+    # Layer graph
+    x = lbann.Input(data_field='samples')
+    y = lbann.L2Norm2(x)
+    layers = list(lbann.traverse_layer_graph(x))
+    metric = lbann.Metric(y, name='obj')
+    callbacks = []
+
+    # Compute expected value with NumPy
+    vals = []
+    for i in range(len(test_dataset)):
+        x = test_dataset[i].sample.astype(np.float64)
+        y = tools.numpy_l2norm2(x)
+        vals.append(y)
+    val = np.mean(vals)
+    tol = 8 * val * np.finfo(np.float32).eps
+    callbacks.append(lbann.CallbackCheckMetric(
+        metric=metric.name,
+        lower_bound=val-tol,
+        upper_bound=val+tol,
+        error_on_failure=True,
+        execution_modes='test'))
+
+    # Construct model
+    num_epochs = 0
+    return lbann.Model(num_epochs,
+                       layers=layers,
+                       metrics=[metric],
+                       callbacks=callbacks)
+
+def construct_data_reader(lbann):
+    """Construct Protobuf message for Python dataset data reader.
+
+    The Python data reader will import the current Python file to
+    access the sample access functions.
+
+    Args:
+        lbann (module): Module for LBANN Python frontend
+
+    """
+
+    dataset_path = os.path.join(work_dir, 'dataset.pkl')
+    
+    # Note: The training data reader should be removed when
+    # https://github.com/LLNL/lbann/issues/1098 is resolved.
+    message = lbann.reader_pb2.DataReader()
+    message.reader.extend([
+        construct_python_dataset_reader(
+            test_dataset,
+            dataset_path,
+            'train',
+            shuffle=False
+        )
+    ])
+    message.reader.extend([
+        construct_python_dataset_reader(
+            test_dataset,
+            dataset_path,
+            'test',
+            shuffle=False
+        )
+    ])
+    return message
+
+# ==============================================
+# Check data types in Python
+# ==============================================
+
+def test_received_dtypes():
+    reader = DataReader(test_dataset,
+                        num_procs=2,
+                        prefetch_factor=2,
+                        dtype='float32')
+    try:
+        # Samples are transferred in their declared type...
+        size, dtype = reader.get_fields()['sample']
+        assert size == test_dataset.sample_size
+        assert np.dtype(dtype) == np.uint8
+
+        reader.queue_samples(list(range(len(test_dataset))))
+        batch = reader.get_batch(len(test_dataset))
+    finally:
+        reader.terminate()
+
+    # ...and received in the data reader's type
+    assert batch['sample'].dtype == np.float32
+    np.testing.assert_array_equal(batch['sample'],
+                                  test_dataset.samples.astype(np.float32))
+
+# ==============================================
+# Setup PyTest
+# ==============================================
+
+work_dir = os.path.join(os.path.dirname(__file__),
+                        'experiments',
+                        os.path.basename(__file__).split('.py')[0])
+os.makedirs(work_dir, exist_ok=True)
+
+# Create test functions that can interact with PyTest
+for _test_func in tools.create_tests(setup_experiment, __file__, work_dir=work_dir):
+    globals()[_test_func.__name__] = _test_func
@@ -0,0 +1,183 @@
+""" Tests the deterministic, resumable sample order of Python datasets. """
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from lbann.util.data import (DataReader, Dataset, DatasetFactory,
+                             SampledDataset, Sample, SampleDims)
+from lbann.util.sampler import IndexSampler
+
+num_samples = 29
+sample_size = 3
+
+
+class IndexDataset(Dataset):
+
+    def __len__(self):
+        return num_samples
+
+    def __getitem__(self, index):
+        return Sample(sample=np.full(sample_size, index, dtype=np.float32))
+
+    def get_sample_dims(self):
+        return SampleDims(sample=[sample_size])
+
+
+class BatchedIndexDataset(IndexDataset):
+    """Dataset that loads several samples at once and holds a large array"""
+
+    def __init__(self):
+        self.data = np.zeros(1 << 20, dtype=np.uint8)
+
+    def __getitems__(self, indices):
+        indices = np.array(indices, dtype=np.float32)
+        return Sample(sample=np.repeat(indices[:, None], sample_size, axis=1))
+
+
+def test_seed_determinism():
+    sampler = IndexSampler(num_samples, seed=7)
+    assert len(sampler) == num_samples
+    for epoch in range(3):
+        indices = sampler.epoch_indices(epoch)
+        assert sorted(indices) == list(range(num_samples))
+        np.testing.assert_array_equal(
+            indices,
+            IndexSampler(num_samples, seed=7).epoch_indices(epoch))
+    assert not np.array_equal(sampler.epoch_indices(0),
+                              sampler.epoch_indices(1))
+    assert not np.array_equal(sampler.epoch_indices(0),
+                              IndexSampler(num_samples, seed=8).epoch_indices(0))
+    np.testing.assert_array_equal(
+        IndexSampler(num_samples, shuffle=False).epoch_indices(2),
+        np.arange(num_samples))
+
+
+def test_seek_and_resume(tmp_path):
+    cursor_path = str(tmp_path / 'cursor.json')
+    sampler = IndexSampler(num_samples, seed=3, cursor_path=cursor_path)
+    first = sampler.take(40)
+    assert first[:num_samples] == sampler.epoch_indices(0).tolist()
+    assert (sampler.epoch, sampler.position) == (1, 40 - num_samples)
+    sampler.save()
+    expected = sampler.take(50)
+
+    # A new sampler restores the cursor and continues the same stream
+    resumed = IndexSampler(num_samples, seed=3, cursor_path=cursor_path)
+    assert resumed.stream_position == 40
+    assert resumed.take(50) == expected
+
+    # Seeking recomputes any position directly
+    resumed.seek(25)
+    assert resumed.take(10) == first[25:35]
+    assert resumed.lookup([40, 5]).tolist() == [expected[0], first[5]]
+
+    # Cursors are only restored into matching samplers
+    with pytest.raises(ValueError):
+        IndexSampler(num_samples, seed=4, cursor_path=cursor_path)
+
+
+@pytest.mark.parametrize('bucketing', [False, True])
+def test_disjoint_shards(bucketing):
+    kwargs = {}
+    if bucketing:
+        kwargs = dict(lengths=np.arange(num_samples) % 5, batch_size=3)
+    shards = [IndexSampler(num_samples, seed=1, **kwargs) for _ in range(3)]
+    for i, sampler in enumerate(shards):
+        sampler.set_shard(3, i)
+    epoch_size = 9 if bucketing else num_samples // 3
+    for epoch in range(2):
+        indices = [set(s.epoch_indices(epoch)) for s in shards]
+        assert all(len(s) == epoch_size for s in indices)
+        assert len(set.union(*indices)) == 3 * epoch_size
+
+    with pytest.raises(ValueError):
+        shards[0].set_shard(3, 3)
+
+
+def test_bucketing():
+    lengths = np.random.default_rng(0).permutation(num_samples)
+    batch_size = 4
+    sampler = IndexSampler(num_samples,
+                           lengths=lengths,
+                           batch_size=batch_size,
+                           bucket_size=num_samples)
+    assert len(sampler) == (num_samples // batch_size) * batch_size
+    for epoch in range(3):
+        batches = sampler.epoch_indices(epoch).reshape(-1, batch_size)
+
+        # With a single bucket, batches are consecutive runs of the
+        # samples sorted by length
+        starts = sorted(np.sort(lengths[b])[0] for b in batches)
+        assert starts == list(range(0, len(sampler), batch_size))
+        for b in batches:
+            assert np.ptp(lengths[b]) == batch_size - 1
+
+    with pytest.raises(ValueError):
+        IndexSampler(num_samples, lengths=lengths)
+
+
+def test_shard_by_trainer():
+    dataset = pickle.dumps(
+        SampledDataset(IndexDataset(), IndexSampler(num_samples, seed=5)))
+    trainers = [pickle.loads(dataset) for _ in range(2)]
+    for i, d in enumerate(trainers):
+        d.set_trainer(i, 2, 0)
+    assert len(trainers[0]) == len(trainers[1]) == num_samples // 2
+    assert not (set(trainers[0].sampler.epoch_indices(0))
+                & set(trainers[1].sampler.epoch_indices(0)))
+
+    # Explicit shards are kept
+    d = SampledDataset(IndexDataset(),
+                       IndexSampler(num_samples, num_shards=1, shard_index=0))
+    d.set_trainer(1, 2, 0)
+    assert len(d) == num_samples
+
+
+@pytest.mark.parametrize('rank', [0, 1])
+def test_cursor_saved_by_rank_zero(tmp_path, rank):
+    cursor_path = str(tmp_path / 'cursor.json')
+    dataset = SampledDataset(
+        IndexDataset(),
+        IndexSampler(num_samples, cursor_path=cursor_path, save_interval=1))
+    dataset.set_trainer(1, 2, rank)
+    assert dataset.sampler.cursor_file == cursor_path + '.shard1'
+
+    reader = DataReader(dataset, num_procs=1, prefetch_factor=2,
+                        dtype='float32')
+    try:
+        reader.start_epoch(4)
+        reader.queue_samples(list(range(4)))
+        batch = reader.get_batch(4)
+    finally:
+        reader.terminate()
+    np.testing.assert_array_equal(batch['sample'][:, 0],
+                                  dataset.sampler.epoch_indices(0)[:4])
+    if rank == 0:
+        with open(dataset.sampler.cursor_file) as f:
+            assert json.load(f)['position'] == 4
+    assert not (tmp_path / 'cursor.json').exists()
+    assert (tmp_path / 'cursor.json.shard1').exists() == (rank == 0)
+
+
+@pytest.mark.parametrize('dataset_class', [IndexDataset, BatchedIndexDataset])
+def test_batched_loading(dataset_class):
+    dataset = SampledDataset(DatasetFactory(dataset_class),
+                             IndexSampler(num_samples, seed=3))
+
+    # The wrapped dataset is not pickled with the sampled dataset
+    assert len(pickle.dumps(dataset)) < 4096
+    np.testing.assert_array_equal(dataset.__getitems__([4, 1]).sample,
+                                  [[4] * sample_size, [1] * sample_size])
+
+    reader = DataReader(dataset, num_procs=1, prefetch_factor=2,
+                        dtype='float32', samples_per_task=3)
+    try:
+        reader.start_epoch(0)
+        reader.queue_samples(list(range(num_samples)))
+        batch = reader.get_batch(num_samples)
+    finally:
+        reader.terminate()
+    np.testing.assert_array_equal(batch['sample'][:, 0],
+                                  dataset.sampler.epoch_indices(0))
@@ -0,0 +1,152 @@
+""" Tests the shared-memory sample ring of the Python data reader. """
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+
+from lbann.util.data import (DataReader, Dataset, Sample, SampleDims,
+                             SharedMemoryRing)
+
+num_samples = 23
+sample_size = 5
+
+
+class IndexDataset(Dataset):
+    """Samples filled with their index, optionally loaded slowly and out of
+    order"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def __len__(self):
+        return num_samples
+
+    def __getitem__(self, index):
+        if self.delay:
+            time.sleep(self.delay * (index % 3))
+        return Sample(sample=np.full(sample_size, index, dtype=np.float32),
+                      label=np.array([index % 2], dtype=np.float32))
+
+    def get_sample_dims(self):
+        return SampleDims(sample=[sample_size], label=[1])
+
+
+def _check(batch, indices):
+    np.testing.assert_array_equal(batch['sample'],
+                                  np.repeat(np.array(indices)[:, None],
+                                            sample_size,
+                                            axis=1))
+    np.testing.assert_array_equal(batch['label'][:, 0],
+                                  np.array(indices) % 2)
+
+
+def _write_slot(spec, slot):
+    ring = SharedMemoryRing(*spec)
+    ring.write(slot, Sample(sample=np.arange(3), label=np.array([7])))
+    ring.close()
+
+
+def test_ring_layout():
+    fields = {'sample': (3, '<f4'), 'label': (1, '<i2')}
+    ring = SharedMemoryRing(4, fields, samples_per_slot=2)
+    try:
+        assert ring.slot_bytes == 2 * SharedMemoryRing.alignment
+        assert ring.field(1, 'sample').shape == (2, 3)
+        assert ring.field(1, 'label').dtype == np.int16
+
+        # Samples written by another process are visible in place
+        process = multiprocessing.Process(target=_write_slot,
+                                          args=(ring.spec(), 3))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        np.testing.assert_array_equal(ring.field(3, 'sample')[0], [0, 1, 2])
+        assert ring.field(3, 'label')[0, 0] == 7
+        assert not ring.field(2, 'sample').any()
+
+        ring.write_batch(0, Sample(sample=np.ones((2, 3)), label=[[1], [2]]))
+        np.testing.assert_array_equal(ring.field(0, 'label')[:, 0], [1, 2])
+        assert not ring.field(1, 'label').any()
+    finally:
+        ring.close(unlink=True)
+    ring.close(unlink=True)
+
+
+@pytest.mark.parametrize('samples_per_task', [1, 3])
+def test_wraparound(samples_per_task):
+    reader = DataReader(IndexDataset(),
+                        num_procs=2,
+                        prefetch_factor=1,
+                        dtype='float32',
+                        samples_per_task=samples_per_task)
+    try:
+        name = reader.ring.name
+        num_slots = reader.ring.num_slots
+        assert num_slots == 2
+
+        # Batches larger than the ring are filled in several waves, and
+        # the same slots are reused over epochs
+        for epoch in range(2):
+            order = np.random.default_rng(epoch).permutation(num_samples)
+            reader.queue_samples(order.tolist())
+            start = 0
+            for batch_size in [1, 7, 2, 9, 4]:
+                batch = reader.get_batch(batch_size)
+                _check(batch, order[start:start + batch_size])
+                start += batch_size
+            assert start == num_samples
+            assert not reader.loaded_samples and not reader.pending_samples
+            assert sorted(reader.free_slots) == list(range(num_slots))
+        assert reader.ring.name == name
+    finally:
+        reader.terminate()
+
+
+def test_slow_consumer():
+    reader = DataReader(IndexDataset(delay=0.01),
+                        num_procs=2,
+                        prefetch_factor=2,
+                        dtype='float32')
+    try:
+        num_slots = reader.ring.num_slots
+        reader.queue_samples(list(range(num_samples)))
+
+        # Workers never run more than a ring ahead of the consumer
+        assert len(reader.loaded_samples) == num_slots
+        assert len(reader.pending_samples) == num_samples - num_slots
+        assert not reader.free_slots
+        time.sleep(0.2)
+        assert len(reader.loaded_samples) == num_slots
+        _check(reader.get_batch(3), [0, 1, 2])
+        assert len(reader.loaded_samples) == num_slots
+        assert len(reader.pending_samples) == num_samples - num_slots - 3
+
+        # Samples are returned in order, although they finish out of order
+        _check(reader.get_batch(num_samples - 3), range(3, num_samples))
+        with pytest.raises(RuntimeError):
+            reader.get_batch(1)
+    finally:
+        reader.terminate()
+
+
+@pytest.mark.parametrize('use_shm_ring', [False, True])
+def test_in_flight_shutdown(use_shm_ring):
+    reader = DataReader(IndexDataset(delay=0.5),
+                        num_procs=2,
+                        prefetch_factor=2,
+                        dtype='float32',
+                        use_shm_ring=use_shm_ring)
+    name = reader.ring.name if use_shm_ring else None
+    reader.queue_samples(list(range(num_samples)))
+
+    # Terminating with samples in flight neither waits for them nor leaves
+    # the ring behind
+    start = time.perf_counter()
+    reader.terminate()
+    assert time.perf_counter() - start < 0.5
+    if use_shm_ring:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+        reader.ring.close(unlink=True)
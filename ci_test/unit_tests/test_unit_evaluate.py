@@ -1,5 +1,8 @@
 """ Tests the LBANN evaluator. """
+import os
+
 import lbann
+import lbann.core.evaluate
 import numpy as np
 import pytest
 
@@ -65,3 +68,47 @@ def test_evaluate_multidim():
     # Test outputs
     assert outputarr.shape == inputarr.shape
     assert np.allclose(outputarr, inputarr)
+
+
+def test_evaluation_session():
+    a = lbann.Input(data_field='samples')
+    lbann.AddConstant(a, constant=1, name='one')
+    lbann.AddConstant(a, constant=2, name='two')
+
+    # Calls with fewer and more samples than the mini-batch size, with
+    # a relaunch once the job's steps are used up
+    with lbann.EvaluationSession(a, (3, 4), 4, ['one', 'two'],
+                                 max_steps=4) as session:
+        for num_samples in (3, 4, 9, 2):
+            inputarr = np.random.rand(num_samples, 12)
+            out1, out2 = session.evaluate(inputarr)
+
+            # Test outputs
+            assert tuple(out1.shape) == (num_samples, 12)
+            assert np.allclose(out1, inputarr + 1)
+            assert np.allclose(out2, inputarr + 2)
+
+
+@pytest.mark.parametrize('scheduler', ('openmpi', 'slurm'))
+def test_evaluation_session_stream_dir(tmp_path, monkeypatch, scheduler):
+    """Only sessions launched on the current node stream via /dev/shm"""
+
+    class Process:
+        pid = 0
+
+        def poll(self):
+            return 0
+
+    monkeypatch.setattr(lbann.core.evaluate.subprocess, 'Popen',
+                        lambda *args, **kwargs: Process())
+    a = lbann.Input(data_field='samples')
+    lbann.AddConstant(a, constant=1, name='one')
+    with lbann.EvaluationSession(a, (3, 4), 4, ['one'],
+                                 work_dir=str(tmp_path),
+                                 scheduler=scheduler,
+                                 nodes=1) as session:
+        parent = os.path.dirname(session.stream_dir)
+    if scheduler == 'openmpi' and os.path.isdir('/dev/shm'):
+        assert parent == '/dev/shm'
+    else:
+        assert parent == os.path.realpath(session.work_dir)
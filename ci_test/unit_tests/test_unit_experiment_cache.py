@@ -0,0 +1,286 @@
+""" Tests the content-addressed experiment cache. """
+import gc
+import os
+import weakref
+
+import numpy as np
+import pytest
+
+import lbann
+import lbann.contrib.hyperparameter
+import lbann.core.util
+import lbann.modules
+from lbann.proto import ExperimentCache
+
+_sample_dims = [4, 3]
+_weights_values = np.random.default_rng(20240119).normal(
+    size=_sample_dims).astype(np.float32)
+_external_weights_threshold = 8
+
+
+def make_experiment(learning_rate=0.1):
+    x = lbann.Input(data_field='samples')
+    x = lbann.Reshape(x, dims=_sample_dims)
+    weights = lbann.Weights(
+        initializer=lbann.ValueInitializer(values=_weights_values.ravel()),
+        optimizer=lbann.NoOptimizer(),
+    )
+    weights = lbann.WeightsLayer(weights=weights, dims=_sample_dims)
+    z = lbann.L2Norm2(lbann.Multiply(x, weights))
+    model = lbann.Model(1,
+                        layers=lbann.traverse_layer_graph(x),
+                        objective_function=z,
+                        metrics=[lbann.Metric(z, name='l2')],
+                        callbacks=[lbann.CallbackPrint()])
+    optimizer = lbann.SGD(learn_rate=learning_rate)
+    reader = lbann.reader_pb2.DataReader()
+    trainer = lbann.Trainer(mini_batch_size=4)
+    return model, optimizer, reader, trainer
+
+
+def _save(cache, filename, model, optimizer, reader, trainer):
+    return cache.save(str(filename),
+                      external_weights_threshold=_external_weights_threshold,
+                      model=model,
+                      optimizer=optimizer,
+                      data_reader=reader,
+                      trainer=trainer)
+
+
+def _files(directory):
+    return {
+        os.path.join(root, f)
+        for root, _, files in os.walk(directory) for f in files
+    }
+
+
+def _load(filename):
+    message = lbann.lbann_pb2.LbannPB()
+    with open(filename, 'rb') as f:
+        message.ParseFromString(f.read())
+    return message
+
+
+@pytest.fixture
+def exports(monkeypatch):
+    """Count layers and weights exported to Protobuf"""
+    counts = {'layer': 0, 'weights': 0}
+
+    def count(cls, kind):
+        export_proto = cls.export_proto
+
+        def wrapper(self):
+            counts[kind] += 1
+            return export_proto(self)
+
+        monkeypatch.setattr(cls, 'export_proto', wrapper)
+
+    count(lbann.Layer, 'layer')
+    count(lbann.Weights, 'weights')
+    return counts
+
+
+def test_save_matches_export(tmp_path):
+    cache = ExperimentCache(tmp_path / 'cache')
+    model, optimizer, reader, trainer = make_experiment()
+    _save(cache, tmp_path / 'experiment.protobin', model, optimizer, reader,
+          trainer)
+    message = _load(tmp_path / 'experiment.protobin')
+
+    assert message.trainer == trainer.export_proto()
+    assert message.optimizer == optimizer.export_proto()
+    assert message.data_reader == reader
+    expected = model.export_proto()
+    assert list(message.model.layer) == list(expected.layer)
+    assert message.model.objective_function == expected.objective_function
+    assert list(message.model.metric) == list(expected.metric)
+    assert list(message.model.callback) == list(expected.callback)
+    assert message.model.num_epochs == expected.num_epochs
+
+    # Weights values are moved to a NumPy file in the cache
+    [weights] = message.model.weights
+    file = weights.initializer.numpy_initializer.file
+    assert file.startswith(cache.weights_dir)
+    np.testing.assert_array_equal(np.load(file), _weights_values.ravel())
+
+
+@pytest.mark.parametrize('use_cache', [False, True])
+def test_external_matrix_shapes(tmp_path, use_cache):
+    rng = np.random.default_rng(20240120)
+    linearity = rng.normal(size=(5, 12)).astype(np.float32)
+    bias = rng.normal(size=5).astype(np.float32)
+    other = rng.normal(size=12).astype(np.float32)
+
+    def weights(values):
+        return lbann.Weights(initializer=lbann.ValueInitializer(values=values),
+                             optimizer=lbann.NoOptimizer())
+
+    # Note: ValueInitializer values of weights matrices are in
+    # column-major order.
+    x = lbann.Input(data_field='samples')
+    y = lbann.FullyConnected(x,
+                             weights=[
+                                 weights(linearity.ravel(order='F')),
+                                 weights(bias)
+                             ],
+                             num_neurons=5)
+    unused = weights(other)
+    model = lbann.Model(1,
+                        layers=lbann.traverse_layer_graph(x),
+                        weights=[unused])
+    filename = str(tmp_path / 'experiment.protobin')
+    if use_cache:
+        ExperimentCache(tmp_path / 'cache').save(filename,
+                                                 external_weights_threshold=4,
+                                                 model=model)
+    else:
+        lbann.proto.save_prototext(filename,
+                                   binary=True,
+                                   external_weights_threshold=4,
+                                   model=model)
+    message = _load(filename)
+
+    # Linearity is saved as a row-major matrix and bias as a vector, as
+    # read by LBANN's NumpyInitializer
+    files = {
+        w.name: w.initializer.numpy_initializer.file
+        for w in message.model.weights
+    }
+    [fc] = [l for l in message.model.layer if l.HasField('fully_connected')]
+    saved_linearity = np.load(files[fc.weights[0]])
+    assert saved_linearity.shape == linearity.shape
+    assert saved_linearity.flags.c_contiguous
+    np.testing.assert_array_equal(saved_linearity, linearity)
+    np.testing.assert_array_equal(np.load(files[fc.weights[1]]), bias)
+
+    # Weights without a known matrix shape are kept in the message
+    assert not files[unused.name]
+    [w] = [w for w in message.model.weights if w.name == unused.name]
+    np.testing.assert_array_equal(w.initializer.value_initializer.values,
+                                  other)
+
+
+def test_unchanged_save_is_cached(tmp_path, exports):
+    cache = ExperimentCache(tmp_path / 'cache')
+    model, optimizer, reader, trainer = make_experiment()
+    key = _save(cache, tmp_path / 'a.protobin', model, optimizer, reader,
+                trainer)
+    assert exports['layer'] == len(model.layers)
+    assert exports['weights'] == 1
+    cache_files = _files(cache.directory)
+
+    # Saving again exports and writes nothing
+    exports.update(layer=0, weights=0)
+    assert _save(cache, tmp_path / 'b.protobin', model, optimizer, reader,
+                 trainer) == key
+    assert _files(cache.directory) == cache_files
+    assert exports == {'layer': 0, 'weights': 0}
+    assert os.path.samefile(tmp_path / 'a.protobin', tmp_path / 'b.protobin')
+
+    # Changing the optimizer only writes a new experiment file
+    optimizer.learn_rate = 0.01
+    assert _save(cache, tmp_path / 'c.protobin', model, optimizer, reader,
+                 trainer) != key
+    assert len(_files(cache.directory) - cache_files) == 1
+    assert exports == {'layer': 0, 'weights': 0}
+    assert _load(tmp_path / 'c.protobin').optimizer.sgd.learn_rate == 0.01
+
+    # Changing a layer only exports that layer
+    [reshape] = [l for l in model.layers if isinstance(l, lbann.Reshape)]
+    reshape.dims = [12]
+    _save(cache, tmp_path / 'd.protobin', model, optimizer, reader, trainer)
+    assert exports == {'layer': 1, 'weights': 0}
+    assert list(_load(tmp_path / 'd.protobin').model.layer) == list(
+        model.export_proto().layer)
+
+    # Replacing weights values only exports those weights
+    [weights] = model.weights
+    weights.initializer.values = 2 * _weights_values.ravel()
+    exports.update(layer=0, weights=0)
+    _save(cache, tmp_path / 'e.protobin', model, optimizer, reader, trainer)
+    message = _load(tmp_path / 'e.protobin')
+    assert exports == {'layer': 0, 'weights': 1}
+    np.testing.assert_array_equal(
+        np.load(message.model.weights[0].initializer.numpy_initializer.file),
+        2 * _weights_values.ravel())
+
+
+def test_rebuilt_experiment_is_cached(tmp_path, exports):
+    cache = ExperimentCache(tmp_path / 'cache')
+    counters = lbann.core.util.name_counters()
+    key = _save(cache, tmp_path / 'a.protobin', *make_experiment())
+    cache_files = _files(cache.directory)
+
+    # Identical experiment with the same default names is exported
+    # again, but not stored again
+    lbann.core.util.reset_name_counters(counters)
+    exports.update(layer=0, weights=0)
+    experiment = make_experiment()
+    assert _save(cache, tmp_path / 'b.protobin', *experiment) == key
+    assert _files(cache.directory) == cache_files
+    assert exports == {'layer': len(experiment[0].layers), 'weights': 1}
+
+    # Without resetting, default names differ, but the weights values
+    # are only stored once
+    layer = weakref.ref(experiment[0].layers[0])
+    assert _save(cache, tmp_path / 'c.protobin', *make_experiment()) != key
+    new_files = _files(cache.directory) - cache_files
+    assert len(new_files) == 1
+    assert not any(f.endswith('.npy') for f in new_files)
+
+    # Objects of previous experiments are not kept alive by the cache
+    del experiment
+    gc.collect()
+    assert layer() is None
+
+
+def test_name_counters():
+    counters = lbann.core.util.name_counters()
+    assert lbann.modules.FullyConnectedModule in counters
+    names = [lbann.Identity().name, lbann.Weights().name]
+    module = lbann.modules.FullyConnectedModule(4)
+    lbann.core.util.reset_name_counters(counters)
+    assert [lbann.Identity().name, lbann.Weights().name] == names
+    assert lbann.modules.FullyConnectedModule(4).name == module.name
+
+
+class _BatchScript:
+
+    def __init__(self, work_dir):
+        self.work_dir = str(work_dir)
+        self.nodes = 1
+        self.procs_per_node = 2
+        self.commands = []
+
+    def add_parallel_command(self, command, **kwargs):
+        self.commands.append(command)
+
+    def run(self, overwrite=False):
+        pass
+
+
+def test_grid_search(tmp_path, exports):
+    cache = ExperimentCache(tmp_path / 'cache')
+    script = _BatchScript(tmp_path)
+    lbann.contrib.hyperparameter.grid_search(script,
+                                             make_experiment,
+                                             experiment_cache=cache,
+                                             learning_rate=[0.1, 0.01, 0.001])
+
+    # Layers and weights are exported for each configuration
+    assert exports['layer'] == 3 * len(make_experiment()[0].layers)
+    assert exports['weights'] == 3
+    assert len(script.commands) == 2
+
+    # Configurations differ by model name and learning rate
+    experiments = [
+        _load(tmp_path / f'run{run}.protobin.trainer{trainer}')
+        for run, trainer in [(0, 0), (0, 1), (1, 0)]
+    ]
+    assert [e.model.name for e in experiments] == ['model0', 'model1', 'model2']
+    np.testing.assert_allclose(
+        [e.optimizer.sgd.learn_rate for e in experiments], [0.1, 0.01, 0.001])
+    assert all(e.model.layer == experiments[0].model.layer
+               for e in experiments)
+    assert _load(tmp_path / 'run1.protobin.trainer1') == experiments[2]
+    assert len(_files(cache.objects_dir)) == 3
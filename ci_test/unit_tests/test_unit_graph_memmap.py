@@ -0,0 +1,171 @@
+""" Tests the memory-mapped graph datasets against the TU parser. """
+import os
+import sys
+
+import numpy as np
+import pytest
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(os.path.dirname(os.path.dirname(current_dir)),
+                        'applications', 'graph', 'GNN', 'data')
+sys.path.insert(0, data_dir)
+sys.path.insert(0, os.path.join(data_dir, 'PROTEINS'))
+import graph_memmap
+import utils as legacy
+
+num_graphs = 12
+max_nodes = 10
+
+
+def write_tu_dataset(directory, name, last_node_edges=False, seed=0):
+    """Write small random graphs in the TU text format.
+
+    Edges are sorted by source node. Unless `last_node_edges` is set,
+    no edge points to the last node of a graph, since the TU parser
+    drops those.
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = rng.integers(3, 2 * max_nodes, size=num_graphs)
+    node_offsets = np.concatenate(([0], np.cumsum(num_nodes)))
+    edges = []
+    for i, n in enumerate(num_nodes):
+        sources = np.sort(rng.integers(0, n, size=2 * n))
+        targets = rng.integers(0, n if last_node_edges else n - 1,
+                               size=2 * n)
+        edges.append(np.stack((sources, targets), axis=1) + node_offsets[i])
+    total_nodes = int(node_offsets[-1])
+
+    def path(description):
+        return os.path.join(directory, f'{name}_{description}.txt')
+
+    np.savetxt(path('A'), np.concatenate(edges) + 1, fmt='%d, %d')
+    np.savetxt(path('graph_indicator'),
+               np.repeat(np.arange(num_graphs), num_nodes) + 1,
+               fmt='%d')
+    np.savetxt(path('graph_labels'), rng.integers(1, 3, size=num_graphs),
+               fmt='%d')
+    node_labels = rng.integers(0, 3, size=total_nodes)
+    node_labels[:3] = np.arange(3)
+    np.savetxt(path('node_labels'), node_labels, fmt='%d')
+    np.savetxt(path('node_attributes'), rng.random(total_nodes), fmt='%.4f')
+    return num_nodes
+
+
+def convert(directory, name):
+    graphs = graph_memmap.read_tu_dataset(str(directory), name,
+                                          node_attributes=False)
+    header_file = graph_memmap.write_graph_dataset(graphs,
+                                                   str(directory / name))
+    return graph_memmap.load_graph_dataset(header_file)[0]
+
+
+def test_round_trip(tmp_path):
+    num_nodes = write_tu_dataset(tmp_path, 'TEST')
+    arrays = convert(tmp_path, 'TEST')
+    kept = np.flatnonzero(num_nodes < max_nodes)
+    assert 0 < len(kept) < num_graphs
+
+    # Sparse format
+    node_features, sources, targets, labels = legacy.TUDataset_Parser(
+        str(tmp_path), 'TEST', 2, max_nodes, 'sparse')
+    assert len(node_features) == len(sources) == len(labels) == len(kept)
+    for i, graph in enumerate(kept):
+        x, edges, y = graph_memmap.get_graph(arrays, graph)
+        np.testing.assert_array_equal(node_features[i][:len(x)], x)
+        assert not node_features[i][len(x):].any()
+        np.testing.assert_array_equal(edges[0], sources[i])
+        np.testing.assert_array_equal(edges[1], targets[i])
+        np.testing.assert_array_equal(y, labels[i])
+
+    # Dense format
+    _, adjs, labels = legacy.TUDataset_Parser(str(tmp_path), 'TEST', 2,
+                                              max_nodes, 'dense')
+    np.testing.assert_array_equal(
+        graph_memmap.dense_adjacency(arrays, kept, max_nodes), adjs)
+    np.testing.assert_array_equal(arrays['targets'][kept], labels)
+
+
+def test_last_node_edges(tmp_path):
+    write_tu_dataset(tmp_path, 'TEST', last_node_edges=True)
+    arrays = convert(tmp_path, 'TEST')
+    edges = np.loadtxt(tmp_path / 'TEST_A.txt', delimiter=',',
+                       dtype=np.int64) - 1
+    assert arrays['edge_index'].shape == edges.T.shape
+    for i in range(num_graphs):
+        _, graph_edges, _ = graph_memmap.get_graph(arrays, i)
+        begin, end = arrays['edge_offsets'][i:i + 2]
+        np.testing.assert_array_equal(
+            graph_edges + arrays['node_offsets'][i], edges[begin:end].T)
+
+
+def test_parallel_read(tmp_path, monkeypatch):
+    write_tu_dataset(tmp_path, 'TEST')
+    path = str(tmp_path / 'TEST_A.txt')
+    expected = graph_memmap.read_table(path, workers=1)
+    monkeypatch.setattr(graph_memmap, 'PARALLEL_READ_SIZE', 64)
+    np.testing.assert_array_equal(graph_memmap.read_table(path, workers=3),
+                                  expected)
+    np.testing.assert_array_equal(
+        graph_memmap.read_table(str(tmp_path / 'TEST_node_attributes.txt'),
+                                np.float32, workers=3)[:, 0],
+        np.loadtxt(tmp_path / 'TEST_node_attributes.txt', dtype=np.float32))
+
+
+@pytest.fixture
+def proteins(tmp_path, monkeypatch):
+    """PROTEINS dataset module reading a synthetic dataset"""
+    pytest.importorskip('lbann.modules.graph.packed')
+    import PROTEINS_Dataset
+    (tmp_path / 'PROTEINS').mkdir()
+    write_tu_dataset(tmp_path / 'PROTEINS', 'PROTEINS')
+    monkeypatch.setattr(PROTEINS_Dataset, 'data_dir', str(tmp_path))
+    return PROTEINS_Dataset, str(tmp_path / 'PROTEINS')
+
+
+def test_proteins_datasets(proteins):
+    PROTEINS_Dataset, directory = proteins
+    node_features, sources, targets, labels = legacy.TUDataset_Parser(
+        directory, 'PROTEINS', 2, max_nodes, 'sparse')
+    _, adjs, _ = legacy.TUDataset_Parser(directory, 'PROTEINS', 2,
+                                         max_nodes, 'dense')
+
+    # Sparse samples hold padded node features, edges and targets
+    sparse = PROTEINS_Dataset.PROTEINS_Sparse_Dataset(max_nodes)
+    assert os.path.isfile(os.path.join(directory, 'PROTEINS.json'))
+    assert len(sparse) == len(labels)
+    assert sparse.max_edges == max(len(s) for s in sources)
+    for i in range(len(sparse)):
+        padding = -np.ones(sparse.max_edges - len(sources[i]))
+        expected = np.concatenate((node_features[i].ravel(),
+                                   sources[i], padding,
+                                   targets[i], padding,
+                                   labels[i]))
+        np.testing.assert_array_equal(sparse[i], expected)
+
+    # Dense samples hold padded node features, adjacency and targets
+    dense = PROTEINS_Dataset.PROTEINS_Dense_Dataset(max_nodes)
+    assert len(dense) == len(labels)
+    for i in range(len(dense)):
+        expected = np.concatenate((node_features[i].ravel(),
+                                   adjs[i].ravel(), labels[i]))
+        np.testing.assert_array_equal(dense[i], expected)
+
+    # Packed graphs are the graphs with fewer than 100 nodes, without
+    # padding
+    node_features, sources, targets, labels = legacy.TUDataset_Parser(
+        directory, 'PROTEINS', 2, 100, 'sparse')
+    assert len(labels) == num_graphs
+    packed = PROTEINS_Dataset.PROTEINS_Packed_Dataset(4 * max_nodes,
+                                                      8 * max_nodes, 4)
+    np.testing.assert_array_equal(packed.targets, labels)
+    for i in range(len(labels)):
+        begin, end = packed.edge_offsets[i:i + 2]
+        node_offset = packed.node_offsets[i]
+        np.testing.assert_array_equal(
+            packed.source_indices[begin:end] - node_offset, sources[i])
+        np.testing.assert_array_equal(
+            packed.target_indices[begin:end] - node_offset, targets[i])
+        begin, end = packed.node_offsets[i:i + 2]
+        np.testing.assert_array_equal(packed.node_features[begin:end],
+                                      node_features[i][:end - begin])
+    assert len(packed) > 0
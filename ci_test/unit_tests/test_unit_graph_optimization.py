@@ -0,0 +1,140 @@
+""" Tests simplification and fusion of the layer graph. """
+import google.protobuf.text_format
+
+import lbann
+from lbann.util.graph_optimization import optimize_graph
+import numpy as np
+
+
+def _build_model():
+    x = lbann.Input(data_field='samples')
+
+    # Redundant reshapes and identities
+    y = lbann.Reshape(x, dims=[3, 4])
+    y = lbann.Reshape(y, dims=[12])
+    y = lbann.Identity(lbann.Reshape(y, dims=[4, 3]))
+
+    # Constant subgraph
+    c = lbann.Constant(value=2.0, num_neurons=[4, 3])
+    c = lbann.Scale(lbann.AddConstant(c, constant=1.0), constant=2.0)
+
+    # Duplicated subgraphs and elementwise chains
+    a = lbann.Exp(lbann.Scale(y, constant=0.5))
+    b = lbann.Exp(lbann.Scale(y, constant=0.5))
+    z = lbann.Tanh(lbann.Sigmoid(lbann.Multiply(lbann.Add(a, b), c)))
+    z = lbann.AddConstant(z, constant=0.0)
+    lbann.Identity(z, name='out')
+    return lbann.Model(0, layers=lbann.traverse_layer_graph(x))
+
+
+def _reference(inputarr):
+    a = np.exp(0.5 * inputarr)
+    z = 1 / (1 + np.exp(-(a + a) * 6.0))
+    return np.tanh(z)
+
+
+def test_optimize_graph_structure():
+    model = _build_model()
+    num_layers = len(model.layers)
+    stats = optimize_graph(model)
+
+    # Input, reshape, fused chains, constant and output remain
+    assert len(model.layers) == 7 < num_layers
+    assert stats['folded'] == 2
+    assert stats['deduplicated'] == 2
+    layers = {l.name: l for l in model.layers}
+    assert isinstance(layers['out'], lbann.Identity)
+    fused = layers['out'].parents[0]
+    assert [type(op) for op in fused.ops] == [
+        lbann.ops.Multiply, lbann.ops.Sigmoid, lbann.ops.Tanh
+    ]
+    assert sum(isinstance(l, lbann.Reshape) for l in model.layers) == 1
+
+    # Graph connections are consistent
+    for l in model.layers:
+        assert all(l in p.children for p in l.parents)
+        assert all(l in c.parents for c in l.children)
+
+
+def test_optimize_graph_keeps_referenced_layers():
+    x = lbann.Input(data_field='samples')
+    y = lbann.Identity(x, name='checked')
+    z = lbann.Exp(lbann.Sigmoid(y, name='named'))
+    model = lbann.Model(0,
+                        layers=lbann.traverse_layer_graph(x),
+                        callbacks=[lbann.CallbackDumpOutputs(layers='checked')])
+    optimize_graph(model, keep=['named'])
+    assert [l.name for l in model.layers] == [x.name, 'checked', 'named', z.name]
+
+
+def test_optimize_graph_outputs():
+    model = _build_model()
+    optimize_graph(model)
+
+    inputarr = np.random.rand(2, 12)
+    outputarr = lbann.evaluate(model, inputarr, ['out'])
+    assert np.allclose(outputarr, _reference(inputarr).reshape(2, 12),
+                       atol=1e-6)
+
+
+def test_optimize_graph_keeps_multi_output_siblings():
+    x = lbann.Input(data_field='samples')
+    sliced = lbann.Slice(x, slice_points=[0, 3, 6])
+    split = lbann.Split(x)
+    a = lbann.Exp(sliced)
+    b = lbann.Exp(sliced)
+    c = lbann.Sigmoid(split)
+    d = lbann.Sigmoid(split)
+    lbann.Subtract(a, b, name='slice_out')
+    lbann.Subtract(c, d, name='split_out')
+    model = lbann.Model(0, layers=lbann.traverse_layer_graph(x))
+    stats = optimize_graph(model, fuse_elementwise=False)
+
+    # Each output of the multi-output layers keeps its own child
+    assert stats['deduplicated'] == 0
+    assert sliced.children == [a, b]
+    assert split.children == [c, d]
+    layers = {l.name: l for l in model.layers}
+    assert layers['slice_out'].parents == [a, b]
+    assert layers['split_out'].parents == [c, d]
+
+
+def test_optimize_graph_removes_reshapes_of_known_dims():
+    x = lbann.Input(data_field='samples')
+    c = lbann.Constant(value=1.0, num_neurons=[4, 3])
+    y = lbann.Reshape(lbann.Tanh(lbann.Multiply(c, lbann.Reshape(x, dims=[4, 3]))),
+                      dims=[4, 3])
+    t = lbann.Reshape(lbann.Exp(lbann.Tessellate(x, dims=[2, 6])), dims=[2, 6])
+    u = lbann.Reshape(lbann.Exp(x), dims=[12])
+    lbann.Add(y, lbann.Reshape(t, dims=[4, 3]), name='out')
+    lbann.Identity(u, name='unknown')
+    model = lbann.Model(0, layers=lbann.traverse_layer_graph(x))
+    optimize_graph(model, fuse_elementwise=False)
+
+    # Reshapes of tensors with known dimensions are removed, but not
+    # reshapes of data-dependent tensors
+    reshapes = [l for l in model.layers if isinstance(l, lbann.Reshape)]
+    assert sorted(l.dims for l in reshapes) == [[4, 3], [4, 3], [12]]
+    layers = {l.name: l for l in model.layers}
+    assert isinstance(layers['unknown'].parents[0], lbann.Reshape)
+
+
+def test_run_optimizes_graph(tmp_path):
+    model = _build_model()
+    lbann.run(lbann.Trainer(mini_batch_size=4),
+              model,
+              lbann.reader_pb2.DataReader(),
+              lbann.NoOptimizer(),
+              work_dir=str(tmp_path),
+              scheduler='openmpi',
+              lbann_exe='lbann',
+              setup_only=True,
+              optimize_graph=True)
+
+    # The exported experiment holds the optimized graph
+    assert len(model.layers) == 7
+    experiment = lbann.lbann_pb2.LbannPB()
+    with open(tmp_path / 'experiment.prototext') as f:
+        google.protobuf.text_format.Merge(f.read(), experiment)
+    assert [l.name for l in experiment.model.layer
+            ] == [l.name for l in model.layers]
@@ -0,0 +1,104 @@
+""" Tests packed minibatches of variable-size graphs. """
+import lbann
+from lbann.modules.graph.packed import (make_packed_sample, pack_graphs,
+                                        packed_sample_size)
+import numpy as np
+import pytest
+
+
+def _random_graphs(num_graphs, node_feature_size=3, num_classes=2):
+    rng = np.random.default_rng(0)
+    num_nodes = rng.integers(1, 10, size=num_graphs)
+    num_edges = rng.integers(0, 20, size=num_graphs)
+    node_offsets = np.concatenate(([0], np.cumsum(num_nodes)))
+    edge_offsets = np.concatenate(([0], np.cumsum(num_edges)))
+    sources = np.concatenate([
+        rng.integers(0, n, size=e) + o
+        for n, e, o in zip(num_nodes, num_edges, node_offsets)
+    ]).astype(np.int32)
+    targets = np.concatenate([
+        rng.integers(0, n, size=e) + o
+        for n, e, o in zip(num_nodes, num_edges, node_offsets)
+    ]).astype(np.int32)
+    features = rng.random((node_offsets[-1], node_feature_size),
+                          dtype=np.float32)
+    labels = np.eye(num_classes, dtype=np.float32)[rng.integers(
+        0, num_classes, size=num_graphs)]
+    return features, sources, targets, labels, node_offsets, edge_offsets
+
+
+def _aggregate(features, sources, targets, num_nodes):
+    """GraphExpand followed by GraphReduce, ignoring negative indices."""
+    out = np.zeros((num_nodes, features.shape[1]), dtype=features.dtype)
+    valid = (sources >= 0) & (targets >= 0)
+    np.add.at(out, sources[valid], features[targets[valid]])
+    return out
+
+
+def test_pack_graphs_capacities():
+    graphs = _random_graphs(50)
+    node_offsets, edge_offsets = graphs[4], graphs[5]
+    pack_offsets = pack_graphs(node_offsets, edge_offsets, 30, 60, 4)
+    assert pack_offsets[0] == 0 and pack_offsets[-1] == 50
+    for first, last in zip(pack_offsets[:-1], pack_offsets[1:]):
+        assert 0 < last - first <= 4
+        assert node_offsets[last] - node_offsets[first] <= 30
+        assert edge_offsets[last] - edge_offsets[first] <= 60
+
+    with pytest.raises(ValueError):
+        pack_graphs(node_offsets, edge_offsets, 5, 60, 4)
+
+
+def test_packed_sample_matches_per_graph_aggregation():
+    features, sources, targets, labels, node_offsets, edge_offsets = \
+        _random_graphs(20)
+    max_nodes, max_edges, max_graphs = 30, 60, 4
+    pack_offsets = pack_graphs(node_offsets, edge_offsets, max_nodes,
+                               max_edges, max_graphs)
+    size = packed_sample_size(max_nodes, 3, max_edges, max_graphs, 2)
+
+    for first, last in zip(pack_offsets[:-1], pack_offsets[1:]):
+        sample = make_packed_sample(features, sources, targets, labels,
+                                    node_offsets, edge_offsets, first, last,
+                                    max_nodes, max_edges, max_graphs)
+        assert sample.shape == (size, )
+        x, s, t, g, y = np.split(
+            sample,
+            np.cumsum([max_nodes * 3, max_edges, max_edges, max_nodes]))
+        x = x.reshape(max_nodes, 3)
+        s, t, g = s.astype(np.int64), t.astype(np.int64), g.astype(np.int64)
+        packed = _aggregate(x, s, t, max_nodes)
+
+        # Each graph's block of the disjoint union matches the graph alone
+        for graph in range(first, last):
+            begin = node_offsets[graph] - node_offsets[first]
+            end = node_offsets[graph + 1] - node_offsets[first]
+            edges = slice(edge_offsets[graph], edge_offsets[graph + 1])
+            alone = _aggregate(features[node_offsets[graph]:
+                                        node_offsets[graph + 1]],
+                               sources[edges] - node_offsets[graph],
+                               targets[edges] - node_offsets[graph],
+                               end - begin)
+            assert np.allclose(packed[begin:end], alone)
+            assert np.all(g[begin:end] == graph - first)
+        assert np.all(g[node_offsets[last] - node_offsets[first]:] == -1)
+        assert np.array_equal(y.reshape(max_graphs, 2)[:last - first],
+                              labels[first:last])
+        assert not y.reshape(max_graphs, 2)[last - first:].any()
+
+
+def test_packed_graph_parser():
+    x = lbann.Input(data_field='samples')
+    data = lbann.modules.graph.PackedGraphParser(x, 30, 3, 60, 4, 2)
+    pooled = lbann.modules.graph.GraphPool(data['node_features'],
+                                           data['graph_indices'], [4, 3])
+    model = lbann.Model(0, layers=lbann.traverse_layer_graph(x))
+    layers = {l.name: l for l in model.layers}
+    assert layers['Packed_Graph_Input'].slice_points == [
+        0, 90, 150, 210, 240, 248
+    ]
+    assert isinstance(pooled, lbann.SafeDivide)
+    assert set(data) == {
+        'node_features', 'source_indices', 'target_indices', 'graph_indices',
+        'target'
+    }
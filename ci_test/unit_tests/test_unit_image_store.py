@@ -0,0 +1,136 @@
+""" Tests the store of pre-decoded images and its dataset reader. """
+import os
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from lbann.contrib.data import image_store
+from lbann.contrib.data.image_store import (ImageStore, ImageStoreDataset,
+                                            build_image_store, decode_image,
+                                            read_label_file)
+from lbann.util.data import (DataReader, Dataset, Sample, SampleDims,
+                             get_worker_index)
+
+
+@pytest.fixture
+def image_list(tmp_path):
+    rng = np.random.default_rng(0)
+    shapes = [(40, 60), (64, 32), (50, 50), (33, 80), (90, 45)]
+    with open(tmp_path / 'labels.txt', 'w') as fp:
+        for i, shape in enumerate(shapes):
+            img = rng.integers(0, 256, size=shape + (3, ), dtype=np.uint8)
+            cv2.imwrite(str(tmp_path / f'img{i}.png'), img)
+            fp.write(f'img{i}.png {i % 3}\n')
+    return read_label_file(str(tmp_path / 'labels.txt'), str(tmp_path))
+
+
+def test_build_store(tmp_path, image_list):
+    files, labels = image_list
+    prefix = str(tmp_path / 'store')
+
+    # Small shards to exercise sharding
+    build_image_store(files,
+                      labels,
+                      prefix,
+                      image_size=24,
+                      shard_size=3 * 24 * 48,
+                      num_procs=2,
+                      chunk_size=2)
+    store = pickle.loads(pickle.dumps(ImageStore(prefix)))
+    assert len(store) == len(files)
+    assert os.path.exists(prefix + '.1.images')
+    np.testing.assert_array_equal(store.labels, [0, 1, 2, 0, 1])
+    for i, f in enumerate(files):
+        img = store[i]
+        assert min(img.shape[:2]) == 24
+        np.testing.assert_array_equal(img, decode_image(f, 24))
+
+
+def test_dataset(tmp_path, image_list):
+    files, labels = image_list
+    prefix = str(tmp_path / 'store')
+    build_image_store(files, labels, prefix, image_size=24, num_procs=1)
+
+    means = (0.5, 0.4, 0.3)
+    stddevs = (0.2, 0.25, 0.3)
+    dataset = ImageStoreDataset(prefix,
+                                num_classes=3,
+                                crop_size=16,
+                                resize_size=24,
+                                train=False,
+                                means=means,
+                                stddevs=stddevs)
+    dims = dataset.get_sample_dims()
+    assert dims.sample == [3 * 16 * 16]
+    assert dims.label == [3]
+
+    batch = dataset.__getitems__([0, 2, 4])
+    assert batch.sample.shape == (3, 3 * 16 * 16)
+    np.testing.assert_array_equal(batch.label,
+                                  np.eye(3, dtype=np.float32)[[0, 2, 1]])
+
+    # Evaluation samples are normalized center crops in CHW format
+    img = ImageStore(prefix)[2]
+    y = (img.shape[0] - 16) // 2
+    x = (img.shape[1] - 16) // 2
+    expected = (img[y:y + 16, x:x + 16] / 255 - means) / stddevs
+    np.testing.assert_allclose(batch.sample[1].reshape(3, 16, 16),
+                               expected.transpose(2, 0, 1),
+                               rtol=1e-5,
+                               atol=1e-5)
+    sample = dataset[2]
+    np.testing.assert_array_equal(sample.sample, batch.sample[1])
+
+    # Training samples are random crops of the same size
+    dataset = ImageStoreDataset(prefix, num_classes=3, crop_size=16, seed=0)
+    batch = dataset.__getitems__([0, 1, 2, 3, 4])
+    assert batch.sample.shape == (5, 3 * 16 * 16)
+    assert np.isfinite(batch.sample).all()
+
+
+class _WorkerIndexDataset(Dataset):
+    """Samples hold the index of the worker that loaded them"""
+
+    def __len__(self):
+        return 8
+
+    def __getitem__(self, index):
+        time.sleep(0.05)
+        return Sample(sample=np.array([self.worker_index], dtype=np.float32))
+
+    def get_sample_dims(self):
+        return SampleDims(sample=[1])
+
+    def worker_init(self):
+        self.worker_index = get_worker_index()
+
+
+def test_worker_seeds(tmp_path, image_list, monkeypatch):
+    # Data reader workers are numbered from 0
+    assert get_worker_index() is None
+    reader = DataReader(_WorkerIndexDataset(),
+                        num_procs=2,
+                        prefetch_factor=4,
+                        dtype='float32')
+    try:
+        reader.queue_samples(list(range(8)))
+        batch = reader.get_batch(8)
+    finally:
+        reader.terminate()
+    assert set(batch['sample'][:, 0]) == {0, 1}
+
+    # Worker random streams are spawned from the seed
+    files, labels = image_list
+    prefix = str(tmp_path / 'store')
+    build_image_store(files, labels, prefix, image_size=32, num_procs=1)
+    dataset = ImageStoreDataset(prefix, num_classes=3, crop_size=16, seed=5)
+    streams = np.random.SeedSequence(5).spawn(2)
+    for index in range(2):
+        monkeypatch.setattr(image_store, 'get_worker_index', lambda: index)
+        dataset.worker_init()
+        assert (dataset.rng.random(4) == np.random.default_rng(
+            streams[index]).random(4)).all()
@@ -0,0 +1,83 @@
+""" Tests static memory and FLOP estimates of a model. """
+import lbann
+
+
+def test_estimate_convnet():
+    x = lbann.Input(data_field='samples')
+    sliced = lbann.Slice(x, axis=0, slice_points=[0, 3 * 8 * 8, 3 * 8 * 8 + 5])
+    img = lbann.Reshape(sliced, dims=[3, 8, 8])
+    label = lbann.Identity(sliced)
+    y = lbann.Convolution(img,
+                          num_dims=2,
+                          out_channels=4,
+                          kernel_size=3,
+                          stride=1,
+                          padding=1,
+                          name='conv')
+    y = lbann.Relu(y, name='relu')
+    y = lbann.Pooling(y,
+                      num_dims=2,
+                      pool_dims_i=2,
+                      pool_strides_i=2,
+                      pool_mode='max',
+                      name='pool')
+    y = lbann.FullyConnected(y, num_neurons=5, has_bias=True, name='fc')
+    loss = lbann.CrossEntropy(lbann.Softmax(y), label)
+    model = lbann.Model(0,
+                        layers=lbann.traverse_layer_graph(x),
+                        objective_function=loss)
+
+    estimate = model.estimate(2, [3 * 8 * 8 + 5])
+    layers = {l.name: l for l in estimate.layers}
+
+    # Output dimensions
+    assert layers[sliced.name].output_dims == [(192, ), (5, )]
+    assert layers[label.name].output_dims == [(5, )]
+    assert layers['conv'].output_dims == [(4, 8, 8)]
+    assert layers['pool'].output_dims == [(4, 4, 4)]
+    assert layers['fc'].output_dims == [(5, )]
+    assert not estimate.unsupported_layers
+
+    # Activations, weights and FLOPs
+    assert layers['conv'].activation_bytes == 4 * 4 * 8 * 8
+    assert layers['conv'].weight_bytes == 4 * (4 * 3 * 3 * 3 + 4)
+    assert layers['conv'].forward_flops == 2 * 4 * 8 * 8 * 3 * 3 * 3
+    assert layers['conv'].backward_flops == 2 * layers['conv'].forward_flops
+    assert layers['fc'].weight_bytes == 4 * (64 * 5 + 5)
+    assert layers['fc'].forward_flops == 2 * 64 * 5
+    assert estimate.forward_flops == 2 * sum(l.forward_flops
+                                             for l in estimate.layers)
+
+    # Peak while computing the ReLU: convolution, ReLU and labels
+    assert estimate.peak_layer == 'relu'
+    assert estimate.peak_activation_bytes == 2 * 4 * (2 * 4 * 8 * 8 + 5)
+
+
+def test_estimate_shared_weights():
+    x = lbann.Input(data_field='samples')
+    weights = [lbann.Weights(), lbann.Weights()]
+    y = lbann.FullyConnected(x,
+                             num_neurons=8,
+                             has_bias=True,
+                             weights=weights,
+                             name='fc1')
+    y = lbann.FullyConnected(y,
+                             num_neurons=8,
+                             has_bias=True,
+                             weights=weights,
+                             name='fc2')
+    model = lbann.Model(0,
+                        layers=lbann.traverse_layer_graph(x),
+                        objective_function=lbann.L2Norm2(y))
+
+    estimate = model.estimate(4, [8])
+    layers = {l.name: l for l in estimate.layers}
+
+    # Shared weights are stored once, but both layers compute their
+    # weight gradients
+    assert layers['fc1'].weight_bytes == 4 * (8 * 8 + 8)
+    assert layers['fc2'].weight_bytes == 0
+    assert estimate.weight_bytes == layers['fc1'].weight_bytes
+    for name in ('fc1', 'fc2'):
+        assert layers[name].forward_flops == 2 * 8 * 8
+        assert layers[name].backward_flops == 2 * layers[name].forward_flops
@@ -0,0 +1,159 @@
+""" Tests indexing of the molecular text datasets. """
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+pytest.importorskip('transformers')
+
+from lbann.contrib.data import molecule_dataset
+from lbann.contrib.data.chem_tokenizers import ChemTokenType
+from lbann.contrib.data.molecule_dataset import (ChemTextDataset,
+                                                 TextDatasetWithOffsets,
+                                                 TokenStore,
+                                                 build_offsets_file,
+                                                 pretokenize_file,
+                                                 read_token_store_header)
+
+_special_tokens = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+_vocab = ['C', 'N', 'O', 'c', '1', '(', ')', '=']
+
+# Contents of the text files, with and without a trailing newline
+_texts = [
+    'CCO\nc1ccccc1\n\nC(=O)O\n',
+    'NCCN\nCé\nCCCCCCCCCCCCCCCCO',
+    '',
+    '\n',
+]
+
+
+def _lines(text):
+    lines = text.split('\n')
+    return lines[:-1] if text.endswith('\n') or not text else lines
+
+
+def _write_vocab(path, tokens=_vocab):
+    path.write_text('\n'.join(_special_tokens + tokens) + '\n')
+    return str(path)
+
+
+def _write_texts(tmp_path):
+    files = []
+    for i, text in enumerate(_texts):
+        files.append(str(tmp_path / f'text{i}.txt'))
+        with open(files[-1], 'wb') as f:
+            f.write(text.encode('utf-8'))
+    return files
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 26])
+def test_offsets_dataset(tmp_path, chunk_size):
+    files = _write_texts(tmp_path)
+    for f in files:
+        assert build_offsets_file(f, chunk_size) == f + '.offsets'
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+
+    expected = [line for text in _texts for line in _lines(text)]
+    dataset = TextDatasetWithOffsets(files)
+    assert len(dataset) == len(expected)
+    assert [dataset[i] for i in range(len(dataset))] == expected
+    assert dataset[-1] == expected[-1]
+    assert dataset[-len(expected)] == expected[0]
+    with pytest.raises(IndexError):
+        dataset[len(expected)]
+    with pytest.raises(IndexError):
+        dataset[-len(expected) - 1]
+
+    # Memory maps are reopened after pickling
+    copy = pickle.loads(pickle.dumps(dataset))
+    assert copy.texts is None and copy.offsets is None
+    assert [copy[i] for i in range(len(copy))] == expected
+
+
+def test_chem_dataset_builds_offsets(tmp_path, monkeypatch):
+    vocab = _write_vocab(tmp_path / 'vocab.txt')
+    files = _write_texts(tmp_path)[:2]
+
+    # Text files are indexed instead of read into memory
+    def read_text(*args):
+        raise AssertionError('text dataset read into memory')
+
+    monkeypatch.setattr(molecule_dataset, 'TextDataset', read_text)
+    seqlen = 32
+    dataset = ChemTextDataset(files,
+                              vocab,
+                              seqlen,
+                              ChemTokenType.SMILES,
+                              input_type=ChemTokenType.SMILES)
+    assert all(os.path.exists(f + '.offsets') for f in files)
+    assert isinstance(dataset.dataset, TextDatasetWithOffsets)
+
+    expected = [line for text in _texts[:2] for line in _lines(text)]
+    assert len(dataset) == len(expected)
+    for i, line in enumerate(expected):
+        ids = dataset.tokenizer(line)['input_ids']
+        sample = dataset[i].sample[:seqlen]
+        np.testing.assert_array_equal(sample[seqlen - len(ids):], ids)
+        assert (sample[:seqlen - len(ids)] == dataset.pad_index).all()
+
+    # Existing offsets are reused
+    mtimes = [os.path.getmtime(f + '.offsets') for f in files]
+    ChemTextDataset(files, vocab, seqlen, ChemTokenType.SMILES)
+    assert [os.path.getmtime(f + '.offsets') for f in files] == mtimes
+
+
+def test_token_store(tmp_path):
+    vocab = _write_vocab(tmp_path / 'vocab.txt')
+    files = _write_texts(tmp_path)[:2]
+    for f in files:
+        assert pretokenize_file(f, vocab, ChemTokenType.SMILES, num_procs=1,
+                                chunk_size=4) == f + '.tokens'
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+    header = read_token_store_header(files[0])
+    assert header['num_samples'] == len(_lines(_texts[0]))
+    assert header['dtype'] == np.dtype(np.uint16).str
+
+    # Samples hold the token IDs of the tokenizer
+    dataset = ChemTextDataset(files, vocab, 32, ChemTokenType.SMILES)
+    assert dataset.pretokenized
+    expected = [line for text in _texts[:2] for line in _lines(text)]
+    assert len(dataset.dataset) == len(expected)
+    for i, line in enumerate(expected):
+        np.testing.assert_array_equal(dataset.dataset[i],
+                                      dataset.tokenizer(line)['input_ids'])
+    np.testing.assert_array_equal(dataset.dataset[-1],
+                                  dataset.tokenizer(expected[-1])['input_ids'])
+    copy = pickle.loads(pickle.dumps(dataset.dataset))
+    np.testing.assert_array_equal(copy[1], dataset.dataset[1])
+
+
+def test_token_store_validation(tmp_path):
+    vocab = _write_vocab(tmp_path / 'vocab.txt')
+    [f] = _write_texts(tmp_path)[:1]
+    pretokenize_file(f, vocab, ChemTokenType.SMILES, num_procs=1)
+    header = read_token_store_header(f)
+    TokenStore(f, header['vocab_hash'], ChemTokenType.SMILES,
+               ChemTokenType.SMILES)
+
+    # Other vocabularies, even with the same size, are rejected
+    other_vocab = _write_vocab(tmp_path / 'other.txt', _vocab[::-1])
+    with pytest.raises(ValueError, match='vocab_hash'):
+        ChemTextDataset(f, other_vocab, 32, ChemTokenType.SMILES)
+
+    # So are other input types
+    with pytest.raises(ValueError, match='input_type'):
+        TokenStore(f, input_type=ChemTokenType.SELFIES)
+
+    # And stores of modified or truncated files
+    with open(f, 'a') as fp:
+        fp.write('CCC\n')
+    with pytest.raises(ValueError, match='bytes'):
+        TokenStore(f)
+    pretokenize_file(f, vocab, ChemTokenType.SMILES, num_procs=1)
+    TokenStore(f)
+    with open(f + '.tokens', 'r+b') as fp:
+        fp.truncate(2)
+    with pytest.raises(ValueError, match='bytes'):
+        TokenStore(f)
@@ -0,0 +1,139 @@
+""" Tests batched patch generation against the per-sample generator. """
+import os
+import sys
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+pytest.importorskip('scipy')
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(current_dir)),
+                 'applications', 'selfsupervised'))
+import patch_generator
+from patch_generator.batched import make_samples, random_transforms
+from patch_dataset import PatchDataset
+
+from lbann.contrib.data.image_store import build_image_store, decode_image
+
+image_size = 160
+num_images = 6
+seed = 20240123
+
+
+def _smooth_images(shape):
+    """Random images without high frequencies, so that interpolation
+    rounding barely matters"""
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(num_images):
+        img = rng.integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+        images.append(
+            cv2.resize(img, shape[::-1], interpolation=cv2.INTER_CUBIC))
+    return images
+
+
+class _ScriptedRandom:
+    """Replays the draws of ``random_transforms`` for one sample through
+    the ``random`` module interface used by the per-sample generator."""
+
+    def __init__(self, t, i):
+        order = t['order'][i]
+        self.order = order
+        self.randints = [int(t['label'][i]), int(t['rotate'][i])]
+        for k in range(1, len(order)):
+            self.randints += [
+                int(t['aperture_size'][i, k]),
+                int(t['aperture_y'][i, k]),
+                int(t['aperture_x'][i, k])
+            ]
+        self.uniforms = [float(t['zoom'][i, 0])]
+        self.randoms = [float(x) for x in t['jitter'][i, 0]]
+        # Patches are resized and flipped before shuffling, in pattern
+        # order
+        self.interps = [int(t['interpolation'][i, k])
+                        for k in np.argsort(order)]
+        self.flips = [bool(t['flip'][i, k]) for k in np.argsort(order)]
+
+    def randint(self, a, b):
+        return self.randints.pop(0)
+
+    def uniform(self, a, b):
+        return self.uniforms.pop(0)
+
+    def random(self):
+        return self.randoms.pop(0)
+
+    def choice(self, seq):
+        if list(seq) == [True, False]:
+            return self.flips.pop(0)
+        return self.interps.pop(0)
+
+    def shuffle(self, x):
+        x[:] = [x[k] for k in self.order]
+
+
+@pytest.mark.parametrize('num_patches', [2, 3, 5])
+def test_matches_per_sample_generator(tmp_path, monkeypatch, num_patches):
+    images = _smooth_images((image_size, image_size))
+    monkeypatch.setattr(patch_generator, 'data_dir', str(tmp_path))
+    monkeypatch.setattr(patch_generator, 'samples',
+                        [(f'img{i}.png', 0) for i in range(num_images)])
+    for i, img in enumerate(images):
+        cv2.imwrite(str(tmp_path / f'img{i}.png'), img)
+
+    patterns = PatchDataset(num_patches, str(tmp_path / 'store')).patterns
+    samples = make_samples(np.stack(images), patterns,
+                           np.random.default_rng(seed))
+    assert samples.shape == (num_images,
+                             patch_generator.sample_dims(num_patches)[0])
+
+    # Per-sample generator with the same random transforms
+    t = random_transforms(num_images, len(patterns), num_patches,
+                          np.random.default_rng(seed))
+    extract_patches_module = sys.modules['patch_generator.extract_patches']
+    for i in range(num_images):
+        scripted = _ScriptedRandom(t, i)
+        monkeypatch.setattr(patch_generator, 'random', scripted)
+        monkeypatch.setattr(extract_patches_module, 'random', scripted)
+        expected = patch_generator.get_sample(i, num_patches)
+        assert not scripted.randints and not scripted.flips
+        assert not scripted.interps
+        patch_values = num_patches * 3 * 96 * 96
+        np.testing.assert_array_equal(samples[i, patch_values:],
+                                      expected[patch_values:])
+
+        # Note: cv2.remap and cv2.resize round interpolation weights
+        # differently, which chroma blur amplifies in dark pixels.
+        error = np.abs(samples[i, :patch_values] - expected[:patch_values])
+        assert error.max() < 0.15
+        assert error.mean() < 0.005
+
+
+def test_dataset(tmp_path):
+    files = []
+    for i, img in enumerate(_smooth_images((200, 170))):
+        files.append(str(tmp_path / f'img{i}.png'))
+        cv2.imwrite(files[-1], img)
+    prefix = str(tmp_path / 'store')
+    build_image_store(files, [0] * num_images,
+                      prefix,
+                      image_size=image_size,
+                      center_crop=True,
+                      num_procs=1)
+
+    # Samples are generated from the center-cropped, resized images
+    dataset = PatchDataset(3, prefix, seed=seed)
+    assert len(dataset) == num_images
+    assert dataset.get_sample_dims().sample == patch_generator.sample_dims(3)
+    indices = [4, 0, 2]
+    images = np.stack([decode_image(files[i], image_size, center_crop=True)
+                       for i in indices])
+    expected = make_samples(images, dataset.patterns,
+                            np.random.default_rng(seed))
+    np.testing.assert_array_equal(dataset.__getitems__(indices).sample,
+                                  expected)
+    assert dataset[1].sample.shape == patch_generator.sample_dims(3)
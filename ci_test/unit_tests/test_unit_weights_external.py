@@ -0,0 +1,213 @@
+import functools
+import operator
+import os
+import os.path
+import sys
+import numpy as np
+
+# Bamboo utilities
+current_file = os.path.realpath(__file__)
+current_dir = os.path.dirname(current_file)
+sys.path.insert(0, os.path.join(os.path.dirname(current_dir), 'common_python'))
+import tools
+
+# ==============================================
+# Objects for Python data reader
+# ==============================================
+# Note: The Python data reader imports this file as a module and calls
+# the functions below to ingest data.
+
+# Data
+np.random.seed(20240118)
+_num_samples = 11
+_sample_dims = (4,3,2)
+_sample_size = functools.reduce(operator.mul, _sample_dims)
+_samples = np.random.normal(size=(_num_samples,_sample_size)).astype(np.float32)
+
+# Sample access functions
+def get_sample(index):
+    return _samples[index,:]
+def num_samples():
+    return _num_samples
+def sample_dims():
+    return (_sample_size,)
+
+# ==============================================
+# Setup LBANN experiment
+# ==============================================
+
+def setup_experiment(lbann, weekly):
+    """Construct LBANN experiment.
+
+    Args:
+        lbann (module): Module for LBANN Python frontend
+
+    """
+    mini_batch_size = num_samples()
+    trainer = lbann.Trainer(mini_batch_size)
+    model = construct_model(lbann)
+    data_reader = construct_data_reader(lbann)
+    optimizer = lbann.NoOptimizer()
+    return trainer, model, data_reader, optimizer, None # Don't request any specific number of nodes
+
+def construct_model(lbann):
+    """Construct LBANN model.
+
+    Args:
+        lbann (module): Module for LBANN Python frontend
+
+    """
+
+    # Input data
+    x = lbann.Input(data_field='samples')
+    x_lbann = x
+
+    # Objects for LBANN model
+    metrics = []
+    callbacks = []
+
+    # ------------------------------------------
+    # Weights layer with external values
+    # ------------------------------------------
+    # Note: The values are moved from the experiment file to a NumPy
+    # file since there are more than _external_weights_threshold
+
+    # Weights
+    weights_values = np.random.normal(size=_sample_dims).astype(np.float32)
+
+    # LBANN implementation
+    x = lbann.Reshape(x_lbann, dims=_sample_dims)
+    weights = lbann.Weights(
+        initializer=lbann.ValueInitializer(values=weights_values.ravel()),
+        optimizer=lbann.NoOptimizer(),
+    )
+    weights = lbann.WeightsLayer(
+        weights=weights,
+        dims=_sample_dims,
+    )
+    y = lbann.Multiply(x, weights)
+    z = lbann.L2Norm2(y)
+    metrics.append(lbann.Metric(z, name='external weights'))
+
+    # NumPy implementation
+    vals = []
+    for i in range(num_samples()):
+        x = get_sample(i).reshape(_sample_dims).astype(np.float64)
+        y = x * weights_values
+        z = tools.numpy_l2norm2(y)
+        vals.append(z)
+    val = np.mean(vals)
+    tol = 8 * val * np.finfo(np.float32).eps
+    callbacks.append(lbann.CallbackCheckMetric(
+        metric=metrics[-1].name,
+        lower_bound=val-tol,
+        upper_bound=val+tol,
+        error_on_failure=True,
+        execution_modes='test'))
+
+    # ------------------------------------------
+    # Fully-connected layer with external values
+    # ------------------------------------------
+    # Note: The linearity is a matrix with width greater than 1, so it
+    # is saved as a 2-D array in row-major order.
+
+    # Weights
+    num_neurons = 5
+    linearity = np.random.normal(
+        size=(num_neurons, _sample_size)).astype(np.float32)
+    bias = np.random.normal(size=num_neurons).astype(np.float32)
+
+    # LBANN implementation
+    # Note: ValueInitializer values are in column-major order.
+    x = x_lbann
+    linearity_weights = lbann.Weights(
+        initializer=lbann.ValueInitializer(
+            values=linearity.ravel(order='F')),
+        optimizer=lbann.NoOptimizer(),
+    )
+    bias_weights = lbann.Weights(
+        initializer=lbann.ValueInitializer(values=bias),
+        optimizer=lbann.NoOptimizer(),
+    )
+    y = lbann.FullyConnected(
+        x,
+        weights=(linearity_weights, bias_weights),
+        num_neurons=num_neurons,
+        has_bias=True,
+    )
+    z = lbann.L2Norm2(y)
+    metrics.append(lbann.Metric(z, name='external fully-connected'))
+
+    # NumPy implementation
+    vals = []
+    for i in range(num_samples()):
+        x = get_sample(i).astype(np.float64)
+        y = linearity.astype(np.float64) @ x + bias
+        z = tools.numpy_l2norm2(y)
+        vals.append(z)
+    val = np.mean(vals)
+    tol = 8 * val * np.finfo(np.float32).eps
+    callbacks.append(lbann.CallbackCheckMetric(
+        metric=metrics[-1].name,
+        lower_bound=val-tol,
+        upper_bound=val+tol,
+        error_on_failure=True,
+        execution_modes='test'))
+
+    # ------------------------------------------
+    # Construct model
+    # ------------------------------------------
+
+    num_epochs = 0
+    return lbann.Model(num_epochs,
+                       layers=lbann.traverse_layer_graph(x_lbann),
+                       metrics=metrics,
+                       callbacks=callbacks)
+
+def construct_data_reader(lbann):
+    """Construct Protobuf message for Python data reader.
+
+    The Python data reader will import the current Python file to
+    access the sample access functions.
+
+    Args:
+        lbann (module): Module for LBANN Python frontend
+
+    """
+
+    # Note: The training data reader should be removed when
+    # https://github.com/LLNL/lbann/issues/1098 is resolved.
+    message = lbann.reader_pb2.DataReader()
+    message.reader.extend([
+        tools.create_python_data_reader(
+            lbann,
+            current_file,
+            'get_sample',
+            'num_samples',
+            'sample_dims',
+            'train'
+        )
+    ])
+    message.reader.extend([
+        tools.create_python_data_reader(
+            lbann,
+            current_file,
+            'get_sample',
+            'num_samples',
+            'sample_dims',
+            'test'
+        )
+    ])
+    return message
+
+# ==============================================
+# Setup PyTest
+# ==============================================
+
+# Create test functions that can interact with PyTest
+_external_weights_threshold = 8
+for _test_func in tools.create_tests(
+        setup_experiment,
+        __file__,
+        external_weights_threshold=_external_weights_threshold):
+    globals()[_test_func.__name__] = _test_func
@@ -39,11 +39,13 @@ public:
   python_dataset_reader(std::string dataset_path,
                         std::string module_dir,
                         uint64_t prefetch_factor,
+                        uint64_t samples_per_task,
                         bool shuffle)
     : generic_data_reader(shuffle),
       m_dataset_path(dataset_path),
       m_module_dir(module_dir),
-      m_prefetch_factor(prefetch_factor)
+      m_prefetch_factor(prefetch_factor),
+      m_samples_per_task(samples_per_task > 0 ? samples_per_task : 1)
   {}
   python_dataset_reader(const python_dataset_reader&) = default;
   python_dataset_reader& operator=(const python_dataset_reader&) = default;
@@ -88,6 +90,21 @@ protected:
 private:
   void queue_epoch();
   void queue_samples(uint64_t samples_to_queue);
+  /** @brief Get the Python handle for a set of input buffers.
+   *
+   *  Input buffers are registered with the Python data reader the
+   *  first time they are seen, so that batches can be loaded into
+   *  them in place.
+   */
+  python::object
+  get_registered_buffers(std::map<data_field_type, CPUMat*>& input_buffers);
+#ifdef LBANN_HAS_DISTCONV
+  /** @brief Copy a batch returned by the Python data reader into the
+   *  input buffers. */
+  void copy_batch(std::map<data_field_type, CPUMat*>& input_buffers,
+                  uint64_t mb_size,
+                  uint64_t sample_size);
+#endif // LBANN_HAS_DISTCONV
 
   /** @brief Path to the pickled dataset object. */
   std::string m_dataset_path;
@@ -95,6 +112,8 @@ private:
   std::string m_module_dir;
   /** @brief Number of samples to prefetch per worker. */
   int m_prefetch_factor;
+  /** @brief Number of samples loaded by each worker task. */
+  int m_samples_per_task;
   /** @brief Number of I/O threads. */
   int m_num_io_threads;
   /** @brief The current dataset shuffled minibatch offset. */
@@ -124,6 +143,13 @@ private:
    */
   python::object m_data_reader;
 
+  /** @brief Python handles for registered input buffers.
+   *
+   *  Keyed by the pointer, leading dimension, and width of each
+   *  input buffer.
+   */
+  std::map<std::vector<El::Int>, python::object> m_registered_buffers;
+
 #ifdef LBANN_HAS_DISTCONV
   /** @brief Whether or not tensor needs shuffling for distconv. */
   bool m_tensor_shuffle_required = true;
@@ -41,7 +41,11 @@ namespace lbann {
 
 /** @brief Layer composed of one or more operator objects
  *
- *  Operators are applied sequentially.
+ *  Operators are applied sequentially: the first operator is applied
+ *  to the layer's inputs and each subsequent operator is applied to
+ *  the output of the previous one. Operators after the first must be
+ *  unary and, if there is more than one operator, the input and
+ *  output data types must match.
  */
 template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
 class OperatorLayer final : public data_type_layer<InputT, OutputT>
@@ -50,8 +54,21 @@ class OperatorLayer final : public data_type_layer<InputT, OutputT>
   using OperatorType = Operator<InputT, OutputT, D>;
   using OperatorPtr = std::unique_ptr<OperatorType>;
 
+  using IntermediateMatrixType = El::AbstractDistMatrix<OutputT>;
+  using IntermediatePtr = std::unique_ptr<IntermediateMatrixType>;
+
   std::vector<OperatorPtr> m_ops;
 
+  /** @brief Outputs of all operators but the last
+   *  @details Only used with multiple operators. Kept from forward
+   *           prop for back prop.
+   */
+  std::vector<IntermediatePtr> m_intermediates;
+  /** @brief Workspace for gradients w.r.t. intermediate outputs
+   *  @details Only used with multiple operators.
+   */
+  std::vector<IntermediatePtr> m_intermediate_grads;
+
 public:
   /** @name Lifecycle functions */
   ///@{
@@ -104,6 +121,12 @@ private:
 
   static std::vector<size_t> fix_type(std::vector<int> const& in);
 
+  /** @brief Get an intermediate matrix with the layer's output
+   *         distribution and size, allocating it if needed.
+   */
+  IntermediateMatrixType&
+  get_intermediate(std::vector<IntermediatePtr>& buffers, size_t index);
+
   std::vector<utils::ConstDistTensorView<InputT, D>> get_inputs() const;
   std::vector<utils::DistTensorView<OutputT, D>> get_outputs();
   std::vector<utils::ConstDistTensorView<OutputT, D>>
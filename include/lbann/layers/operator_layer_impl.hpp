@@ -37,6 +37,7 @@
 #include "lbann/proto/layers.pb.h"
 #include <cereal/types/base_class.hpp>
 #include <memory>
+#include <type_traits>
 
 namespace lbann {
 
@@ -57,8 +58,16 @@ OperatorLayer<InputT, OutputT, Layout, D>::OperatorLayer(
   std::vector<OperatorPtr> operators)
   : DataTypeLayer(&comm), m_ops{std::move(operators)}
 {
-  LBANN_ASSERT(m_ops.size() == 1UL); // For starters.
-  LBANN_ASSERT(m_ops[0]);
+  LBANN_ASSERT(!m_ops.empty());
+  for (auto const& op : m_ops) {
+    LBANN_ASSERT(op);
+  }
+  if constexpr (!std::is_same_v<InputT, OutputT>) {
+    if (m_ops.size() > 1UL) {
+      LBANN_ERROR("Chaining operators requires matching input and output "
+                  "data types");
+    }
+  }
   this->m_expected_num_parent_layers = -1; // No limit on parents
 }
 
@@ -75,6 +84,8 @@ auto OperatorLayer<InputT, OutputT, Layout, D>::operator=(
   // This is self-assignment safe
   data_type_layer<InputT, OutputT>::operator=(other);
   m_ops = clone_ops(other.m_ops);
+  m_intermediates.clear();
+  m_intermediate_grads.clear();
   return *this;
 }
 
@@ -106,7 +117,9 @@ OperatorLayer<InputT, OutputT, Layout, D>::get_device_allocation() const
 template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
 bool OperatorLayer<InputT, OutputT, Layout, D>::can_run_inplace() const
 {
-  return true;
+  // The first operator of a chain may need the layer inputs in back
+  // prop, after they would be overwritten
+  return m_ops.size() == 1UL;
 }
 
 template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
@@ -123,15 +136,57 @@ int OperatorLayer<InputT, OutputT, Layout, D>::get_backprop_requirements() const
 template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
 void OperatorLayer<InputT, OutputT, Layout, D>::fp_compute()
 {
-  return m_ops[0]->fp_compute(this->get_inputs(), this->get_outputs());
+  auto const num_ops = m_ops.size();
+  if (num_ops == 1UL) {
+    return m_ops[0]->fp_compute(this->get_inputs(), this->get_outputs());
+  }
+  if constexpr (std::is_same_v<InputT, OutputT>) {
+    // Apply operators in sequence, keeping intermediate outputs for
+    // back prop
+    auto const& acts = this->get_activations();
+    auto const dims = splice_dims(acts.Width(), this->get_output_dims());
+    auto inputs = this->get_inputs();
+    for (size_t ii = 0; ii + 1 < num_ops; ++ii) {
+      auto& intermediate = get_intermediate(m_intermediates, ii);
+      std::vector<utils::DistTensorView<OutputT, D>> outputs;
+      outputs.emplace_back(intermediate, dims);
+      m_ops[ii]->fp_compute(inputs, outputs);
+      inputs.clear();
+      inputs.emplace_back(intermediate, dims);
+    }
+    m_ops.back()->fp_compute(inputs, this->get_outputs());
+  }
 }
 
 template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
 void OperatorLayer<InputT, OutputT, Layout, D>::bp_compute()
 {
-  return m_ops[0]->bp_compute(this->get_inputs(),
-                              this->get_grad_wrt_outputs(),
+  auto const num_ops = m_ops.size();
+  if (num_ops == 1UL) {
+    return m_ops[0]->bp_compute(this->get_inputs(),
+                                this->get_grad_wrt_outputs(),
+                                this->get_grad_wrt_inputs());
+  }
+  if constexpr (std::is_same_v<InputT, OutputT>) {
+    // Apply operators in reverse, alternating between two gradient
+    // workspaces
+    auto const& acts = this->get_activations();
+    auto const dims = splice_dims(acts.Width(), this->get_output_dims());
+    auto grad_wrt_outputs = this->get_grad_wrt_outputs();
+    for (size_t ii = num_ops - 1; ii > 0; --ii) {
+      auto& grad = get_intermediate(m_intermediate_grads, ii % 2);
+      std::vector<utils::ConstDistTensorView<InputT, D>> inputs;
+      inputs.emplace_back(*m_intermediates[ii - 1], dims);
+      std::vector<utils::DistTensorView<InputT, D>> grad_wrt_inputs;
+      grad_wrt_inputs.emplace_back(grad, dims);
+      m_ops[ii]->bp_compute(inputs, grad_wrt_outputs, grad_wrt_inputs);
+      grad_wrt_outputs.clear();
+      grad_wrt_outputs.emplace_back(grad, dims);
+    }
+    m_ops.front()->bp_compute(this->get_inputs(),
+                              grad_wrt_outputs,
                               this->get_grad_wrt_inputs());
+  }
 }
 
 template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
@@ -176,6 +231,24 @@ OperatorLayer<InputT, OutputT, Layout, D>::fix_type(std::vector<int> const& in)
   return std::vector<size_t>{cbegin(in), cend(in)};
 }
 
+template <typename InputT, typename OutputT, data_layout Layout, El::Device D>
+auto OperatorLayer<InputT, OutputT, Layout, D>::get_intermediate(
+  std::vector<IntermediatePtr>& buffers,
+  size_t index) -> IntermediateMatrixType&
+{
+  auto const& acts = this->get_activations();
+  if (buffers.size() <= index) {
+    buffers.resize(index + 1);
+  }
+  auto& buffer = buffers[index];
+  if (!buffer) {
+    buffer.reset(acts.Construct(acts.Grid(), acts.Root()));
+  }
+  buffer->AlignWith(acts);
+  buffer->Resize(acts.Height(), acts.Width());
+  return *buffer;
+}
+
 // WARNING: The next 4 functions all assume the minibatch dim is the
 // width of the matrix.
 
@@ -88,4 +88,4 @@ from lbann.core.training_algorithm import *
 from lbann.core.weights import *
 from lbann.launcher import run
 from lbann.lbann_features import *
-from lbann.core.evaluate import evaluate
+from lbann.core.evaluate import evaluate, EvaluationSession
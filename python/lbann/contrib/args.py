@@ -375,3 +375,9 @@ def add_amp_arguments(args: argparse.ArgumentParser) -> None:
         action='store_true',
         default=False,
         help='Enable automatic mixed precision')
+    args.add_argument(
+        '--amp-planner',
+        action='store_true',
+        default=False,
+        help='Choose layer datatypes for automatic mixed precision to '
+        'minimize precision conversions')
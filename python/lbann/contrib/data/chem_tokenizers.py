@@ -2,8 +2,12 @@
 Contains a variety of molecular tokenizers for use with dataset readers.
 """
 from enum import Enum, auto
+import itertools
+from multiprocessing import Pool
 import re
-from typing import Dict, Type
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
 
 try:
     from transformers import BertTokenizer
@@ -29,6 +33,157 @@ class ChemTokenType(Enum):
 
 
 class ChemTokenizer(BertTokenizer):
+    """
+    Base class for molecular tokenizers.
+
+    Besides the per-string HuggingFace interface, provides a batch interface
+    (``encode_batch``, ``encode_ragged``) that splits molecules with
+    ``_tokenize`` and converts all tokens of a batch to IDs in one pass over
+    a precompiled lookup table, bypassing the per-string HuggingFace
+    machinery. Molecules that contain added or special tokens (e.g.
+    ``[MASK]``) are split with ``tokenize``.
+    """
+
+    def _lookup_table(self) -> Dict[str, int]:
+        """
+        Returns the token to ID table (including added tokens), built on
+        first use and rebuilt when tokens are added.
+        """
+        table = getattr(self, '_vocab_table', None)
+        if table is None:
+            table = self.get_vocab()
+            self._vocab_table = table
+        return table
+
+    def _add_tokens(self, new_tokens, special_tokens: bool = False) -> int:
+        # Added tokens invalidate the lookup table and the added tokens
+        # pattern
+        self._vocab_table = None
+        self._added_pattern = None
+        return super()._add_tokens(new_tokens, special_tokens=special_tokens)
+
+    def _added_tokens_pattern(self) -> re.Pattern:
+        """
+        Returns a pattern that matches added and special tokens, built on
+        first use.
+        """
+        pattern = getattr(self, '_added_pattern', None)
+        if pattern is None:
+            added = set(self.get_added_vocab()) | set(self.all_special_tokens)
+            pattern = re.compile('|'.join(
+                re.escape(token)
+                for token in sorted(added, key=len, reverse=True)))
+            self._added_pattern = pattern
+        return pattern
+
+    def _encode_ragged(self,
+                       texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # Split molecules as ``tokenize`` does. Empty strings have no
+        # tokens, and strings that contain added or special tokens are
+        # split by ``tokenize`` itself.
+        has_added_tokens = self._added_tokens_pattern().search
+        split = self._tokenize
+        tokens = [(self.tokenize(text) if has_added_tokens(text) else
+                   split(text)) if text else [] for text in texts]
+        lengths = np.fromiter(map(len, tokens),
+                              dtype=np.int64,
+                              count=len(tokens))
+
+        # Look up all tokens at once, unknown tokens map to [UNK]
+        table = self._lookup_table()
+        ids = np.fromiter(map(table.get,
+                              itertools.chain.from_iterable(tokens),
+                              itertools.repeat(self.unk_token_id)),
+                          dtype=np.int32,
+                          count=int(lengths.sum()))
+
+        # Surround each sequence with [CLS] and [SEP]
+        lengths += 2
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        out = np.empty(ends[-1] if len(ends) > 0 else 0, dtype=np.int32)
+        inner = np.ones(len(out), dtype=bool)
+        inner[starts] = False
+        inner[ends - 1] = False
+        out[starts] = self.cls_token_id
+        out[ends - 1] = self.sep_token_id
+        out[inner] = ids
+        return out, lengths
+
+    def encode_ragged(
+            self,
+            texts: Sequence[str],
+            num_procs: Optional[int] = None,
+            chunk_size: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Tokenizes a list of molecules into a flat array of token IDs.
+
+        Each sequence holds the same token IDs as the per-string interface
+        (``tokenizer(text)['input_ids']``), including the [CLS] and [SEP]
+        tokens.
+
+        :param texts: Molecules, in the tokenizer's format.
+        :param num_procs: Number of processes to tokenize with. If None or 1,
+                          tokenizes in the calling process.
+        :param chunk_size: Number of molecules per process pool task.
+        :return: Concatenated token IDs (int32) and the length of each
+                 sequence (int64).
+        """
+        if num_procs is None or num_procs <= 1 or len(texts) <= chunk_size:
+            return self._encode_ragged(texts)
+
+        chunks = [
+            texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)
+        ]
+        with Pool(num_procs,
+                  initializer=_init_batch_worker,
+                  initargs=(self, )) as pool:
+            results = pool.map(_encode_ragged_chunk, chunks)
+        return (np.concatenate([ids for ids, _ in results]),
+                np.concatenate([lengths for _, lengths in results]))
+
+    def encode_batch(self,
+                     texts: Sequence[str],
+                     max_length: Optional[int] = None,
+                     pad_left: bool = False,
+                     num_procs: Optional[int] = None,
+                     chunk_size: int = 4096) -> np.ndarray:
+        """
+        Tokenizes a list of molecules into a padded matrix of token IDs.
+
+        :param texts: Molecules, in the tokenizer's format.
+        :param max_length: Number of columns. Longer sequences are truncated.
+                           If None, uses the longest sequence.
+        :param pad_left: If True, pads sequences on the left.
+        :param num_procs: Number of processes to tokenize with. If None or 1,
+                          tokenizes in the calling process.
+        :param chunk_size: Number of molecules per process pool task.
+        :return: An int32 matrix with one row per molecule, padded with the
+                 padding token.
+        """
+        ids, lengths = self.encode_ragged(texts, num_procs, chunk_size)
+        if max_length is None:
+            max_length = int(lengths.max()) if len(lengths) > 0 else 0
+
+        # Drop truncated tokens
+        if len(lengths) > 0 and lengths.max() > max_length:
+            ends = np.cumsum(lengths)
+            starts = ends - lengths
+            keep = np.minimum(lengths, max_length)
+            owner = np.repeat(np.arange(len(lengths)), lengths)
+            ids = ids[np.arange(len(ids)) - starts[owner] < keep[owner]]
+            lengths = keep
+
+        out = np.full((len(texts), max_length),
+                      self.pad_token_id,
+                      dtype=np.int32)
+        columns = np.arange(max_length)
+        if pad_left:
+            mask = columns >= (max_length - lengths)[:, None]
+        else:
+            mask = columns < lengths[:, None]
+        out[mask] = ids
+        return out
 
     @staticmethod
     def from_smiles(text: str) -> str:
@@ -138,6 +293,19 @@ class AISTokenizer(ChemTokenizer):
         return text
 
 
+_batch_worker_tokenizer = None
+
+
+def _init_batch_worker(tokenizer: ChemTokenizer):
+    global _batch_worker_tokenizer
+    _batch_worker_tokenizer = tokenizer
+
+
+def _encode_ragged_chunk(
+        texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    return _batch_worker_tokenizer._encode_ragged(texts)
+
+
 TOKENIZERS: Dict[ChemTokenType, Type[ChemTokenizer]] = {
     ChemTokenType.SMILES: SMILESTokenizer,
     ChemTokenType.SELFIES: SELFIESTokenizer,
@@ -0,0 +1,367 @@
+"""
+Contains a store of pre-decoded, pre-resized images and an LBANN dataset
+reader for it.
+
+Image datasets such as ImageNet are stored as JPEGs that are decoded and
+resized every time a sample is read, which bounds training throughput by
+JPEG decoding. ``build_image_store`` decodes every image once, resizes it
+to a small working resolution and writes the pixels as raw uint8 data, so
+that later epochs (and later runs over the same data) only copy pixels
+from memory-mapped files.
+"""
+
+from multiprocessing import Pool
+import numpy as np
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from lbann.util.data import Dataset, Sample, SampleDims, get_worker_index
+
+# Type of the records in the store index
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('label', '<i8'),
+                        ('shard', '<u4'), ('height', '<u4'),
+                        ('width', '<u4')])
+
+# Normalization of BGR channels, as in the ImageNet data reader
+IMAGENET_MEANS = (0.406, 0.456, 0.485)
+IMAGENET_STDDEVS = (0.225, 0.224, 0.229)
+
+
+def _shard_file(prefix: str, shard: int) -> str:
+    return f'{prefix}.{shard}.images'
+
+
+def _index_file(prefix: str) -> str:
+    return f'{prefix}.index.npy'
+
+
+def read_label_file(label_file: str,
+                    data_dir: str = '') -> Tuple[List[str], np.ndarray]:
+    """
+    Reads an image list in the format of the LBANN image data readers: one
+    image per line, given as a file path relative to the data directory and
+    an integer label.
+
+    :param label_file: Image list.
+    :param data_dir: Directory the image paths are relative to.
+    :return: Image file paths and labels.
+    """
+    files = []
+    labels = []
+    with open(label_file) as fp:
+        for line in fp:
+            line = line.split()
+            if not line:
+                continue
+            files.append(os.path.join(data_dir, line[0]))
+            labels.append(int(line[1]) if len(line) > 1 else -1)
+    return files, np.array(labels, dtype=np.int64)
+
+
+def decode_image(fname: str,
+                 image_size: int,
+                 center_crop: bool = False) -> np.ndarray:
+    """
+    Decodes an image and resizes it so that its shorter side has
+    ``image_size`` pixels.
+
+    :param fname: Image file.
+    :param image_size: Length of the shorter side after resizing.
+    :param center_crop: Whether to also crop the image to a centered
+                        ``image_size`` x ``image_size`` square.
+    :return: uint8 image in HWC format with BGR channels.
+    """
+    import cv2
+    img = cv2.imdecode(np.fromfile(fname, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f'could not decode image {fname}')
+
+    height, width = img.shape[:2]
+    size = min(height, width)
+    if center_crop:
+        y = (height - size) // 2
+        x = (width - size) // 2
+        img = img[y:y + size, x:x + size]
+        height = width = size
+    new_height = max(1, round(height * image_size / size))
+    new_width = max(1, round(width * image_size / size))
+    if (new_height, new_width) != (height, width):
+        interpolation = (cv2.INTER_AREA
+                         if size > image_size else cv2.INTER_LINEAR)
+        img = cv2.resize(img, (new_width, new_height),
+                         interpolation=interpolation)
+    return np.ascontiguousarray(img)
+
+
+def _decode_chunk(args: Tuple[Sequence[str], int, bool]) -> List[np.ndarray]:
+    files, image_size, center_crop = args
+    return [decode_image(f, image_size, center_crop) for f in files]
+
+
+def build_image_store(files: Sequence[str],
+                      labels: Sequence[int],
+                      prefix: str,
+                      image_size: int = 256,
+                      center_crop: bool = False,
+                      shard_size: int = 1 << 32,
+                      num_procs: Optional[int] = None,
+                      chunk_size: int = 64) -> str:
+    """
+    Decodes images in parallel and writes them as an ``ImageStore``.
+
+    Images are written in order to shard files ``prefix.<n>.images``, each
+    holding up to ``shard_size`` bytes of uint8 HWC pixels. The index
+    ``prefix.index.npy`` records the shard, byte offset, height, width and
+    label of every image.
+
+    :param files: Image files.
+    :param labels: Integer label of each image.
+    :param prefix: Path prefix of the store files.
+    :param image_size: Length of the shorter image side in the store.
+    :param center_crop: Whether to crop images to centered squares.
+    :param shard_size: Maximum number of bytes per shard. Larger images are
+                       stored in a shard of their own.
+    :param num_procs: Number of decoder processes (default: CPU count).
+    :param chunk_size: Number of images decoded per task.
+    :return: Path to the index file.
+    """
+    if len(files) != len(labels):
+        raise ValueError(f'got {len(files)} image files but '
+                         f'{len(labels)} labels')
+    index = np.zeros(len(files), dtype=INDEX_DTYPE)
+    index['label'] = labels
+    chunks = [(files[i:i + chunk_size], image_size, center_crop)
+              for i in range(0, len(files), chunk_size)]
+
+    shard = 0
+    offset = 0
+    i = 0
+    fp = open(_shard_file(prefix, shard), 'wb')
+    try:
+        with Pool(num_procs) as pool:
+            for images in pool.imap(_decode_chunk, chunks):
+                for img in images:
+                    if offset > 0 and offset + img.nbytes > shard_size:
+                        fp.close()
+                        shard += 1
+                        offset = 0
+                        fp = open(_shard_file(prefix, shard), 'wb')
+                    fp.write(img.data)
+                    index['shard'][i] = shard
+                    index['offset'][i] = offset
+                    index['height'][i], index['width'][i] = img.shape[:2]
+                    offset += img.nbytes
+                    i += 1
+    finally:
+        fp.close()
+
+    # The index is written last, since the store is detected by its presence
+    np.save(_index_file(prefix), index)
+    return _index_file(prefix)
+
+
+class ImageStore:
+    """
+    Pre-decoded images written by ``build_image_store``. Pixels are
+    memory-mapped and read on demand.
+    """
+
+    def __init__(self, prefix: str):
+        """
+        :param prefix: Path prefix of the store files.
+        """
+        self.prefix = prefix
+
+        # Memory maps are opened lazily so that the object can be pickled
+        self.index = None
+        self.shards = None
+
+    def _lazy_reload(self):
+        if self.shards is not None:
+            return
+
+        self.index = np.load(_index_file(self.prefix), mmap_mode='r')
+        num_shards = int(self.index['shard'].max()) + 1 if len(
+            self.index) else 0
+        self.shards = [
+            np.memmap(_shard_file(self.prefix, shard), dtype=np.uint8,
+                      mode='r') for shard in range(num_shards)
+        ]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['index'] = None
+        state['shards'] = None
+        return state
+
+    def __len__(self):
+        self._lazy_reload()
+        return len(self.index)
+
+    @property
+    def labels(self) -> np.ndarray:
+        self._lazy_reload()
+        return self.index['label']
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """
+        :param i: Image index.
+        :return: uint8 image in HWC format with BGR channels. The array is a
+                 read-only view of the memory-mapped store.
+        """
+        self._lazy_reload()
+        offset, _, shard, height, width = self.index[i].item()
+        size = height * width * 3
+        return self.shards[shard][offset:offset + size].reshape(
+            height, width, 3)
+
+
+def random_resized_crop_box(rng: np.random.Generator,
+                            height: int,
+                            width: int,
+                            scale: Tuple[float, float] = (0.08, 1.0),
+                            ratio: Tuple[float, float] = (3 / 4, 4 / 3),
+                            attempts: int = 10) -> Tuple[int, int, int, int]:
+    """
+    Samples a crop with random area and aspect ratio, as in the
+    ``random_resized_crop`` transform. Falls back to a centered crop with the
+    closest valid aspect ratio.
+
+    :return: Top, left, height and width of the crop.
+    """
+    area = height * width
+    log_ratio = np.log(ratio)
+    for _ in range(attempts):
+        target_area = area * rng.uniform(*scale)
+        aspect = np.exp(rng.uniform(*log_ratio))
+        w = int(round(np.sqrt(target_area * aspect)))
+        h = int(round(np.sqrt(target_area / aspect)))
+        if 0 < w <= width and 0 < h <= height:
+            y = int(rng.integers(0, height - h + 1))
+            x = int(rng.integers(0, width - w + 1))
+            return y, x, h, w
+
+    aspect = width / height
+    if aspect < ratio[0]:
+        w, h = width, int(round(width / ratio[0]))
+    elif aspect > ratio[1]:
+        w, h = int(round(height * ratio[1])), height
+    else:
+        w, h = width, height
+    return (height - h) // 2, (width - w) // 2, h, w
+
+
+class ImageStoreDataset(Dataset):
+    """
+    An image classification dataset reader for an ``ImageStore``.
+
+    Training samples are random resized crops with random horizontal flips,
+    and evaluation samples are center crops of the image resized to
+    ``resize_size``, like the transforms of the ImageNet data reader.
+    Samples are CHW images normalized per channel, and labels are one-hot.
+
+    Since the store is memory-mapped, the dataset should be shipped with
+    ``lbann.util.data.DatasetFactory``. All samples of a worker task are
+    normalized at once (see ``__getitems__``).
+    """
+
+    def __init__(self,
+                 prefix: str,
+                 num_classes: int = 1000,
+                 crop_size: int = 224,
+                 resize_size: int = 256,
+                 train: bool = True,
+                 means: Sequence[float] = IMAGENET_MEANS,
+                 stddevs: Sequence[float] = IMAGENET_STDDEVS,
+                 seed: Optional[int] = None):
+        """
+        :param prefix: Path prefix of the store files.
+        :param num_classes: Number of classes.
+        :param crop_size: Height and width of the samples.
+        :param resize_size: Length of the shorter image side before center
+                            cropping evaluation samples.
+        :param train: Whether to apply training data augmentation.
+        :param means: Mean of each BGR channel.
+        :param stddevs: Standard deviation of each BGR channel.
+        :param seed: Random seed, combined with the data reader worker
+                     index.
+        """
+        self.store = ImageStore(prefix)
+        self.num_classes = num_classes
+        self.crop_size = crop_size
+        self.resize_size = resize_size
+        self.train = train
+        self.scale = (1 / (255 * np.asarray(stddevs))).astype(np.float32)
+        self.shift = (-np.asarray(means) / np.asarray(stddevs)).astype(
+            np.float32)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def worker_init(self):
+        # Workers need distinct random streams. Same as
+        # SeedSequence(seed).spawn(index + 1)[index].
+        seed = self.seed
+        if seed is not None:
+            seed = np.random.SeedSequence(seed,
+                                          spawn_key=(get_worker_index() or 0,))
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return len(self.store)
+
+    def crop(self, img: np.ndarray, out: np.ndarray) -> None:
+        """
+        Writes the augmented crop of a stored image into ``out``.
+
+        :param img: uint8 image in HWC format.
+        :param out: uint8 array of shape (crop_size, crop_size, 3).
+        """
+        import cv2
+        height, width = img.shape[:2]
+        size = (self.crop_size, self.crop_size)
+        if self.train:
+            y, x, h, w = random_resized_crop_box(self.rng, height, width)
+            img = img[y:y + h, x:x + w]
+            if self.rng.random() < 0.5:
+                img = img[:, ::-1]
+        else:
+            # Resize the shorter side, then crop the center
+            short = min(height, width)
+            if short != self.resize_size:
+                height = round(height * self.resize_size / short)
+                width = round(width * self.resize_size / short)
+                img = cv2.resize(img, (width, height),
+                                 interpolation=cv2.INTER_LINEAR)
+            y = max(0, (height - self.crop_size) // 2)
+            x = max(0, (width - self.crop_size) // 2)
+            img = img[y:y + self.crop_size, x:x + self.crop_size]
+        if img.shape[:2] == size:
+            out[...] = img
+        else:
+            cv2.resize(np.ascontiguousarray(img), size, dst=out,
+                       interpolation=cv2.INTER_LINEAR)
+
+    def __getitem__(self, index: int) -> Sample:
+        sample = self.__getitems__([index])
+        return Sample(sample=sample.sample[0], label=sample.label[0])
+
+    def __getitems__(self, indices: Sequence[int]) -> Sample:
+        crops = np.empty((len(indices), self.crop_size, self.crop_size, 3),
+                         dtype=np.uint8)
+        for i, index in enumerate(indices):
+            self.crop(self.store[index], crops[i])
+
+        # Normalize and transpose to CHW format in one pass
+        samples = np.empty((len(indices), 3, self.crop_size, self.crop_size),
+                           dtype=np.float32)
+        chw = crops.transpose(0, 3, 1, 2)
+        np.multiply(chw, self.scale[:, None, None], out=samples)
+        samples += self.shift[:, None, None]
+
+        labels = np.zeros((len(indices), self.num_classes), dtype=np.float32)
+        labels[np.arange(len(indices)), self.store.labels[indices]] = 1
+        return Sample(sample=samples.reshape(len(indices), -1), label=labels)
+
+    def get_sample_dims(self) -> SampleDims:
+        return SampleDims(sample=[3 * self.crop_size * self.crop_size],
+                          label=[self.num_classes])
@@ -3,9 +3,12 @@ Contains an LBANN dataset reader for molecular text datasets in various
 input formats.
 """
 
+import hashlib
+import json
+from multiprocessing import Pool
 import numpy as np
 import os
-from typing import List, Union
+from typing import List, Optional, Tuple, Union
 
 from lbann.contrib.data.chem_tokenizers import TOKENIZERS, ChemTokenType
 from lbann.util.data import Dataset as LBANNDataset, Sample, SampleDims
@@ -16,6 +19,47 @@ def concat(*args):
     return np.concatenate(tuple(a.flat for a in args))
 
 
+def _memmap(fname: str, dtype: np.dtype) -> np.ndarray:
+    # NumPy cannot memory-map empty files
+    if os.path.getsize(fname) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(fname, dtype=dtype, mode='r')
+
+
+def build_offsets_file(fname: str, chunk_size: int = 1 << 26) -> str:
+    """
+    Writes the line offsets index read by ``TextDatasetWithOffsets``.
+
+    The index holds, for every line, the byte offset of its end in the
+    text file. It lets the file be memory-mapped and read on demand
+    instead of being loaded into every data reader process.
+
+    The index is written to a temporary file and moved into place, so
+    processes that build it concurrently never read a partial index.
+
+    :param fname: Newline-separated text file.
+    :param chunk_size: Number of bytes scanned at a time.
+    :return: Path to the offsets file.
+    """
+    data = _memmap(fname, np.uint8)
+    offsets = []
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        offsets.append(np.flatnonzero(chunk == ord('\n')).astype(np.uint64) +
+                       start)
+    if len(data) > 0 and data[-1] != ord('\n'):
+        offsets.append(np.array([len(data)], dtype=np.uint64))
+
+    out_fname = fname + '.offsets'
+    tmp_fname = f'{out_fname}.{os.getpid()}.tmp'
+    if offsets:
+        np.concatenate(offsets).tofile(tmp_fname)
+    else:
+        np.empty(0, dtype=np.uint64).tofile(tmp_fname)
+    os.replace(tmp_fname, out_fname)
+    return out_fname
+
+
 class TextDataset(Dataset):
     """
     Simple PyTorch text dataset. Adapted from the now-deprecated 
@@ -43,8 +87,8 @@ class TextDataset(Dataset):
 
 class TextDatasetWithOffsets(Dataset):
     """
-    PyTorch text dataset with offset files. Not loaded to memory but read
-    on demand.
+    PyTorch text dataset with offset files (see ``build_offsets_file``). Not
+    loaded to memory but read on demand.
     """
 
     def __init__(self, file_or_files: Union[str, List[str]]):
@@ -52,32 +96,39 @@ class TextDatasetWithOffsets(Dataset):
             file_or_files = [file_or_files]
         self.files = file_or_files
 
-        self.offsets = [
-            np.memmap(f + '.offsets', dtype=np.uint64) for f in file_or_files
+        self.samples = [
+            os.path.getsize(f + '.offsets') // 8 for f in file_or_files
         ]
-        self.samples = [o.shape[0] for o in self.offsets]
         self.cs = np.cumsum(np.array(self.samples, dtype=np.uint64),
                             dtype=np.uint64)
         self.total_samples = sum(self.samples)
 
-        # Clean memmapped files so that the object can be pickled
+        # Memory maps are opened lazily so that the object can be pickled
         self.offsets = None
-        #self.files = [np.memmap(f, dtype=np.uint8) for f in file_or_files]
+        self.texts = None
 
     def _lazy_reload(self):
         if self.offsets is not None:
             return
 
-        self.offsets = [
-            np.memmap(f + '.offsets', dtype=np.uint64) for f in self.files
-        ]
-        self.files = [np.memmap(f, dtype=np.uint8) for f in self.files]
+        self.offsets = [_memmap(f + '.offsets', np.uint64) for f in self.files]
+        self.texts = [_memmap(f, np.uint8) for f in self.files]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['offsets'] = None
+        state['texts'] = None
+        return state
 
     def __len__(self):
         return self.total_samples
 
     def __getitem__(self, i: int) -> str:
         self._lazy_reload()
+        if i < 0:
+            i += self.total_samples
+        if not 0 <= i < self.total_samples:
+            raise IndexError('dataset index out of range')
 
         # Find file
         f = self.cs.searchsorted(i, side='right')
@@ -91,12 +142,291 @@ class TextDatasetWithOffsets(Dataset):
         eoff = self.offsets[f][local_i].item()
 
         # Return string
-        return self.files[f][soff:eoff].tobytes().decode('utf-8')
+        return self.texts[f][soff:eoff].tobytes().decode('utf-8')
+
+
+def token_dtype(vocab_size: int) -> np.dtype:
+    """
+    Returns the narrowest unsigned integer type that holds every token ID of
+    a vocabulary.
+    """
+    return np.dtype(np.uint16 if vocab_size <= (1 << 16) else np.uint32)
+
+
+def vocab_hash(tokenizer) -> str:
+    """
+    Returns a SHA-256 hash of a tokenizer's vocabulary, including added and
+    special tokens, in token ID order.
+    """
+    vocab = sorted(tokenizer.get_vocab().items(), key=lambda kv: kv[1])
+    data = '\n'.join(f'{i}\t{token}' for token, i in vocab)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _make_decoder(tokenizer, input_type: ChemTokenType):
+    if input_type == ChemTokenType.SMILES:
+        return tokenizer.from_smiles
+    elif input_type == ChemTokenType.SELFIES:
+        return tokenizer.from_selfies
+    elif input_type == ChemTokenType.AIS:
+        return tokenizer.from_ais
+    raise ValueError(f'Unrecognized input type {input_type}')
+
+
+class TokenStore(Dataset):
+    """
+    Pre-tokenized molecular dataset, written by ``pretokenize_file``. Token IDs
+    are memory-mapped and read on demand.
+
+    Each text file ``f`` is stored as ``f.tokens``, the token IDs of all lines
+    concatenated, and ``f.tokens.offsets``, the (uint64) end offset of every
+    line in ``f.tokens``. As with the text offsets index, line ``i`` spans
+    ``[offsets[i - 1], offsets[i])``. The header ``f.tokens.json`` records the
+    store version, token type, tokenizer and input types, the hash of the
+    vocabulary (see ``vocab_hash``), the number of lines and tokens, and the
+    size of ``f``.
+
+    Headers are validated on open. Stores written with another vocabulary,
+    tokenizer or input type, for another version of ``f``, or that are
+    truncated raise a ``ValueError``.
+    """
+
+    def __init__(self,
+                 file_or_files: Union[str, List[str]],
+                 vocab_hash: Optional[str] = None,
+                 tokenizer_type: Optional[ChemTokenType] = None,
+                 input_type: Optional[ChemTokenType] = None):
+        """
+        Opens a pre-tokenized dataset.
+
+        :param file_or_files: Text file name or list of text file names.
+        :param vocab_hash: Expected vocabulary hash. Not checked if None.
+        :param tokenizer_type: Expected tokenizer type. Not checked if None.
+        :param input_type: Expected molecule representation of the text
+                           files. Not checked if None.
+        """
+        if isinstance(file_or_files, str):
+            file_or_files = [file_or_files]
+        self.files = file_or_files
+
+        expected = {
+            'version': TOKEN_STORE_VERSION,
+            'vocab_hash': vocab_hash,
+            'tokenizer_type': tokenizer_type and tokenizer_type.name,
+            'input_type': input_type and input_type.name,
+        }
+        headers = [read_token_store_header(f) for f in file_or_files]
+        for f, header in zip(file_or_files, headers):
+            for key, value in expected.items():
+                if value is not None and header.get(key) != value:
+                    raise ValueError(
+                        f'Pre-tokenized store of {f} has {key} '
+                        f'{header.get(key)}, expected {value}. Re-run '
+                        'pretokenize_file to rebuild it.')
+            self._check_sizes(f, header)
+        dtypes = {header['dtype'] for header in headers}
+        if len(dtypes) > 1:
+            raise ValueError(f'Pre-tokenized stores have different token '
+                             f'types {sorted(dtypes)}')
+        self.dtype = np.dtype(dtypes.pop() if dtypes else np.uint32)
+
+        samples = [header['num_samples'] for header in headers]
+        self.cs = np.cumsum(np.array(samples, dtype=np.uint64),
+                            dtype=np.uint64)
+        self.total_samples = sum(samples)
+
+        # Memory maps are opened lazily so that the object can be pickled
+        self.tokens = None
+        self.offsets = None
+
+    @staticmethod
+    def _check_sizes(fname: str, header: dict):
+        sizes = {
+            fname: header['source_size'],
+            fname + '.tokens':
+            header['num_tokens'] * np.dtype(header['dtype']).itemsize,
+            fname + '.tokens.offsets': header['num_samples'] * 8,
+        }
+        for f, size in sizes.items():
+            if os.path.getsize(f) != size:
+                raise ValueError(
+                    f'{f} has {os.path.getsize(f)} bytes, but the '
+                    f'pre-tokenized store header expects {size}. Re-run '
+                    'pretokenize_file to rebuild it.')
+
+    def _lazy_reload(self):
+        if self.tokens is not None:
+            return
+
+        self.offsets = [
+            _memmap(f + '.tokens.offsets', np.uint64) for f in self.files
+        ]
+        self.tokens = [_memmap(f + '.tokens', self.dtype) for f in self.files]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['tokens'] = None
+        state['offsets'] = None
+        return state
+
+    def __len__(self):
+        return self.total_samples
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        self._lazy_reload()
+        if i < 0:
+            i += self.total_samples
+        if not 0 <= i < self.total_samples:
+            raise IndexError('dataset index out of range')
+
+        # Find file
+        f = self.cs.searchsorted(i, side='right')
+        local_i = i - (self.cs[f - 1].item() if f > 0 else 0)
+
+        # Find offset
+        soff = self.offsets[f][local_i - 1].item() if local_i > 0 else 0
+        eoff = self.offsets[f][local_i].item()
+
+        return self.tokens[f][soff:eoff]
+
+
+TOKEN_STORE_VERSION = 1
+
+
+def read_token_store_header(fname: str) -> dict:
+    """
+    Reads the header of the ``TokenStore`` of a text file.
+
+    :param fname: Text file name.
+    :return: Header dictionary.
+    """
+    with open(fname + '.tokens.json', 'r') as fp:
+        return json.load(fp)
+
+
+_pretokenize_tokenizer = None
+_pretokenize_decode = None
+
+
+def _init_pretokenize_worker(vocab: str, tokenizer_type: ChemTokenType,
+                             input_type: ChemTokenType):
+    global _pretokenize_tokenizer, _pretokenize_decode
+    _pretokenize_tokenizer = TOKENIZERS[tokenizer_type](vocab)
+    _pretokenize_decode = _make_decoder(_pretokenize_tokenizer, input_type)
+
+
+def _pretokenize_chunk(
+        args: Tuple[str, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    fname, start, end = args
+    with open(fname, 'rb') as fp:
+        fp.seek(start)
+        data = fp.read(end - start)
+    lines = data.split(b'\n')
+    if data.endswith(b'\n'):
+        lines.pop()
+
+    samples = [_pretokenize_decode(l.decode('utf-8').strip()) for l in lines]
+    ids, lengths = _pretokenize_tokenizer.encode_ragged(samples)
+    dtype = token_dtype(len(_pretokenize_tokenizer))
+    return ids.astype(dtype), lengths
+
+
+def _line_aligned_chunks(fname: str, chunk_size: int) -> List[Tuple[int, int]]:
+    size = os.path.getsize(fname)
+    bounds = [0]
+    with open(fname, 'rb') as fp:
+        while bounds[-1] + chunk_size < size:
+            fp.seek(bounds[-1] + chunk_size)
+            fp.readline()
+            if fp.tell() >= size:
+                break
+            bounds.append(fp.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def pretokenize_file(fname: str,
+                     vocab: str,
+                     tokenizer_type: ChemTokenType,
+                     input_type: Optional[ChemTokenType] = None,
+                     num_procs: Optional[int] = None,
+                     chunk_size: int = 1 << 24) -> str:
+    """
+    Tokenizes a newline-separated molecular text file offline and writes it
+    as a ``TokenStore``. ``ChemTextDataset`` reads the store instead of the
+    text file when it exists, so training runs no tokenizer or molecule
+    format conversion.
+
+    Files are written under temporary names and moved into place, with the
+    header last, so that a store is only detected once it is complete.
+
+    The store holds the same token IDs ``ChemTextDataset`` would compute
+    (before trimming and padding), one entry per line of the text file.
+
+    :param fname: Newline-separated text file.
+    :param vocab: File path containing a newline-separated list of
+                  vocabulary entries.
+    :param tokenizer_type: The tokenizer type to use.
+    :param input_type: Molecule representation of the text file. If None,
+                       uses the same representation as ``tokenizer_type``.
+    :param num_procs: Number of tokenizer processes (default: CPU count).
+    :param chunk_size: Approximate number of bytes tokenized per task.
+    :return: Path to the token file.
+    """
+    input_type = input_type or tokenizer_type
+    source_size = os.path.getsize(fname)
+    chunks = [(fname, s, e) for s, e in _line_aligned_chunks(fname, chunk_size)]
+    tokenizer = TOKENIZERS[tokenizer_type](vocab)
+
+    offsets = []
+    total = 0
+    out_fname = fname + '.tokens'
+    tmp_suffix = f'.{os.getpid()}.tmp'
+    pool = Pool(num_procs,
+                initializer=_init_pretokenize_worker,
+                initargs=(vocab, tokenizer_type, input_type))
+    with open(out_fname + tmp_suffix, 'wb') as fp, pool:
+        for ids, lengths in pool.imap(_pretokenize_chunk, chunks):
+            ids.tofile(fp)
+            offsets.append(np.cumsum(lengths, dtype=np.uint64) + total)
+            total += len(ids)
+    offsets = (np.concatenate(offsets)
+               if offsets else np.empty(0, dtype=np.uint64))
+    offsets.tofile(out_fname + '.offsets' + tmp_suffix)
+
+    header = {
+        'version': TOKEN_STORE_VERSION,
+        'tokenizer_type': tokenizer_type.name,
+        'input_type': input_type.name,
+        'vocab_hash': vocab_hash(tokenizer),
+        'dtype': token_dtype(len(tokenizer)).str,
+        'num_samples': len(offsets),
+        'num_tokens': total,
+        'source_size': source_size,
+    }
+    with open(out_fname + '.json' + tmp_suffix, 'w') as fp:
+        json.dump(header, fp, indent=2)
+
+    # The header is moved last, since the store is detected by its presence
+    for suffix in ('', '.offsets', '.json'):
+        os.replace(out_fname + suffix + tmp_suffix, out_fname + suffix)
+    return out_fname
 
 
 class ChemTextDataset(LBANNDataset):
     """
     A molecular dataset reader supporting different atom formats and tokenizers.
+
+    Dataset files are memory-mapped and read on demand through their offsets
+    index (see ``build_offsets_file``), which is built on first use if it is
+    missing. Combined with ``lbann.util.data.DatasetFactory``, this keeps the
+    dataset out of the pickled data reader and shares its pages between
+    worker processes.
+
+    If every dataset file has been pre-tokenized (see ``pretokenize_file``),
+    token IDs are read from the memory-mapped ``TokenStore`` and no
+    tokenization happens during training. The stores must have been written
+    with the same vocabulary, tokenizer and input types.
     """
 
     def __init__(self,
@@ -129,20 +459,23 @@ class ChemTextDataset(LBANNDataset):
 
         # Make decoder based on input type
         input_type = input_type or tokenizer_type
-        if input_type == ChemTokenType.SMILES:
-            self.decode = self.tokenizer.from_smiles
-        elif input_type == ChemTokenType.SELFIES:
-            self.decode = self.tokenizer.from_selfies
-        elif input_type == ChemTokenType.AIS:
-            self.decode = self.tokenizer.from_ais
+        self.decode = _make_decoder(self.tokenizer, input_type)
+
+        if isinstance(fname, str):
+            fname = [fname]
+        self.pretokenized = all(
+            os.path.exists(f + '.tokens.json') for f in fname)
+        if self.pretokenized:
+            print('Using pre-tokenized dataset')
+            self.dataset = TokenStore(fname, vocab_hash(self.tokenizer),
+                                      tokenizer_type, input_type)
         else:
-            raise ValueError(f'Unrecognized input type {input_type}')
-
-        if os.path.exists(fname[0] + '.offsets'):
-            print('Using fast text dataset with offsets')
+            # Index the text once, so that no process reads it into memory
+            for f in fname:
+                if not os.path.exists(f + '.offsets'):
+                    print(f'Building offsets index for {f}')
+                    build_offsets_file(f)
             self.dataset = TextDatasetWithOffsets(fname)
-        else:
-            self.dataset = TextDataset(fname)
 
         self._vocab_size = len(self.tokenizer)
         self.mlm_prob = mlm_probability
@@ -160,9 +493,12 @@ class ChemTextDataset(LBANNDataset):
         return len(self.dataset)
 
     def __getitem__(self, index: int):
-        sample = self.decode(self.dataset[index])
-        tokenized = self.tokenizer(sample)
-        ids = np.array(tokenized['input_ids'], dtype=np.int32)
+        if self.pretokenized:
+            ids = self.dataset[index].astype(np.int32)
+        else:
+            sample = self.decode(self.dataset[index].strip())
+            tokenized = self.tokenizer(sample)
+            ids = np.array(tokenized['input_ids'], dtype=np.int32)
 
         if self.attn_mask:
             samp = Sample(
@@ -3,6 +3,7 @@ import os
 import shutil
 
 import lbann
+import lbann.core.util
 import lbann.launcher
 import lbann.proto
 
@@ -11,6 +12,7 @@ def grid_search(
         make_experiment,
         procs_per_trainer=1,
         hyperparameters_file=None,
+        experiment_cache=None,
         **kwargs,
 ):
     """Run LBANN with exhaustive grid search over hyperparameter values
@@ -32,6 +34,15 @@ def grid_search(
         hyperparameters_file (str): CSV file to write model
             configurations (default: hyperparameters.csv in work
             directory).
+        experiment_cache (str or lbann.proto.ExperimentCache,
+            optional): Cache, or cache directory, for experiment
+            files. If set, experiments are saved as binary files
+            assembled from cached components, so components shared
+            between configurations (e.g. the model graph) are only
+            written once (see `lbann.proto.ExperimentCache`). Default
+            names (e.g. of layers and weights) are then generated
+            identically for each configuration, so make_experiment
+            should not reuse objects created in previous calls.
         **kwargs (list): Hyperparameter values. Each kwarg should be a
             list of values to pass to the corresponding kwarg in
             make_experiment.
@@ -51,17 +62,35 @@ def grid_search(
     num_trainers = (num_nodes * procs_per_node) // procs_per_trainer
     num_nodes = (procs_per_trainer * num_trainers) // procs_per_node
 
+    # Experiment file names
+    # Note: LBANN replaces everything after "trainer" with the trainer
+    # ID, so binary files are marked with "protobin" before it.
+    if experiment_cache is not None:
+        experiment_cache = lbann.proto.ExperimentCache.get(experiment_cache)
+        proto_file_format = 'run{}.protobin.trainer{}'
+    else:
+        proto_file_format = 'run{}.trainer{}'
+    def proto_file(run_id, trainer_id):
+        return os.path.join(work_dir,
+                            proto_file_format.format(run_id, trainer_id))
+
     # Iterate through Cartesian product of hyperparameter values
     # Note: Export Protobuf message for each configuration and add
     # LBANN invocation as needed.
     arg_keys = list(kwargs.keys())
     arg_values = list(kwargs.values())
     hyperparameters = [['run_id', 'trainer_id', 'model_name'] + arg_keys]
+    if experiment_cache is not None:
+        initial_counters = lbann.core.util.name_counters()
     for model_id, values in enumerate(itertools.product(*arg_values)):
         run_id = model_id // num_trainers
         trainer_id = model_id % num_trainers
 
         # Construct experiment
+        # Note: If caching experiments, reset default name counters so
+        # that identical graphs are serialized identically.
+        if experiment_cache is not None:
+            lbann.core.util.reset_name_counters(initial_counters)
         args = dict(zip(arg_keys, values))
         model, optimizer, reader, trainer = make_experiment(**args)
         if not model.name:
@@ -71,12 +100,20 @@ def grid_search(
         hyperparameters.append([run_id, trainer_id, model.name] + list(values))
 
         # Export Protobuf file
-        lbann.proto.save_prototext(
-            os.path.join(work_dir, f'run{run_id}.trainer{trainer_id}'),
-            model=model,
-            optimizer=optimizer,
-            data_reader=reader,
-            trainer=trainer)
+        if experiment_cache is not None:
+            experiment_cache.save(
+                proto_file(run_id, trainer_id),
+                model=model,
+                optimizer=optimizer,
+                data_reader=reader,
+                trainer=trainer)
+        else:
+            lbann.proto.save_prototext(
+                proto_file(run_id, trainer_id),
+                model=model,
+                optimizer=optimizer,
+                data_reader=reader,
+                trainer=trainer)
 
         # Invocation to launch LBANN
         if trainer_id == num_trainers-1:
@@ -84,7 +121,7 @@ def grid_search(
                 lbann.lbann_exe(),
                 f'--procs_per_trainer={procs_per_trainer}',
                 '--generate_multi_proto',
-                f'--prototext={work_dir}/run{run_id}.trainer0']
+                f'--prototext={proto_file(run_id, 0)}']
             script.add_parallel_command(
                 command, nodes=num_nodes, procs_per_node=procs_per_node)
 
@@ -93,19 +130,20 @@ def grid_search(
     # trainers, repeat the last configuration until we are using a
     # whole number of nodes.
     if trainer_id+1 != num_trainers:
-        last_prototext = os.path.join(work_dir, f'run{run_id}.trainer{trainer_id}')
+        last_prototext = proto_file(run_id, trainer_id)
         while ((trainer_id+1)*procs_per_trainer) % procs_per_node != 0:
             trainer_id += 1
             hyperparameters.append(list(hyperparameters[-1]))
             hyperparameters[-1][1] = trainer_id
-            shutil.copyfile(
-                last_prototext,
-                os.path.join(work_dir, f'run{run_id}.trainer{trainer_id}'))
+            # Note: Do not write through hard links into the cache
+            if os.path.lexists(proto_file(run_id, trainer_id)):
+                os.remove(proto_file(run_id, trainer_id))
+            shutil.copyfile(last_prototext, proto_file(run_id, trainer_id))
         command = [
             lbann.lbann_exe(),
             f'--procs_per_trainer={procs_per_trainer}',
             '--generate_multi_proto',
-            f'--prototext={work_dir}/run{run_id}.trainer0']
+            f'--prototext={proto_file(run_id, 0)}']
         script.add_parallel_command(
             command,
             nodes=((trainer_id+1)*procs_per_trainer) // procs_per_node,
@@ -109,7 +109,10 @@ def run(
     nvprof=False,
     nvprof_output_name=None,
     binary_protobuf=False,
+    external_weights_threshold=None,
+    experiment_cache=None,
     profiler_cmd=None,
+    optimize_graph=False,
     *args,
     **kwargs,
 ):
@@ -130,7 +133,8 @@ def run(
     # Set default file name and extension
     if proto_file_name is None:
         proto_file_name = ('experiment.protobin'
-                           if binary_protobuf else 'experiment.prototext')
+                           if binary_protobuf or experiment_cache is not None
+                           else 'experiment.prototext')
 
     # Batch script invokes LBANN
     lbann_command = [lbann_exe]
@@ -142,12 +146,25 @@ def run(
         lbann_command=[profiler_cmd]+lbann_command
     lbann_command.extend(make_iterable(lbann_args))
     proto_file = os.path.join(script.work_dir, proto_file_name)
-    lbann.proto.save_prototext(proto_file,
-                               binary=binary_protobuf,
-                               trainer=trainer,
-                               model=model,
-                               data_reader=data_reader,
-                               optimizer=optimizer)
+    if optimize_graph:
+        from lbann.util import graph_optimization
+        graph_optimization.optimize_graph(model)
+    if experiment_cache is not None:
+        cache = lbann.proto.ExperimentCache.get(experiment_cache)
+        cache.save(proto_file,
+                   external_weights_threshold=external_weights_threshold,
+                   trainer=trainer,
+                   model=model,
+                   data_reader=data_reader,
+                   optimizer=optimizer)
+    else:
+        lbann.proto.save_prototext(proto_file,
+                                   binary=binary_protobuf,
+                                   external_weights_threshold=external_weights_threshold,
+                                   trainer=trainer,
+                                   model=model,
+                                   data_reader=data_reader,
+                                   optimizer=optimizer)
     lbann_command.append('--prototext={}'.format(proto_file))
     if procs_per_trainer is not None:
         lbann_command.append(f'--procs_per_trainer={procs_per_trainer}')
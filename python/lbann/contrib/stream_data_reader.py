@@ -0,0 +1,104 @@
+"""
+Data reader that streams mini-batches published by a persistent
+evaluation session (see ``lbann.EvaluationSession``).
+
+The session writes the inputs of each mini-batch step to a NumPy file in
+a stream directory, preferably on a memory-backed file system. Reader
+workers wait for the file of the step they are asked for, memory-map it
+and return its rows, so an LBANN job started once can evaluate any number
+of batches.
+"""
+import os
+import time
+import numpy as np
+from lbann.util.data import Dataset, Sample, SampleDims
+
+STOP_FILE = 'stop'
+
+
+def input_file(directory: str, step: int) -> str:
+    """
+    Input file for a mini-batch step.
+
+    :param directory: Stream directory
+    :param step: Mini-batch step
+    :return: Path of the NumPy file with the step's inputs
+    """
+    return os.path.join(directory, f'input{step}.npy')
+
+
+class StreamDataset(Dataset):
+    """
+    Dataset whose samples are published step by step in a stream
+    directory. Sample ``i`` is row ``i % mini_batch_size`` of the inputs of
+    step ``i // mini_batch_size``, so LBANN's shuffling must be disabled.
+
+    Once the session writes the stop file, or if there is no stream
+    directory (e.g. for an unused training reader), zeros are returned
+    without waiting.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 sample_size: int,
+                 mini_batch_size: int,
+                 num_steps: int,
+                 poll_interval: float = 1e-4,
+                 max_poll_interval: float = 1e-2) -> None:
+        """
+        StreamDataset Constructor
+
+        :param directory: Stream directory, or None to return zeros
+        :param sample_size: Number of values per sample
+        :param mini_batch_size: Number of samples per step
+        :param num_steps: Number of steps in the stream
+        :param poll_interval: Initial wait between checks for an input file,
+                              in seconds. Doubled after each check.
+        :param max_poll_interval: Maximum wait between checks, in seconds
+        """
+        self.directory = directory
+        self.sample_size = sample_size
+        self.mini_batch_size = mini_batch_size
+        self.num_steps = num_steps
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._step = None
+        self._inputs = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_step'] = None
+        state['_inputs'] = None
+        return state
+
+    def __len__(self) -> int:
+        return self.num_steps * self.mini_batch_size
+
+    def get_sample_dims(self) -> SampleDims:
+        return SampleDims(sample=(self.sample_size, ))
+
+    def _wait_for_inputs(self, step: int):
+        """Memory-map the inputs of a step once they are published."""
+        if self.directory is None:
+            return None
+        file_name = input_file(self.directory, step)
+        stop_file = os.path.join(self.directory, STOP_FILE)
+        interval = self.poll_interval
+        while True:
+            try:
+                return np.load(file_name, mmap_mode='r')
+            except FileNotFoundError:
+                pass
+            if os.path.exists(stop_file):
+                return None
+            time.sleep(interval)
+            interval = min(2 * interval, self.max_poll_interval)
+
+    def __getitem__(self, index: int) -> Sample:
+        step, row = divmod(index, self.mini_batch_size)
+        if step != self._step:
+            self._inputs = self._wait_for_inputs(step)
+            self._step = step
+        if self._inputs is None:
+            return Sample(sample=np.zeros(self.sample_size, dtype=np.float32))
+        return Sample(sample=self._inputs[row])
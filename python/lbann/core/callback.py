@@ -22,6 +22,7 @@ if callbacks_pb2:
         base_class = Callback,
         base_has_export_proto = True)
     for c in classes:
+        c.__module__ = __name__
         globals()[c.__name__] = c
 
 class ImageSelectionStrategy(abc.ABC):
@@ -41,4 +42,5 @@ if callbacks_pb2:
         base_class = ImageSelectionStrategy,
         base_has_export_proto = True)
     for c in classes:
+        c.__module__ = __name__
         globals()[c.__name__] = c
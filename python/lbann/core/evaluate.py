@@ -27,14 +27,23 @@
 """ Python interface to evaluate a single set of inputs. """
 
 import copy
+import functools
+import io
 import lbann
-from lbann.launcher import make_timestamped_work_dir
-from lbann.contrib import single_tensor_data_reader
+from lbann.launcher import detect_scheduler, make_timestamped_work_dir
+from lbann.contrib import single_tensor_data_reader, stream_data_reader
+from lbann.util.data import construct_python_dataset_reader
 import numpy as np
 import numpy.typing as npt
 import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
 from typing import Dict, List, Optional, Tuple, Union
 import warnings
+import weakref
 
 
 def evaluate(
@@ -64,23 +73,15 @@ def evaluate(
 
     ########################
     # Canonicalize arguments
-
-    # Set model to always be an lbann.Model
-    if isinstance(model, (list, tuple, set, lbann.Layer)):
-        if isinstance(model, lbann.Layer):
-            model = [model]
-        model = lbann.Model(0, model)
-
-    # Obtain outputs if not given
-    if not outputs:
-        outputs = [l.name for l in model.layers if not l.children]
-
+    model, outputs = _canonicalize_model(model, outputs)
     extra_callbacks = extra_callbacks or []
     #####################
     if 'job_name' not in kwargs:
         kwargs['job_name'] = 'lbann_evaluate'
 
     workdir = make_timestamped_work_dir(**kwargs)
+    kwargs.pop('work_dir', None)
+    kwargs.pop('experiment_dir', None)
     fmt = 'npy' if lbann.has_feature('CNPY') else 'csv'
 
     # Reset fields for evaluation
@@ -126,8 +127,24 @@ def evaluate(
     return output_tensors
 
 
-def _setup_data_reader(inputs: npt.NDArray, workdir: str, training: bool):
-    # Save inputs
+def _canonicalize_model(
+    model: Union[lbann.Model, List[lbann.Layer]],
+    outputs: Optional[List[str]],
+) -> Tuple[lbann.Model, List[str]]:
+    # Set model to always be an lbann.Model
+    if isinstance(model, (list, tuple, set, lbann.Layer)):
+        if isinstance(model, lbann.Layer):
+            model = [model]
+        model = lbann.Model(0, model)
+
+    # Obtain outputs if not given
+    if not outputs:
+        outputs = [l.name for l in model.layers if not l.children]
+
+    return model, outputs
+
+
+def _flatten_inputs(inputs: npt.NDArray) -> npt.NDArray:
     if len(inputs.shape) == 1:  # Minibatch dimension must exist
         inputs = inputs.reshape(1, inputs.shape[0])
     elif len(inputs.shape) > 2:
@@ -135,7 +152,12 @@ def _setup_data_reader(inputs: npt.NDArray, workdir: str, training: bool):
             f'{len(inputs.shape)}-dimensional tensor given, all dimensions '
             'beyond the second one will be flattened')
         inputs = inputs.reshape(inputs.shape[0], -1)
+    return inputs
+
 
+def _setup_data_reader(inputs: npt.NDArray, workdir: str, training: bool):
+    # Save inputs
+    inputs = _flatten_inputs(inputs)
     np.save(os.path.join(workdir, 'data.npy'), inputs)
 
     # Construct protobuf message for data reader
@@ -186,3 +208,336 @@ def _collect_outputs(output_names: List[str], workdir: str, dtype: np.dtype,
             outputs.append(np.load(fname))
 
     return tuple(outputs)
+
+
+class EvaluationSession:
+    """
+    Persistent LBANN job for repeated evaluation of a model.
+
+    ``evaluate`` launches a new LBANN job for every call, which costs
+    seconds of startup even for tiny models. A session launches LBANN once
+    in testing mode and keeps the model loaded. Each ``evaluate`` call
+    splits its inputs into mini-batches and publishes them in a stream
+    directory, where a streaming data reader picks them up (see
+    ``lbann.contrib.stream_data_reader``). Outputs are dumped to the same
+    directory. By default, single-node sessions that are launched on the
+    current node without a job scheduler stream through ``/dev/shm``, so
+    inputs and outputs never touch a disk.
+
+    The job serves up to ``max_steps`` mini-batches and is relaunched
+    transparently once they are used up. Sessions only evaluate in testing
+    mode, so model weights do not change between calls.
+
+    Example::
+
+        with lbann.EvaluationSession(model, sample_dims=(3, 4),
+                                     mini_batch_size=32) as session:
+            for inputs in batches:
+                outputs = session.evaluate(inputs)
+    """
+
+    def __init__(
+        self,
+        model: Union[lbann.Model, List[lbann.Layer]],
+        sample_dims: Union[int, Tuple[int, ...]],
+        mini_batch_size: int,
+        outputs: Optional[List[str]] = None,
+        extra_callbacks: Optional[List[lbann.Callback]] = None,
+        max_steps: int = 65536,
+        stream_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        **kwargs,
+    ) -> None:
+        """
+        Launches LBANN with the given model.
+
+        :param model: The LBANN model or layer graph to evaluate.
+        :param sample_dims: Dimensions of a single input sample. Samples are
+                            flattened and mapped to the ``lbann.Input`` with
+                            the ``samples`` data field.
+        :param mini_batch_size: Number of samples evaluated per step. Calls
+                                are padded to a multiple of this size.
+        :param outputs: An optional list of layer names to output as the
+                        return value. If not given, returns all layers
+                        without children.
+        :param extra_callbacks: If given, uses additional callbacks in the
+                                evaluated model.
+        :param max_steps: Number of mini-batches served by one LBANN job.
+        :param stream_dir: Directory for streamed inputs and outputs. If not
+                           given, a temporary directory in ``/dev/shm`` is
+                           used for single-node jobs launched without a
+                           job scheduler, and in the work directory
+                           otherwise, since scheduled jobs may run on
+                           another node.
+        :param timeout: If given, maximum time in seconds to wait for the
+                        outputs of a mini-batch.
+        :param kwargs: Additional keyword arguments to pass onto
+                       ``lbann.run``
+        """
+        self.model, self.outputs = _canonicalize_model(model, outputs)
+        self.extra_callbacks = extra_callbacks or []
+        if isinstance(sample_dims, int):
+            sample_dims = (sample_dims, )
+        self.sample_size = functools.reduce(lambda x, y: x * y, sample_dims,
+                                            1)
+        self.mini_batch_size = mini_batch_size
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.fmt = 'npy' if lbann.has_feature('CNPY') else 'csv'
+
+        if 'job_name' not in kwargs:
+            kwargs['job_name'] = 'lbann_evaluate_session'
+        self.work_dir = make_timestamped_work_dir(**kwargs)
+        kwargs.pop('work_dir', None)
+        kwargs.pop('experiment_dir', None)
+        if not kwargs.get('scheduler'):
+            kwargs['scheduler'] = detect_scheduler()
+        self._kwargs = kwargs
+        self._user_stream_dir = stream_dir
+
+        self._process = None
+        self._finalizer = None
+        self.start()
+
+    def start(self) -> None:
+        """
+        Launches the LBANN job, if it is not running.
+        """
+        if self._process is not None:
+            return
+
+        # Set up stream directory
+        if self._user_stream_dir is not None:
+            self.stream_dir = os.path.realpath(self._user_stream_dir)
+            os.makedirs(self.stream_dir, exist_ok=True)
+            owns_stream_dir = False
+        else:
+            parent = self.work_dir
+            if (self._kwargs['scheduler'].lower() == 'openmpi'
+                    and self._kwargs.get('nodes', 1) == 1
+                    and os.path.isdir('/dev/shm')):
+                parent = '/dev/shm'
+            self.stream_dir = tempfile.mkdtemp(prefix='lbann_evaluate_',
+                                               dir=parent)
+            owns_stream_dir = True
+        self._output_dir = os.path.join(self.stream_dir, 'trainer0', 'model0')
+
+        # Reset fields for evaluation
+        model = self.model
+        old_epochs = model.epochs
+        old_callbacks = model.callbacks
+        old_metrics = model.metrics
+
+        try:
+            model.epochs = 0
+            model.callbacks = [
+                lbann.CallbackDumpOutputs(batch_interval=1,
+                                          execution_modes='test',
+                                          directory=self.stream_dir,
+                                          format=self.fmt,
+                                          layers=' '.join(self.outputs))
+            ] + self.extra_callbacks
+            model.metrics = []
+
+            data_reader = self._setup_data_reader()
+            trainer = lbann.Trainer(self.mini_batch_size)
+
+            # Write batch script without running it
+            kwargs = dict(self._kwargs,
+                          setup_only=True,
+                          batch_job=False,
+                          overwrite_script=True)
+            lbann.run(trainer, model, data_reader, lbann.NoOptimizer(),
+                      self.work_dir, **kwargs)
+
+        finally:
+            # Set fields back to original state
+            model.epochs = old_epochs
+            model.callbacks = old_callbacks
+            model.metrics = old_metrics
+
+        # Launch LBANN in the background
+        with open(os.path.join(self.work_dir, 'out.log'), 'ab') as out, \
+                open(os.path.join(self.work_dir, 'err.log'), 'ab') as err:
+            self._process = subprocess.Popen(
+                os.path.join(self.work_dir, 'batch.sh'),
+                stdout=out,
+                stderr=err,
+                cwd=self.work_dir,
+                start_new_session=True)
+        self._finalizer = weakref.finalize(
+            self, _shutdown_session, self._process, self.stream_dir,
+            owns_stream_dir)
+        self._step = 0
+
+    def close(self) -> None:
+        """
+        Stops the LBANN job and removes streamed files.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+        self._process = None
+        self._finalizer = None
+
+    def restart(self) -> None:
+        """
+        Relaunches the LBANN job.
+        """
+        self.close()
+        self.start()
+
+    def __enter__(self) -> 'EvaluationSession':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def evaluate(
+            self,
+            inputs: npt.NDArray) -> Union[npt.NDArray, Tuple[npt.NDArray]]:
+        """
+        Evaluates the model on the given inputs.
+
+        :param inputs: A tensor with the inputs to the model, with the
+                       mini-batch dimension first.
+        :return: Output tensor or tensors of the LBANN model.
+        """
+        inputs = _flatten_inputs(np.asarray(inputs))
+        if inputs.shape[1] != self.sample_size:
+            raise ValueError(f'Expected samples with {self.sample_size} '
+                             f'values, but got {inputs.shape[1]}')
+        num_samples = inputs.shape[0]
+        mb_size = self.mini_batch_size
+        num_steps = -(-num_samples // mb_size)
+        if num_steps > self.max_steps:
+            raise ValueError(f'{num_samples} samples need {num_steps} '
+                             f'mini-batches, but the session only serves '
+                             f'{self.max_steps} per job')
+        if self._process is None or self._step + num_steps > self.max_steps:
+            self.restart()
+
+        # Publish all mini-batches, so that LBANN can run ahead
+        first_step = self._step
+        for i in range(num_steps):
+            batch = inputs[i * mb_size:(i + 1) * mb_size]
+            if batch.shape[0] < mb_size:
+                padding = np.zeros((mb_size - batch.shape[0], batch.shape[1]),
+                                   dtype=batch.dtype)
+                batch = np.concatenate((batch, padding))
+            self._publish(first_step + i, batch)
+        self._step += num_steps
+
+        # Collect outputs
+        output_tensors = [[] for _ in self.outputs]
+        for step in range(first_step, first_step + num_steps):
+            for i, name in enumerate(self.outputs):
+                output_tensors[i].append(
+                    self._wait_for_output(step, name, inputs.dtype))
+            os.remove(stream_data_reader.input_file(self.stream_dir, step))
+        output_tensors = tuple(
+            np.concatenate(tensors)[:num_samples]
+            for tensors in output_tensors)
+
+        # Unpack tuple if single-element
+        if len(output_tensors) == 1:
+            output_tensors = output_tensors[0]
+
+        return output_tensors
+
+    def _setup_data_reader(self):
+        # The training reader is required but unused, so it does not wait
+        # for inputs
+        data_reader = lbann.reader_pb2.DataReader()
+        for role, directory in (('train', None), ('test', self.stream_dir)):
+            dataset = stream_data_reader.StreamDataset(directory,
+                                                       self.sample_size,
+                                                       self.mini_batch_size,
+                                                       self.max_steps)
+            data_reader.reader.extend([
+                construct_python_dataset_reader(
+                    dataset,
+                    dataset_path=os.path.join(self.work_dir,
+                                              f'{role}_dataset.pkl'),
+                    role=role,
+                    shuffle=False,
+                    load_module=False)
+            ])
+        return data_reader
+
+    def _publish(self, step: int, batch: npt.NDArray) -> None:
+        # Renaming makes the file appear atomically to the data reader
+        file_name = stream_data_reader.input_file(self.stream_dir, step)
+        with open(file_name + '.tmp', 'wb') as f:
+            np.save(f, batch)
+        os.replace(file_name + '.tmp', file_name)
+
+    def _wait_for_output(self, step: int, name: str,
+                         dtype: np.dtype) -> npt.NDArray:
+        file_name = os.path.join(
+            self._output_dir,
+            f'sgd.testing.epoch.0.step.{step}_{name}_output0.{self.fmt}')
+        start = time.perf_counter()
+        interval = 1e-4
+        while True:
+            output = _read_complete_output(file_name, self.fmt, dtype,
+                                           self.mini_batch_size)
+            if output is not None:
+                os.remove(file_name)
+                return output
+            if self._process.poll() is not None:
+                raise RuntimeError(
+                    f'LBANN exited with status {self._process.returncode} '
+                    f'(see logs in {self.work_dir})')
+            if (self.timeout is not None
+                    and time.perf_counter() - start > self.timeout):
+                raise TimeoutError(f'No output from layer "{name}" after '
+                                   f'{self.timeout} seconds')
+            time.sleep(interval)
+            interval = min(2 * interval, 1e-2)
+
+
+def _read_complete_output(file_name: str, fmt: str, dtype: np.dtype,
+                          num_rows: int) -> Optional[npt.NDArray]:
+    # Outputs are written in place, so check that the file is complete
+    try:
+        with open(file_name, 'rb') as f:
+            if fmt == 'csv':
+                data = f.read()
+                if data.count(b'\n') < num_rows:
+                    return None
+                return np.loadtxt(io.BytesIO(data), dtype, delimiter=',',
+                                  ndmin=2)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, _, out_dtype = header
+            size = int(np.prod(shape)) * out_dtype.itemsize
+            if os.fstat(f.fileno()).st_size < f.tell() + size:
+                return None
+            f.seek(0)
+            return np.load(f)
+    except (FileNotFoundError, ValueError, EOFError):
+        return None
+
+
+def _shutdown_session(process: subprocess.Popen, stream_dir: str,
+                      remove_stream_dir: bool) -> None:
+    # Unblock the data reader, then stop the job
+    try:
+        open(os.path.join(stream_dir, stream_data_reader.STOP_FILE),
+             'w').close()
+    except OSError:
+        pass
+    if process.poll() is None:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        except ProcessLookupError:
+            pass
+    if remove_stream_dir:
+        shutil.rmtree(stream_dir, ignore_errors=True)
@@ -5,6 +5,7 @@ from lbann.util import make_iterable
 import lbann.core.util
 
 
+@lbann.core.util.register_name_counter
 class Layer(abc.ABC):
     """Neural network tensor operation.
 
@@ -61,9 +62,19 @@ class Layer(abc.ABC):
     def export_proto(self):
         """Construct and return a protobuf message."""
         proto = layers_pb2.Layer()
-        proto.parents[:] = [l.name for l in self.parents]
-        proto.children[:] = [l.name for l in self.children]
-        proto.weights[:] = [w.name for w in self.weights]
+        self.export_proto_into(proto)
+        return proto
+
+    def export_proto_into(self, proto):
+        """Write protobuf message into an existing message.
+
+        Avoids constructing and copying an intermediate message, e.g.
+        when adding many layers to a model message.
+
+        """
+        proto.parents.extend([l.name for l in self.parents])
+        proto.children.extend([l.name for l in self.children])
+        proto.weights.extend([w.name for w in self.weights])
         proto.name = self.name
         if self.device:
             proto.device_allocation = self.device
@@ -82,7 +93,6 @@ class Layer(abc.ABC):
             lbann.core.util.set_protobuf_message(proto.parallel_strategy,
                                                  **self.parallel_strategy)
             proto.parallel_strategy.SetInParent()
-        return proto
 
     def add_parent(self, parent):
         """This layer will receive an input tensor from `parent`."""
@@ -126,6 +136,7 @@ if layers_pb2:
             'parallel_strategy']),
         base_has_export_proto = True)
     for c in classes:
+        c.__module__ = __name__
         globals()[c.__name__] = c
 
 
@@ -89,7 +89,13 @@ class Model:
         if self.summary_dir is not None:
             model.summarizer.dir = self.summary_dir
         # Add model components
-        model.layer.extend([l.export_proto() for l in self.layers])
+        # Note: Layers are written directly into the model message,
+        # unless they override export_proto
+        for l in self.layers:
+            if type(l).export_proto is lbann.core.layer.Layer.export_proto:
+                l.export_proto_into(model.layer.add())
+            else:
+                model.layer.extend([l.export_proto()])
         model.weights.extend([w.export_proto() for w in self.weights])
         model.objective_function.CopyFrom(self.objective_function.export_proto())
         model.metric.extend([m.export_proto() for m in self.metrics])
@@ -109,6 +115,30 @@ class Model:
 
         return model
 
+    def estimate(self, mini_batch_size, input_dims, default_datatype=None):
+        """Estimate memory use and compute cost without running LBANN.
+
+        See `lbann.util.cost_model.estimate_model`.
+
+        Args:
+            mini_batch_size (int): Samples per mini-batch.
+            input_dims (list of int or dict of {str: list of int}):
+                Dimensions of a sample for each data field of the
+                input layers. A single list is used for all input
+                layers.
+            default_datatype (lbann.DataType, optional): Data type of
+                layers that do not set one (default: FLOAT).
+
+        Returns:
+            lbann.util.cost_model.ModelEstimate: Per-layer output
+                dimensions, activation and weight bytes and FLOPs,
+                and the peak size of live activations.
+
+        """
+        from lbann.util.cost_model import estimate_model  # Avoid circular imports
+        return estimate_model(self, mini_batch_size, input_dims,
+                              default_datatype)
+
     def __call__(self, *args, **kwargs):
         from lbann.core.evaluate import evaluate  # Avoid circular imports
         return evaluate(self, *args, **kwargs)
@@ -39,8 +39,8 @@ def generate_operator_layer(operator_class):
         layer_kwargs['ops'] = [ operator_class(**op_kwargs) ]
         OperatorLayer.__init__(self, *args, **layer_kwargs)
 
-    def export_proto(self):
-        """Construct and return a protobuf message."""
+    def export_proto_into(self, proto):
+        """Write protobuf message into an existing message."""
 
         # Use default datatype if not specified
         if self.datatype is None:
@@ -63,11 +63,13 @@ def generate_operator_layer(operator_class):
             o.device = device
 
         # Generate Protobuf message
-        return OperatorLayer.export_proto(self)
+        OperatorLayer.export_proto_into(self, proto)
 
     # Return operator layer class
     class_name = operator_class.__name__
-    class_dict = {'__init__': __init__, 'export_proto': export_proto}
+    class_dict = {'__init__': __init__,
+                  'export_proto_into': export_proto_into,
+                  '__module__': __name__}
     return type(class_name, (OperatorLayer,), class_dict)
 
 def is_operator_class(obj):
@@ -17,4 +17,5 @@ if optimizers_pb2:
         base_class = Optimizer,
         base_has_export_proto = True)
     for c in classes:
+        c.__module__ = __name__
         globals()[c.__name__] = c
@@ -5,8 +5,9 @@ from Protobuf messages.
 
 """
 import google.protobuf.descriptor
+import google.protobuf.message
 import google.protobuf.wrappers_pb2
-from lbann import lbann_pb2, callbacks_pb2, datatype_pb2, layers_pb2, metrics_pb2, model_pb2, objective_functions_pb2, optimizers_pb2, weights_pb2
+from lbann import lbann_pb2, callbacks_pb2, datatype_pb2, layers_pb2, metrics_pb2, model_pb2, objective_functions_pb2, operators_pb2, optimizers_pb2, training_algorithm_pb2, weights_pb2
 from lbann.util import make_iterable
 
 # Each field in a Protobuf message is labeled as 'optional',
@@ -59,6 +60,83 @@ _protobuf_type_wrappers = (
     google.protobuf.wrappers_pb2.BytesValue.DESCRIPTOR
 )
 
+def _make_field_setter(field_descriptor):
+    """Make a function that sets a field in a Protobuf message.
+
+    The type of the field is resolved once, so the returned function
+    only does the work needed for that kind of field.
+
+    Args:
+        field_descriptor (google.protobuf.descriptor.FieldDescriptor):
+            Descriptor for Protobuf message field.
+
+    Returns:
+        function: Function with signature `(message, value)`.
+
+    """
+    field_name = field_descriptor.name
+    FieldDescriptor = google.protobuf.descriptor.FieldDescriptor
+
+    if field_descriptor.message_type in _protobuf_type_wrappers:
+        def set_field(message, value):
+            field = getattr(message, field_name)
+            field.SetInParent()
+            field.value = value
+
+    elif field_descriptor.label == FieldDescriptor.LABEL_REPEATED:
+        if field_descriptor.type == FieldDescriptor.TYPE_MESSAGE:
+            def set_field(message, value):
+                getattr(message, field_name).extend(
+                    [x.export_proto() for x in make_iterable(value)])
+        else:
+            def set_field(message, value):
+                field = getattr(message, field_name)
+                try:
+                    field.extend(make_iterable(value))
+                except TypeError:
+                    if (type(value).__module__ == 'numpy' and type(value).__name__ == 'nditer'):
+                        value.reset()
+                        for v in value:
+                            field.append(float(v))
+                    else:
+                        raise
+
+    elif field_descriptor.type == FieldDescriptor.TYPE_MESSAGE:
+        def set_field(message, value):
+            if not isinstance(value, google.protobuf.message.Message):
+                # 'value' is (hopefully) an LBANN class
+                # representation of a protobuf message.
+                value = value.export_proto()
+            getattr(message, field_name).MergeFrom(value)
+
+    else:
+        def set_field(message, value):
+            setattr(message, field_name, value)
+
+    return set_field
+
+# Field setters for each Protobuf message type, built on first use
+_export_plans = {}
+
+def _get_export_plan(message_descriptor):
+    """Field setters for a Protobuf message type.
+
+    Args:
+        message_descriptor (google.protobuf.descriptor.Descriptor):
+            Descriptor for Protobuf message.
+
+    Returns:
+        dict of {str: function}: Setter function for each field (see
+            `_make_field_setter`).
+
+    """
+    plan = _export_plans.get(message_descriptor.full_name)
+    if plan is None:
+        plan = {field.name: _make_field_setter(field)
+                for field in message_descriptor.fields}
+        _export_plans[message_descriptor.full_name] = plan
+    return plan
+
 def _generate_class(message_descriptor,
                     base_field_name,
                     base_class,
@@ -89,6 +167,10 @@ def _generate_class(message_descriptor,
     message_name = message_descriptor.name
     field_descriptors = message_descriptor.fields_by_name
     field_names = field_descriptors.keys()
+
+    # Precompute how each field is exported
+    export_plan = tuple(_get_export_plan(message_descriptor).items())
+    proto_type = None
     enums = message_descriptor.enum_types_by_name
         # Handle "enum" type data.
     all_enums = {}
@@ -137,8 +219,22 @@ def _generate_class(message_descriptor,
         for arg in field_names:
             setattr(self, arg, kwargs.get(arg, None))
 
+    def set_fields(self, message):
+        """Set fields of generated class in a protobuf message."""
+        for field_name, set_field in export_plan:
+            val = getattr(self, field_name, None)
+            if val is not None:
+                try:
+                    set_field(message, val)
+                except Exception:
+                    raise TypeError(
+                        f'Attempted to set field "{field_name}" in '
+                        f'Protobuf message {message_name} '
+                        f'with a {type(val).__name__}')
+
     def export_proto(self):
         """Construct and return a protobuf message."""
+        nonlocal proto_type
 
         # Construct Protobuf message
         if base_has_export_proto:
@@ -153,24 +249,26 @@ def _generate_class(message_descriptor,
             # elsewhere. But this code either works or doesn't get
             # executed now, so I vote delaying this fix until a need
             # arises.
-            proto_modules = [callbacks_pb2, layers_pb2, metrics_pb2, model_pb2, objective_functions_pb2, operators_pb2, optimizers_pb2, training_algorithm_pb2, weights_pb2]
-            proto_type = None
-            while proto_type is None:
-                proto_type = getattr(proto_modules.pop(), message_name, None)
+            if proto_type is None:
+                proto_modules = [callbacks_pb2, layers_pb2, metrics_pb2, model_pb2, objective_functions_pb2, operators_pb2, optimizers_pb2, training_algorithm_pb2, weights_pb2]
+                while proto_type is None:
+                    proto_type = getattr(proto_modules.pop(), message_name, None)
             proto = proto_type()
             message = proto
 
         # Set message
-        kwargs = {}
-        for field_name in field_names:
-            val = getattr(self, field_name, None)
-            if val is not None:
-                kwargs[field_name] = val
-        set_protobuf_message(message, **kwargs)
+        set_fields(self, message)
 
         # Return Protobuf message
         return proto
 
+    def export_proto_into(self, proto):
+        """Write protobuf message into an existing message."""
+        base_class.export_proto_into(self, proto)
+        message = getattr(proto, base_field_name)
+        message.SetInParent()
+        set_fields(self, message)
+
     def get_field_names(self):
         """Names of parameters in derived class."""
         return field_names
@@ -187,10 +285,16 @@ def _generate_class(message_descriptor,
         doc = 'Fields: none\n'
 
     # Create new class
+    # Note: If the base class can write into an existing message (see
+    # `Layer.export_proto_into`), the generated class extends that
+    # instead of overriding `export_proto`.
     class_dictionary = {'__init__': __init__,
                         '__doc__': doc,
-                        'export_proto': export_proto,
                         'get_field_names': get_field_names}
+    if base_has_export_proto and hasattr(base_class, 'export_proto_into'):
+        class_dictionary['export_proto_into'] = export_proto_into
+    else:
+        class_dictionary['export_proto'] = export_proto
     class_dictionary.update(all_enums)
 
     return type(message_name, (base_class,), class_dictionary)
@@ -234,13 +338,14 @@ def generate_classes_from_protobuf_message(message,
 
 def set_protobuf_message(message, **kwargs):
 
-    field_descriptors = message.DESCRIPTOR.fields_by_name
+    export_plan = _get_export_plan(message.DESCRIPTOR)
 
     # Iterate through kwargs
     for field_name, value in kwargs.items():
 
         # Make sure kwarg corresponds to field in message
-        if field_name not in field_descriptors:
+        set_field = export_plan.get(field_name)
+        if set_field is None:
             raise KeyError(
                 f'Protobuf message {message.DESCRIPTOR.name} '
                 f'has no field "{field_name}"')
@@ -251,34 +356,8 @@ def set_protobuf_message(message, **kwargs):
 
         # Attempt to set field
         try:
-            field = getattr(message, field_name)
-            field_descriptor = field_descriptors[field_name]
-            if field_descriptor.message_type in _protobuf_type_wrappers:
-                field.SetInParent()
-                field.value = value
-            elif field_descriptor.label == google.protobuf.descriptor.FieldDescriptor.LABEL_REPEATED:
-                try:
-                    iterable_value = make_iterable(value)
-                    if field_descriptor.type == field_descriptor.TYPE_MESSAGE:
-                        field.extend([x.export_proto() for x in iterable_value])
-                    else:
-                        field.extend(iterable_value)
-                except TypeError:
-                    if (type(value).__module__ == 'numpy' and type(value).__name__ == 'nditer'):
-                        value.reset()
-                        for v in value:
-                            field.append(float(v))
-                    else:
-                        raise
-            elif isinstance(value, google.protobuf.message.Message):
-                getattr(message, field_name).MergeFrom(value)
-            elif callable(getattr(value, "export_proto", None)):
-                # 'value' is (hopefully) an LBANN class
-                # representation of a protobuf message.
-                getattr(message, field_name).MergeFrom(value.export_proto())
-            else:
-                setattr(message, field_name, value)
-        except:
+            set_field(message, value)
+        except Exception:
             raise TypeError(
                 f'Attempted to set field "{field_name}" in '
                 f'Protobuf message {message.DESCRIPTOR.name} '
@@ -310,3 +389,49 @@ def get_parallel_strategy_args(**kwargs):
             if group_name in kwargs.keys() else 1
 
     return parallel_strategy
+
+# Classes with a static ``global_count`` attribute, used to generate
+# default object names (e.g. "layer3")
+_name_counter_classes = []
+
+def register_name_counter(cls):
+    """Register the default name counter of a class.
+
+    The class must have an integer ``global_count`` attribute. Can be
+    used as a class decorator.
+
+    """
+    if cls not in _name_counter_classes:
+        _name_counter_classes.append(cls)
+    return cls
+
+def name_counters():
+    """Current values of the counters used for default names.
+
+    Returns:
+        dict of {type: int}: Value of ``global_count`` for each
+            registered class.
+
+    """
+    return {cls: cls.global_count for cls in _name_counter_classes}
+
+def reset_name_counters(counters=None):
+    """Reset the counters used for default names.
+
+    Objects constructed after a reset get the same default names as
+    objects constructed after the counters had the given values, e.g.
+    so that identical experiments are exported identically. Objects
+    constructed before the reset should not be combined with objects
+    constructed after it, since their names may collide.
+
+    Args:
+        counters (dict of {type: int}, optional): Values from
+            `name_counters`. Classes that are missing, e.g. since
+            they were registered later, are reset to zero. All
+            counters are reset to zero by default.
+
+    """
+    if counters is None:
+        counters = {}
+    for cls in _name_counter_classes:
+        cls.global_count = counters.get(cls, 0)
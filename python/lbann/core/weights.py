@@ -22,6 +22,7 @@ if weights_pb2:
         base_class = Initializer,
         base_has_export_proto = True)
     for c in classes:
+        c.__module__ = __name__
         globals()[c.__name__] = c
 
 
@@ -31,6 +32,7 @@ class ShardingStrategy(Enum):
         GRID_COLS = 2 # Sharded across the process grid columns (STAR x MR)
 
 
+@lbann.core.util.register_name_counter
 class Weights:
     """Trainable parameters for neural network."""
 
@@ -77,8 +77,11 @@ def run(
     nvprof=False,
     nvprof_output_name=None,
     binary_protobuf=False,
+    external_weights_threshold=None,
+    experiment_cache=None,
     experiment_dir=None,
     profiler_cmd=None,
+    optimize_graph=False,
 ):
     """Run LBANN.
 
@@ -131,7 +134,26 @@ def run(
             (see https://docs.nvidia.com/cuda/profiler-users-guide/).
         binary_protobuf (bool, optional): If true, saves experiment description
             as a binary file. Otherwise, saves as prototext.
+        external_weights_threshold (int, optional): If set, weights
+            initialized with more values than this are saved as NumPy
+            files in the work directory instead of inside the
+            experiment description (see
+            `lbann.proto.save_prototext`).
+        experiment_cache (str or lbann.proto.ExperimentCache,
+            optional): Cache, or cache directory, for experiment
+            files. If set, the experiment is saved as a binary file
+            assembled from cached components, which are only
+            serialized when they change (see
+            `lbann.proto.ExperimentCache`). Experiments that are
+            rebuilt between runs are only identical if the default
+            name counters are reset before building them (see
+            `lbann.core.util.reset_name_counters`). The file name
+            should contain 'protobin'.
         experiment_dir (str, optional, deprecated): See `work_dir`.
+        optimize_graph (bool, optional): If true, the model's layer
+            graph is simplified in place before it is saved, e.g. by
+            folding constants and fusing operator layers (see
+            `lbann.util.graph_optimization.optimize_graph`).
 
     Returns:
         int: Exit status.
@@ -171,15 +193,29 @@ def run(
     # Set default file name and extension
     if proto_file_name is None:
         proto_file_name = ('experiment.protobin'
-                           if binary_protobuf else 'experiment.prototext')
+                           if binary_protobuf or experiment_cache is not None
+                           else 'experiment.prototext')
     proto_file = os.path.join(script.work_dir, proto_file_name)
 
-    lbann.proto.save_prototext(proto_file,
-                               binary=binary_protobuf,
-                               trainer=trainer,
-                               model=model,
-                               data_reader=data_reader,
-                               optimizer=optimizer)
+    if optimize_graph:
+        from lbann.util import graph_optimization
+        graph_optimization.optimize_graph(model)
+    if experiment_cache is not None:
+        cache = lbann.proto.ExperimentCache.get(experiment_cache)
+        cache.save(proto_file,
+                   external_weights_threshold=external_weights_threshold,
+                   trainer=trainer,
+                   model=model,
+                   data_reader=data_reader,
+                   optimizer=optimizer)
+    else:
+        lbann.proto.save_prototext(proto_file,
+                                   binary=binary_protobuf,
+                                   external_weights_threshold=external_weights_threshold,
+                                   trainer=trainer,
+                                   model=model,
+                                   data_reader=data_reader,
+                                   optimizer=optimizer)
     lbann_command.append('--prototext={}'.format(proto_file))
     if procs_per_trainer is not None:
         lbann_command.append(f'--procs_per_trainer={procs_per_trainer}')
@@ -202,6 +238,39 @@ def run(
     return status
 
 
+def detect_scheduler():
+    """Detect the job scheduler on the system.
+
+    Returns:
+        str: 'slurm', 'lsf' or 'flux' if the scheduler's commands are
+            found. Falls back to 'openmpi', which launches on the
+            current node.
+
+    """
+    try:
+        subprocess.call(['sbatch', '--version'],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+        return 'slurm'
+    except:
+        pass
+    try:
+        subprocess.call(['bsub', '-V'],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+        return 'lsf'
+    except:
+        pass
+    try:
+        subprocess.call(['flux', '-V'],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+        print('I have found a flux scheduler')
+        return 'flux'
+    except:
+        pass
+    return 'openmpi'
+
 def make_batch_script(script_file=None,
                       work_dir=None,
                       nodes=1,
@@ -255,34 +324,8 @@ def make_batch_script(script_file=None,
     """
 
     # Try detecting job scheduler if not provided
-    # Note: Fallback to OpenMPI launcher
-    if not scheduler:
-        try:
-            subprocess.call(['sbatch', '--version'],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL)
-            scheduler = 'slurm'
-        except:
-            pass
-    if not scheduler:
-        try:
-            subprocess.call(['bsub', '-V'],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL)
-            scheduler = 'lsf'
-        except:
-            pass
-    if not scheduler:
-        try:
-            subprocess.call(['flux', '-V'],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL)
-            scheduler = 'flux'
-            print('I have found a flux scheduler')
-        except:
-            pass
     if not scheduler:
-        scheduler = 'openmpi'
+        scheduler = detect_scheduler()
 
     # Create work directory if not provided
     work_dir = make_timestamped_work_dir(work_dir=work_dir,
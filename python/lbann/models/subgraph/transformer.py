@@ -1284,7 +1284,7 @@ class TransformerAllSubgraph(lbann.modules.Module):
         if size not in self._subsequent_mask_cache:
             vals = np.triu(np.full((size, size), -1e9), k=1)
             weights = lbann.Weights(
-                initializer=lbann.ValueInitializer(values=vals.flat),
+                initializer=lbann.ValueInitializer(values=vals.ravel()),
                 optimizer=lbann.NoOptimizer(),
                 name=f"{self.name}_mask{size}_weights",
             )
@@ -600,7 +600,7 @@ class Transformer(lbann.modules.Module):
                 vals = np.tile(vals, (self.num_heads, 1, 1))
 
             weights = lbann.Weights(
-                initializer=lbann.ValueInitializer(values=vals.flat),
+                initializer=lbann.ValueInitializer(values=vals.ravel()),
                 optimizer=lbann.NoOptimizer(),
                 name=f'{self.name}_mask{size}_weights',
             )
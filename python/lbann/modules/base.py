@@ -17,6 +17,13 @@ class Module(abc.ABC):
 
     """
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Register static counter used for default names
+        if isinstance(cls.__dict__.get('global_count'), int):
+            lbann.core.util.register_name_counter(cls)
+
     def forward(self, *args, **kwargs):
         """Apply module pattern.
 
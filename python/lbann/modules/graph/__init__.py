@@ -6,5 +6,6 @@ convolutional networks.
 # import from sub modules
 
 from lbann.modules.graph.utils import GraphExpand, GraphReduce
+from lbann.modules.graph.packed import PackedGraphParser, GraphPool
 from lbann.modules.graph.dense import DenseGCNConv, DenseGraphConv, DenseNNConv
 from lbann.modules.graph.sparse import GCNConv, GINConv, GraphConv, GatedGraphConv, NNConv
\ No newline at end of file
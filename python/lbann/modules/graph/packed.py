@@ -0,0 +1,245 @@
+"""Packed minibatches of variable-size graphs.
+
+Several graphs are concatenated into one disjoint-union graph per
+sample, so padding is only needed at the end of each pack instead of
+for every graph. A packed sample is a flat vector with the fields
+
+    node_features   (max_nodes * node_feature_size)
+    source_indices  (max_edges)
+    target_indices  (max_edges)
+    graph_indices   (max_nodes)
+    targets         (max_graphs * num_classes)
+
+Node indices in the edge lists are relative to the first node of the
+pack, and the graph index of each node is relative to the first graph
+of the pack. Padded edges and nodes have index -1, which `GraphExpand`
+and `GraphReduce` ignore, and padded graphs have zero targets.
+
+Graphs are stored as contiguous arrays with offsets: node features of
+all graphs concatenated, edge lists with int32 node indices numbered
+across the whole dataset, and int64 node and edge offsets of each
+graph. `pack_graphs` groups consecutive graphs into packs and
+`make_packed_sample` builds a packed sample without per-graph loops.
+"""
+from itertools import accumulate
+
+import numpy as np
+
+import lbann
+from lbann.modules.graph.utils import GraphReduce
+
+
+def packed_sample_size(max_nodes,
+                       node_feature_size,
+                       max_edges,
+                       max_graphs,
+                       num_classes=1):
+    """Size of a packed sample
+
+       Args:
+            max_nodes (int): Maximum number of nodes in a pack
+            node_feature_size (int): The dimensionality of the node features
+            max_edges (int): Maximum number of edges in a pack
+            max_graphs (int): Maximum number of graphs in a pack
+            num_classes (int): The number of classes in the target or 1 for
+                               regression (default: 1)
+       returns: (int) number of entries in a packed sample
+    """
+    return _slice_points(max_nodes, node_feature_size, max_edges,
+                         max_graphs, num_classes)[-1]
+
+
+def _slice_points(max_nodes, node_feature_size, max_edges, max_graphs,
+                  num_classes):
+    """Offsets of the fields in a packed sample"""
+    return list(accumulate([0,
+                            max_nodes * node_feature_size,
+                            max_edges,
+                            max_edges,
+                            max_nodes,
+                            max_graphs * num_classes]))
+
+
+def pack_graphs(node_offsets, edge_offsets, max_nodes, max_edges, max_graphs):
+    """Groups consecutive graphs into packs that fit the capacities.
+
+       Packs are filled greedily in dataset order, so pack i holds graphs
+       pack_offsets[i] to pack_offsets[i+1].
+
+       Args:
+            node_offsets (array): Offsets of the nodes of each graph, with
+                                  length num_graphs + 1
+            edge_offsets (array): Offsets of the edges of each graph, with
+                                  length num_graphs + 1
+            max_nodes (int): Maximum number of nodes in a pack
+            max_edges (int): Maximum number of edges in a pack
+            max_graphs (int): Maximum number of graphs in a pack
+       returns: (array) int64 offsets of the first graph of each pack, with
+                length num_packs + 1
+    """
+    node_counts = np.diff(node_offsets)
+    edge_counts = np.diff(edge_offsets)
+    too_large = np.flatnonzero((node_counts > max_nodes) |
+                               (edge_counts > max_edges))
+    if too_large.size:
+        graph = too_large[0]
+        raise ValueError(f"graph {graph} has {node_counts[graph]} nodes and "
+                         f"{edge_counts[graph]} edges, which exceeds the pack "
+                         f"capacity of {max_nodes} nodes and {max_edges} edges")
+
+    pack_offsets = [0]
+    nodes = edges = 0
+    for graph, (n, e) in enumerate(zip(node_counts, edge_counts)):
+        if (graph - pack_offsets[-1] == max_graphs or
+                nodes + n > max_nodes or edges + e > max_edges):
+            pack_offsets.append(graph)
+            nodes = edges = 0
+        nodes += n
+        edges += e
+    pack_offsets.append(len(node_counts))
+    return np.array(pack_offsets, dtype=np.int64)
+
+
+def make_packed_sample(node_features,
+                       source_indices,
+                       target_indices,
+                       targets,
+                       node_offsets,
+                       edge_offsets,
+                       first_graph,
+                       last_graph,
+                       max_nodes,
+                       max_edges,
+                       max_graphs,
+                       dtype=np.float32):
+    """Builds a packed sample from graphs first_graph to last_graph
+
+       Args:
+            node_features (array): Node features of all graphs with shape
+                                   (total_nodes, node_feature_size)
+            source_indices (array): Source node of all edges with shape
+                                    (total_edges), numbered across graphs
+            target_indices (array): Target node of all edges with shape
+                                    (total_edges), numbered across graphs
+            targets (array): Targets of all graphs with shape
+                             (num_graphs, num_classes)
+            node_offsets (array): Offsets of the nodes of each graph
+            edge_offsets (array): Offsets of the edges of each graph
+            first_graph (int): Index of the first graph in the pack
+            last_graph (int): One past the index of the last graph in the pack
+            max_nodes (int): Maximum number of nodes in a pack
+            max_edges (int): Maximum number of edges in a pack
+            max_graphs (int): Maximum number of graphs in a pack
+            dtype (numpy.dtype): Type of the sample (default: float32)
+       returns: (array) packed sample of size `packed_sample_size`
+    """
+    node_begin, node_end = node_offsets[first_graph], node_offsets[last_graph]
+    edge_begin, edge_end = edge_offsets[first_graph], edge_offsets[last_graph]
+    num_nodes = node_end - node_begin
+    num_edges = edge_end - edge_begin
+    num_graphs = last_graph - first_graph
+    node_feature_size = node_features.shape[1]
+    num_classes = targets.shape[1]
+
+    slice_points = _slice_points(max_nodes, node_feature_size, max_edges,
+                                 max_graphs, num_classes)
+    sample = np.empty(slice_points[-1], dtype=dtype)
+    x, s, t, g, y = np.split(sample, slice_points[1:-1])
+    x = x.reshape(max_nodes, node_feature_size)
+    y = y.reshape(max_graphs, num_classes)
+
+    x[:num_nodes] = node_features[node_begin:node_end]
+    x[num_nodes:] = 0
+    s[:num_edges] = source_indices[edge_begin:edge_end] - node_begin
+    t[:num_edges] = target_indices[edge_begin:edge_end] - node_begin
+    s[num_edges:] = -1
+    t[num_edges:] = -1
+    g[:num_nodes] = np.repeat(
+        np.arange(num_graphs, dtype=np.int32),
+        np.diff(node_offsets[first_graph:last_graph + 1]))
+    g[num_nodes:] = -1
+    y[:num_graphs] = targets[first_graph:last_graph]
+    y[num_graphs:] = 0
+    return sample
+
+
+def PackedGraphParser(_lbann_input_,
+                      max_nodes,
+                      node_feature_size,
+                      max_edges,
+                      max_graphs,
+                      num_classes=1,
+                      name="Packed_Graph"):
+    """Slices a packed sample of several graphs into its fields
+
+       Args:
+            _lbann_input_ (Layer): The input layer of the LBANN model
+            max_nodes (int): Maximum number of nodes in a pack
+            node_feature_size (int): The dimensionality of the node features
+            max_edges (int): Maximum number of edges in a pack
+            max_graphs (int): Maximum number of graphs in a pack
+            num_classes (int): The number of classes in the target or 1 for
+                               regression (default: 1)
+            name (str): Prefix of the layer names (default: Packed_Graph)
+       returns: (dictionary) Returns a dictionary with the keys: node_features,
+                source_indices, target_indices, graph_indices, and target.
+                The target has shape (max_graphs, num_classes)
+    """
+    slice_points = _slice_points(max_nodes, node_feature_size, max_edges,
+                                 max_graphs, num_classes)
+    sliced_input = lbann.Slice(_lbann_input_,
+                               slice_points=slice_points,
+                               name=f"{name}_Input")
+    node_features = lbann.Reshape(lbann.Identity(sliced_input),
+                                  dims=[max_nodes, node_feature_size],
+                                  name=f"{name}_Node_Features")
+    source_indices = lbann.Identity(sliced_input,
+                                    name=f"{name}_Source_Indices")
+    target_indices = lbann.Identity(sliced_input,
+                                    name=f"{name}_Target_Indices")
+    graph_indices = lbann.Identity(sliced_input,
+                                   name=f"{name}_Graph_Indices")
+    targets = lbann.Reshape(lbann.Identity(sliced_input),
+                            dims=[max_graphs, num_classes],
+                            name=f"{name}_Targets")
+
+    return {"node_features": node_features,
+            "source_indices": source_indices,
+            "target_indices": target_indices,
+            "graph_indices": graph_indices,
+            "target": targets}
+
+
+def GraphPool(features, graph_indices, dims, mean=True, name=None):
+    """Reduces node features of packed graphs to one vector per graph
+
+       output[graph_indices[i]] += features[i]
+
+       Args:
+            features (Layer): 2D matrix with shape (max_nodes, F)
+            graph_indices (Layer): 1D matrix with shape (max_nodes)
+            dims (list of int): tuple of ints with the values (max_graphs, F)
+            mean (bool): Whether to average instead of sum (default: True)
+            name (str): Default name of the layer is graph_pool_{number}
+       returns: (Layer) of shape (max_graphs, F)
+    """
+    GraphPool.count += 1
+    if (name is None):
+        name = f"graph_pool_{GraphPool.count}"
+    pooled = GraphReduce(features, graph_indices, dims, name=f"{name}_sum")
+    if not mean:
+        return pooled
+
+    # Number of nodes in each graph, ignoring padded nodes
+    max_graphs, num_features = dims
+    is_node = lbann.GreaterEqualConstant(graph_indices, constant=0,
+                                         name=f"{name}_is_node")
+    counts = lbann.Scatter(is_node, graph_indices, dims=[max_graphs],
+                           name=f"{name}_counts")
+    counts = lbann.Tessellate(lbann.Reshape(counts, dims=[max_graphs, 1]),
+                              dims=dims,
+                              name=f"{name}_tiled_counts")
+    return lbann.SafeDivide(pooled, counts, name=name)
+
+
+GraphPool.count = 0
@@ -57,7 +57,7 @@ def _make_constant_from_array(array, name=None) -> lbann.WeightsLayer:
         weights_name = None
 
     w = lbann.Weights(
-        initializer=lbann.ValueInitializer(values=array.flat),
+        initializer=lbann.ValueInitializer(values=array.ravel()),
         optimizer=lbann.NoOptimizer(),
         name=weights_name,
     )
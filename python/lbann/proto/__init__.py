@@ -1 +1,2 @@
 from .serialize import *
+from .cache import ExperimentCache
@@ -0,0 +1,356 @@
+"""Content-addressed cache of serialized experiment files."""
+
+import copy
+import hashlib
+import os
+import shutil
+import google.protobuf.message
+import numpy as np
+from lbann import lbann_pb2, model_pb2, NoOptimizer
+from lbann.core.layer import Layer
+from lbann.core.model import Model
+from lbann.core.weights import Weights
+from lbann.proto.serialize import (_external_weights_values,
+                                   _layer_weights_shapes, _weights_shapes)
+
+_layer_field_number = model_pb2.Model.DESCRIPTOR.fields_by_name['layer'].number
+_weights_field_number = model_pb2.Model.DESCRIPTOR.fields_by_name['weights'].number
+
+
+def _encode_varint(value):
+    """Encode an unsigned integer as a Protobuf varint."""
+    data = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def _encode_bytes_field(field_number, data):
+    """Encode a serialized message or string as a field of a message."""
+    tag = (field_number << 3) | 2  # Length-delimited wire type
+    return _encode_varint(tag) + _encode_varint(len(data)) + data
+
+
+def _save_array(file, array):
+    with open(file, 'wb') as f:
+        np.save(f, array)
+
+
+def _save_experiment(file, components):
+    """Write serialized experiment parts as an ``LbannPB`` message."""
+    with open(file, 'wb') as f:
+        for field_number, parts in components:
+            f.write(_encode_bytes_field(field_number,
+                                        b''.join(data for data, _ in parts)))
+
+
+def _is_component(value):
+    """Whether a value is an LBANN object exported as part of its owner.
+
+    Layers and weights referenced by other objects are exported by
+    name, so they are not components of their owner.
+
+    """
+    return (hasattr(value, 'export_proto') and hasattr(value, '__dict__')
+            and not isinstance(value, (Layer, Weights)))
+
+
+def _copy_state(value, components):
+    """Copy the containers in an attribute value.
+
+    LBANN objects found in the value are appended to `components`.
+    Other values are not copied.
+
+    """
+    value_type = type(value)
+    if value_type is list:
+        return [_copy_state(v, components) for v in value]
+    if value_type is tuple:
+        return tuple([_copy_state(v, components) for v in value])
+    if value_type is dict:
+        return {k: _copy_state(v, components) for k, v in value.items()}
+    if _is_component(value):
+        components.append(value)
+    return value
+
+
+def _snapshot(obj):
+    """Copies of the attributes of an object and of its components.
+
+    Attribute values are compared with the copies by identity first,
+    so checking an unchanged object does not depend on the size of its
+    values (see `_unchanged`).
+
+    """
+    snapshot = []
+    pending = [obj]
+    seen = set()
+    while pending:
+        o = pending.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        components = []
+        state = _copy_state(vars(o), components)
+        snapshot.append((None if o is obj else o, state))
+        pending.extend(components)
+    return snapshot
+
+
+def _unchanged(obj, snapshot):
+    """Whether an object and its components match a snapshot."""
+    try:
+        return all(vars(obj if o is None else o) == state
+                   for o, state in snapshot)
+    except ValueError:
+        # Comparing different NumPy arrays is ambiguous
+        return False
+
+
+class ExperimentCache:
+    """Content-addressed cache of experiment files.
+
+    Experiments are split into parts (the `trainer`, `data_reader`
+    and `optimizer`, and each layer and weights of the `model` along
+    with the remaining model fields), which are serialized to binary
+    Protobuf separately. Experiment files are assembled by
+    concatenating the serialized parts, which is a valid serialization
+    of the full ``LbannPB`` message, and are stored under a SHA-256
+    hash of the parts.
+
+    Serialized parts of the last saved experiment are kept in memory,
+    along with the Python objects they were exported from and copies
+    of their attributes. Saving the same objects again, e.g. in a
+    hyperparameter sweep where only the optimizer changes, therefore
+    only exports, serializes and hashes the objects whose attributes
+    changed, and an identical experiment is not written again.
+    Attribute values are compared by identity first, so NumPy arrays
+    and other values that are not containers should be replaced
+    rather than modified in place, and layers and weights should not
+    be renamed once referenced by other objects. Experiments that are
+    rebuilt from scratch are exported again, but their files are only
+    stored once.
+
+    Default names of layers and weights are part of the experiment, so
+    an experiment that is rebuilt from scratch is only identical to
+    the previous one if the name counters are reset in between (see
+    `lbann.core.util.reset_name_counters`).
+
+    Experiment files are hard-linked from the cache into place when
+    possible, so they should not be modified after saving.
+
+    Args:
+        directory (str): Cache directory.
+
+    """
+
+    # Caches opened with `get`, indexed by directory
+    _caches = {}
+
+    @classmethod
+    def get(cls, cache):
+        """Get an experiment cache from a cache or its directory.
+
+        Caches are shared between calls with the same directory, so
+        that serialized parts are reused.
+
+        """
+        if isinstance(cache, cls):
+            return cache
+        directory = os.path.realpath(cache)
+        if directory not in cls._caches:
+            cls._caches[directory] = cls(directory)
+        return cls._caches[directory]
+
+    def __init__(self, directory):
+        self.directory = os.path.realpath(directory)
+        self.objects_dir = os.path.join(self.directory, 'objects')
+        self.weights_dir = os.path.join(self.directory, 'weights')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._parts = {}
+        self._used_parts = {}
+        self._layer_shapes = {}
+
+    def _object_file(self, key, suffix='.protobin'):
+        return os.path.join(self.objects_dir, key[:2], key + suffix)
+
+    def _write(self, file, write, *args):
+        """Write a file atomically with ``write(file, *args)``, unless it
+        already exists."""
+        if not os.path.exists(file):
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            tmp_file = f'{file}.{os.getpid()}.tmp'
+            write(tmp_file, *args)
+            os.replace(tmp_file, file)
+
+    def _part(self, kind, obj, export, *args):
+        """Serialized part of an experiment and its SHA-256 digest.
+
+        Parts are exported with ``export(obj, *args)``. They are reused
+        if ``obj`` was exported with the same ``args`` in the last
+        saved experiment and its attributes did not change since.
+
+        """
+        key = (kind, id(obj))
+        entry = self._parts.get(key)
+        if (entry is None or entry[0] is not obj or entry[1] != args
+                or not _unchanged(obj, entry[2])):
+            data = export(obj, *args)
+            part = (data, hashlib.sha256(data).digest())
+
+            # Note: Exporting may fill in defaults (e.g. data types of
+            # operator layers), so the snapshot is taken afterwards.
+            entry = (obj, args, _snapshot(obj), part)
+        self._used_parts[key] = entry
+        return entry[3]
+
+    def _externalize(self, weights, threshold, shape):
+        """Move large weight values to a NumPy file in the cache.
+
+        NumPy files are named after the hash of their contents, so
+        identical values are only written once.
+
+        """
+        array = _external_weights_values(weights, threshold, shape)
+        if array is None:
+            return
+        key = hashlib.sha256(array.dtype.str.encode()
+                             + array.tobytes()).hexdigest()
+        file = os.path.join(self.weights_dir, key[:2], key + '.npy')
+        self._write(file, _save_array, array)
+        weights.initializer.numpy_initializer.file = file
+
+    def _export_message(self, obj):
+        return obj.export_proto().SerializeToString(deterministic=True)
+
+    def _export_model(self, model):
+        shell = copy.copy(model)
+        shell.layers = []
+        shell.weights = []
+        return self._export_message(shell)
+
+    def _export_layer(self, layer):
+        message = layer.export_proto()
+        data = _encode_bytes_field(
+            _layer_field_number,
+            message.SerializeToString(deterministic=True))
+        self._layer_shapes[data] = _layer_weights_shapes(message)
+        return data
+
+    def _export_weights(self, weights, threshold, shape):
+        message = weights.export_proto()
+        if threshold is not None:
+            self._externalize(message, threshold, shape)
+        data = message.SerializeToString(deterministic=True)
+        return _encode_bytes_field(_weights_field_number, data)
+
+    def _model_parts(self, model, external_weights_threshold):
+        """Serialized parts of a model.
+
+        The model fields other than layers and weights form the first
+        part, followed by a part per layer and per weights. Weights are
+        ordered by name, so that the serialization does not depend on
+        set order. Weights matrix shapes are taken from the exported
+        layers, since externalized values are saved in that shape.
+
+        """
+        parts = [self._part('model', model, self._export_model)]
+        layer_parts = [
+            self._part('layer', l, self._export_layer) for l in model.layers
+        ]
+        parts.extend(layer_parts)
+        shapes = {}
+        if external_weights_threshold is not None:
+            shapes = _weights_shapes(
+                self._layer_shapes[data] for data, _ in layer_parts)
+        for w in sorted(model.weights, key=lambda w: w.name):
+            parts.append(self._part('weights', w, self._export_weights,
+                                    external_weights_threshold,
+                                    shapes.get(w.name)))
+        return parts
+
+    def save(self, filename, external_weights_threshold=None, **kwargs):
+        """Save a binary experiment file through the cache.
+
+        LbannPB fields (e.g. `model`, `data_reader`, `optimizer`) are
+        accepted via `kwargs`, as in `lbann.proto.save_prototext`.
+
+        Args:
+            filename (str): Experiment file. LBANN reads it as binary
+                Protobuf if the name contains 'protobin'.
+            external_weights_threshold (int, optional): Move model
+                weights with more values than this to NumPy files in
+                the cache (see `lbann.proto.externalize_weights`).
+
+        Returns:
+            str: Hash of the experiment file.
+
+        """
+        field_descriptors = lbann_pb2.LbannPB.DESCRIPTOR.fields_by_name
+
+        # Make sure keyword arguments are valid
+        for key in kwargs:
+            if key not in field_descriptors:
+                raise TypeError("'{}' is an invalid keyword "
+                                "argument for this function".format(key))
+
+        # Make sure default optimizer is set
+        if kwargs.get('optimizer') is None:
+            kwargs['optimizer'] = NoOptimizer()
+
+        # Serialize components in field order
+        self._used_parts = {}
+        components = []
+        for field in lbann_pb2.LbannPB.DESCRIPTOR.fields:
+            val = kwargs.get(field.name)
+            if val is None:
+                continue
+            if isinstance(val, google.protobuf.message.Message):
+                if (field.name == 'model'
+                        and external_weights_threshold is not None):
+                    message = type(val)()
+                    message.CopyFrom(val)
+                    shapes = _weights_shapes(
+                        _layer_weights_shapes(l) for l in message.layer)
+                    for w in message.weights:
+                        self._externalize(w, external_weights_threshold,
+                                          shapes.get(w.name))
+                    val = message
+                data = val.SerializeToString(deterministic=True)
+                parts = [(data, hashlib.sha256(data).digest())]
+            elif isinstance(val, Model):
+                parts = self._model_parts(val, external_weights_threshold)
+            else:
+                parts = [self._part(field.name, val, self._export_message)]
+            components.append((field.number, parts))
+
+        # Only keep the parts of this experiment in memory
+        self._parts, self._used_parts = self._used_parts, {}
+        self._layer_shapes = {
+            entry[3][0]: self._layer_shapes[entry[3][0]]
+            for (kind, _), entry in self._parts.items() if kind == 'layer'
+        }
+
+        # Hash experiment from the digests of its parts
+        experiment_hash = hashlib.sha256()
+        for field_number, parts in components:
+            experiment_hash.update(_encode_varint(field_number))
+            experiment_hash.update(_encode_varint(len(parts)))
+            for _, digest in parts:
+                experiment_hash.update(digest)
+        key = experiment_hash.hexdigest()
+
+        # Store experiment if needed and link it into place
+        self._write(self._object_file(key), _save_experiment, components)
+        if os.path.lexists(filename):
+            os.remove(filename)
+        try:
+            os.link(self._object_file(key), filename)
+        except OSError:
+            shutil.copyfile(self._object_file(key), filename)
+        return key
@@ -1,17 +1,194 @@
 """Generate LBANN experiment prototext files."""
 
+import os
+import re
 import google.protobuf.text_format
 import google.protobuf.message
+import numpy as np
 from lbann import lbann_pb2, NoOptimizer
 
 
-def save_prototext(filename, binary=False, **kwargs):
+# Layers whose weights matrices all have width 1
+_COLUMN_WEIGHTS_LAYERS = frozenset([
+    'weights_layer', 'convolution', 'deconvolution', 'batch_normalization',
+    'entrywise_batch_normalization', 'layer_norm'
+])
+
+
+def _layer_weights_shapes(layer):
+    """Known dimensions of the weights matrices of a layer message.
+
+    LBANN stores weights as matrices whose shape depends on the layer
+    that uses them. Only one matrix dimension follows from the layer
+    parameters; the other follows from the number of values.
+
+    Args:
+        layer (layers_pb2.Layer): Layer message.
+
+    Returns:
+        dict of {str: (str, int)}: For each weights name, either
+            ``('height', h)`` or ``('width', w)``. Weights of layers
+            without a known matrix layout are mapped to None.
+
+    """
+    ltype = layer.WhichOneof('layer_type')
+    params = getattr(layer, ltype) if ltype else None
+    names = list(layer.weights)
+    rules = [None] * len(names)
+    if ltype in _COLUMN_WEIGHTS_LAYERS:
+        rules = [('width', 1)] * len(names)
+    elif ltype in ('fully_connected', 'channelwise_fully_connected'):
+        if ltype == 'fully_connected':
+            outputs = params.num_neurons
+            transpose = params.transpose
+        else:
+            outputs = int(np.prod(params.output_channel_dims))
+            transpose = params.transpose.value
+        rules = [('width', 1)] * len(names)
+        if names and outputs > 0:
+            rules[0] = ('width' if transpose else 'height', outputs)
+        elif names:
+            rules[0] = None
+    elif ltype in ('embedding', 'dist_embedding'):
+        rules = [('height', params.embedding_dim)] + [None] * (len(names) - 1)
+    elif ltype in ('channelwise_scale_bias', 'entrywise_scale_bias'):
+        rules = [('width', 2)] * len(names)
+    elif ltype == 'gru':
+        rows = 3 * params.hidden_size
+        rules = [('height', rows) if i % 4 < 2 else ('width', 1)
+                 for i in range(len(names))]
+    return dict(zip(names, rules))
+
+
+def _weights_shapes(layer_shapes):
+    """Merge the weights matrix dimensions of several layers.
+
+    Args:
+        layer_shapes (iterable of dict): Outputs of
+            `_layer_weights_shapes`.
+
+    Returns:
+        dict of {str: (str, int)}: Weights used by layers with
+            different matrix layouts are mapped to None.
+
+    """
+    shapes = {}
+    for layer in layer_shapes:
+        for name, shape in layer.items():
+            if name in shapes and shapes[name] != shape:
+                shape = None
+            shapes[name] = shape
+    return shapes
+
+
+def _external_weights_values(weights, threshold, shape):
+    """Values of a weights message that should be moved to a file.
+
+    LBANN reads weights matrices with width 1 from flat arrays and
+    other weights matrices from 2-D arrays in row-major order, whereas
+    ``ValueInitializer`` values are in column-major order.
+
+    Args:
+        weights (weights_pb2.Weights): Weights message.
+        threshold (int): Largest number of values kept in the message.
+        shape ((str, int)): Known dimension of the weights matrix (see
+            `_layer_weights_shapes`). Values of weights without a known
+            shape are kept in the message.
+
+    Returns:
+        numpy.ndarray: Values of a ``ValueInitializer`` with more than
+            ``threshold`` values, or None.
+
+    """
+    init = weights.initializer
+    if shape is None:
+        return None
+    if init.WhichOneof('initializer_type') != 'value_initializer':
+        return None
+    values = init.value_initializer
+    if len(values.values_d) > threshold:
+        array = np.array(values.values_d, dtype=np.float64)
+    elif len(values.values) > threshold:
+        array = np.array(values.values, dtype=np.float32)
+    else:
+        return None
+
+    # Convert column-major matrices to row-major 2-D arrays
+    dim, size = shape
+    if size <= 0 or array.size % size != 0:
+        return None
+    width = size if dim == 'width' else array.size // size
+    if width == 1:
+        return array
+    return np.ascontiguousarray(array.reshape(width, -1).T)
+
+
+def externalize_weights(message, directory, threshold):
+    """Move large weight values out of an experiment message.
+
+    Weights initialized with a ``ValueInitializer`` holding more than
+    ``threshold`` values are saved to NumPy files in ``directory`` and
+    switched to a ``NumpyInitializer`` that reads them back. Values are
+    saved as float32, or as float64 if given in ``values_d``.
+
+    Weights matrices with width greater than 1 are saved as 2-D arrays
+    with the matrix shape. Weights whose matrix shape cannot be
+    determined from the layers that use them are kept in the message.
+
+    Args:
+        message (lbann_pb2.LbannPB or model_pb2.Model): Experiment or
+            model message, modified in place.
+        directory (str): Directory for NumPy files.
+        threshold (int): Largest number of values kept in the message.
+
+    Returns:
+        list of str: NumPy files written.
+
+    """
+    if message.DESCRIPTOR.name == 'LbannPB':
+        message = message.model
+    shapes = _weights_shapes(
+        _layer_weights_shapes(l) for l in message.layer)
+    files = []
+    used_names = set()
+    for i, weights in enumerate(message.weights):
+        array = _external_weights_values(weights, threshold,
+                                         shapes.get(weights.name))
+        if array is None:
+            continue
+
+        # Pick a unique file name based on the weights name
+        name = re.sub(r'[^\w.-]', '_', weights.name) or f'weights{i}'
+        if name in used_names:
+            name = f'{name}_{i}'
+        used_names.add(name)
+
+        os.makedirs(directory, exist_ok=True)
+        file = os.path.join(os.path.realpath(directory), f'{name}.npy')
+        np.save(file, array)
+        weights.initializer.numpy_initializer.file = file
+        files.append(file)
+    return files
+
+
+def save_prototext(filename,
+                   binary=False,
+                   external_weights_threshold=None,
+                   external_weights_dir=None,
+                   **kwargs):
     """Save a prototext file.
 
     LbannPB fields (e.g. `model`, `data_reader`, `optimizer`) are
     accepted via `kwargs`. The `binary` field saves the experiment file as
     a protobuf binary message, rather than as a text format.
 
+    Constant tensors embedded with ``ValueInitializer`` are written
+    value by value into the experiment file. If
+    `external_weights_threshold` is set, initializers with more values
+    are instead saved as NumPy files in `external_weights_dir` (default:
+    a directory named after the experiment file) and loaded with a
+    ``NumpyInitializer`` (see `externalize_weights`).
+
     """
 
     # Construct protobuf message
@@ -41,6 +218,13 @@ def save_prototext(filename, binary=False, **kwargs):
         message.optimizer.CopyFrom(NoOptimizer().export_proto())
         message.optimizer.SetInParent()
 
+    # Move large weight values to NumPy files
+    if external_weights_threshold is not None:
+        if external_weights_dir is None:
+            external_weights_dir = os.path.splitext(filename)[0] + '_weights'
+        externalize_weights(message, external_weights_dir,
+                            external_weights_threshold)
+
     # Write to file
     with open(filename, 'wb') as f:
         if binary:
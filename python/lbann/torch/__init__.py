@@ -30,3 +30,4 @@ and functions and convert them to LBANN graphs, including network parameters.
 """
 
 from .compiler import compile, lazy_compile
+from .profiling import CompilationReport
@@ -0,0 +1,416 @@
+################################################################################
+# Copyright (c) 2014-2023, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+# Written by the LBANN Research Team (B. Van Essen, et al.) listed in
+# the CONTRIBUTORS file. <lbann-dev@llnl.gov>
+#
+# LLNL-CODE-697807.
+# All rights reserved.
+#
+# This file is part of LBANN: Livermore Big Artificial Neural Network
+# Toolkit. For details, see http://software.llnl.gov/LBANN or
+# https://github.com/LLNL/LBANN.
+#
+# Licensed under the Apache License, Version 2.0 (the "Licensee"); you
+# may not use this file except in compliance with the License.  You may
+# obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the license.
+#
+################################################################################
+"""
+On-disk cache of compiled LBANN graphs.
+
+Compiling a module runs Dynamo tracing, fake tensor propagation, partial
+lowering and every replacement converter, which takes minutes for large
+models. The resulting graph only depends on the module's structure and
+code (and its parameters, if weights are included), on the shapes and
+types of the compilation inputs, and on the converters. Graphs are cached
+under a hash of those, as a pickle of the LBANN layers whose large arrays
+(e.g., converted weights) are spilled to NumPy files and memory-mapped when
+loaded.
+
+The cache directory is given to ``lbann.torch.compile`` or
+``lbann.torch.lazy_compile``, or set with the ``LBANN_TORCH_COMPILE_CACHE``
+environment variable.
+"""
+import dataclasses
+import enum
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import lbann
+import numpy as np
+import torch
+from torch import nn
+
+from lbann.torch import converters
+
+# Version of the cached graph format
+CACHE_VERSION = 1
+
+# Arrays with more values are stored in separate NumPy files
+SPILL_THRESHOLD = 1024
+
+
+def default_cache_dir() -> Optional[str]:
+    """
+    Returns the compilation cache directory set in the environment, if any.
+    """
+    return os.environ.get('LBANN_TORCH_COMPILE_CACHE') or None
+
+
+def _qualified_name(obj: Any) -> str:
+    if isinstance(obj, str):
+        return obj
+    return f'{getattr(obj, "__module__", "")}.{getattr(obj, "__qualname__", repr(obj))}'
+
+
+def _hash_code(h, code) -> None:
+    """
+    Hashes a code object, including nested functions in its constants.
+    """
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _hash_code(h, const)
+        else:
+            h.update(repr(const).encode())
+
+
+def _hash_callable(h, f: Callable[..., Any]) -> None:
+    """
+    Hashes the name and code of a function or method. Global variables and
+    closure contents are not included.
+    """
+    f = getattr(f, '__func__', f)
+    h.update(_qualified_name(f).encode())
+    code = getattr(f, '__code__', None)
+    if code is not None:
+        _hash_code(h, code)
+
+
+def _hash_tensor(h, tensor: torch.Tensor) -> None:
+    """
+    Hashes the contents of a tensor, regardless of its type.
+    """
+    data = tensor.detach().cpu().contiguous().reshape(-1)
+    h.update(data.view(torch.uint8).numpy().tobytes())
+
+
+def _describe_value(value: Any, seen: set) -> str:
+    """
+    Describes an attribute value by its contents, e.g., a configuration
+    object by its fields. Objects are described by their attributes, up to
+    reference cycles. Modules (which are hashed separately) and other
+    callables are only described by their type.
+    """
+    if value is None or isinstance(value, (bool, int, float, complex, str,
+                                           bytes)):
+        return repr(value)
+    if isinstance(value, enum.Enum):
+        return f'{_qualified_name(type(value))}.{value.name}'
+    if isinstance(value, (torch.dtype, torch.device, torch.Size)):
+        return str(value)
+    if isinstance(value, type):
+        return _qualified_name(value)
+    if isinstance(value, nn.Module) or callable(value):
+        return _qualified_name(type(value))
+    if id(value) in seen:
+        return '...'
+    seen = seen | {id(value)}
+    if isinstance(value, torch.Tensor):
+        h = hashlib.sha256()
+        _hash_tensor(h, value)
+        return f'Tensor({tuple(value.shape)}, {value.dtype}, {h.hexdigest()})'
+    if isinstance(value, np.ndarray):
+        return (f'ndarray({value.shape}, {value.dtype}, '
+                f'{hashlib.sha256(value.tobytes()).hexdigest()})')
+    if isinstance(value, (list, tuple)):
+        return '{}({})'.format(type(value).__name__,
+                               ','.join(_describe_value(v, seen)
+                                        for v in value))
+    if isinstance(value, (set, frozenset)):
+        return '{}({})'.format(type(value).__name__,
+                               ','.join(sorted(_describe_value(v, seen)
+                                               for v in value)))
+    if isinstance(value, dict):
+        items = sorted((repr(k), _describe_value(v, seen))
+                       for k, v in value.items())
+        return 'dict({})'.format(','.join(f'{k}={v}' for k, v in items))
+
+    # Configuration objects, e.g., Huggingface Transformers configurations
+    to_dict = getattr(value, 'to_dict', None)
+    if callable(to_dict):
+        return (f'{_qualified_name(type(value))}'
+                f'({_describe_value(to_dict(), seen)})')
+    if dataclasses.is_dataclass(value):
+        return (f'{_qualified_name(type(value))}'
+                f'({_describe_value(dataclasses.asdict(value), seen)})')
+    if hasattr(value, '__dict__'):
+        return (f'{_qualified_name(type(value))}'
+                f'({_describe_value(vars(value), seen)})')
+    return _qualified_name(type(value))
+
+
+def _hash_attributes(h, mod: nn.Module) -> None:
+    """
+    Hashes the attributes of a module that may change its computation, i.e.,
+    values (including configuration objects), functions (e.g., a lambda
+    assigned at runtime) and hooks. Submodules, parameters and buffers are
+    hashed separately.
+    """
+    for attr, value in sorted(vars(mod).items()):
+        if attr in ('_forward_hooks', '_forward_pre_hooks'):
+            for hook in value.values():
+                _hash_callable(h, hook)
+        elif attr.startswith('_'):
+            continue
+        elif hasattr(value, '__code__') or hasattr(value, '__func__'):
+            h.update(f'{attr}:'.encode())
+            _hash_callable(h, value)
+        else:
+            h.update(f'{attr}={_describe_value(value, set())}\n'.encode())
+
+
+def _hash_class(h, cls: type, hashed: Dict[type, bytes]) -> None:
+    """
+    Hashes the source code and the methods of a module class and of its
+    base classes, so that changes to any method (not only ``forward``) are
+    detected, including methods replaced at runtime. PyTorch classes are
+    covered by the PyTorch version.
+    """
+    if cls not in hashed:
+        class_hash = hashlib.sha256()
+        for base in cls.__mro__:
+            if base is object or base.__module__.split('.')[0] == 'torch':
+                continue
+            class_hash.update(_qualified_name(base).encode())
+            try:
+                class_hash.update(inspect.getsource(base).encode())
+            except (OSError, TypeError):
+                pass  # Source is unavailable, e.g., in interactive sessions
+            for name, value in sorted(vars(base).items()):
+                value = getattr(value, '__func__', value)  # staticmethod
+                if hasattr(value, '__code__'):
+                    class_hash.update(f'{name}:'.encode())
+                    _hash_callable(class_hash, value)
+        hashed[cls] = class_hash.digest()
+    h.update(hashed[cls])
+
+
+def registry_version() -> str:
+    """
+    Returns a hash of the LBANN PyTorch frontend and of every registered
+    replacement and weight converter. It changes whenever a converter is
+    added, removed or modified.
+    """
+    converters.load_replacements()
+    h = hashlib.sha256()
+
+    # Frontend source files
+    frontend_dir = os.path.dirname(os.path.abspath(__file__))
+    for fname in sorted(
+            glob.glob(os.path.join(frontend_dir, '*.py')) +
+            glob.glob(os.path.join(frontend_dir, 'replacements', '*.py'))):
+        h.update(os.path.basename(fname).encode())
+        with open(fname, 'rb') as fp:
+            h.update(fp.read())
+
+    # Registered converters, including those added by users
+    registries = (converters.modules, converters.functions,
+                  converters.module_parameters,
+                  converters.opaque_shape_inference)
+    for registry in registries:
+        for key in sorted(registry, key=_qualified_name):
+            h.update(_qualified_name(key).encode())
+            value = registry[key]
+            if isinstance(value, tuple):  # Opaque shape inference
+                h.update(value[0].encode())
+                value = value[1]
+            _hash_callable(h, value)
+
+    return h.hexdigest()
+
+
+def _describe_input(value: Any) -> str:
+    """
+    Describes a compilation input by its shape and type.
+    """
+    if isinstance(value, torch.Tensor):
+        return f'Tensor({tuple(value.shape)}, {value.dtype})'
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return f'{type(value).__name__}({",".join(map(_describe_input, value))})'
+    if isinstance(value, dict):
+        return 'dict({})'.format(','.join(
+            f'{k}={_describe_input(value[k])}' for k in sorted(value)))
+    return type(value).__qualname__
+
+
+def compile_key(module_or_function: Union[nn.Module, Callable[..., Any]],
+                args: Sequence[Any],
+                kwargs: Dict[str, Any],
+                with_weights: bool,
+                trace: bool = False) -> str:
+    """
+    Returns the cache key of a compilation.
+
+    :param module_or_function: ``torch.nn.Module`` or function to compile.
+    :param args: Positional compilation inputs.
+    :param kwargs: Named compilation inputs.
+    :param with_weights: Whether parameters are stored in the LBANN graph. If
+                         so, parameter values are part of the key.
+    :param trace: Whether the graph is obtained by tracing.
+    :return: Hexadecimal key.
+    """
+    h = hashlib.sha256()
+    h.update(f'v{CACHE_VERSION} torch={torch.__version__} trace={trace} '
+             f'with_weights={with_weights}\n'.encode())
+    h.update(registry_version().encode())
+
+    if isinstance(module_or_function, nn.Module):
+        # Module tree, hyperparameters and code
+        hashed_classes = {}
+        for name, mod in module_or_function.named_modules():
+            h.update(f'{name}:{_qualified_name(type(mod))}:'
+                     f'{mod.extra_repr()}:{mod.training}\n'.encode())
+            _hash_callable(h, type(mod).forward)
+            _hash_class(h, type(mod), hashed_classes)
+            _hash_attributes(h, mod)
+
+        # Parameter and buffer shapes, and values if stored in the graph
+        for name, param in module_or_function.named_parameters():
+            h.update(f'{name}:{tuple(param.shape)}:{param.dtype}\n'.encode())
+            if with_weights:
+                _hash_tensor(h, param)
+        for name, buf in module_or_function.named_buffers():
+            h.update(f'{name}:{tuple(buf.shape)}:{buf.dtype}\n'.encode())
+            _hash_tensor(h, buf)
+    else:
+        _hash_callable(h, module_or_function)
+
+    # Input shapes and types
+    for value in args:
+        h.update(f'{_describe_input(value)}\n'.encode())
+    for name in sorted(kwargs):
+        h.update(f'{name}={_describe_input(kwargs[name])}\n'.encode())
+
+    return h.hexdigest()
+
+
+class _SpillingPickler(pickle.Pickler):
+    """
+    Pickler that stores large NumPy arrays in separate files.
+    """
+
+    def __init__(self, file, directory: str, threshold: int):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.directory = directory
+        self.threshold = threshold
+        self.spilled = {}
+
+    def persistent_id(self, obj):
+        if (isinstance(obj, np.ndarray) and obj.size > self.threshold
+                and not obj.dtype.hasobject):
+            if id(obj) not in self.spilled:
+                fname = f'array{len(self.spilled)}.npy'
+                np.save(os.path.join(self.directory, fname), obj)
+                self.spilled[id(obj)] = (fname, obj)
+            return self.spilled[id(obj)][0]
+        return None
+
+
+class _SpillingUnpickler(pickle.Unpickler):
+    """
+    Unpickler that memory-maps arrays stored by ``_SpillingPickler``.
+    """
+
+    def __init__(self, file, directory: str):
+        super().__init__(file)
+        self.directory = directory
+
+    def persistent_load(self, pid):
+        return np.load(os.path.join(self.directory, pid), mmap_mode='r')
+
+
+def _entry_dir(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], key)
+
+
+def save_graph(cache_dir: str,
+               key: str,
+               graph: List[lbann.Layer],
+               threshold: int = SPILL_THRESHOLD) -> None:
+    """
+    Stores a compiled LBANN graph in the cache.
+
+    :param cache_dir: Cache directory.
+    :param key: Cache key (see ``compile_key``).
+    :param graph: LBANN graph given as a list of Layers.
+    :param threshold: Arrays with more values are stored in NumPy files.
+    """
+    entry_dir = _entry_dir(cache_dir, key)
+    if os.path.isdir(entry_dir):
+        return
+
+    # Write the entry in a temporary directory and move it into place, so
+    # that concurrent compilations never see a partial entry
+    os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{key}.',
+                               dir=os.path.dirname(entry_dir))
+    try:
+        with open(os.path.join(tmp_dir, 'graph.pkl'), 'wb') as fp:
+            _SpillingPickler(fp, tmp_dir, threshold).dump(graph)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        if not os.path.isdir(entry_dir):
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_graph(cache_dir: str, key: str) -> Optional[List[lbann.Layer]]:
+    """
+    Loads a compiled LBANN graph from the cache.
+
+    Layers and weights with default names are renamed, so that they do not
+    clash with objects created in this process.
+
+    :param cache_dir: Cache directory.
+    :param key: Cache key (see ``compile_key``).
+    :return: LBANN graph given as a list of Layers, or None if not cached.
+    """
+    entry_dir = _entry_dir(cache_dir, key)
+    try:
+        with open(os.path.join(entry_dir, 'graph.pkl'), 'rb') as fp:
+            graph = _SpillingUnpickler(fp, entry_dir).load()
+    except FileNotFoundError:
+        return None
+
+    renamed = set()
+    for layer in graph:
+        if re.fullmatch(r'layer\d+', layer.name):
+            lbann.Layer.global_count += 1
+            layer.name = f'layer{lbann.Layer.global_count}'
+        for w in layer.weights:
+            if id(w) not in renamed and re.fullmatch(r'weights\d+', w.name):
+                lbann.Weights.global_count += 1
+                w.name = f'weights{lbann.Weights.global_count}'
+            renamed.add(id(w))
+    return graph
@@ -44,7 +44,7 @@ except (ModuleNotFoundError, ImportError):
 import functools
 import inspect
 import lbann
-from lbann.torch import converters, opaque, lowering
+from lbann.torch import cache, converters, opaque, lowering, profiling
 from lbann.torch.helpers import LBANNGraph
 from torch import nn, _dynamo as dynamo
 from torch._dynamo.exc import BackendCompilerFailed
@@ -55,6 +55,8 @@ def compile(module_or_function: Union[nn.Module, Callable[..., Any]],
             *sample_args,
             trace: bool = False,
             with_weights: bool = True,
+            cache_dir: Optional[str] = None,
+            report: Optional[profiling.CompilationReport] = None,
             **sample_kwargs) -> List[lbann.Layer]:
     """
     Compiles the given PyTorch module or function into an LBANN graph.
@@ -72,6 +74,12 @@ def compile(module_or_function: Union[nn.Module, Callable[..., Any]],
     :param with_weights: If True (default), also stores the parameters of
                          the given model as constant initializers of the LBANN
                          graph's weights.
+    :param cache_dir: If given, directory of an on-disk compilation cache (see
+                      ``lbann.torch.cache``). Defaults to the
+                      ``LBANN_TORCH_COMPILE_CACHE`` environment variable.
+    :param report: If given, records pass and converter timings and graph
+                   statistics into this report (see
+                   ``lbann.torch.profiling``).
     :param sample_kwargs: Named arguments to pass in for compilation. Note that
                           this is necessary to compile ahead-of-time (without
                           tracing).
@@ -82,13 +90,47 @@ def compile(module_or_function: Union[nn.Module, Callable[..., Any]],
                          'compilation')
 
     if trace:
-        return _trace(module_or_function, sample_args, sample_kwargs,
-                      with_weights)
+        return _run_compilation(
+            lambda: _trace(module_or_function, sample_args, sample_kwargs,
+                           with_weights), module_or_function, sample_args,
+            sample_kwargs, with_weights, True,
+            cache_dir or cache.default_cache_dir(), report)
 
-    cmod = lazy_compile(module_or_function)
+    cmod = lazy_compile(module_or_function, with_weights, cache_dir, report)
     return cmod(*tuple(sample_kwargs.values()))
 
 
+def _run_compilation(compile_fn: Callable[[], List[lbann.Layer]],
+                     module_or_function: Union[nn.Module, Callable[..., Any]],
+                     args, kwargs, with_weights: bool, trace: bool,
+                     cache_dir: Optional[str],
+                     report: Optional[profiling.CompilationReport]):
+    """
+    Runs a compilation, loading its result from the compilation cache if
+    enabled, and records it into a report if given.
+    """
+    with profiling.recording(report), profiling.time_pass('total'):
+        if report is not None:
+            report.compilations += 1
+        if not cache_dir:
+            return compile_fn()
+
+        with profiling.time_pass('cache_lookup'):
+            key = cache.compile_key(module_or_function, args, kwargs,
+                                    with_weights, trace)
+            graph = cache.load_graph(cache_dir, key)
+        if graph is not None:
+            if report is not None:
+                report.cache_hits += 1
+                report.layers += len(graph)
+            return graph
+
+        graph = compile_fn()
+        with profiling.time_pass('cache_save'):
+            cache.save_graph(cache_dir, key, graph)
+        return graph
+
+
 def _trace(f, example_args, example_kwargs, with_weights) -> List[lbann.Layer]:
     """
     Traces through a function or Module to obtain an LBANN graph.
@@ -155,7 +197,9 @@ def _get_module_argnames(f: Union[nn.Module, Callable[..., Any]]) -> List[str]:
 
 
 def lazy_compile(module_or_function: Union[nn.Module, Callable[..., Any]],
-                 with_weights: bool = True):
+                 with_weights: bool = True,
+                 cache_dir: Optional[str] = None,
+                 report: Optional[profiling.CompilationReport] = None):
     """
     Compile a Python function with PyTorch to an LBANN graph lazily. This means
     that whenever the decorated function is called, an LBANN graph will be
@@ -166,23 +210,33 @@ def lazy_compile(module_or_function: Union[nn.Module, Callable[..., Any]],
     :param with_weights: If True (default), also stores the parameters of
                          the given model as constant initializers of the LBANN
                          graph's weights.
+    :param cache_dir: If given, directory of an on-disk compilation cache (see
+                      ``lbann.torch.cache``). Defaults to the
+                      ``LBANN_TORCH_COMPILE_CACHE`` environment variable.
+    :param report: If given, records pass and converter timings and graph
+                   statistics of every compilation into this report (see
+                   ``lbann.torch.profiling``).
     """
     converters.load_replacements()
+    cache_dir = cache_dir or cache.default_cache_dir()
 
     argnames = _get_module_argnames(module_or_function)
 
     f = module_or_function
     if isinstance(f, nn.Module):
-        f = opaque.wrap_opaque_modules(f)
-        print('Replaced opaque operators on the module tree:',
-              opaque.count_replaced_submodules(f))
+        with profiling.recording(report), profiling.time_pass('opaque'):
+            f = opaque.wrap_opaque_modules(f)
+            num_opaque = opaque.count_replaced_submodules(f)
+        print('Replaced opaque operators on the module tree:', num_opaque)
+        if report is not None:
+            report.opaque_modules += num_opaque
 
     f = dynamo.optimize(functools.partial(lowering.dynamo_callback, argnames,
                                           with_weights),
                         nopython=True)(f)
 
     @functools.wraps(f)
-    def _wrapped(*args, **kwargs):
+    def _compile(*args, **kwargs):
         try:
             f(*args, **kwargs)
         except BackendCompilerFailed as ex:
@@ -196,4 +250,13 @@ def lazy_compile(module_or_function: Union[nn.Module, Callable[..., Any]],
             'Could not extract an LBANN graph from PyTorch module '
             'or function')
 
+    if not cache_dir and report is None:
+        return _compile
+
+    @functools.wraps(f)
+    def _wrapped(*args, **kwargs):
+        return _run_compilation(lambda: _compile(*args, **kwargs),
+                                module_or_function, args, kwargs,
+                                with_weights, False, cache_dir, report)
+
     return _wrapped
@@ -138,7 +138,7 @@ def register_module_weight_converter(
         def replacement(mod: ClassName, layer: lbann.MatchingClass):
             layer.weights = lbann.Weights(
                 initializer=lbann.ValueInitializer(
-                    values=mod.weights.detach().cpu().numpy().flat))
+                    values=mod.weights.detach().cpu().numpy().ravel()))
 
 
     :param modclass: A module type or a sequence thereof whose weights will be
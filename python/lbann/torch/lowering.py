@@ -30,7 +30,7 @@ and maintain neural network semantics necessary for LBANN.
 """
 
 import lbann
-from lbann.torch import converters, helpers, opaque
+from lbann.torch import converters, helpers, opaque, profiling
 
 import torch
 from torch import fx
@@ -73,6 +73,9 @@ def dynamo_callback(input_names: List[str], with_weights: bool,
     else:
         layer_graph = list(
             lbann.traverse_layer_graph(inputs[-len(input_names):]))
+    report = profiling.active_report()
+    if report is not None:
+        report.layers += len(layer_graph)
 
     raise helpers.LBANNGraph(layer_graph)
 
@@ -103,17 +106,37 @@ def replace_fx(gm: fx.GraphModule,
                      a subgraph is being replaced.
     """
 
+    report = profiling.active_report()
+    if report is not None and not subgraph:
+        report.nodes_before_lowering += len(gm.graph.nodes)
+
     # Tensor metadata (type, shape, etc.) propagation
     fake_mode = FakeTensorMode(allow_non_fake_inputs=True)
-    FakeTensorProp(gm, fake_mode).propagate(*example_inputs)
+    with profiling.time_pass('fake_tensor_prop'):
+        FakeTensorProp(gm, fake_mode).propagate(*example_inputs)
 
     # Partially lower graph when a module or function is unsupported
     if not subgraph:
-        gm = partial_lowering(gm)
-        gm.graph.eliminate_dead_code()
+        with profiling.time_pass('partial_lowering'):
+            gm = partial_lowering(gm)
+            gm.graph.eliminate_dead_code()
+        if report is not None:
+            report.nodes_after_lowering += len(gm.graph.nodes)
 
     # Re-propagate tensor metadata after lowering
-    FakeTensorProp(gm, fake_mode).propagate(*example_inputs)
+    with profiling.time_pass('fake_tensor_prop_lowered'):
+        FakeTensorProp(gm, fake_mode).propagate(*example_inputs)
+
+    with profiling.time_pass('conversion'):
+        return _convert_nodes(gm, with_weights, replaced, subgraph)
+
+
+def _convert_nodes(gm: fx.GraphModule, with_weights: bool,
+                   replaced: Optional[Dict[fx.Node, lbann.Layer]],
+                   subgraph: bool):
+    """
+    Final pass of ``replace_fx``, which converts every node to LBANN layers.
+    """
 
     replaced = replaced or {}
     inputs = []
@@ -155,7 +178,9 @@ def replace_fx(gm: fx.GraphModule,
             elif type(submodule) in converters.modules:
                 # If module is replaceable, replace it
                 node.stack_trace = f'{type(submodule).__name__}_{len(replaced)}'
-                replaced[node] = converters.modules[type(submodule)](
+                replaced[node] = profiling.call_converter(
+                    type(submodule).__name__,
+                    converters.modules[type(submodule)],
                     submodule, *repl(node.args),
                     **{k: repl(v)
                        for k, v in node.kwargs.items()})
@@ -167,7 +192,9 @@ def replace_fx(gm: fx.GraphModule,
                             warnings.warn('No converter found for weights of '
                                           f'module type "{type(submodule)}"!')
                     else:
-                        converters.module_parameters[type(submodule)](
+                        profiling.call_converter(
+                            f'{type(submodule).__name__} weights',
+                            converters.module_parameters[type(submodule)],
                             submodule, replaced[node])
 
                 replaced[node].name = node.name
@@ -186,9 +213,10 @@ def replace_fx(gm: fx.GraphModule,
 
             if funcname in converters.functions:
                 node.stack_trace = f'{funcname}_{len(replaced)}'
-                replaced[node] = converters.functions[funcname](*repl(
-                    node.args), **{k: repl(v)
-                                   for k, v in node.kwargs.items()})
+                replaced[node] = profiling.call_converter(
+                    funcname, converters.functions[funcname],
+                    *repl(node.args), **{k: repl(v)
+                                         for k, v in node.kwargs.items()})
                 replaced[node].name = node.name
                 replaced[node].shape = node.meta['val'].shape
                 rep.add(node.stack_trace)
@@ -258,7 +286,7 @@ def replace_fx(gm: fx.GraphModule,
                         dims=attr.shape,
                         weights=lbann.Weights(
                             initializer=lbann.ValueInitializer(
-                                values=attr.detach().cpu().numpy().flat)))
+                                values=attr.detach().cpu().numpy().ravel())))
                 else:
                     lbann_node = lbann.WeightsLayer(dims=attr.shape)
                 make_input = False
@@ -386,6 +414,7 @@ def partial_lowering(gm: fx.GraphModule) -> fx.GraphModule:
     for node in gm.graph.nodes:
         # Decide whether this node should be lowered
         decompose = False
+        lowered_name = None
         if node not in skip_nodes:
             if node.op == 'call_module':
                 submodule = _fetch_attr(gm, node.target)
@@ -397,6 +426,7 @@ def partial_lowering(gm: fx.GraphModule) -> fx.GraphModule:
                 if isinstance(submodule, fx.GraphModule) or type(
                         submodule) not in converters.modules:
                     decompose = True
+                    lowered_name = type(submodule).__name__
                     warnings.warn(
                         'Could not find replacement for '
                         f'module type "{type(submodule)}". Lowering.')
@@ -407,12 +437,14 @@ def partial_lowering(gm: fx.GraphModule) -> fx.GraphModule:
                     funcname = node.target.__module__ + '.' + node.target.__name__
                 if funcname not in converters.functions:
                     decompose = True
+                    lowered_name = funcname
                     warnings.warn(
                         'Could not find replacement for '
                         f'function "{str(node.target)}" ({funcname}). Lowering.'
                     )
             elif node.op == 'call_method':
                 decompose = True
+                lowered_name = f'method {node.target}'
                 warnings.warn(
                     f'Lowering method "{str(node.target)}" operating '
                     f'on object {str(node.args[0])}.')
@@ -429,6 +461,10 @@ def partial_lowering(gm: fx.GraphModule) -> fx.GraphModule:
         # End of lowering decision
 
         if decompose:
+            report = profiling.active_report()
+            if report is not None:
+                report.lowered_nodes[lowered_name] += 1
+
             # Lower and reconstruct graph
             lowered = lower_single_node(gm, node)
             proxy_args = [
@@ -0,0 +1,208 @@
+################################################################################
+# Copyright (c) 2014-2023, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+# Written by the LBANN Research Team (B. Van Essen, et al.) listed in
+# the CONTRIBUTORS file. <lbann-dev@llnl.gov>
+#
+# LLNL-CODE-697807.
+# All rights reserved.
+#
+# This file is part of LBANN: Livermore Big Artificial Neural Network
+# Toolkit. For details, see http://software.llnl.gov/LBANN or
+# https://github.com/LLNL/LBANN.
+#
+# Licensed under the Apache License, Version 2.0 (the "Licensee"); you
+# may not use this file except in compliance with the License.  You may
+# obtain a copy of the License at:
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the license.
+#
+################################################################################
+"""
+Opt-in profiling of the LBANN PyTorch frontend.
+
+Pass a ``CompilationReport`` to ``lbann.torch.compile`` or
+``lbann.torch.lazy_compile`` to record the wall time of each compilation
+pass, the number of calls to and time spent in each converter, the number
+of graph nodes before and after partial lowering, and which nodes had no
+converter and were lowered. Reports can be printed or saved as JSON.
+
+Example::
+
+    report = lbann.torch.CompilationReport()
+    graph = lbann.torch.compile(model, x=x, report=report)
+    print(report.summary())
+    report.save_json('compile_report.json')
+"""
+from collections import defaultdict
+import contextlib
+import json
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Report being recorded by the current compilation, if any
+_active_report = None
+
+
+def active_report() -> Optional['CompilationReport']:
+    """
+    Returns the report being recorded, or None if profiling is disabled.
+    """
+    return _active_report
+
+
+@contextlib.contextmanager
+def recording(report: Optional['CompilationReport']) -> Iterator[None]:
+    """
+    Records compilation statistics into the given report within the context.
+    Does nothing if the report is None.
+    """
+    global _active_report
+    if report is None:
+        yield
+        return
+    previous = _active_report
+    _active_report = report
+    try:
+        yield
+    finally:
+        _active_report = previous
+
+
+class CompilationReport:
+    """
+    Timing and statistics of LBANN graph compilations. Statistics accumulate
+    over every compilation recorded into the same report.
+    """
+
+    def __init__(self):
+        #: Number of compilations recorded
+        self.compilations = 0
+        #: Number of compilations loaded from the compilation cache
+        self.cache_hits = 0
+        #: Wall time of each pass, in seconds
+        self.pass_times: Dict[str, float] = defaultdict(float)
+        #: Number of calls to each converter
+        self.converter_calls: Dict[str, int] = defaultdict(int)
+        #: Time spent in each converter, in seconds
+        self.converter_times: Dict[str, float] = defaultdict(float)
+        #: Number of nodes with no converter that were lowered, by target
+        self.lowered_nodes: Dict[str, int] = defaultdict(int)
+        #: FX graph nodes before partial lowering
+        self.nodes_before_lowering = 0
+        #: FX graph nodes after partial lowering
+        self.nodes_after_lowering = 0
+        #: Number of submodules replaced by opaque modules
+        self.opaque_modules = 0
+        #: Number of LBANN layers in the compiled graphs
+        self.layers = 0
+
+    @contextlib.contextmanager
+    def time_pass(self, name: str) -> Iterator[None]:
+        """
+        Adds the wall time of the context to a pass.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.pass_times[name] += time.perf_counter() - start
+
+    def call_converter(self, name: str, converter: Callable[..., Any],
+                       *args, **kwargs) -> Any:
+        """
+        Calls a converter, recording the call and its time.
+        """
+        start = time.perf_counter()
+        try:
+            return converter(*args, **kwargs)
+        finally:
+            self.converter_calls[name] += 1
+            self.converter_times[name] += time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the report as a JSON-serializable dictionary.
+        """
+        return {
+            'compilations': self.compilations,
+            'cache_hits': self.cache_hits,
+            'pass_times': dict(self.pass_times),
+            'converters': {
+                name: {
+                    'calls': self.converter_calls[name],
+                    'time': self.converter_times[name],
+                }
+                for name in sorted(self.converter_calls)
+            },
+            'nodes_before_lowering': self.nodes_before_lowering,
+            'nodes_after_lowering': self.nodes_after_lowering,
+            'lowered_nodes': dict(self.lowered_nodes),
+            'opaque_modules': self.opaque_modules,
+            'layers': self.layers,
+        }
+
+    def save_json(self, path: str) -> None:
+        """
+        Saves the report as a JSON file.
+        """
+        with open(path, 'w') as fp:
+            json.dump(self.to_dict(), fp, indent=2)
+
+    def summary(self, max_converters: int = 20) -> str:
+        """
+        Returns a human-readable summary of the report.
+
+        :param max_converters: Number of slowest converters to list.
+        """
+        lines = [
+            f'Compilations: {self.compilations} '
+            f'({self.cache_hits} from cache)',
+            f'FX nodes: {self.nodes_before_lowering} before lowering, '
+            f'{self.nodes_after_lowering} after',
+            f'Opaque modules: {self.opaque_modules}',
+            f'LBANN layers: {self.layers}',
+            'Passes:',
+        ]
+        for name, seconds in self.pass_times.items():
+            lines.append(f'  {name:<32} {seconds:10.4f} s')
+        if self.converter_calls:
+            lines.append('Converters (slowest first):')
+            slowest = sorted(self.converter_times.items(),
+                             key=lambda item: item[1],
+                             reverse=True)
+            for name, seconds in slowest[:max_converters]:
+                lines.append(f'  {name:<32} {self.converter_calls[name]:6d} '
+                             f'calls {seconds:10.4f} s')
+        if self.lowered_nodes:
+            lines.append('Lowered nodes (no converter):')
+            for name, count in sorted(self.lowered_nodes.items(),
+                                      key=lambda item: item[1],
+                                      reverse=True):
+                lines.append(f'  {name:<32} {count:6d}')
+        return '\n'.join(lines)
+
+
+def time_pass(name: str):
+    """
+    Times a pass into the active report, if any.
+    """
+    if _active_report is None:
+        return contextlib.nullcontext()
+    return _active_report.time_pass(name)
+
+
+def call_converter(name: str, converter: Callable[..., Any], *args,
+                   **kwargs) -> Any:
+    """
+    Calls a converter, recording it into the active report, if any.
+    """
+    if _active_report is None:
+        return converter(*args, **kwargs)
+    return _active_report.call_converter(name, converter, *args, **kwargs)
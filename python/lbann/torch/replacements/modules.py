@@ -263,7 +263,7 @@ def _as_weights(scalar_or_array) -> lbann.Weights:
         if isinstance(scalar_or_array, torch.Tensor):
             scalar_or_array = scalar_or_array.detach().cpu().numpy()
         return lbann.Weights(initializer=lbann.ValueInitializer(
-            values=scalar_or_array.flat))
+            values=scalar_or_array.ravel()))
     return lbann.Weights(initializer=lbann.ValueInitializer(
         values=[scalar_or_array]))  # Assuming scalar
 
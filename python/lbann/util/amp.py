@@ -1,11 +1,14 @@
 """Support for automatic mixed precision."""
 
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
+import collections
 import functools
 import argparse
 
 import lbann
+from lbann.util.layer_types import MULTI_OUTPUT_LAYERS
 
 
 # Define layers that can be converted to FP16, or that must run in FP32.
@@ -137,32 +140,303 @@ def get_widest_datatype(datatypes: list[lbann.DataType]) -> lbann.DataType:
     return widest
 
 
-def set_layer_datatypes(model: lbann.Model) -> None:
-    """Set datatypes for layers in the model.
+def _widest_parent_datatypes(
+        layers: Sequence[lbann.Layer]) -> Dict[lbann.Layer, int]:
+    """Datatypes from the conversion lists and parent layer types.
 
-    If a layer that does not have a datatype set, it will be set based
-    on the conversion lists and its parent layer types.
+    Layers with a datatype keep it.
 
     """
-    for layer in lbann.traverse_layer_graph(model.layers):
-        if layer.datatype is not None:
-            continue  # Skip when datatype is already set.
+    datatypes = {}
+    for layer in layers:
         layer_type = type(layer)
-        if layer_type in FP16_LAYERS:
-            layer.datatype = lbann.DataType.FP16
+        if layer.datatype is not None:
+            datatypes[layer] = layer.datatype
+        elif layer_type in FP16_LAYERS:
+            datatypes[layer] = lbann.DataType.FP16
         elif layer_type in FP32_LAYERS:
-            layer.datatype = lbann.DataType.FLOAT
+            datatypes[layer] = lbann.DataType.FLOAT
         else:
             # Conservatively assume layers with no parents should
             # be in FP32 if there is not conversion or datatype
             # specified.
             if not layer.parents:
-                layer.datatype = lbann.DataType.FLOAT
+                datatypes[layer] = lbann.DataType.FLOAT
             else:
                 # Set the layer's type as the widest type among its
                 # parents.
-                layer.datatype = get_widest_datatype(
-                    [l.datatype for l in layer.parents])
+                datatypes[layer] = get_widest_datatype(
+                    [datatypes[l] for l in layer.parents])
+    return datatypes
+
+
+def set_layer_datatypes(model: lbann.Model) -> None:
+    """Set datatypes for layers in the model.
+
+    If a layer that does not have a datatype set, it will be set based
+    on the conversion lists and its parent layer types.
+
+    """
+    layers = list(lbann.traverse_layer_graph(model.layers))
+    for layer, datatype in _widest_parent_datatypes(layers).items():
+        layer.datatype = datatype
+
+
+# Bytes per tensor entry for datatypes used in AMP
+DATATYPE_BYTES = {
+    lbann.DataType.FP16: 2,
+    lbann.DataType.FLOAT: 4,
+    lbann.DataType.DOUBLE: 8,
+}
+
+
+@dataclass
+class AmpPlan:
+    """Datatype assignment chosen by `plan_layer_datatypes`.
+
+    Bytes are estimated memory traffic per sample: each activation is
+    written once and read by each child, and each conversion reads a
+    tensor and writes it in another datatype. Without input
+    dimensions, every tensor is counted as one entry.
+
+    Attributes:
+        datatypes (dict of {str: lbann.DataType}): Datatype of each
+            layer, by name.
+        conversions (list of (str, str, list of str)): Inserted or
+            implicit conversions, as the name of the converted layer,
+            the name of the conversion layer (None if the children
+            convert their inputs) and the names of the children that
+            receive the converted tensor.
+        num_casts (int): Conversions in the plan.
+        baseline_num_casts (int): Conversions with the conversion
+            lists and widest-parent rule (see `set_layer_datatypes`).
+        bytes (int): Estimated memory traffic of the plan.
+        baseline_bytes (int): Estimated memory traffic with the
+            conversion lists and widest-parent rule.
+
+    """
+    datatypes: Dict[str, int] = field(default_factory=dict)
+    conversions: List[Tuple[str, Optional[str], List[str]]] = field(
+        default_factory=list)
+    num_casts: int = 0
+    baseline_num_casts: int = 0
+    bytes: int = 0
+    baseline_bytes: int = 0
+
+    @property
+    def casts_saved(self) -> int:
+        return self.baseline_num_casts - self.num_casts
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.baseline_bytes - self.bytes
+
+    def summary(self) -> str:
+        """Human-readable description of the plan."""
+        lines = [
+            f'AMP plan: {self.num_casts} conversions '
+            f'({self.casts_saved} fewer than widest-parent rule), '
+            f'{self.bytes} bytes of activation traffic per sample '
+            f'({self.bytes_saved} saved)'
+        ]
+        for source, cast, children in self.conversions:
+            via = f' via {cast}' if cast else ''
+            lines.append(f'  {source} -> {", ".join(children)}{via}')
+        return '\n'.join(lines)
+
+
+def _min_cut_source_side(capacities: Dict[object, Dict[object, float]],
+                         source: object, sink: object) -> set:
+    """Nodes on the source side of a minimum s-t cut.
+
+    Pushes flow along shortest augmenting paths (Edmonds-Karp) in a
+    graph given as nested dicts of edge capacities.
+
+    """
+    residual = collections.defaultdict(dict)
+    for u, edges in capacities.items():
+        for v, cap in edges.items():
+            residual[u][v] = residual[u].get(v, 0) + cap
+            residual[v].setdefault(u, 0)
+
+    while True:
+        # Breadth-first search for an augmenting path
+        parents = {source: None}
+        queue = collections.deque([source])
+        while queue and sink not in parents:
+            u = queue.popleft()
+            for v, cap in residual[u].items():
+                if cap > 0 and v not in parents:
+                    parents[v] = u
+                    queue.append(v)
+        if sink not in parents:
+            # Nodes reachable in the residual graph
+            return set(parents)
+
+        # Push flow along path
+        path = []
+        v = sink
+        while parents[v] is not None:
+            path.append((parents[v], v))
+            v = parents[v]
+        flow = min(residual[u][v] for u, v in path)
+        for u, v in path:
+            residual[u][v] -= flow
+            residual[v][u] += flow
+
+
+def _activation_entries(model: lbann.Model, layers, input_dims):
+    """Entries in each layer's outputs per sample."""
+    if input_dims is None:
+        return {l: 1 for l in layers}
+    from lbann.util.cost_model import estimate_model
+
+    # Exporting the model sets datatypes of operator layers
+    datatypes = [l.datatype for l in layers]
+    estimate = estimate_model(model, 1, input_dims)
+    for layer, datatype in zip(layers, datatypes):
+        layer.datatype = datatype
+    entries = {
+        l.name: sum(functools.reduce(lambda a, b: a * b, d, 1)
+                    for d in l.output_dims)
+        for l in estimate.layers
+    }
+    return {l: entries.get(l.name, 1) for l in layers}
+
+
+def _conversions(layers, datatypes, shared: bool):
+    """Groups of children that convert a layer's output."""
+    groups = []
+    for layer in layers:
+        by_datatype = collections.defaultdict(list)
+        for child in layer.children:
+            if datatypes[child] != datatypes[layer]:
+                by_datatype[datatypes[child]].append(child)
+        for datatype, children in by_datatype.items():
+            if shared and type(layer) not in MULTI_OUTPUT_LAYERS:
+                groups.append((layer, datatype, children))
+            else:
+                groups.extend((layer, datatype, [c]) for c in children)
+    return groups
+
+
+def _traffic(layers, datatypes, entries, conversions) -> int:
+    """Estimated bytes of activation traffic per sample."""
+    total = 0
+    for layer in layers:
+        size = DATATYPE_BYTES.get(datatypes[layer], 4)
+        total += entries[layer] * size * (1 + len(layer.children))
+    for layer, datatype, _ in conversions:
+        total += entries[layer] * (DATATYPE_BYTES.get(datatypes[layer], 4) +
+                                   DATATYPE_BYTES.get(datatype, 4))
+    return total
+
+
+def plan_layer_datatypes(
+        model: lbann.Model,
+        input_dims: Optional[Union[Sequence[int],
+                                   Dict[str, Sequence[int]]]] = None,
+        insert_casts: bool = True) -> AmpPlan:
+    """Set datatypes for layers to minimize precision conversions.
+
+    Layers in `FP16_LAYERS` run in FP16 and layers in `FP32_LAYERS`
+    (which are numerically sensitive) run in FP32. Layers that already
+    have a datatype keep it. The remaining layers are assigned FP16 or
+    FP32 to minimize the estimated activation traffic, including the
+    conversions at precision boundaries, which is found exactly as a
+    minimum cut of the layer graph.
+
+    If `insert_casts` is set, children that need the same conversion
+    of a layer's output share an `Identity` layer that converts it
+    once, instead of each converting their input.
+
+    Args:
+        model: Model whose layers are assigned datatypes.
+        input_dims: Sample dimensions of input layers (see
+            `lbann.Model.estimate`), used to weight tensors by size.
+            If not given, every tensor has the same weight.
+        insert_casts: Whether to insert shared conversion layers.
+
+    Returns:
+        AmpPlan: Chosen datatypes, conversions and estimated savings.
+
+    """
+    layers = list(lbann.traverse_layer_graph(model.layers))
+    entries = _activation_entries(model, layers, input_dims)
+    FP16, FP32 = lbann.DataType.FP16, lbann.DataType.FLOAT
+    infinity = float('inf')
+
+    # Labeling cost as a graph cut: layers on the source side are FP16
+    source, sink = object(), object()
+    capacities = collections.defaultdict(dict)
+    for layer in layers:
+        traffic = entries[layer] * (1 + len(layer.children))
+        fp16_cost = DATATYPE_BYTES[FP16] * traffic
+        fp32_cost = DATATYPE_BYTES[FP32] * traffic
+        fixed = layer.datatype
+        if fixed is None and type(layer) in FP16_LAYERS:
+            fixed = FP16
+        elif fixed is None and type(layer) in FP32_LAYERS:
+            fixed = FP32
+        if fixed is not None:
+            fp16_cost = 0 if fixed == FP16 else infinity
+            fp32_cost = 0 if fixed == FP32 else infinity
+            if fixed not in (FP16, FP32):
+                continue  # Layer is not part of the cut
+        capacities[source][layer] = fp32_cost
+        capacities[layer][sink] = fp16_cost
+    for layer in layers:
+        for child in layer.children:
+            if layer in capacities and child in capacities:
+                cast_cost = entries[layer] * (DATATYPE_BYTES[FP16] +
+                                              DATATYPE_BYTES[FP32])
+                capacities[layer][child] = (capacities[layer].get(child, 0) +
+                                            cast_cost)
+                capacities[child][layer] = (capacities[child].get(layer, 0) +
+                                            cast_cost)
+    fp16_layers = _min_cut_source_side(capacities, source, sink)
+    datatypes = {
+        l: (l.datatype if l not in capacities else
+            FP16 if l in fp16_layers else FP32)
+        for l in layers
+    }
+
+    # Compare with conversion lists and widest-parent rule
+    baseline = _widest_parent_datatypes(layers)
+    baseline_conversions = _conversions(layers, baseline, False)
+    conversions = _conversions(layers, datatypes, insert_casts)
+    plan = AmpPlan(
+        datatypes={l.name: datatypes[l] for l in layers},
+        num_casts=len(conversions),
+        baseline_num_casts=len(baseline_conversions),
+        bytes=_traffic(layers, datatypes, entries, conversions),
+        baseline_bytes=_traffic(layers, baseline, entries,
+                                baseline_conversions),
+    )
+
+    # Apply datatypes and insert conversion layers
+    for layer in layers:
+        layer.datatype = datatypes[layer]
+    for layer, datatype, children in conversions:
+        cast = None
+        if insert_casts and len(children) > 1:
+            suffix = 'fp16' if datatype == FP16 else 'fp32'
+            cast = lbann.Identity(datatype=datatype,
+                                  device=layer.device,
+                                  data_layout=layer.data_layout,
+                                  name=f'{layer.name}_{suffix}')
+            for child in children:
+                child.parents = [cast if p is layer else p
+                                 for p in child.parents]
+                layer.children.remove(child)
+                cast.children.append(child)
+            layer.children.append(cast)
+            cast.parents.append(layer)
+        plan.conversions.append(
+            (layer.name, cast.name if cast else None,
+             [c.name for c in children]))
+    model.layers = list(lbann.traverse_layer_graph(model.layers))
+    return plan
 
 
 def enable_amp(model: lbann.Model,
@@ -170,8 +444,20 @@ def enable_amp(model: lbann.Model,
                init_scale: Optional[float] = None,
                growth_factor: Optional[float] = None,
                backoff_factor: Optional[float] = None,
-               growth_interval: Optional[int] = None) -> None:
-    """Enable automatic mixed precision for a model if requested."""
+               growth_interval: Optional[int] = None,
+               input_dims: Optional[Union[Sequence[int],
+                                          Dict[str, Sequence[int]]]] = None
+               ) -> Optional[AmpPlan]:
+    """Enable automatic mixed precision for a model if requested.
+
+    With `--amp-planner`, layer datatypes are chosen by
+    `plan_layer_datatypes`, which uses `input_dims` if given.
+
+    Returns:
+        AmpPlan: Datatype plan, if `--amp-planner` was given. None
+            otherwise.
+
+    """
     if model.amp is not None:
         raise RuntimeError('Model already has AMP options set, not resetting')
 
@@ -182,11 +468,15 @@ def enable_amp(model: lbann.Model,
                          '`add_amp_arguments`')
 
     if not enable_amp:
-        return
+        return None
 
     # Set up datatypes.
     add_weights(model)
-    set_layer_datatypes(model)
+    if getattr(args, 'amp_planner', False):
+        plan = plan_layer_datatypes(model, input_dims)
+    else:
+        plan = None
+        set_layer_datatypes(model)
 
     # Enable AMP in the model.
     model.amp = lbann.AmpOptions(
@@ -195,3 +485,4 @@ def enable_amp(model: lbann.Model,
         growth_factor=growth_factor,
         backoff_factor=backoff_factor,
         growth_interval=growth_interval)
+    return plan
@@ -0,0 +1,521 @@
+"""Static estimates of a model's memory use and compute cost.
+
+Infers the output dimensions of each layer in an exported model and
+estimates the bytes held by its activations and weights and the FLOPs
+of its forward and backward passes. The estimates are analytic: they
+count multiply-adds in dense layers and a small constant per tensor
+entry elsewhere, and do not account for workspaces, error signals or
+communication buffers.
+
+Layers without a shape rule are assumed to output a tensor with the
+dimensions of their first parent and are flagged as unsupported in the
+estimate.
+
+"""
+
+from dataclasses import dataclass, field
+import functools
+import io
+import operator
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from lbann import DataType
+
+# Bytes per tensor entry
+DATATYPE_BYTES = {
+    DataType.FLOAT: 4,
+    DataType.DOUBLE: 8,
+    DataType.FP16: 2,
+    DataType.COMPLEX_FLOAT: 8,
+    DataType.COMPLEX_DOUBLE: 16,
+}
+
+# FLOPs per output entry of layers without a specific cost rule.
+# Layers not listed cost one FLOP per output entry.
+FLOPS_PER_ENTRY = {
+    'input': 0,
+    'constant': 0,
+    'identity': 0,
+    'reshape': 0,
+    'split': 0,
+    'slice': 0,
+    'concatenation': 0,
+    'permute': 0,
+    'crop': 0,
+    'stop_gradient': 0,
+    'dummy': 0,
+    'weights_layer': 0,
+    'elu': 4,
+    'softmax': 5,
+    'log_softmax': 5,
+    'channelwise_softmax': 5,
+    'batch_normalization': 5,
+    'entrywise_batch_normalization': 5,
+    'layer_norm': 8,
+    'instance_norm': 8,
+    'local_response_normalization': 10,
+    'gaussian': 10,
+    'uniform': 4,
+}
+
+# Layers that produce one output tensor per child
+MULTI_OUTPUT_LAYERS = frozenset(['slice', 'split'])
+
+# Layers that output a tensor with the dimensions of their first input
+ELEMENTWISE_LAYERS = frozenset([
+    'relu', 'elu', 'leaky_relu', 'selu_dropout', 'dropout', 'identity',
+    'identity_zero', 'stop_gradient', 'softmax', 'log_softmax',
+    'channelwise_softmax', 'operator_layer', 'sum', 'weighted_sum',
+    'hadamard', 'batch_normalization', 'entrywise_batch_normalization',
+    'layer_norm', 'instance_norm', 'local_response_normalization',
+    'channelwise_scale_bias', 'entrywise_scale_bias', 'split', 'sort',
+    'bernoulli', 'rotation', 'cutout', 'composite_image_transformation',
+    'dft_abs', 'uniform_hash', 'in_top_k', 'batchwise_reduce_sum',
+    'evaluation', 'dummy'
+])
+
+# Layers that output a scalar
+SCALAR_LAYERS = frozenset([
+    'reduction', 'l1_norm', 'l2_norm2', 'mean_squared_error',
+    'mean_absolute_error', 'cross_entropy', 'categorical_accuracy',
+    'top_k_categorical_accuracy', 'covariance', 'variance', 'argmax',
+    'argmin', 'mini_batch_index', 'mini_batch_size'
+])
+
+
+@dataclass
+class LayerEstimate:
+    """Estimated cost of a layer.
+
+    Activation bytes and FLOPs are per sample. Weights shared by
+    several layers are only counted in the weight bytes of the first
+    one, but every layer that uses them computes weight gradients in
+    back prop.
+
+    """
+    name: str
+    type: str
+    output_dims: List[Tuple[int, ...]]
+    activation_bytes: int = 0
+    weight_bytes: int = 0
+    forward_flops: int = 0
+    backward_flops: int = 0
+    supported: bool = True
+
+
+@dataclass
+class ModelEstimate:
+    """Estimated cost of a model for a mini-batch.
+
+    Attributes:
+        mini_batch_size (int): Samples per mini-batch.
+        layers (list of LayerEstimate): Per-layer estimates, in
+            topological order.
+        peak_activation_bytes (int): Largest total size of the
+            activations that are live at the same time during forward
+            prop, freeing each activation after its last child is
+            computed.
+        peak_layer (str): Layer being computed at the peak.
+        total_activation_bytes (int): Total size of all activations,
+            which are all kept for back prop during training.
+        weight_bytes (int): Total size of the weights.
+        forward_flops (int): FLOPs of forward prop.
+        backward_flops (int): FLOPs of back prop.
+
+    """
+    mini_batch_size: int
+    layers: List[LayerEstimate] = field(default_factory=list)
+    peak_activation_bytes: int = 0
+    peak_layer: Optional[str] = None
+    total_activation_bytes: int = 0
+    weight_bytes: int = 0
+    forward_flops: int = 0
+    backward_flops: int = 0
+
+    @property
+    def unsupported_layers(self) -> List[str]:
+        """Names of layers without a shape rule."""
+        return [l.name for l in self.layers if not l.supported]
+
+    def to_dict(self) -> dict:
+        """Estimate as nested dicts and lists, e.g. for JSON output."""
+        return dict(
+            mini_batch_size=self.mini_batch_size,
+            peak_activation_bytes=self.peak_activation_bytes,
+            peak_layer=self.peak_layer,
+            total_activation_bytes=self.total_activation_bytes,
+            weight_bytes=self.weight_bytes,
+            forward_flops=self.forward_flops,
+            backward_flops=self.backward_flops,
+            layers=[l.__dict__.copy() for l in self.layers],
+        )
+
+    def summary(self) -> str:
+        """Human-readable table of the estimate."""
+        out = io.StringIO()
+        out.write(f'{"Layer":<24} {"Type":<22} {"Output dims":<18} '
+                  f'{"Act. B/sample":>14} {"Weight B":>12} '
+                  f'{"Fwd FLOP/sample":>16} {"Bwd FLOP/sample":>16}\n')
+        for l in self.layers:
+            dims = ' '.join('x'.join(map(str, d)) for d in l.output_dims)
+            ltype = l.type if l.supported else l.type + '*'
+            out.write(f'{l.name[:24]:<24} {ltype[:22]:<22} {dims[:18]:<18} '
+                      f'{l.activation_bytes:>14} {l.weight_bytes:>12} '
+                      f'{l.forward_flops:>16} {l.backward_flops:>16}\n')
+        out.write(f'Mini-batch size: {self.mini_batch_size}\n')
+        out.write(f'Peak live activations: '
+                  f'{_format_bytes(self.peak_activation_bytes)} '
+                  f'(at {self.peak_layer})\n')
+        out.write(f'All activations: '
+                  f'{_format_bytes(self.total_activation_bytes)}\n')
+        out.write(f'Weights: {_format_bytes(self.weight_bytes)}\n')
+        out.write(f'Forward: {self.forward_flops:.3e} FLOPs\n')
+        out.write(f'Backward: {self.backward_flops:.3e} FLOPs\n')
+        if self.unsupported_layers:
+            out.write('* Unsupported layer type, assumed to keep the '
+                      'dimensions of its first parent\n')
+        return out.getvalue()
+
+
+def _format_bytes(num_bytes: int) -> str:
+    if num_bytes < 1024:
+        return f'{num_bytes} B'
+    for unit in ('KiB', 'MiB', 'GiB', 'TiB'):
+        num_bytes /= 1024
+        if num_bytes < 1024 or unit == 'TiB':
+            return f'{num_bytes:.1f} {unit}'
+
+
+def _prod(dims) -> int:
+    return functools.reduce(operator.mul, dims, 1)
+
+
+def _broadcast(values, num_dims: int, default: int) -> List[int]:
+    """Expand a per-dimension parameter given as zero or one values."""
+    values = list(values)
+    if not values:
+        return [default] * num_dims
+    if len(values) == 1:
+        return values * num_dims
+    return values
+
+
+def _infer_dims(dims: Sequence[int], size: int) -> Tuple[int, ...]:
+    """Replace a -1 in dimensions so they match a tensor size."""
+    dims = list(dims)
+    if -1 in dims:
+        known = -_prod(dims)
+        dims[dims.index(-1)] = size // known if known else 0
+    return tuple(dims)
+
+
+def _window_layer(in_dims, kernel, stride, padding, dilation):
+    """Output spatial dims of convolution or pooling."""
+    spatial = in_dims[1:]
+    out = []
+    for i, k, s, p, d in zip(spatial, kernel, stride, padding, dilation):
+        out.append((i + 2 * p - d * (k - 1) - 1) // s + 1)
+    return out
+
+
+def _layer_cost(ltype, params, proto, in_dims, hint_dims, input_dims):
+    """Output dims, forward FLOPs and weight entries of a layer.
+
+    Returns None for layer types without a shape rule.
+
+    """
+    x = in_dims[0] if in_dims else None
+    flops = None
+    weights = 0
+
+    if ltype == 'input':
+        field_name = params.data_field or 'samples'
+        if field_name not in input_dims:
+            raise ValueError(
+                f'Dimensions of input layer "{proto.name}" with data '
+                f'field "{field_name}" are not given')
+        outs = [tuple(input_dims[field_name])]
+    elif ltype == 'split' and proto.children:
+        outs = [x] * len(proto.children)
+    elif ltype in ELEMENTWISE_LAYERS:
+        outs = [x]
+        if ltype == 'operator_layer':
+            flops = _prod(x) * max(len(params.ops), 1)
+        elif ltype in ('sum', 'weighted_sum', 'hadamard'):
+            flops = _prod(x) * max(len(in_dims) - 1, 1)
+        if ltype in ('batch_normalization', 'channelwise_scale_bias'):
+            weights = (4 if ltype == 'batch_normalization' else 2) * x[0]
+        elif ltype == 'entrywise_batch_normalization':
+            weights = 2 * _prod(x)
+        elif ltype == 'entrywise_scale_bias':
+            weights = 2 * _prod(x)
+        elif ltype == 'layer_norm':
+            start = params.start_dim if params.start_dim >= 0 else (
+                len(x) + params.start_dim)
+            weights = (int(params.scale) + int(params.bias)) * _prod(
+                x[start:])
+    elif ltype in SCALAR_LAYERS:
+        outs = [(1, )]
+        flops = sum(_prod(d) for d in in_dims)
+    elif ltype == 'fully_connected':
+        size = _prod(x)
+        outs = [(params.num_neurons, )]
+        flops = 2 * size * params.num_neurons
+        weights = size * params.num_neurons + (params.num_neurons
+                                              if params.has_bias else 0)
+    elif ltype == 'channelwise_fully_connected':
+        out_channel = tuple(params.output_channel_dims)
+        in_channel = _prod(x[1:])
+        out_size = _prod(out_channel)
+        outs = [(x[0], ) + out_channel]
+        flops = 2 * x[0] * in_channel * out_size
+        has_bias = params.bias.value if params.HasField('bias') else True
+        weights = in_channel * out_size + (out_size if has_bias else 0)
+    elif ltype in ('convolution', 'deconvolution'):
+        num_dims = len(x) - 1
+        kernel = _broadcast(params.kernel_size, num_dims, 1)
+        stride = _broadcast(params.stride, num_dims, 1)
+        padding = _broadcast(params.padding, num_dims, 0)
+        dilation = _broadcast(params.dilation, num_dims, 1)
+        groups = params.groups.value if params.HasField('groups') else 1
+        has_bias = (params.has_bias.value
+                    if params.HasField('has_bias') else True)
+        if ltype == 'convolution':
+            spatial = _window_layer(x, kernel, stride, padding, dilation)
+            flops = (2 * _prod(spatial) * params.out_channels *
+                     (x[0] // groups) * _prod(kernel))
+        else:
+            out_padding = _broadcast(params.output_padding, num_dims, 0)
+            spatial = [(i - 1) * s - 2 * p + d * (k - 1) + op + 1
+                       for i, k, s, p, d, op in zip(x[1:], kernel, stride,
+                                                    padding, dilation,
+                                                    out_padding)]
+            flops = (2 * _prod(x[1:]) * x[0] *
+                     (params.out_channels // groups) * _prod(kernel))
+        outs = [(params.out_channels, ) + tuple(spatial)]
+        in_channels, out_channels = ((x[0], params.out_channels)
+                                     if ltype == 'convolution' else
+                                     (params.out_channels, x[0]))
+        weights = (out_channels * (in_channels // groups) * _prod(kernel) +
+                   (params.out_channels if has_bias else 0))
+    elif ltype == 'pooling':
+        num_dims = len(x) - 1
+        if params.has_vectors:
+            kernel = _broadcast(params.pool_dims, num_dims, 1)
+            stride = _broadcast(params.pool_strides, num_dims, 1)
+            padding = _broadcast(params.pool_pads, num_dims, 0)
+        else:
+            kernel = [params.pool_dims_i] * num_dims
+            stride = [params.pool_strides_i or 1] * num_dims
+            padding = [params.pool_pads_i] * num_dims
+        spatial = _window_layer(x, kernel, stride, padding, [1] * num_dims)
+        outs = [(x[0], ) + tuple(spatial)]
+        flops = _prod(outs[0]) * _prod(kernel)
+    elif ltype == 'upsample':
+        num_dims = len(x) - 1
+        scale = (_broadcast(params.scale_factors, num_dims, 1)
+                 if params.has_vectors else [params.scale_factors_i] *
+                 num_dims)
+        outs = [(x[0], ) + tuple(i * s for i, s in zip(x[1:], scale))]
+    elif ltype == 'unpooling':
+        outs = [hint_dims]
+    elif ltype == 'bilinear_resize':
+        outs = [tuple(x[:-2]) + (params.height, params.width)]
+        flops = 8 * _prod(outs[0])
+    elif ltype in ('embedding', 'dist_embedding'):
+        outs = [tuple(x) + (params.embedding_dim, )]
+        weights = params.num_embeddings * params.embedding_dim
+    elif ltype == 'matmul':
+        a, b = in_dims[0], in_dims[1]
+        m, k = (a[-1], a[-2]) if params.transpose_a else (a[-2], a[-1])
+        n = b[-2] if params.transpose_b else b[-1]
+        outs = [tuple(a[:-2]) + (m, n)]
+        flops = 2 * _prod(a[:-2]) * m * k * n
+    elif ltype == 'concatenation':
+        axis = params.axis
+        out = list(x)
+        out[axis] = sum(d[axis] for d in in_dims)
+        outs = [tuple(out)]
+    elif ltype == 'slice':
+        points = list(params.slice_points)
+        outs = []
+        for start, end in zip(points[:-1], points[1:]):
+            out = list(x)
+            out[params.axis] = end - start
+            outs.append(tuple(out))
+    elif ltype == 'reshape':
+        outs = [_infer_dims(params.dims, _prod(x))]
+    elif ltype in ('tessellate', 'crop', 'scatter'):
+        outs = [tuple(params.dims)]
+    elif ltype in ('constant', 'gaussian', 'uniform'):
+        dims = (params.num_neurons
+                if ltype == 'constant' else params.neuron_dims)
+        outs = [tuple(dims) if dims else hint_dims]
+    elif ltype == 'weights_layer':
+        outs = [tuple(params.dims)]
+        weights = _prod(params.dims)
+    elif ltype == 'permute':
+        outs = [tuple(x[a] for a in params.axes)]
+    elif ltype == 'one_hot':
+        outs = [(params.size, )]
+    elif ltype == 'channelwise_mean':
+        outs = [(x[0], )]
+        flops = _prod(x)
+    elif ltype == 'multidim_reduction':
+        out = tuple(d for i, d in enumerate(x) if i not in set(params.axes))
+        outs = [out or (1, )]
+        flops = _prod(x)
+    elif ltype == 'gather':
+        values, indices = in_dims[0], in_dims[1]
+        if len(values) == 1:
+            outs = [tuple(indices)]
+        elif params.HasField('axis') and params.axis.value == 1:
+            outs = [(values[0], indices[-1])]
+        else:
+            outs = [(indices[-1], values[1])]
+    else:
+        return None
+
+    if flops is None:
+        flops = FLOPS_PER_ENTRY.get(ltype, 1) * sum(map(_prod, outs))
+    return outs, flops, weights
+
+
+def _topological_order(layers) -> list:
+    """Sort layer messages so parents and hint layers come first.
+
+    Layers that are already sorted keep their order.
+
+    """
+    by_name = {l.name: l for l in layers}
+    visited = set()
+    order = []
+    for root in layers:
+        stack = [(root, False)]
+        while stack:
+            l, expanded = stack.pop()
+            if expanded:
+                order.append(l)
+                continue
+            if l.name in visited:
+                continue
+            visited.add(l.name)
+            stack.append((l, True))
+            deps = list(l.parents)
+            if l.hint_layer:
+                deps.append(l.hint_layer)
+            for name in reversed(deps):
+                if name in by_name and name not in visited:
+                    stack.append((by_name[name], False))
+    return order
+
+
+def estimate_model(model,
+                   mini_batch_size: int,
+                   input_dims: Union[Sequence[int], Dict[str, Sequence[int]]],
+                   default_datatype: Optional[int] = None) -> ModelEstimate:
+    """Estimate the memory use and compute cost of a model.
+
+    Args:
+        model (lbann_pb2.Model or lbann.Model): Model, exported to
+            Protobuf if needed.
+        mini_batch_size (int): Samples per mini-batch.
+        input_dims (list of int or dict of {str: list of int}):
+            Dimensions of a sample for each data field of the input
+            layers (e.g. ``{'samples': [3, 224, 224], 'labels':
+            [1000]}``). A single list is used for all input layers.
+        default_datatype (lbann.DataType, optional): Data type of
+            layers that do not set one (default: FLOAT).
+
+    Returns:
+        ModelEstimate: Per-layer and total estimates.
+
+    """
+    if default_datatype is None:
+        default_datatype = DataType.FLOAT
+    if hasattr(model, 'export_proto'):
+        model = model.export_proto()
+    if not isinstance(input_dims, dict):
+        input_dims = {
+            l.input.data_field or 'samples': input_dims
+            for l in model.layer if l.WhichOneof('layer_type') == 'input'
+        }
+
+    layers = _topological_order(list(model.layer))
+    estimate = ModelEstimate(mini_batch_size)
+    output_dims = {}
+    children = {l.name: list(l.children) for l in layers}
+    counted_weights = set()
+
+    # Number of times each layer is consumed by a child
+    num_consumers = {}
+    for l in layers:
+        for p in l.parents:
+            num_consumers[p] = num_consumers.get(p, 0) + 1
+    live = {}
+    live_bytes = 0
+
+    for l in layers:
+        ltype = l.WhichOneof('layer_type') or 'unknown'
+        params = getattr(l, ltype, None)
+
+        # Dimensions of layer inputs
+        in_dims = []
+        for p in l.parents:
+            outs = output_dims[p]
+            index = 0
+            if len(outs) > 1 and l.name in children[p]:
+                index = children[p].index(l.name)
+            in_dims.append(outs[index])
+        hint_dims = (output_dims[l.hint_layer][0]
+                     if l.hint_layer in output_dims else None)
+
+        cost = _layer_cost(ltype, params, l, in_dims, hint_dims, input_dims)
+        supported = cost is not None
+        if not supported:
+            outs = [in_dims[0] if in_dims else (1, )]
+            cost = (outs, _prod(outs[0]), 0)
+        outs, flops, weights = cost
+        has_weights = weights > 0
+        if (l.weights and all(w in counted_weights for w in l.weights)):
+            weights = 0
+        counted_weights.update(l.weights)
+        output_dims[l.name] = outs
+
+        # Per-layer estimate
+        entry_bytes = DATATYPE_BYTES.get(l.datatype or default_datatype, 4)
+        layer = LayerEstimate(
+            name=l.name,
+            type=ltype,
+            output_dims=outs,
+            activation_bytes=entry_bytes * sum(map(_prod, outs)),
+            weight_bytes=entry_bytes * weights,
+            forward_flops=flops,
+            backward_flops=(
+                0 if ltype in ('input', 'constant', 'gaussian', 'uniform')
+                else 2 * flops if has_weights else flops),
+            supported=supported,
+        )
+        estimate.layers.append(layer)
+
+        # Live activations after computing layer, then free inputs
+        # that have no remaining children
+        size = layer.activation_bytes * mini_batch_size
+        live[l.name] = size
+        live_bytes += size
+        if live_bytes > estimate.peak_activation_bytes:
+            estimate.peak_activation_bytes = live_bytes
+            estimate.peak_layer = l.name
+        for p in l.parents:
+            num_consumers[p] -= 1
+            if num_consumers[p] == 0 and p in live:
+                live_bytes -= live.pop(p)
+
+    estimate.total_activation_bytes = mini_batch_size * sum(
+        l.activation_bytes for l in estimate.layers)
+    estimate.weight_bytes = sum(l.weight_bytes for l in estimate.layers)
+    estimate.forward_flops = mini_batch_size * sum(
+        l.forward_flops for l in estimate.layers)
+    estimate.backward_flops = mini_batch_size * sum(
+        l.backward_flops for l in estimate.layers)
+    return estimate
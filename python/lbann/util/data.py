@@ -1,12 +1,15 @@
 from abc import ABC, abstractmethod
+from collections import deque
 import os
+import ctypes
 import inspect
 import pickle
 import lbann
-from multiprocessing import Pool
+from lbann.util.sampler import IndexSampler
+from multiprocessing import Pool, Value
 from multiprocessing.shared_memory import SharedMemory
 import numpy as np
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 from numpy.typing import ArrayLike
 import concurrent.futures as cf
 
@@ -21,6 +24,7 @@ class Sample:
         sample: Optional[ArrayLike] = None,
         label: Optional[ArrayLike] = None,
         response: Optional[ArrayLike] = None,
+        **fields: ArrayLike,
     ) -> None:
         """
         Sample Constructor
@@ -31,6 +35,8 @@ class Sample:
         :type label: Optional[ArrayLike], optional
         :param response: Response input field, defaults to None
         :type response: Optional[ArrayLike], optional
+        :param fields: Additional named input fields
+        :type fields: ArrayLike
         """
         if sample is not None:
             self.sample = sample
@@ -38,11 +44,19 @@ class Sample:
             self.label = label
         if response is not None:
             self.response = response
+        for name, value in fields.items():
+            setattr(self, name, value)
 
 
 class SampleDims:
     """
     Describes the dimensions of the samples returned by a dataset.
+
+    Each data field may optionally declare the type its values are stored
+    and transferred in, e.g. ``int32`` for token IDs or ``uint8`` for
+    images. Values are only converted to the type expected by their
+    destination when a batch is assembled. Fields without a declared type
+    are transferred in the data reader's type.
     """
 
     def __init__(
@@ -50,6 +64,8 @@ class SampleDims:
         sample: Optional[ArrayLike] = None,
         label: Optional[ArrayLike] = None,
         response: Optional[ArrayLike] = None,
+        dtypes: Optional[Dict[str, str]] = None,
+        **fields: ArrayLike,
     ) -> None:
         """
         SampleDims Constructor
@@ -60,6 +76,10 @@ class SampleDims:
         :type label: Optional[ArrayLike], optional
         :param response: Response dimensions, defaults to None
         :type response: Optional[ArrayLike], optional
+        :param dtypes: Type of each data field, defaults to None
+        :type dtypes: Optional[Dict[str, str]], optional
+        :param fields: Dimensions of additional named data fields
+        :type fields: ArrayLike
         """
         if sample is not None:
             self.sample = sample
@@ -67,11 +87,34 @@ class SampleDims:
             self.label = label
         if response is not None:
             self.response = response
+        for name, dims in fields.items():
+            setattr(self, name, dims)
+        self.dtypes = dict(dtypes) if dtypes is not None else {}
+
+    def field_names(self) -> List[str]:
+        """
+        Names of the data fields described, in the order they are packed.
+
+        :return: Data field names
+        :rtype: List[str]
+        """
+        return [name for name in vars(self) if name != "dtypes"]
 
 
 class Dataset(ABC):
     """
     Abstract base class for datasets.
+
+    Datasets may optionally define ``__getitems__(indices)``, which loads
+    several samples at once and returns a single :class:`Sample` whose fields
+    are stacked along the first axis. When present, it is used by
+    :class:`DataReader` for worker tasks that load more than one sample.
+
+    Datasets holding large amounts of data should avoid loading it in the
+    constructor, since the dataset is pickled and copied into every data
+    reader worker. Instead, they should be shipped with a
+    :class:`DatasetFactory` and open their backing stores lazily, either on
+    first access or in :meth:`worker_init`.
     """
 
     @abstractmethod
@@ -107,6 +150,15 @@ class Dataset(ABC):
         """
         pass
 
+    def worker_init(self) -> None:
+        """
+        Called once in each data reader worker process before any samples
+        are loaded. Datasets may override this to open memory-mapped or
+        shared backing stores, or to seed per-worker random number
+        generators from :func:`get_worker_index`.
+        """
+        pass
+
 
 class DistConvDataset(Dataset):
     """
@@ -158,13 +210,389 @@ class DistConvDataset(Dataset):
         self._num_io_partitions = num_io_partitions
 
 
+class DatasetFactory(Dataset):
+    """
+    Ships a dataset as its constructor arguments instead of its contents.
+
+    Only the dataset class and its constructor arguments are pickled, and
+    each process that uses the dataset constructs its own instance. The
+    parent process constructs one when LBANN queries the dataset size and
+    sample dimensions. Every data reader worker then constructs its own in
+    :meth:`worker_init`, instead of receiving a copy of the parent's.
+
+    To benefit, a dataset must follow this protocol:
+
+    1. Its constructor arguments are small and picklable, e.g. file paths
+       and options.
+    2. Its constructor is cheap and does not load sample data into memory.
+       Large arrays are opened as memory maps (``np.load(...,
+       mmap_mode="r")``, ``np.memmap``) or attached from shared memory,
+       either on first access or in :meth:`Dataset.worker_init`.
+
+    Memory-mapped pages are then shared by all processes on a node through
+    the page cache, so resident memory does not grow with the number of
+    workers.
+
+    Attributes not defined by the factory, such as dataset-specific
+    metadata, are looked up on the constructed dataset.
+    """
+
+    def __init__(self, dataset_class: type, *args, **kwargs) -> None:
+        """
+        DatasetFactory Constructor
+
+        :param dataset_class: Dataset class, or any importable callable that
+            returns a dataset
+        :type dataset_class: type
+        :param args: Positional constructor arguments
+        :param kwargs: Keyword constructor arguments
+        """
+        self.dataset_class = dataset_class
+        self.args = args
+        self.kwargs = kwargs
+        self._dataset = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["_dataset"] = None
+        return state
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not found on the factory
+        if name.startswith("_") and name != "__getitems__":
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    @property
+    def dataset(self) -> Dataset:
+        """
+        Dataset instance owned by the current process.
+
+        :return: Constructed dataset
+        :rtype: Dataset
+        """
+        if self._dataset is None:
+            self._dataset = self.dataset_class(*self.args, **self.kwargs)
+        return self._dataset
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def __getitem__(self, index: int) -> Sample:
+        return self.dataset[index]
+
+    def get_sample_dims(self) -> SampleDims:
+        return self.dataset.get_sample_dims()
+
+    def worker_init(self) -> None:
+        """
+        Construct a fresh dataset in the worker process, discarding any
+        instance inherited from the parent process.
+        """
+        self._dataset = None
+        if hasattr(self.dataset, "worker_init"):
+            self.dataset.worker_init()
+
+
+class SampledDataset(Dataset):
+    """
+    Dataset whose sample order is determined by an :class:`IndexSampler`.
+
+    The data reader maps the positions requested by LBANN through the
+    sampler, so LBANN's own shuffling must be disabled. Samples are then
+    loaded from the wrapped dataset by their dataset index.
+
+    LBANN calls :meth:`set_trainer` after loading the dataset, so that each
+    trainer reads its own shard of the sampler's order.
+    """
+
+    def __init__(self, dataset: Dataset, sampler: IndexSampler) -> None:
+        """
+        SampledDataset Constructor
+
+        :param dataset: Wrapped dataset
+        :type dataset: Dataset
+        :param sampler: Sample order
+        :type sampler: IndexSampler
+        """
+        if sampler.num_samples != len(dataset):
+            raise ValueError(
+                f"sampler expects {sampler.num_samples} samples, "
+                f"but dataset has {len(dataset)}"
+            )
+        self.dataset = dataset
+        self.sampler = sampler
+        self.rank = 0
+
+    def set_trainer(self, trainer_index: int, num_trainers: int, rank: int) -> None:
+        """
+        Set the trainer of this process. Unless the sampler was given
+        explicit shards, it reads the shard of the trainer.
+
+        :param trainer_index: Index of the trainer
+        :type trainer_index: int
+        :param num_trainers: Number of trainers
+        :type num_trainers: int
+        :param rank: Rank in the trainer of this process
+        :type rank: int
+        """
+        self.rank = rank
+        if self.sampler.shard_by_trainer:
+            self.sampler.set_shard(num_trainers, trainer_index)
+
+    def __len__(self) -> int:
+        """
+        Number of samples per epoch, as determined by the sampler.
+
+        :return: Samples per epoch
+        :rtype: int
+        """
+        return len(self.sampler)
+
+    def __getitem__(self, index: int) -> Sample:
+        """
+        Load the sample at a dataset index.
+
+        :param index: Index in the wrapped dataset
+        :type index: int
+        :return: Sample
+        :rtype: Sample
+        """
+        return self.dataset[index]
+
+    def __getitems__(self, indices: List[int]) -> Sample:
+        """
+        Load several samples by their dataset indices.
+
+        The wrapped dataset is looked up at call time, so that wrapping a
+        :class:`DatasetFactory` does not construct and pickle its dataset.
+        Datasets without ``__getitems__`` load the samples one at a time.
+
+        :param indices: Indices in the wrapped dataset
+        :type indices: List[int]
+        :return: Samples whose fields are stacked along the first axis
+        :rtype: Sample
+        """
+        if hasattr(self.dataset, "__getitems__"):
+            return self.dataset.__getitems__(indices)
+        samples = [self.dataset[index] for index in indices]
+        return Sample(
+            **{
+                field: np.stack([np.ravel(getattr(s, field)) for s in samples])
+                for field in vars(samples[0])
+            }
+        )
+
+    def get_sample_dims(self) -> SampleDims:
+        """
+        Return the dimensions of the samples in the wrapped dataset.
+
+        :return: Sample dimensions of each data field
+        :rtype: SampleDims
+        """
+        return self.dataset.get_sample_dims()
+
+    def worker_init(self) -> None:
+        """
+        Initialize the wrapped dataset in a worker process.
+        """
+        if hasattr(self.dataset, "worker_init"):
+            self.dataset.worker_init()
+
+
+class SharedMemoryRing:
+    """
+    Preallocated ring of fixed-size shared-memory sample slots.
+
+    A single shared-memory segment is created by the parent process and
+    reused for the lifetime of the data reader. Worker processes attach to
+    the segment once and write samples directly into the slot assigned to
+    them by the parent, which recycles the slot once its samples have been
+    copied into a batch.
+
+    Each slot holds ``samples_per_slot`` samples. Within a slot, every data
+    field is stored in its own type as a contiguous
+    ``[samples_per_slot, field_size]`` block so that runs of samples can be
+    copied into a batch in one operation.
+    """
+
+    # Byte alignment of each field block within a slot
+    alignment = 64
+
+    def __init__(
+        self,
+        num_slots: int,
+        fields: Dict[str, Tuple[int, str]],
+        name: Optional[str] = None,
+        samples_per_slot: int = 1,
+    ) -> None:
+        """
+        SharedMemoryRing Constructor
+
+        :param num_slots: Number of slots in the ring
+        :type num_slots: int
+        :param fields: Number of entries per sample and type of each data
+            field, in the order the fields are packed into a slot
+        :type fields: Dict[str, Tuple[int, str]]
+        :param name: Name of an existing segment to attach to, defaults to None
+            (create a new segment)
+        :type name: Optional[str], optional
+        :param samples_per_slot: Number of samples held by each slot,
+            defaults to 1
+        :type samples_per_slot: int, optional
+        """
+        self.num_slots = num_slots
+        self.fields = {
+            field: (size, np.dtype(dtype)) for field, (size, dtype) in fields.items()
+        }
+        self.samples_per_slot = samples_per_slot
+
+        self.field_offsets = {}
+        offset = 0
+        for field, (size, dtype) in self.fields.items():
+            nbytes = samples_per_slot * size * dtype.itemsize
+            self.field_offsets[field] = (offset, offset + nbytes)
+            offset += -(-nbytes // self.alignment) * self.alignment
+        self.slot_bytes = offset
+
+        if name is None:
+            self.shm = SharedMemory(create=True, size=max(1, num_slots * offset))
+        else:
+            self.shm = SharedMemory(name=name)
+        self.slots = np.ndarray(
+            (num_slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf
+        )
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the underlying shared-memory segment.
+
+        :return: Shared-memory segment name
+        :rtype: str
+        """
+        return self.shm.name
+
+    def spec(self) -> tuple:
+        """
+        Arguments needed to attach to this ring from another process.
+
+        :return: Constructor arguments for attaching to the ring
+        :rtype: tuple
+        """
+        fields = {
+            field: (size, dtype.str) for field, (size, dtype) in self.fields.items()
+        }
+        return (self.num_slots, fields, self.name, self.samples_per_slot)
+
+    def field(self, slot: int, field: str) -> np.ndarray:
+        """
+        Return a view of one data field in a slot.
+
+        :param slot: Slot index
+        :type slot: int
+        :param field: Data field name
+        :type field: str
+        :return: ``[samples_per_slot, field_size]`` view into the
+            shared-memory segment
+        :rtype: np.ndarray
+        """
+        begin, end = self.field_offsets[field]
+        size, dtype = self.fields[field]
+        return (
+            self.slots[slot, begin:end]
+            .view(dtype)
+            .reshape(self.samples_per_slot, size)
+        )
+
+    def write(self, slot: int, sample: Sample, index: int = 0) -> None:
+        """
+        Copy a sample into a slot.
+
+        :param slot: Slot index
+        :type slot: int
+        :param sample: Sample to write
+        :type sample: Sample
+        :param index: Position of the sample within the slot, defaults to 0
+        :type index: int, optional
+        """
+        for field in self.fields:
+            if hasattr(sample, field):
+                self.field(slot, field)[index, :] = np.ravel(getattr(sample, field))
+
+    def write_batch(self, slot: int, samples: Sample) -> None:
+        """
+        Copy a batch of samples into a slot.
+
+        :param slot: Slot index
+        :type slot: int
+        :param samples: Samples whose fields are stacked along the first axis
+        :type samples: Sample
+        """
+        for field, (size, _) in self.fields.items():
+            if hasattr(samples, field):
+                values = np.asarray(getattr(samples, field))
+                values = values.reshape(len(values), size)
+                self.field(slot, field)[: len(values), :] = values
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        Detach from the shared-memory segment.
+
+        :param unlink: Also destroy the segment, defaults to False
+        :type unlink: bool, optional
+        """
+        if self.shm is None:
+            return
+        del self.slots
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+
+class _SlotTask:
+    """
+    Samples loaded, or being loaded, into one slot of a shared-memory ring.
+    """
+
+    def __init__(self, slot: int, num_samples: int, result) -> None:
+        self.slot = slot
+        self.start = 0
+        self.stop = num_samples
+        self.result = result
+
+
+# Index of the current data reader worker process
+g_worker_index = None
+
+
+def get_worker_index() -> Optional[int]:
+    """
+    Index of the current data reader worker process.
+
+    Workers are numbered from 0 in the order they start, so the indices do
+    not depend on process IDs. Available in :meth:`Dataset.worker_init`.
+
+    :return: Worker index, or None outside of data reader workers
+    :rtype: Optional[int]
+    """
+    return g_worker_index
+
+
 class DataReader:
     """
     Helper class used by LBANN to control worker processes and handle sample/batch loading.
     """
 
     def __init__(
-        self, dataset: Dataset, num_procs: int, prefetch_factor: int, dtype: str
+        self,
+        dataset: Dataset,
+        num_procs: int,
+        prefetch_factor: int,
+        dtype: str,
+        use_shm_ring: bool = True,
+        samples_per_task: int = 1,
     ) -> None:
         """
         DataReader Constructor
@@ -177,34 +605,76 @@ class DataReader:
         :type num_procs: int
         :param prefetch_factor: Number of samples to prefetch per worker
         :type prefetch_factor: int
-        :param dtype: Type of the batches to be returned
+        :param dtype: Type of the sample, label, and response batches to be
+            returned, and of data fields that do not declare a type
         :type dtype: str
+        :param use_shm_ring: Load samples into a preallocated ring of
+            shared-memory slots instead of creating a shared-memory segment
+            per sample, defaults to True
+        :type use_shm_ring: bool, optional
+        :param samples_per_task: Number of samples loaded by each worker task.
+            Values above 1 require the shared-memory ring, and
+            ``prefetch_factor`` then counts tasks rather than samples,
+            defaults to 1
+        :type samples_per_task: int, optional
         """
+        if samples_per_task > 1 and not use_shm_ring:
+            raise ValueError(
+                "loading several samples per worker task requires the "
+                "shared-memory ring"
+            )
+
         self.dataset = dataset
         self.num_procs = num_procs
         self.prefetch_factor = prefetch_factor
         self.dtype = dtype
+        self.samples_per_task = max(1, samples_per_task)
         self.sample_dims = dataset.get_sample_dims()
         self.num_io_partitions = 1
-        self.loaded_samples = []
+        self.loaded_samples = deque()
+        self.batch_buffers = []
+        self.sampler = None
+        self.epoch_start = None
+        self.mini_batch_stride = 0
+        self.batches_this_epoch = 0
         self.thread_pool = cf.ThreadPoolExecutor(max_workers=num_procs)
 
         if isinstance(self.dataset, DistConvDataset):
             self.num_io_partitions = self.dataset.num_io_partitions
+        if isinstance(self.dataset, SampledDataset):
+            self.sampler = self.dataset.sampler
+
+        self.ring = None
+        self.free_slots = deque()
+        self.pending_samples = deque()
+        if use_shm_ring:
+            self.ring = SharedMemoryRing(
+                max(1, num_procs * prefetch_factor),
+                self.get_fields(),
+                samples_per_slot=self.samples_per_task,
+            )
+            self.free_slots.extend(range(self.ring.num_slots))
 
         self.pool = Pool(
             processes=num_procs,
             initializer=DataReader.init_worker,
-            initargs=(self.dataset,),
+            initargs=(
+                self.dataset,
+                self.get_fields(),
+                self.ring.spec() if self.ring else None,
+                Value("i", 0),
+            ),
         )
 
     @staticmethod
-    def init_worker(dataset):
+    def init_worker(dataset, fields, ring_spec=None, num_started=None):
         """
         Initialize worker process.
 
         Disables the LBANN signal handler since it reports a spurious error
         when the worker process recieves SIGTERM from the master process.
+        Attaches to the parent's shared-memory ring if one is used, and
+        takes the next worker index from the shared ``num_started`` counter.
         """
         import signal
 
@@ -216,81 +686,187 @@ class DataReader:
                 pass
 
         # Process-local storage
-        global g_dataset
+        global g_dataset, g_fields, g_ring, g_worker_index
+        if num_started is not None:
+            with num_started.get_lock():
+                g_worker_index = num_started.value
+                num_started.value += 1
+        if hasattr(dataset, "worker_init"):
+            dataset.worker_init()
         g_dataset = dataset
+        g_fields = fields
+        g_ring = SharedMemoryRing(*ring_spec) if ring_spec is not None else None
+
+    def get_fields(self) -> Dict[str, Tuple[int, str]]:
+        """
+        Number of entries per sample and transfer type of each data field.
+
+        :return: Field sizes and types, in the order fields are packed into
+            a sample
+        :rtype: Dict[str, Tuple[int, str]]
+        """
+        dtypes = getattr(self.sample_dims, "dtypes", {})
+        fields = {}
+        for field in self.sample_dims.field_names():
+            size = int(np.prod(getattr(self.sample_dims, field)))
+            if field == "sample":
+                size //= self.num_io_partitions
+            fields[field] = (size, np.dtype(dtypes.get(field, self.dtype)).str)
+        return fields
+
+    def get_batch_dtype(self, field: str) -> np.dtype:
+        """
+        Type of a data field in batches returned by :meth:`get_batch`.
+
+        Sample, label, and response batches are consumed by LBANN and
+        returned in the data reader's type. Other data fields are returned
+        in their own type.
+
+        :param field: Data field name
+        :type field: str
+        :return: Batch type
+        :rtype: np.dtype
+        """
+        if field in ("sample", "label", "response"):
+            return np.dtype(self.dtype)
+        return np.dtype(self.get_fields()[field][1])
 
     def terminate(self) -> None:
         """
-        Terminate all worker processes.
+        Terminate all worker processes and release the shared-memory ring.
         """
         self.pool.terminate()
+        if self.ring is not None:
+            self.ring.close(unlink=True)
 
     @staticmethod
-    def load_sample(ind) -> Sample:
+    def load_sample(ind) -> str:
         """
-        Loads the sample from the dataset at the specified index.
-        This function must be called from a worker process.
+        Loads the sample from the dataset at the specified index into a new
+        shared-memory segment. This function must be called from a worker
+        process.
 
-        :param dataset: Dataset
-        :type dataset: Dataset
         :param ind: Index to load
         :type ind: int
-        :return: Sample
-        :rtype: Sample
+        :return: Name of the shared-memory segment holding the sample
+        :rtype: str
         """
-        samp = g_dataset[ind]
+        ring = SharedMemoryRing(1, g_fields)
+        ring.write(0, g_dataset[ind])
+        name = ring.name
+        ring.close()
+        return name
 
-        shm_size = 0
-        dtype = None
-        if hasattr(samp, "sample"):
-            dtype = samp.sample.dtype
-            shm_size += samp.sample.size
-        if hasattr(samp, "label"):
-            dtype = samp.label.dtype
-            shm_size += samp.label.size
-        if hasattr(samp, "response"):
-            dtype = samp.response.dtype
-            shm_size += samp.response.size
+    @staticmethod
+    def load_samples_into_slot(inds: List[int], slot: int) -> int:
+        """
+        Loads the samples from the dataset at the specified indices into a
+        slot of the shared-memory ring. This function must be called from a
+        worker process.
 
-        shm = SharedMemory(create=True, size=shm_size * dtype.itemsize)
-        shm_arr = np.ndarray(shm_size, dtype=dtype, buffer=shm.buf)
+        If the dataset defines ``__getitems__``, all samples are loaded with
+        a single call to it.
 
-        offset = 0
-        if hasattr(samp, "sample"):
-            new_offset = offset + samp.sample.size
-            shm_arr[offset:new_offset] = samp.sample.ravel()
-            offset = new_offset
-        if hasattr(samp, "label"):
-            new_offset = offset + samp.label.size
-            shm_arr[offset:new_offset] = samp.label.ravel()
-            offset = new_offset
-        if hasattr(samp, "response"):
-            new_offset = offset + samp.response.size
-            shm_arr[offset:new_offset] = samp.response.ravel()
-            offset = new_offset
-
-        shm.close()
-        return shm.name, shm_size
+        :param inds: Indices to load
+        :type inds: List[int]
+        :param slot: Ring slot to write the samples into
+        :type slot: int
+        :return: Ring slot holding the samples
+        :rtype: int
+        """
+        if len(inds) > 1 and hasattr(g_dataset, "__getitems__"):
+            g_ring.write_batch(slot, g_dataset.__getitems__(inds))
+        else:
+            for i, ind in enumerate(inds):
+                g_ring.write(slot, g_dataset[ind], i)
+        return slot
 
     def load_next_sample_async(self, ind: int):
         """
         Submit the next sample index to be loaded to the worker pool.
         """
-        self.loaded_samples.append(
-            self.pool.apply_async(DataReader.load_sample, (ind,))
-        )
+        if self.ring is None:
+            self.loaded_samples.append(
+                self.pool.apply_async(DataReader.load_sample, (ind,))
+            )
+            return
+
+        self.pending_samples.append(ind)
+        self.submit_pending_samples()
+
+    def submit_pending_samples(self) -> None:
+        """
+        Submit queued sample indices to the worker pool while ring slots are
+        available.
+        """
+        while self.free_slots and self.pending_samples:
+            slot = self.free_slots.popleft()
+            num_samples = min(self.samples_per_task, len(self.pending_samples))
+            inds = [self.pending_samples.popleft() for _ in range(num_samples)]
+            result = self.pool.apply_async(
+                DataReader.load_samples_into_slot, (inds, slot)
+            )
+            self.loaded_samples.append(_SlotTask(slot, num_samples, result))
 
     def queue_samples(self, inds: List[int]) -> None:
         """
         Set the indices to be loaded this epoch and start submitting jobs
         to the worker pool.
 
-        :param inds: List of sample indices
+        :param inds: List of sample indices. If the dataset has a sampler,
+            these are positions within the epoch.
         :type inds: List[int]
         """
+        if self.sampler is not None:
+            inds = self.sampler.lookup(self.epoch_start + np.asarray(inds)).tolist()
         for ind in inds:
             self.load_next_sample_async(ind)
 
+    def start_epoch(self, mini_batch_stride: int) -> None:
+        """
+        Prepare for a new epoch. Called by LBANN before the samples of an
+        epoch are queued.
+
+        If the dataset has a sampler, each epoch continues its stream of
+        samples where the previous one ended. The first epoch starts at the
+        sampler's cursor, so a restored cursor resumes mid-epoch.
+
+        :param mini_batch_stride: Number of samples in each mini-batch,
+            summed over the ranks of the trainer
+        :type mini_batch_stride: int
+        """
+        if self.sampler is None:
+            return
+
+        if self.epoch_start is None:
+            self.epoch_start = self.sampler.stream_position
+        else:
+            self.epoch_start += len(self.sampler)
+        self.mini_batch_stride = mini_batch_stride
+        self.batches_this_epoch = 0
+        self.sampler.seek(self.epoch_start)
+
+    def advance_sampler(self) -> None:
+        """
+        Move the sampler's cursor past the mini-batch that was just loaded
+        and periodically save it. All ranks of a trainer share the cursor,
+        so it is only saved by rank 0.
+        """
+        if self.sampler is None:
+            return
+
+        self.batches_this_epoch += 1
+        consumed = min(
+            self.batches_this_epoch * self.mini_batch_stride, len(self.sampler)
+        )
+        self.sampler.seek(self.epoch_start + consumed)
+        if (
+            self.sampler.cursor_path is not None
+            and self.dataset.rank == 0
+            and self.batches_this_epoch % self.sampler.save_interval == 0
+        ):
+            self.sampler.save()
+
     def get_batch(self, batch_size: int) -> Dict[str, Union[np.ndarray, int]]:
         """
         Return a batch of samples.
@@ -302,53 +878,156 @@ class DataReader:
         """
 
         batch = {}
-        if hasattr(self.sample_dims, "sample"):
-            sample_size = np.prod(self.sample_dims.sample) // self.num_io_partitions
-            batch["sample"] = np.empty([batch_size, sample_size], dtype=self.dtype)
-            batch["sample_ptr"] = batch["sample"].ctypes.data
-        if hasattr(self.sample_dims, "label"):
-            label_size = np.prod(self.sample_dims.sample)
-            batch["label"] = np.empty([batch_size, label_size], dtype=self.dtype)
-            batch["label_ptr"] = batch["label"].ctypes.data
-        if hasattr(self.sample_dims, "response"):
-            response_size = self.sample_dims.response
-            batch["response"] = np.empty([batch_size, response_size], dtype=self.dtype)
-            batch["response_ptr"] = batch["response"].ctypes.data
+        for field, (size, _) in self.get_fields().items():
+            batch[field] = np.empty(
+                [batch_size, size], dtype=self.get_batch_dtype(field)
+            )
+            batch[f"{field}_ptr"] = batch[field].ctypes.data
+
+        self.fill_batch(batch, batch_size)
+        self.advance_sampler()
+        return batch
+
+    def register_batch_buffers(self, buffers: Dict[str, tuple]) -> int:
+        """
+        Register persistent buffers that batches can be loaded into in place.
+
+        Each buffer is a column-major matrix owned by the caller, with one
+        column per sample. The memory must stay valid for the lifetime of
+        the data reader. Only the registered input fields are loaded, and
+        values are converted to the buffer's type as they are copied.
+
+        :param buffers: Pointer, leading dimension, number of columns and,
+            optionally, type of the buffer for each input field. Buffers
+            without a type are in the data reader's type.
+        :type buffers: Dict[str, tuple]
+        :return: Handle to pass to :meth:`get_batch_into`
+        :rtype: int
+        """
+        fields = self.get_fields()
+        views = {}
+        for field, (ptr, ldim, capacity, *dtype) in buffers.items():
+            if field not in fields:
+                raise ValueError(f"dataset does not provide input field {field}")
+            size = fields[field][0]
+            if ldim < size:
+                raise ValueError(
+                    f"buffer for input field {field} has leading dimension "
+                    f"{ldim}, but samples have {size} entries"
+                )
+            dtype = np.dtype(dtype[0] if dtype else self.dtype)
+            ctype = np.ctypeslib.as_ctypes_type(dtype)
+            array = np.ctypeslib.as_array(
+                ctypes.cast(ptr, ctypes.POINTER(ctype)), shape=(capacity, ldim)
+            )
+            views[field] = array[:, :size]
+        self.batch_buffers.append(views)
+        return len(self.batch_buffers) - 1
+
+    def get_batch_into(self, batch_size: int, buffers_id: int) -> None:
+        """
+        Load a batch of samples directly into registered buffers.
+
+        :param batch_size: Number of samples to load
+        :type batch_size: int
+        :param buffers_id: Handle returned by :meth:`register_batch_buffers`
+        :type buffers_id: int
+        """
+        batch = {}
+        for field, view in self.batch_buffers[buffers_id].items():
+            if batch_size > len(view):
+                raise ValueError(
+                    f"batch of {batch_size} samples does not fit in the "
+                    f"{len(view)} columns registered for input field {field}"
+                )
+            batch[field] = view[:batch_size]
+        self.fill_batch(batch, batch_size)
+        self.advance_sampler()
+
+    def fill_batch(self, batch: Dict[str, np.ndarray], batch_size: int) -> None:
+        """
+        Copy the next batch of loaded samples into batch arrays.
+
+        :param batch: ``[batch_size, field_size]`` array for each input field
+            to load
+        :type batch: Dict[str, np.ndarray]
+        :param batch_size: Number of samples to copy
+        :type batch_size: int
+        """
+        if self.ring is not None:
+            self.get_batch_from_ring(batch, batch_size)
+            return
+
+        fields = self.get_fields()
 
         def copy_to_array(i, sample):
-            shm_name, shm_size = sample.get()
-
-            shm = SharedMemory(name=shm_name)
-            shm_arr = np.ndarray(shm_size, dtype=self.dtype, buffer=shm.buf)
-
-            offset = 0
-            if hasattr(self.sample_dims, "sample"):
-                new_offset = offset + sample_size
-                batch["sample"][i, :] = shm_arr[offset:new_offset]
-                offset = new_offset
-            if hasattr(self.sample_dims, "label"):
-                new_offset = offset + label_size
-                batch["label"][i, :] = shm_arr[offset:new_offset]
-                offset = new_offset
-            if hasattr(self.sample_dims, "response"):
-                new_offset = offset + response_size
-                batch["response"][i, :] = shm_arr[offset:new_offset]
-                offset = new_offset
-
-            del shm_arr
-
-            shm.close()
-            shm.unlink()
+            ring = SharedMemoryRing(1, fields, name=sample.get())
+            for field in fields:
+                if field in batch:
+                    batch[field][i, :] = ring.field(0, field)[0]
+            ring.close(unlink=True)
 
         futures = []
         for i in range(batch_size):
             futures.append(
-                self.thread_pool.submit(copy_to_array, i, self.loaded_samples.pop(0))
+                self.thread_pool.submit(copy_to_array, i, self.loaded_samples.popleft())
             )
 
         cf.wait(futures)
 
-        return batch
+    def get_batch_from_ring(self, batch: Dict[str, np.ndarray], batch_size: int) -> None:
+        """
+        Fill a batch with samples loaded into the shared-memory ring.
+
+        Slots are recycled as soon as all of their samples have been copied,
+        so batches larger than the ring are filled in several waves.
+
+        :param batch: Batch arrays for each input field
+        :type batch: Dict[str, np.ndarray]
+        :param batch_size: Number of samples to copy
+        :type batch_size: int
+        """
+
+        def copy_from_slot(i, task, start, count):
+            task.result.get()
+            for field in self.ring.fields:
+                if field in batch:
+                    batch[field][i : i + count, :] = self.ring.field(
+                        task.slot, field
+                    )[start : start + count, :]
+            return task
+
+        i = 0
+        while i < batch_size:
+            if not self.loaded_samples:
+                raise RuntimeError(
+                    f"Python data reader requested {batch_size} samples, "
+                    f"but only {i} were queued"
+                )
+
+            # Copy every loaded task needed for this batch, possibly
+            # leaving part of the last one for the next batch
+            futures = []
+            for task in self.loaded_samples:
+                if i == batch_size:
+                    break
+                count = min(task.stop - task.start, batch_size - i)
+                futures.append(
+                    self.thread_pool.submit(copy_from_slot, i, task, task.start, count)
+                )
+                task.start += count
+                i += count
+
+            for future in cf.as_completed(futures):
+                task = future.result()
+                if task.start == task.stop:
+                    self.free_slots.append(task.slot)
+                    self.submit_pending_samples()
+
+            while self.loaded_samples and (
+                self.loaded_samples[0].start == self.loaded_samples[0].stop
+            ):
+                self.loaded_samples.popleft()
 
 
 def construct_python_dataset_reader(
@@ -360,12 +1039,17 @@ def construct_python_dataset_reader(
     validation_fraction: Optional[float] = 0.0,
     load_module: Optional[bool] = True,
     prefetch_factor: Optional[int] = 1,
+    samples_per_task: Optional[int] = 1,
+    sampler: Optional[IndexSampler] = None,
 ) -> lbann.reader_pb2.Reader:
     """
     Helper function to take a Dataset object, pickle it, save it, and return
     a LBANN data reader protobuf message.
 
-    :param dataset: Dataset
+    Datasets wrapped in a :class:`DatasetFactory` are pickled as their
+    constructor arguments and constructed separately in each process.
+
+    :param dataset: Dataset or dataset factory
     :type dataset: Dataset
     :param dataset_path: Path to save pickled dataset, defaults to the current working directory
     :type dataset_path: Optional[str], optional
@@ -382,22 +1066,44 @@ def construct_python_dataset_reader(
     :type load_module: Optional[bool], optional
     :param prefetch_factor: Number of samples to prefetch per data reader process, defaults to 1
     :type prefetch_factor: Optional[int], optional
+    :param samples_per_task: Number of samples loaded by each data reader
+        worker task. Values above 1 amortize task overhead for small samples,
+        and ``prefetch_factor`` then counts tasks rather than samples,
+        defaults to 1
+    :type samples_per_task: Optional[int], optional
+    :param sampler: Python-side sample order. LBANN's shuffling is disabled
+        and samples are read in the sampler's order. Each trainer reads its
+        own shard, unless the sampler has explicit shards, defaults to None
+    :type sampler: Optional[IndexSampler], optional
     :return: LBANN Reader protobuf message
     :rtype: lbann.reader_pb2.Reader
     """
     if dataset_path is None:
         dataset_path = os.path.join(os.getcwd(), f"{role}_dataset.pkl")
 
-    with open(dataset_path, "wb") as f:
-        pickle.dump(dataset, f)
-
     module_dir = None
     if load_module:
+        dataset_class = type(dataset)
+        if isinstance(dataset, DatasetFactory):
+            dataset_class = dataset.dataset_class
         try:
-            module_dir = os.path.dirname(inspect.getsourcefile(type(dataset)))
+            module_dir = os.path.dirname(inspect.getsourcefile(dataset_class))
         except:
             pass
 
+    if sampler is not None:
+        if isinstance(dataset, DistConvDataset):
+            raise ValueError("samplers are not supported for DistConv datasets")
+        if fraction_of_data_to_use != 1.0 or validation_fraction != 0.0:
+            raise ValueError(
+                "samplers require all samples to be used for the same role"
+            )
+        dataset = SampledDataset(dataset, sampler)
+        shuffle = False
+
+    with open(dataset_path, "wb") as f:
+        pickle.dump(dataset, f)
+
     reader = lbann.reader_pb2.Reader(
         name="python_dataset",
         role=role,
@@ -408,6 +1114,7 @@ def construct_python_dataset_reader(
             dataset_path=dataset_path,
             module_dir=module_dir,
             prefetch_factor=prefetch_factor,
+            samples_per_task=samples_per_task,
         ),
     )
 
@@ -0,0 +1,488 @@
+"""Simplification and fusion passes over the layer graph.
+
+The passes rewrite a model's layer graph in place before it is
+exported, so that LBANN executes fewer layers. This reduces per-layer
+overheads and the memory held for activations and error signals:
+
+- Constant folding: Layers whose inputs are all `Constant` layers are
+  replaced by `Constant` layers.
+- No-op removal: `Identity` layers, reshapes of tensors that already
+  have the requested dimensions and trivial operators (e.g. adding
+  zero) are bypassed. Reshapes of reshapes only reshape once. Tensor
+  dimensions are only known where the graph determines them, i.e.
+  downstream of layers that set their output dimensions (`Reshape`,
+  `Constant`, `Tessellate`, ...) through entrywise layers.
+- Deduplication: Layers that compute the same function of the same
+  parents (including layers sharing weights) are merged. Children of
+  multi-output layers such as `Slice` read different outputs and are
+  never merged.
+- Elementwise fusion: Chains of operator layers are merged into a
+  single operator layer that applies the operators in sequence.
+
+Layers whose names are referenced by the model's objective function,
+metrics, callbacks or hint layers keep their names, as do layers
+without children, so evaluation outputs are not affected.
+
+"""
+
+import math
+import re
+from typing import Dict, Iterable, Union
+
+import lbann
+from lbann.util import make_iterable
+from lbann.util.layer_types import MULTI_OUTPUT_LAYERS
+
+# Layers that are random or have internal state, so two instances with
+# the same parents may compute different outputs.
+NONDETERMINISTIC_LAYERS = frozenset([
+    lbann.Input,
+    lbann.Dummy,
+    lbann.Dropout,
+    lbann.SeluDropout,
+    lbann.Gaussian,
+    lbann.Uniform,
+    lbann.Bernoulli,
+    lbann.CategoricalRandom,
+    lbann.DiscreteRandom,
+    lbann.BatchNormalization,
+    lbann.EntrywiseBatchNormalization,
+])
+
+
+def _compare(predicate):
+    """Entrywise comparison returning 1 or 0."""
+    return lambda op, *xs: 1.0 if predicate(*xs) else 0.0
+
+
+# Scalar implementations of operators, used for constant folding.
+# Operators with rounding or approximation behavior that Python does
+# not reproduce exactly are omitted.
+FOLDABLE_OPERATORS = {
+    lbann.ops.Abs: lambda op, x: abs(x),
+    lbann.ops.Acos: lambda op, x: math.acos(x),
+    lbann.ops.Acosh: lambda op, x: math.acosh(x),
+    lbann.ops.Add: lambda op, x, y: x + y,
+    lbann.ops.AddConstant: lambda op, x: x + op.constant,
+    lbann.ops.Asin: lambda op, x: math.asin(x),
+    lbann.ops.Asinh: lambda op, x: math.asinh(x),
+    lbann.ops.Atan: lambda op, x: math.atan(x),
+    lbann.ops.Atanh: lambda op, x: math.atanh(x),
+    lbann.ops.Ceil: lambda op, x: float(math.ceil(x)),
+    lbann.ops.Clamp: lambda op, x: min(max(x, op.min), op.max),
+    lbann.ops.ConstantSubtract: lambda op, x: op.constant - x,
+    lbann.ops.Cos: lambda op, x: math.cos(x),
+    lbann.ops.Cosh: lambda op, x: math.cosh(x),
+    lbann.ops.Divide: lambda op, x, y: x / y,
+    lbann.ops.Equal: _compare(lambda x, y: x == y),
+    lbann.ops.EqualConstant: lambda op, x: float(x == op.constant),
+    lbann.ops.Erf: lambda op, x: math.erf(x),
+    lbann.ops.Exp: lambda op, x: math.exp(x),
+    lbann.ops.Expm1: lambda op, x: math.expm1(x),
+    lbann.ops.Floor: lambda op, x: float(math.floor(x)),
+    lbann.ops.Greater: _compare(lambda x, y: x > y),
+    lbann.ops.GreaterConstant: lambda op, x: float(x > op.constant),
+    lbann.ops.GreaterEqual: _compare(lambda x, y: x >= y),
+    lbann.ops.GreaterEqualConstant: lambda op, x: float(x >= op.constant),
+    lbann.ops.Less: _compare(lambda x, y: x < y),
+    lbann.ops.LessConstant: lambda op, x: float(x < op.constant),
+    lbann.ops.LessEqual: _compare(lambda x, y: x <= y),
+    lbann.ops.LessEqualConstant: lambda op, x: float(x <= op.constant),
+    lbann.ops.Log: lambda op, x: math.log(x),
+    lbann.ops.Log1p: lambda op, x: math.log1p(x),
+    lbann.ops.LogicalAnd: _compare(lambda x, y: x != 0 and y != 0),
+    lbann.ops.LogicalNot: _compare(lambda x: x == 0),
+    lbann.ops.LogicalOr: _compare(lambda x, y: x != 0 or y != 0),
+    lbann.ops.LogicalXor: _compare(lambda x, y: (x != 0) != (y != 0)),
+    lbann.ops.Max: lambda op, x, y: max(x, y),
+    lbann.ops.MaxConstant: lambda op, x: max(x, op.constant),
+    lbann.ops.Min: lambda op, x, y: min(x, y),
+    lbann.ops.MinConstant: lambda op, x: min(x, op.constant),
+    lbann.ops.Multiply: lambda op, x, y: x * y,
+    lbann.ops.Negative: lambda op, x: -x,
+    lbann.ops.NotEqual: _compare(lambda x, y: x != y),
+    lbann.ops.NotEqualConstant: lambda op, x: float(x != op.constant),
+    lbann.ops.Pow: lambda op, x, y: math.pow(x, y),
+    lbann.ops.Reciprocal: lambda op, x: 1 / x,
+    lbann.ops.Rsqrt: lambda op, x: 1 / math.sqrt(x),
+    lbann.ops.Scale: lambda op, x: op.constant * x,
+    lbann.ops.Sigmoid: lambda op, x: 1 / (1 + math.exp(-x)),
+    lbann.ops.Sign: lambda op, x: float((x > 0) - (x < 0)),
+    lbann.ops.Sin: lambda op, x: math.sin(x),
+    lbann.ops.Sinh: lambda op, x: math.sinh(x),
+    lbann.ops.Sqrt: lambda op, x: math.sqrt(x),
+    lbann.ops.Square: lambda op, x: x * x,
+    lbann.ops.SquaredDifference: lambda op, x, y: (x - y) * (x - y),
+    lbann.ops.Subtract: lambda op, x, y: x - y,
+    lbann.ops.SubtractConstant: lambda op, x: x - op.constant,
+    lbann.ops.Tan: lambda op, x: math.tan(x),
+    lbann.ops.Tanh: lambda op, x: math.tanh(x),
+}
+
+
+def _is_noop_operator(op: lbann.ops.Operator) -> bool:
+    """Whether an operator returns its input unchanged."""
+    if isinstance(op, (lbann.ops.AddConstant, lbann.ops.SubtractConstant)):
+        return op.constant == 0
+    if isinstance(op, lbann.ops.Scale):
+        return op.constant == 1
+    return False
+
+
+def _placement(layer: lbann.Layer) -> tuple:
+    """Datatype, device and distribution of a layer's outputs."""
+    return (layer.datatype or lbann.DataType.DEFAULT_DATATYPE,
+            (layer.device or '').lower(),
+            layer.data_layout or 'data_parallel',
+            tuple(sorted(layer.parallel_strategy.items())),
+            tuple(sorted(layer.grid_tag.items())))
+
+
+def _constant_dims(layer: lbann.Layer):
+    """Dimensions of a `Constant` layer, or None if set by a hint layer."""
+    if layer.num_neurons is None:
+        return None
+    return [int(d) for d in make_iterable(layer.num_neurons)]
+
+
+def _dims(value):
+    """Dimensions given as a list or a space-separated string."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split()
+    return [int(d) for d in make_iterable(value)]
+
+
+def _output_dims(layer: lbann.Layer):
+    """Output dimensions of a layer, if they follow from the graph.
+
+    Dimensions are known for layers that set them explicitly and for
+    entrywise layers with a parent of known dimensions. Returns
+    None otherwise, e.g. for layers that depend on the input data.
+
+    """
+    if layer.hint_layer is not None:
+        return None
+    if isinstance(layer, lbann.Constant):
+        return _constant_dims(layer)
+    if isinstance(layer, (lbann.Reshape, lbann.Tessellate,
+                          lbann.WeightsLayer)):
+        dims = _dims(layer.dims)
+        return None if dims is None or -1 in dims else dims
+    if isinstance(layer, (lbann.Gaussian, lbann.Uniform)):
+        return _dims(layer.neuron_dims)
+    if isinstance(layer, (lbann.Identity, lbann.OperatorLayer)):
+        # Inputs of entrywise layers all have the output dimensions
+        for parent in layer.parents:
+            if type(parent) in MULTI_OUTPUT_LAYERS:
+                continue
+            dims = _output_dims(parent)
+            if dims is not None:
+                return dims
+    return None
+
+
+def _message_names(message):
+    """Words in the string fields of a Protobuf message."""
+    for field, value in message.ListFields():
+        values = value if field.label == field.LABEL_REPEATED else (value, )
+        if field.type == field.TYPE_STRING:
+            for v in values:
+                yield from re.split(r'[\s,]+', v)
+        elif field.type == field.TYPE_MESSAGE:
+            for v in values:
+                yield from _message_names(v)
+
+
+def referenced_layer_names(model: lbann.Model) -> set:
+    """Names that may refer to layers outside of the layer graph.
+
+    Collects the words in all string fields of the model's objective
+    function, metrics and callbacks, as well as the names of hint
+    layers.
+
+    """
+    names = set()
+    messages = [model.objective_function.export_proto()]
+    messages.extend(m.export_proto() for m in model.metrics)
+    messages.extend(c.export_proto() for c in model.callbacks)
+    for message in messages:
+        names.update(_message_names(message))
+    for l in model.layers:
+        if l.hint_layer is not None:
+            names.add(l.hint_layer.name)
+    return names
+
+
+class _GraphRewriter:
+    """Helper for rewriting the connections of a layer graph."""
+
+    def __init__(self, layers, keep):
+        self.layers = list(layers)
+        self.keep = set(keep)
+        self.removed = set()
+        self.sinks = set(l for l in self.layers if not l.children)
+
+    def is_protected(self, layer):
+        """Whether a layer must stay in the graph."""
+        return layer.name in self.keep or layer in self.sinks
+
+    def traverse(self):
+        """Remaining layers in topological order."""
+        return list(lbann.traverse_layer_graph(
+            [l for l in self.layers if l not in self.removed]))
+
+    def replace(self, old, new):
+        """Send the output of `new` to the children of `old`."""
+        for child in old.children:
+            child.parents = [new if p is old else p for p in child.parents]
+            new.children.append(child)
+        if old in self.sinks:
+            self.sinks.add(new)
+        if old.name in self.keep:
+            for l in self.layers:
+                if l.hint_layer is old:
+                    l.hint_layer = new
+        old.children = []
+        self.disconnect(old)
+        if new not in self.layers:
+            self.layers.append(new)
+
+    def bypass(self, layer):
+        """Send the input of a single-parent layer to its children."""
+        parent = layer.parents[0]
+        index = parent.children.index(layer)
+        parent.children[index:index + 1] = layer.children
+        for child in layer.children:
+            child.parents = [parent if p is layer else p
+                             for p in child.parents]
+        layer.parents = []
+        layer.children = []
+        self.removed.add(layer)
+
+    def disconnect(self, layer):
+        """Remove a layer without children, and any parent left unused."""
+        parents = layer.parents
+        for parent in parents:
+            parent.children.remove(layer)
+        layer.parents = []
+        self.removed.add(layer)
+        for parent in set(parents):
+            if not parent.children and not self.is_protected(parent):
+                self.disconnect(parent)
+
+
+def _fold_constants(graph: _GraphRewriter) -> int:
+    """Replace layers with constant inputs by `Constant` layers."""
+    num_folded = 0
+    for l in graph.traverse():
+        if (l in graph.removed or not l.parents
+                or not all(isinstance(p, lbann.Constant) for p in l.parents)
+                or any(_placement(p) != _placement(l.parents[0])
+                       for p in l.parents)):
+            continue
+        parent = l.parents[0]
+        dims = _constant_dims(parent)
+        hint_layer = parent.hint_layer
+        if isinstance(l, lbann.OperatorLayer):
+            try:
+                values = [p.value or 0.0 for p in l.parents]
+                for op in l.ops:
+                    values = [FOLDABLE_OPERATORS[type(op)](op, *values)]
+                value = values[0]
+            except (KeyError, TypeError, ArithmeticError, ValueError):
+                continue
+        elif isinstance(l, lbann.Sum):
+            value = sum(p.value or 0.0 for p in l.parents)
+        elif isinstance(l, (lbann.Reshape, lbann.Tessellate)):
+            value = parent.value
+            dims = [int(d) for d in make_iterable(l.dims)]
+            hint_layer = None
+            if -1 in dims:
+                continue
+        else:
+            continue
+        if (len(l.parents) > 1 and any(
+                _constant_dims(p) != dims or p.hint_layer is not hint_layer
+                for p in l.parents)):
+            continue
+        folded = lbann.Constant(value=value,
+                                num_neurons=dims,
+                                name=l.name,
+                                device=l.device,
+                                data_layout=l.data_layout,
+                                datatype=l.datatype,
+                                hint_layer=hint_layer,
+                                parallel_strategy=l.parallel_strategy)
+        folded.grid_tag = l.grid_tag
+        graph.replace(l, folded)
+        num_folded += 1
+    return num_folded
+
+
+def _remove_noops(graph: _GraphRewriter) -> int:
+    """Bypass layers that return their input unchanged."""
+    num_removed = 0
+    for l in graph.traverse():
+        if len(l.parents) != 1 or l in graph.removed:
+            continue
+        parent = l.parents[0]
+
+        # Reshape of a reshape only needs to reshape once
+        if (isinstance(l, lbann.Reshape) and isinstance(parent, lbann.Reshape)
+                and list(make_iterable(l.dims)) != list(
+                    make_iterable(parent.dims))
+                and _placement(l) == _placement(parent)
+                and len(parent.parents) == 1):
+            grandparent = parent.parents[0]
+            if parent.children == [l] and not graph.is_protected(parent):
+                graph.bypass(parent)
+                num_removed += 1
+                parent = grandparent
+            elif type(grandparent) not in MULTI_OUTPUT_LAYERS:
+                parent.children.remove(l)
+                grandparent.children.append(l)
+                l.parents = [grandparent]
+                parent = grandparent
+
+        # Check whether layer is a no-op
+        if isinstance(l, lbann.Identity):
+            noop = True
+        elif isinstance(l, lbann.Reshape):
+            dims = _output_dims(parent)
+            noop = dims is not None and dims == _dims(l.dims)
+        elif isinstance(l, lbann.OperatorLayer):
+            noop = all(_is_noop_operator(op) for op in l.ops)
+        else:
+            noop = False
+        if (not noop or graph.is_protected(l)
+                or _placement(l) != _placement(parent)
+                or (len(l.children) > 1
+                    and type(parent) in MULTI_OUTPUT_LAYERS)):
+            continue
+        graph.bypass(l)
+        num_removed += 1
+    return num_removed
+
+
+def _deduplicate(graph: _GraphRewriter) -> int:
+    """Merge layers that compute the same function of the same inputs."""
+    num_merged = 0
+    canonical = {}
+    for l in graph.traverse():
+        if (l in graph.removed or type(l) in MULTI_OUTPUT_LAYERS
+                or type(l) in NONDETERMINISTIC_LAYERS
+                or (not l.parents and not isinstance(l, lbann.Constant))):
+            continue
+
+        # Children of a multi-output layer read different outputs, even
+        # though their messages name the same parent
+        if any(type(p) in MULTI_OUTPUT_LAYERS for p in l.parents):
+            continue
+
+        # Key is the layer's message without its name and children
+        # Note: Exporting operator layers may set their datatype.
+        datatype = l.datatype
+        proto = l.export_proto()
+        l.datatype = datatype
+        proto.ClearField('name')
+        proto.ClearField('children')
+        key = proto.SerializeToString(deterministic=True)
+
+        original = canonical.setdefault(key, l)
+        if original is l or graph.is_protected(l):
+            continue
+        for parent in l.parents:
+            parent.children.remove(l)
+        l.parents = []
+        graph.replace(l, original)
+        num_merged += 1
+    return num_merged
+
+
+def _fuse_elementwise(graph: _GraphRewriter) -> int:
+    """Merge chains of operator layers into single layers."""
+    num_fused = 0
+    for l in graph.traverse():
+        if (not isinstance(l, lbann.OperatorLayer) or len(l.parents) != 1
+                or l.hint_layer is not None):
+            continue
+        parent = l.parents[0]
+        if (not isinstance(parent, lbann.OperatorLayer)
+                or parent.children != [l] or graph.is_protected(parent)
+                or parent.hint_layer is not None
+                or _placement(l) != _placement(parent)
+                or ((type(l) is lbann.OperatorLayer) !=
+                    (type(parent) is lbann.OperatorLayer))):
+            continue
+
+        # Operators of the parent are applied first
+        l.ops = list(make_iterable(parent.ops)) + list(make_iterable(l.ops))
+        l.parents = parent.parents
+        for grandparent in parent.parents:
+            index = grandparent.children.index(parent)
+            grandparent.children[index] = l
+        parent.parents = []
+        parent.children = []
+        graph.removed.add(parent)
+        num_fused += 1
+    return num_fused
+
+
+def optimize_graph(model: lbann.Model,
+                   keep: Iterable[Union[lbann.Layer, str]] = (),
+                   fold_constants: bool = True,
+                   remove_noops: bool = True,
+                   deduplicate: bool = True,
+                   fuse_elementwise: bool = True) -> Dict[str, int]:
+    """Simplify a model's layer graph in place.
+
+    Call before exporting the model, or pass ``optimize_graph=True``
+    to `lbann.run`, which calls this with the default options. Layers
+    referenced by name in the model (see `referenced_layer_names`) or
+    without children are not removed. Layers must not be added to the
+    model afterwards, since parts of the graph may have been removed.
+
+    Args:
+        model (lbann.Model): Model to optimize.
+        keep (Iterable of lbann.Layer or str, optional): Additional
+            layers, or layer names, that must not be removed.
+        fold_constants (bool, optional): Replace layers with constant
+            inputs by `Constant` layers.
+        remove_noops (bool, optional): Bypass identity layers and
+            redundant reshapes.
+        deduplicate (bool, optional): Merge identical layers.
+        fuse_elementwise (bool, optional): Merge chains of operator
+            layers.
+
+    Returns:
+        dict of {str: int}: Number of layers folded, removed, merged
+            into duplicates or fused by each pass.
+
+    """
+    keep_names = referenced_layer_names(model)
+    keep_names.update(l if isinstance(l, str) else l.name
+                      for l in make_iterable(keep))
+    graph = _GraphRewriter(model.layers, keep_names)
+    stats = dict(folded=0, removed=0, deduplicated=0, fused=0)
+
+    # Simplifications may enable each other, so repeat until the graph
+    # stops changing
+    changed = True
+    while changed:
+        changed = False
+        for enabled, key, func in (
+            (fold_constants, 'folded', _fold_constants),
+            (remove_noops, 'removed', _remove_noops),
+            (deduplicate, 'deduplicated', _deduplicate),
+        ):
+            if enabled:
+                count = func(graph)
+                stats[key] += count
+                changed = changed or count > 0
+    if fuse_elementwise:
+        stats['fused'] = _fuse_elementwise(graph)
+
+    model.layers = graph.traverse()
+    return stats
@@ -0,0 +1,14 @@
+"""Groups of layer types shared by the model graph passes."""
+
+import lbann
+
+
+# Layers that produce one output per child. Their children read
+# different tensors, so they cannot be merged, reordered or share a
+# conversion of their input.
+MULTI_OUTPUT_LAYERS = frozenset([
+    lbann.Slice,
+    lbann.Split,
+    lbann.Cross_Grid_Sum,
+    lbann.Cross_Grid_Sum_Slice,
+])
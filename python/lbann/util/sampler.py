@@ -0,0 +1,330 @@
+"""Deterministic, resumable sample orders for Python datasets."""
+import json
+import os
+import numpy as np
+from numpy.typing import ArrayLike
+from typing import Dict, List, Optional
+
+
+class IndexSampler:
+    """
+    Deterministic, resumable order of dataset indices.
+
+    The sampler defines an endless stream of dataset indices, one epoch at a
+    time. The order of each epoch depends only on the seed and the epoch
+    number, so any position in the stream can be recomputed without
+    replaying earlier epochs. Each epoch is:
+
+    1. A seeded permutation of the dataset indices (or the identity if
+       shuffling is disabled).
+    2. Optionally bucketed by sample length: the permutation is split into
+       buckets, each bucket is sorted by length and cut into batches, and
+       the batches are shuffled. Batches therefore contain samples of
+       similar length. Samples that do not fill a batch are dropped for
+       that epoch.
+    3. Split into ``num_shards`` equal shards. When bucketing, shards are
+       made of whole batches. Samples that do not divide evenly between
+       shards are dropped for that epoch. By default, the dataset is split
+       into one shard per LBANN trainer when the data reader is set up.
+
+    The cursor records how far into the stream the sampler has progressed
+    and can be saved and restored, so a job can restart mid-epoch at the
+    same sample without re-reading or re-shuffling the dataset.
+    """
+
+    def __init__(
+        self,
+        num_samples: int,
+        seed: int = 0,
+        shuffle: bool = True,
+        num_shards: Optional[int] = None,
+        shard_index: int = 0,
+        lengths: Optional[ArrayLike] = None,
+        batch_size: Optional[int] = None,
+        bucket_size: Optional[int] = None,
+        cursor_path: Optional[str] = None,
+        save_interval: int = 100,
+    ) -> None:
+        """
+        IndexSampler Constructor
+
+        :param num_samples: Number of samples in the dataset
+        :type num_samples: int
+        :param seed: Random seed, defaults to 0
+        :type seed: int, optional
+        :param shuffle: Shuffle the samples each epoch, defaults to True
+        :type shuffle: bool, optional
+        :param num_shards: Number of shards the dataset is split into,
+            defaults to None (one shard per trainer, see :meth:`set_shard`)
+        :type num_shards: Optional[int], optional
+        :param shard_index: Shard read by this sampler, defaults to 0
+        :type shard_index: int, optional
+        :param lengths: Length of each sample, used to bucket samples of
+            similar length into the same batch, defaults to None (no
+            bucketing)
+        :type lengths: Optional[ArrayLike], optional
+        :param batch_size: Batch size used when bucketing by length,
+            defaults to None
+        :type batch_size: Optional[int], optional
+        :param bucket_size: Number of samples sorted together when bucketing
+            by length, defaults to 100 batches
+        :type bucket_size: Optional[int], optional
+        :param cursor_path: JSON file the cursor is saved to with
+            :meth:`save`. If the file exists, the cursor is restored from it.
+            When sharding by trainer, each shard uses its own file (see
+            :attr:`cursor_file`), defaults to None
+        :type cursor_path: Optional[str], optional
+        :param save_interval: Number of mini-batches between cursor saves
+            when training with LBANN, defaults to 100
+        :type save_interval: int, optional
+        """
+        if lengths is not None:
+            lengths = np.asarray(lengths)
+            if len(lengths) != num_samples:
+                raise ValueError(
+                    f"got {len(lengths)} sample lengths for {num_samples} samples"
+                )
+            if batch_size is None:
+                raise ValueError("bucketing by length requires a batch size")
+
+        self.num_samples = num_samples
+        self.seed = seed
+        self.shuffle = shuffle
+        self.shard_by_trainer = num_shards is None
+        self.lengths = lengths
+        self.batch_size = batch_size
+        self.bucket_size = bucket_size
+        self.cursor_path = cursor_path
+        self.save_interval = max(1, save_interval)
+        self.epoch = 0
+        self.position = 0
+        self.set_shard(num_shards or 1, shard_index)
+
+    def set_shard(self, num_shards: int, shard_index: int) -> None:
+        """
+        Select the shard read by this sampler and restore its cursor.
+
+        Called by the data reader with the number of LBANN trainers and the
+        trainer's index when sharding by trainer, since the sampler is
+        pickled before the trainers are known.
+
+        :param num_shards: Number of shards the dataset is split into
+        :type num_shards: int
+        :param shard_index: Shard read by this sampler
+        :type shard_index: int
+        """
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(
+                f"invalid shard index {shard_index} for {num_shards} shards"
+            )
+        self.num_shards = num_shards
+        self.shard_index = shard_index
+        self.epoch = 0
+        self.position = 0
+        self._epoch_cache = {}
+
+        # Samples are divided between shards in units of whole batches
+        # when bucketing
+        unit = self.batch_size if self.lengths is not None else 1
+        self.epoch_size = (self.num_samples // (unit * num_shards)) * unit
+
+        if self.cursor_file is not None and os.path.exists(self.cursor_file):
+            self.load()
+
+    @property
+    def cursor_file(self) -> Optional[str]:
+        """
+        File the cursor of this shard is saved to.
+
+        :return: The cursor path, with a ``.shard<index>`` suffix when the
+            dataset is sharded by trainer between several trainers
+        :rtype: Optional[str]
+        """
+        if self.cursor_path is None or not (
+            self.shard_by_trainer and self.num_shards > 1
+        ):
+            return self.cursor_path
+        return f"{self.cursor_path}.shard{self.shard_index}"
+
+    def __len__(self) -> int:
+        """
+        Number of samples per epoch in this shard.
+
+        :return: Samples per epoch
+        :rtype: int
+        """
+        return self.epoch_size
+
+    def _rng(self, epoch: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, epoch])
+
+    def _bucket(self, order: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Group samples of similar length into batches."""
+        bucket_size = self.bucket_size or 100 * self.batch_size
+        buckets = []
+        for start in range(0, len(order), bucket_size):
+            bucket = order[start : start + bucket_size]
+            buckets.append(bucket[np.argsort(self.lengths[bucket], kind="stable")])
+        order = np.concatenate(buckets)
+        num_batches = len(order) // self.batch_size
+        batches = order[: num_batches * self.batch_size].reshape(
+            num_batches, self.batch_size
+        )
+        if self.shuffle:
+            batches = batches[rng.permutation(num_batches)]
+        return batches
+
+    def epoch_indices(self, epoch: int) -> np.ndarray:
+        """
+        Dataset indices read by this shard in an epoch.
+
+        :param epoch: Epoch number
+        :type epoch: int
+        :return: Dataset indices, in order
+        :rtype: np.ndarray
+        """
+        if epoch in self._epoch_cache:
+            return self._epoch_cache[epoch]
+
+        rng = self._rng(epoch)
+        if self.shuffle:
+            order = rng.permutation(self.num_samples)
+        else:
+            order = np.arange(self.num_samples)
+
+        if self.lengths is not None:
+            batches = self._bucket(order, rng)
+            usable = (len(batches) // self.num_shards) * self.num_shards
+            indices = batches[self.shard_index : usable : self.num_shards].ravel()
+        else:
+            usable = self.epoch_size * self.num_shards
+            indices = order[self.shard_index : usable : self.num_shards]
+        indices = indices[: self.epoch_size]
+
+        # Keep the orders of the two most recent epochs, since lookups may
+        # straddle an epoch boundary
+        self._epoch_cache = {
+            e: v for e, v in self._epoch_cache.items() if e == epoch - 1
+        }
+        self._epoch_cache[epoch] = indices
+        return indices
+
+    @property
+    def stream_position(self) -> int:
+        """
+        Position of the cursor in the stream of samples.
+
+        :return: Number of samples read from this shard since epoch 0
+        :rtype: int
+        """
+        return self.epoch * self.epoch_size + self.position
+
+    def lookup(self, positions: ArrayLike) -> np.ndarray:
+        """
+        Dataset indices at positions in the stream of samples.
+
+        :param positions: Stream positions, as counted by
+            :attr:`stream_position`
+        :type positions: ArrayLike
+        :return: Dataset indices
+        :rtype: np.ndarray
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.epoch_size == 0:
+            raise ValueError("sampler shard has no samples")
+        epochs, offsets = np.divmod(positions, self.epoch_size)
+        indices = np.empty(positions.shape, dtype=np.int64)
+        for epoch in np.unique(epochs):
+            mask = epochs == epoch
+            indices[mask] = self.epoch_indices(int(epoch))[offsets[mask]]
+        return indices
+
+    def seek(self, stream_position: int) -> None:
+        """
+        Move the cursor to a position in the stream of samples.
+
+        :param stream_position: Stream position, as counted by
+            :attr:`stream_position`
+        :type stream_position: int
+        """
+        self.epoch, self.position = divmod(stream_position, max(1, self.epoch_size))
+
+    def take(self, num_samples: int) -> List[int]:
+        """
+        Return the next dataset indices and advance the cursor.
+
+        :param num_samples: Number of indices to return
+        :type num_samples: int
+        :return: Dataset indices
+        :rtype: List[int]
+        """
+        start = self.stream_position
+        indices = self.lookup(np.arange(start, start + num_samples))
+        self.seek(start + num_samples)
+        return indices.tolist()
+
+    def __iter__(self):
+        """
+        Iterate over the rest of the current epoch, advancing the cursor.
+        """
+        epoch = self.epoch
+        while self.epoch == epoch:
+            yield self.take(1)[0]
+
+    def state_dict(self) -> Dict[str, int]:
+        """
+        Serializable cursor state.
+
+        :return: Cursor state and the settings needed to validate it
+        :rtype: Dict[str, int]
+        """
+        return {
+            "seed": self.seed,
+            "num_samples": self.num_samples,
+            "num_shards": self.num_shards,
+            "shard_index": self.shard_index,
+            "epoch": self.epoch,
+            "position": self.position,
+        }
+
+    def load_state_dict(self, state: Dict[str, int]) -> None:
+        """
+        Restore cursor state.
+
+        :param state: State returned by :meth:`state_dict`
+        :type state: Dict[str, int]
+        """
+        for key in ("seed", "num_samples", "num_shards", "shard_index"):
+            if state[key] != getattr(self, key):
+                raise ValueError(
+                    f"sampler cursor was saved with {key}={state[key]}, "
+                    f"but sampler has {key}={getattr(self, key)}"
+                )
+        self.epoch = state["epoch"]
+        self.position = state["position"]
+
+    def save(self, path: Optional[str] = None) -> None:
+        """
+        Save the cursor to a JSON file.
+
+        The file is replaced atomically, so a job interrupted while saving
+        leaves the previous cursor intact.
+
+        :param path: Output file, defaults to :attr:`cursor_file`
+        :type path: Optional[str], optional
+        """
+        path = path or self.cursor_file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state_dict(), f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None) -> None:
+        """
+        Restore the cursor from a JSON file.
+
+        :param path: Input file, defaults to :attr:`cursor_file`
+        :type path: Optional[str], optional
+        """
+        with open(path or self.cursor_file, "r") as f:
+            self.load_state_dict(json.load(f))
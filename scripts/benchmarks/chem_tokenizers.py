@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Benchmark batch tokenization of molecules.
+
+Compares the per-string HuggingFace path used by ``ChemTextDataset``
+against the batch path (``encode_batch``), in molecules per second.
+
+"""
+
+import argparse
+import time
+import numpy as np
+from lbann.contrib.data.chem_tokenizers import TOKENIZERS, ChemTokenType
+
+def load_molecules(args):
+    """Return molecules from a file, or random SMILES-like strings."""
+    if args.file:
+        with open(args.file, 'r') as f:
+            return [line.strip() for _, line in zip(range(args.num_molecules),
+                                                    f)]
+    rng = np.random.default_rng(20240115)
+    alphabet = list('CCCCcccNnOo()=#123') + ['Cl', 'Br', '[nH]', '[C@@H]']
+    return [''.join(rng.choice(alphabet, rng.integers(10, 60)))
+            for _ in range(args.num_molecules)]
+
+def timed(func):
+    """Return the median run time of a function."""
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark batch tokenization of molecules')
+    parser.add_argument('vocab', help='vocabulary file')
+    parser.add_argument('--file', default=None,
+                        help='newline-separated molecules '
+                        '(default: random SMILES-like strings)')
+    parser.add_argument('--token-format', default='smiles',
+                        choices=[s.name.lower() for s in ChemTokenType],
+                        help='tokenizer type (default: smiles)')
+    parser.add_argument('--num-molecules', type=int, default=100000,
+                        help='number of molecules (default: 100000)')
+    parser.add_argument('--num-procs', type=int, nargs='+', default=[1, 8],
+                        help='process counts for the batch path '
+                        '(default: 1 8)')
+    args = parser.parse_args()
+
+    tokenizer = TOKENIZERS[ChemTokenType[args.token_format.upper()]](
+        args.vocab)
+    molecules = load_molecules(args)
+    n = len(molecules)
+
+    t = timed(lambda: [tokenizer(m)['input_ids'] for m in molecules])
+    print(f'{"per-string":>16}: {n / t:12.0f} molecules/s')
+    for num_procs in args.num_procs:
+        t = timed(lambda: tokenizer.encode_batch(molecules,
+                                                 num_procs=num_procs))
+        print(f'{f"batch, {num_procs} procs":>16}: {n / t:12.0f} molecules/s')
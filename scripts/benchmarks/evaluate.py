@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Benchmark repeated evaluation of a small model.
+
+Compares ``lbann.evaluate``, which launches an LBANN job per call, with
+an ``lbann.EvaluationSession``, which launches LBANN once and streams
+mini-batches to it. Reports calls per second for each; the session's
+startup time is reported separately.
+
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import lbann
+
+def build_model(args):
+    """Construct a small fully-connected network."""
+    x = lbann.Input(data_field='samples')
+    y = x
+    for i in range(args.num_layers):
+        y = lbann.FullyConnected(y, num_neurons=args.sample_size)
+        y = lbann.Relu(y)
+    y = lbann.Identity(y, name='output')
+    return lbann.Model(0, layers=lbann.traverse_layer_graph(x))
+
+def calls_per_second(func, calls):
+    """Return the rate of repeated calls to a function."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return calls / (time.perf_counter() - start)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark lbann.evaluate against a persistent '
+        'evaluation session')
+    parser.add_argument('--num-layers', type=int, default=2,
+                        help='fully-connected layers (default: 2)')
+    parser.add_argument('--sample-size', type=int, default=64,
+                        help='values per sample (default: 64)')
+    parser.add_argument('--mini-batch-size', type=int, default=16,
+                        help='samples per call (default: 16)')
+    parser.add_argument('--calls', type=int, default=100,
+                        help='session calls (default: 100)')
+    parser.add_argument('--evaluate-calls', type=int, default=3,
+                        help='lbann.evaluate calls (default: 3)')
+    args = parser.parse_args()
+
+    model = build_model(args)
+    inputs = np.random.rand(args.mini_batch_size,
+                            args.sample_size).astype(np.float32)
+    with tempfile.TemporaryDirectory() as work_dir:
+
+        # One LBANN job per call
+        def evaluate():
+            lbann.evaluate(model, inputs, outputs=['output'],
+                           work_dir=tempfile.mkdtemp(dir=work_dir))
+        rate = calls_per_second(evaluate, args.evaluate_calls)
+        print(f'lbann.evaluate: {rate:.3f} calls/s')
+
+        # Persistent session
+        start = time.perf_counter()
+        session = lbann.EvaluationSession(
+            model,
+            args.sample_size,
+            args.mini_batch_size,
+            outputs=['output'],
+            work_dir=os.path.join(work_dir, 'session'),
+        )
+        with session:
+            session.evaluate(inputs)
+            print(f'session startup: {time.perf_counter() - start:.3f} s')
+            rate = calls_per_second(lambda: session.evaluate(inputs),
+                                    args.calls)
+            print(f'session: {rate:.3f} calls/s')
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Benchmark saving experiments through an experiment cache.
+
+Builds an ``lbann.models.Transformer`` with an additional weights
+tensor given by value, and compares saving it as a plain binary
+experiment file with saving it through a ``lbann.proto.ExperimentCache``,
+first into an empty cache and then again after changing the optimizer,
+as in a hyperparameter sweep.
+
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import lbann
+import lbann.proto
+from export_proto import build_model, timed
+
+def add_value_weights(model, size):
+    """Add a weights tensor with explicit values to a model."""
+    values = np.random.default_rng(0).normal(size=size).astype(np.float32)
+    weights = lbann.Weights(
+        initializer=lbann.ValueInitializer(values=values),
+        optimizer=lbann.NoOptimizer(),
+    )
+    x = lbann.WeightsLayer(weights=weights, dims=[size])
+    y = lbann.Reduction(x)
+    model.layers.extend([x, y])
+    model.weights.add(weights)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark saving experiments through a cache')
+    parser.add_argument('--num-layers', type=int, default=24,
+                        help='encoder and decoder layers (default: 24)')
+    parser.add_argument('--parallel-heads', type=int, default=4,
+                        help='subgraph-parallel attention heads '
+                        '(default: 4)')
+    parser.add_argument('--hidden-size', type=int, default=256,
+                        help='hidden size (default: 256)')
+    parser.add_argument('--num-heads', type=int, default=8,
+                        help='attention heads (default: 8)')
+    parser.add_argument('--sequence-length', type=int, default=16,
+                        help='sequence length (default: 16)')
+    parser.add_argument('--value-weights', type=int, default=1 << 20,
+                        help='values of the explicit weights tensor '
+                        '(default: 1048576)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='timed repetitions (default: 3)')
+    args = parser.parse_args()
+
+    model = build_model(args)
+    add_value_weights(model, args.value_weights)
+    optimizer = lbann.SGD(learn_rate=0.1)
+    print(f'{len(model.layers)} layers, {len(model.weights)} weights')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, 'experiment.protobin')
+        plain = timed(lambda: lbann.proto.save_prototext(
+            file, binary=True, model=model, optimizer=optimizer),
+                      args.repeats)
+        print(f'plain save:  {plain:8.3f} s')
+
+        def cold_save():
+            cache_dir = tempfile.mkdtemp(dir=tmp_dir)
+            lbann.proto.ExperimentCache(cache_dir).save(
+                file, model=model, optimizer=optimizer)
+        cold = timed(cold_save, args.repeats)
+        print(f'cold cache:  {cold:8.3f} s')
+
+        cache = lbann.proto.ExperimentCache(os.path.join(tmp_dir, 'cache'))
+        cache.save(file, model=model, optimizer=optimizer)
+        def warm_save():
+            optimizer.learn_rate *= 0.5
+            cache.save(file, model=model, optimizer=optimizer)
+        warm = timed(warm_save, args.repeats)
+        print(f'warm cache:  {warm:8.3f} s ({plain / warm:.1f}x faster '
+              f'than plain save)')
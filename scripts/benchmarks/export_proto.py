@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Benchmark exporting a large layer graph to Protobuf.
+
+Builds an ``lbann.models.Transformer`` and times ``Model.export_proto``
+and writing the experiment file, which dominate the setup time of
+``lbann.run`` for models with tens of thousands of layers. Exporting
+the layers is also timed with the original path, which built a
+message per layer, set its fields through the generic descriptor
+lookup of ``set_protobuf_message`` and copied it into the model.
+
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import google.protobuf.descriptor
+import google.protobuf.message
+import numpy as np
+import lbann
+import lbann.models
+from lbann import layers_pb2, model_pb2
+from lbann.core.util import _protobuf_type_wrappers
+from lbann.util import make_iterable
+
+def build_model(args):
+    """Construct a Transformer model with its layer graph."""
+    transformer = lbann.models.Transformer(
+        hidden_size=args.hidden_size,
+        num_heads=args.num_heads,
+        num_encoder_layers=args.num_layers,
+        num_decoder_layers=args.num_layers,
+        parallel_attention_heads=args.parallel_heads,
+    )
+    source = lbann.Reshape(lbann.Input(data_field='samples'),
+                           dims=[args.sequence_length, args.hidden_size])
+    target = lbann.Identity(source)
+    y = transformer(source, target, args.sequence_length)
+    loss = lbann.L2Norm2(y)
+    return lbann.Model(1,
+                       layers=lbann.traverse_layer_graph(source),
+                       objective_function=loss)
+
+def legacy_set_protobuf_message(message, **kwargs):
+    """Original ``lbann.core.util.set_protobuf_message``."""
+    field_descriptors = message.DESCRIPTOR.fields_by_name
+    for field_name, value in kwargs.items():
+        if field_name not in field_descriptors:
+            raise KeyError(
+                f'Protobuf message {message.DESCRIPTOR.name} '
+                f'has no field "{field_name}"')
+        if value is None:
+            continue
+        try:
+            field = getattr(message, field_name)
+            field_descriptor = field_descriptors[field_name]
+            if field_descriptor.message_type in _protobuf_type_wrappers:
+                field.SetInParent()
+                field.value = value
+            elif field_descriptor.label == google.protobuf.descriptor.FieldDescriptor.LABEL_REPEATED:
+                try:
+                    iterable_value = make_iterable(value)
+                    if field_descriptor.type == field_descriptor.TYPE_MESSAGE:
+                        field.extend([x.export_proto() for x in iterable_value])
+                    else:
+                        field.extend(iterable_value)
+                except TypeError:
+                    if (type(value).__module__ == 'numpy' and type(value).__name__ == 'nditer'):
+                        value.reset()
+                        for v in value:
+                            field.append(float(v))
+                    else:
+                        raise
+            elif isinstance(value, google.protobuf.message.Message):
+                getattr(message, field_name).MergeFrom(value)
+            elif callable(getattr(value, "export_proto", None)):
+                getattr(message, field_name).MergeFrom(value.export_proto())
+            else:
+                setattr(message, field_name, value)
+        except:
+            raise TypeError(
+                f'Attempted to set field "{field_name}" in '
+                f'Protobuf message {message.DESCRIPTOR.name} '
+                f'with a {type(value).__name__}')
+
+# Layer message field of each generated layer class
+_layer_fields = {field.message_type.name: field.name
+                 for field in layers_pb2.Layer.DESCRIPTOR.fields
+                 if field.message_type is not None}
+
+def legacy_export_layer(layer):
+    """Export a layer like the original generated ``export_proto``.
+
+    Operator layers configure their operators when they are exported,
+    so the model should have been exported once before.
+
+    """
+    proto = layers_pb2.Layer()
+    lbann.Layer.export_proto_into(layer, proto)
+    cls = next(c for c in type(layer).__mro__ if c.__name__ in _layer_fields)
+    message = getattr(proto, _layer_fields[cls.__name__])
+    message.SetInParent()
+    kwargs = {}
+    for field_name in layer.get_field_names():
+        val = getattr(layer, field_name, None)
+        if val is not None:
+            kwargs[field_name] = val
+    legacy_set_protobuf_message(message, **kwargs)
+    return proto
+
+def export_layers(model, legacy=False):
+    """Export the layers of a model into a model message."""
+    message = model_pb2.Model()
+    if legacy:
+        message.layer.extend([legacy_export_layer(l) for l in model.layers])
+    else:
+        for l in model.layers:
+            l.export_proto_into(message.layer.add())
+    return message
+
+def timed(func, repeats):
+    """Return the median run time of a function."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark Protobuf export of a large Transformer')
+    parser.add_argument('--num-layers', type=int, default=24,
+                        help='encoder and decoder layers (default: 24)')
+    parser.add_argument('--parallel-heads', type=int, default=4,
+                        help='subgraph-parallel attention heads '
+                        '(default: 4)')
+    parser.add_argument('--hidden-size', type=int, default=256,
+                        help='hidden size (default: 256)')
+    parser.add_argument('--num-heads', type=int, default=8,
+                        help='attention heads (default: 8)')
+    parser.add_argument('--sequence-length', type=int, default=16,
+                        help='sequence length (default: 16)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='timed repetitions (default: 3)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = build_model(args)
+    print(f'{len(model.layers)} layers, {len(model.weights)} weights '
+          f'(built in {time.perf_counter() - start:.2f} s)')
+
+    t = timed(model.export_proto, args.repeats)
+    print(f'export_proto:   {t:8.3f} s')
+    if (export_layers(model, legacy=True).SerializeToString()
+        != export_layers(model).SerializeToString()):
+        raise RuntimeError('exported layers differ from the original path')
+    before = timed(lambda: export_layers(model, legacy=True), args.repeats)
+    after = timed(lambda: export_layers(model), args.repeats)
+    print(f'layers, before: {before:8.3f} s')
+    print(f'layers, after:  {after:8.3f} s ({before / after:.2f}x faster)')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for binary in (False, True):
+            file = os.path.join(tmp_dir, 'experiment')
+            t = timed(lambda: lbann.proto.save_prototext(
+                file, binary=binary, model=model), args.repeats)
+            name = 'protobin' if binary else 'prototext'
+            print(f'save {name}: {t:8.3f} s')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark batch handoff in the Python dataset data reader.
+
+Compares the copy path, where each batch is returned in freshly
+allocated arrays and then copied into LBANN's input buffer, against
+loading batches in place into a persistent registered buffer.
+
+"""
+
+import argparse
+import time
+import numpy as np
+from lbann.util.data import DataReader, Dataset, Sample, SampleDims
+
+class RandomDataset(Dataset):
+    """Dataset of constant random samples."""
+
+    def __init__(self, num_samples, sample_size):
+        self.num_samples = num_samples
+        self.data = np.random.random(sample_size).astype(np.float32)
+
+    def __len__(self):
+        return self.num_samples
+
+    def __getitem__(self, index):
+        return Sample(sample=self.data)
+
+    def get_sample_dims(self):
+        return SampleDims(sample=self.data.shape)
+
+def benchmark(sample_size, args):
+    """Return seconds per batch for the copy and in-place paths."""
+    dataset = RandomDataset(args.mini_batch_size * args.num_batches,
+                            sample_size)
+    reader = DataReader(dataset,
+                        args.num_procs,
+                        args.prefetch_factor,
+                        'f')
+
+    # Persistent input buffer, as allocated by LBANN
+    buffer = np.empty((args.mini_batch_size, sample_size), dtype=np.float32)
+    buffers_id = reader.register_batch_buffers(
+        {'sample': (buffer.ctypes.data, sample_size, args.mini_batch_size)})
+
+    def run(fetch):
+        times = []
+        for _ in range(args.num_batches):
+            reader.queue_samples(list(range(args.mini_batch_size)))
+            start = time.perf_counter()
+            fetch()
+            times.append(time.perf_counter() - start)
+        return np.median(times)
+
+    def copy_path():
+        batch = reader.get_batch(args.mini_batch_size)
+        np.copyto(buffer, batch['sample'])
+
+    def in_place_path():
+        reader.get_batch_into(args.mini_batch_size, buffers_id)
+
+    try:
+        return run(copy_path), run(in_place_path)
+    finally:
+        reader.terminate()
+
+# Parse command-line arguments
+parser = argparse.ArgumentParser(
+    description='Benchmark batch handoff in the Python dataset data reader.')
+parser.add_argument('--sample-sizes', action='store', nargs='+', type=int,
+                    default=[1024, 64*1024, 1024*1024, 4*128**3],
+                    help='number of float32 entries per sample '
+                    '(default: 1K, 64K, 1M, 4x128^3)',
+                    metavar='SIZE')
+parser.add_argument('--mini-batch-size', action='store', default=4, type=int,
+                    help='mini-batch size (default: 4)', metavar='NUM')
+parser.add_argument('--num-batches', action='store', default=20, type=int,
+                    help='number of timed batches (default: 20)',
+                    metavar='NUM')
+parser.add_argument('--num-procs', action='store', default=4, type=int,
+                    help='number of worker processes (default: 4)',
+                    metavar='NUM')
+parser.add_argument('--prefetch-factor', action='store', default=1, type=int,
+                    help='samples to prefetch per worker (default: 1)',
+                    metavar='NUM')
+args = parser.parse_args()
+
+print(f'{"sample size":>12} {"copy (ms)":>10} {"in place (ms)":>14} {"speedup":>8}')
+for sample_size in args.sample_sizes:
+    copy_time, in_place_time = benchmark(sample_size, args)
+    print(f'{sample_size:>12} {copy_time*1e3:>10.3f} '
+          f'{in_place_time*1e3:>14.3f} {copy_time/in_place_time:>8.2f}')
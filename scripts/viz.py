@@ -2,11 +2,13 @@
 """Visualize an LBANN model's layer graph and save to file."""
 
 import argparse
+import math
 import random
 import re
 import graphviz
 from lbann import lbann_pb2, layers_pb2
 from lbann.proto import serialize
+from lbann.util import cost_model
 
 # Pastel rainbow (slightly shuffled) from colorkit.co
 palette = [
@@ -50,7 +52,31 @@ parser.add_argument('--color-cross-grid',
                     action='store_true',
                     default=False,
                     help='Highlight cross-grid edges')
+parser.add_argument('--heatmap',
+                    action='store',
+                    default=None,
+                    type=str,
+                    choices=('forward-flops', 'backward-flops', 'activations',
+                             'weights'),
+                    help='color layers by estimated cost '
+                    '(requires --input-dims)')
+parser.add_argument('--input-dims',
+                    action='append',
+                    default=[],
+                    type=str,
+                    help='sample dimensions of input layers, either for all '
+                    'input layers (e.g. 3,224,224) or for a data field '
+                    '(e.g. labels=1000). May be repeated.',
+                    metavar='[FIELD=]DIMS')
+parser.add_argument('--mini-batch-size',
+                    action='store',
+                    default=1,
+                    type=int,
+                    help='mini-batch size for cost estimates (default: 1)',
+                    metavar='NUM')
 args = parser.parse_args()
+if args.heatmap and not args.input_dims:
+    parser.error('--heatmap requires --input-dims')
 
 # Strip extension from filename
 filename = args.output
@@ -65,6 +91,51 @@ label_format = re.sub(r' |-|_', '', args.label_format.lower())
 proto = serialize.generic_load(args.input)
 model = proto.model
 
+# Estimate layer costs for heatmap
+heat = {}
+if args.heatmap:
+    input_dims = {}
+    for arg in args.input_dims:
+        field, _, dims = arg.rpartition('=')
+        dims = [int(d) for d in dims.split(',')]
+        if field:
+            input_dims[field] = dims
+        else:
+            for l in model.layer:
+                if l.HasField('input'):
+                    input_dims.setdefault(l.input.data_field or 'samples',
+                                          dims)
+    estimate = cost_model.estimate_model(model, args.mini_batch_size,
+                                         input_dims)
+    print(estimate.summary())
+    attr = {
+        'forward-flops': 'forward_flops',
+        'backward-flops': 'backward_flops',
+        'activations': 'activation_bytes',
+        'weights': 'weight_bytes',
+    }[args.heatmap]
+    scale = 1 if attr == 'weight_bytes' else args.mini_batch_size
+    heat = {l.name: getattr(l, attr) * scale for l in estimate.layers}
+max_heat = max(heat.values(), default=0)
+
+
+def heat_color(value):
+    """White-to-red color for a cost, on a log scale."""
+    if max_heat <= 0 or value <= 0:
+        return '#ffffff'
+    level = math.log1p(value) / math.log1p(max_heat)
+    other = round(255 * (1 - level))
+    return f'#ff{other:02x}{other:02x}'
+
+
+def heat_label(value):
+    """Abbreviated cost."""
+    for suffix in ('', 'K', 'M', 'G', 'T'):
+        if abs(value) < 1000 or suffix == 'T':
+            return f'{value:.4g}{suffix}'
+        value /= 1000
+
+
 # Construct graphviz graph
 graph = graphviz.Digraph(filename=filename,
                          format=file_format,
@@ -115,6 +186,12 @@ for l in model.layer:
     attrs = {}
     if tag != 0:
         attrs = dict(style='filled', fillcolor=palette[tag % len(palette)])
+    if l.name in heat:
+        attrs = dict(style='filled', fillcolor=heat_color(heat[l.name]))
+        if label.startswith('<'):
+            label = f'{label[:-1]}<br/>{heat_label(heat[l.name])}>'
+        else:
+            label = f'{label}\\n{heat_label(heat[l.name])}'
     graph.node(l.name, label=label, **attrs)
 
 # Add parent/child relationships as layer graph edges
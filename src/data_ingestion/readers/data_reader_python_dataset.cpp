@@ -97,13 +97,6 @@ bool python_dataset_reader::fetch_data_block(
     queue_samples(mb_size - m_queued_samples);
   }
 
-  // Check that shared memory array is large enough
-  uint64_t num_io_partitions = 1;
-#ifdef LBANN_HAS_DISTCONV
-  num_io_partitions = dc::get_number_of_io_partitions();
-#endif // LBANN_HAS_DISTCONV
-  const uint64_t sample_size = get_linearized_data_size() / num_io_partitions;
-
   El::Int sample_index;
   for (uint64_t i = 0; i < mb_size; ++i) {
     sample_index =
@@ -111,6 +104,85 @@ bool python_dataset_reader::fetch_data_block(
     indices_fetched.Set(i, 0, sample_index);
   }
 
+#ifdef LBANN_HAS_DISTCONV
+  // Responses of DistConv datasets are redistributed in a staging
+  // buffer, so fall back to copying batches returned by the Python data
+  // reader
+  if (!m_tensor_shuffle_required && has_responses()) {
+    const uint64_t sample_size =
+      get_linearized_data_size() / dc::get_number_of_io_partitions();
+    copy_batch(input_buffers, mb_size, sample_size);
+    this->queue_samples(mb_size);
+    return true;
+  }
+#endif // LBANN_HAS_DISTCONV
+
+  // Load the next batch directly into the input buffers
+  python::object buffers_id = get_registered_buffers(input_buffers);
+  python::object(PyObject_CallMethod(m_data_reader,
+                                     "get_batch_into",
+                                     "(l, O)",
+                                     mb_size,
+                                     buffers_id.get()));
+  python::check_error();
+
+  // Prefetch the next minibatch asynchronously
+  this->queue_samples(mb_size);
+
+  return true;
+}
+
+python::object python_dataset_reader::get_registered_buffers(
+  std::map<data_field_type, CPUMat*>& input_buffers)
+{
+  // NOTE: ASSUMES GIL IS ALREADY TAKEN
+
+  // Input buffers are identified by their memory layout
+  std::vector<std::pair<std::string, CPUMat*>> fields;
+  fields.emplace_back("sample", input_buffers[INPUT_DATA_TYPE_SAMPLES]);
+  if (has_labels()) {
+    fields.emplace_back("label", input_buffers[INPUT_DATA_TYPE_LABELS]);
+  }
+  if (has_responses()) {
+    fields.emplace_back("response", input_buffers[INPUT_DATA_TYPE_RESPONSES]);
+  }
+  std::vector<El::Int> key;
+  for (const auto& [name, buf] : fields) {
+    key.push_back(reinterpret_cast<El::Int>(buf->Buffer()));
+    key.push_back(buf->LDim());
+    key.push_back(buf->Width());
+  }
+  auto it = m_registered_buffers.find(key);
+  if (it != m_registered_buffers.end()) {
+    return it->second;
+  }
+
+  // Register buffers with the Python data reader
+  python::object buffers = PyDict_New();
+  for (const auto& [name, buf] : fields) {
+    python::object buffer = Py_BuildValue("(N, l, l)",
+                                          PyLong_FromVoidPtr(buf->Buffer()),
+                                          static_cast<long>(buf->LDim()),
+                                          static_cast<long>(buf->Width()));
+    PyDict_SetItemString(buffers, name.c_str(), buffer);
+  }
+  python::object buffers_id = PyObject_CallMethod(m_data_reader,
+                                                  "register_batch_buffers",
+                                                  "(O)",
+                                                  buffers.get());
+  python::check_error();
+  m_registered_buffers[key] = buffers_id;
+  return buffers_id;
+}
+
+#ifdef LBANN_HAS_DISTCONV
+void python_dataset_reader::copy_batch(
+  std::map<data_field_type, CPUMat*>& input_buffers,
+  uint64_t mb_size,
+  uint64_t sample_size)
+{
+  // NOTE: ASSUMES GIL IS ALREADY TAKEN
+
   // Get the next batch from the Python data reader
   python::object batch =
     PyObject_CallMethod(m_data_reader, "get_batch", "(l)", mb_size);
@@ -147,10 +219,7 @@ bool python_dataset_reader::fetch_data_block(
     DataType* responses_ptr = static_cast<DataType*>(
       PyLong_AsVoidPtr(PyDict_GetItemString(batch, "response_ptr")));
 
-#ifdef LBANN_HAS_DISTCONV
-    if (!m_tensor_shuffle_required)
-      shuffle_responses(responses_ptr);
-#endif // LBANN_HAS_DISTCONV
+    shuffle_responses(responses_ptr);
 
     CPUMat response_shared_memory_matrix(get_num_responses(),
                                          mb_size,
@@ -159,14 +228,8 @@ bool python_dataset_reader::fetch_data_block(
     CPUMat& Y = *(input_buffers[INPUT_DATA_TYPE_RESPONSES]);
     El::Copy(response_shared_memory_matrix, Y);
   }
-
-  // Prefetch the next minibatch asynchronously
-  this->queue_samples(mb_size);
-
-  return true;
 }
 
-#ifdef LBANN_HAS_DISTCONV
 void python_dataset_reader::shuffle_responses(DataType* responses_ptr)
 {
   // Shuffles the responses so that they are on the same ranks as the
@@ -301,11 +364,13 @@ void python_dataset_reader::setup(int num_io_threads,
   python::object lbann_data = PyImport_ImportModule("lbann.util.data");
   m_data_reader = PyObject_CallMethod(lbann_data,
                                       "DataReader",
-                                      "(O, l, l, s)",
+                                      "(O, l, l, s, O, i)",
                                       m_dataset.get(),
                                       num_io_threads,
                                       m_prefetch_factor,
-                                      datatype_typecode.c_str());
+                                      datatype_typecode.c_str(),
+                                      Py_True,
+                                      m_samples_per_task);
   python::check_error();
 
   queue_epoch();
@@ -360,6 +425,16 @@ void python_dataset_reader::queue_epoch()
   // Acquire Python GIL
   python::global_interpreter_lock gil;
 
+  // Notify the Python data reader that a new epoch is starting
+  execution_mode mode = exec_mode_from_string(get_role());
+  dataset& ds = get_trainer().get_data_coordinator().get_dataset(mode);
+  python::object(
+    PyObject_CallMethod(m_data_reader,
+                        "start_epoch",
+                        "(l)",
+                        static_cast<long>(ds.get_stride_to_next_mini_batch())));
+  python::check_error();
+
   // Resets the sample offset to the beginning of the epoch
   m_dataset_minibatch_offset = 0;
   m_dataset_sample_offset = 0;
@@ -370,7 +445,7 @@ void python_dataset_reader::queue_epoch()
 
   // Prefetch the first set of samples (if less than minibatch size, the first
   // minibatch read will take care of the rest)
-  queue_samples(m_prefetch_factor * m_num_io_threads);
+  queue_samples(m_prefetch_factor * m_num_io_threads * m_samples_per_task);
 }
 
 void python_dataset_reader::load()
@@ -395,9 +470,25 @@ void python_dataset_reader::load()
   m_dataset = PyObject_CallMethod(pickle_module, "loads", "(O)", data.get());
   python::check_error();
 
+  python::object lbann_data_module = PyImport_ImportModule("lbann.util.data");
+  python::check_error();
+
+  // Sampled datasets read the shard of the trainer
+  python::object sampled_dataset_class =
+    PyObject_GetAttrString(lbann_data_module, "SampledDataset");
+  if (PyObject_IsInstance(m_dataset, sampled_dataset_class)) {
+    python::object(
+      PyObject_CallMethod(m_dataset,
+                          "set_trainer",
+                          "(lll)",
+                          static_cast<long>(get_comm()->get_trainer_rank()),
+                          static_cast<long>(get_comm()->get_num_trainers()),
+                          static_cast<long>(get_comm()->get_rank_in_trainer())));
+  }
+  python::check_error();
+
 #ifdef LBANN_HAS_DISTCONV
   // Check if dataset supports distconv
-  python::object lbann_data_module = PyImport_ImportModule("lbann.util.data");
   python::object distconv_dataset_class =
     PyObject_GetAttrString(lbann_data_module, "DistConvDataset");
   if (PyObject_IsInstance(m_dataset, distconv_dataset_class)) {
@@ -37,10 +37,9 @@ void OperatorLayer<T, O, L, D>::write_specific_proto(
 
   proto.set_datatype(proto::ProtoDataType<T>);
   auto* msg = proto.mutable_operator_layer();
-  auto* op = msg->add_ops();
-  op->set_input_datatype(proto::ProtoDataType<T>);
-  op->set_output_datatype(proto::ProtoDataType<O>);
-  op->set_device_allocation(proto::ProtoDevice<D>);
+  for (auto const& op : m_ops) {
+    op->write_proto(*msg->add_ops());
+  }
 }
 
 #define PROTO_DEVICE(T, D)                                                     \
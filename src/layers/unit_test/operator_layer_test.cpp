@@ -142,16 +142,27 @@ TEMPLATE_LIST_TEST_CASE("OperatorLayer lifecycle",
       layer = std::make_unique<OperatorLayer>(world_comm, std::move(ops)));
     CHECK(IsValidPtr(layer));
   }
-  SECTION("Constructing with multiple operators fails")
+  SECTION("Construct with a chain of operators")
   {
     LayerPtr layer = nullptr;
     std::vector<std::unique_ptr<OpType>> ops;
     ops.reserve(2);
     ops.push_back(std::make_unique<ClampOpType>(-1.0, 1.0));
     ops.push_back(std::make_unique<ClampOpType>(-0.5, 0.5));
-    REQUIRE_THROWS(
+    REQUIRE_NOTHROW(
       layer = std::make_unique<OperatorLayer>(world_comm, std::move(ops)));
-    CHECK_FALSE(IsValidPtr(layer));
+    CHECK(IsValidPtr(layer));
+  }
+  SECTION("Copy construction with a chain of operators")
+  {
+    LayerPtr layer = nullptr;
+    std::vector<std::unique_ptr<OpType>> ops;
+    ops.reserve(2);
+    ops.push_back(std::make_unique<ClampOpType>(-1.0, 1.0));
+    ops.push_back(std::make_unique<ClampOpType>(-0.5, 0.5));
+    OperatorLayer src_layer(world_comm, std::move(ops));
+    REQUIRE_NOTHROW(layer = std::make_unique<OperatorLayer>(src_layer));
+    CHECK(IsValidPtr(layer));
   }
   SECTION("Copy construction")
   {
@@ -452,6 +452,7 @@ void init_data_readers(
       reader = new python_dataset_reader(params.dataset_path(),
                                          params.module_dir(),
                                          params.prefetch_factor(),
+                                         params.samples_per_task(),
                                          shuffle);
 #else
       LBANN_ERROR("attempted to construct Python data reader, "
@@ -667,6 +668,7 @@ void init_data_readers(
             split_reader = new python_dataset_reader(params.dataset_path(),
                                                      params.module_dir(),
                                                      params.prefetch_factor(),
+                                                     params.samples_per_task(),
                                                      shuffle);
             (*(python_dataset_reader*)split_reader) = (*(python_dataset_reader*)reader);
 #else